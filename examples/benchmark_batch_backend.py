@@ -0,0 +1,57 @@
+"""
+Compare per task overhead of :py:class:`BatchManager` and :py:class:`PoolBatchManager`.
+
+Run ``python benchmark_batch_backend.py [tasks_num] [process_num]``.
+"""
+import sys
+import time
+from dataclasses import dataclass, field
+from uuid import UUID, uuid4
+
+from PartSegCore.analysis.batch_processing.parallel_backend import BatchManager, PoolBatchManager
+
+
+@dataclass
+class GlobalParameters:
+    shift: int = 1
+    uuid: UUID = field(default_factory=uuid4)
+
+
+def tiny_task(data, global_parameters: GlobalParameters):
+    return data + global_parameters.shift
+
+
+def measure(manager_class, tasks_num: int, process_num: int) -> float:
+    """Time from adding work to consuming the last result, including workers start"""
+    manager = manager_class()
+    manager.set_number_of_process(process_num)
+    start = time.perf_counter()
+    manager.add_work(list(range(tasks_num)), GlobalParameters(), tiny_task)
+    results_num = 0
+    while manager.has_work:
+        results_num += len(manager.get_result())
+        time.sleep(0.001)
+    duration = time.perf_counter() - start
+    if results_num != tasks_num:  # pragma: no cover
+        raise RuntimeError(f"Expected {tasks_num} results, got {results_num}")
+    while not manager.finished:
+        manager.join_all()
+        time.sleep(0.1)
+    return duration
+
+
+def main():
+    tasks_num = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    process_num = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    for manager_class in (BatchManager, PoolBatchManager):
+        start_duration = measure(manager_class, 1, process_num)
+        duration = measure(manager_class, tasks_num, process_num)
+        per_task = (duration - start_duration) / (tasks_num - 1)
+        print(
+            f"{manager_class.__name__}: {tasks_num} tasks in {duration:.2f} s "
+            f"(start {start_duration:.2f} s), {per_task * 10**6:.1f} µs per task"
+        )
+
+
+if __name__ == "__main__":
+    main()
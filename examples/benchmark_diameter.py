@@ -0,0 +1,57 @@
+"""
+Compare :py:class:`Diameter` and :py:class:`DistanceMaskROI` point reduction with reference implementation
+(:py:func:`iterative_double_normal` on all border points and :py:func:`min_distance_brute`).
+
+Run ``python benchmark_diameter.py [radius]``.
+"""
+import sys
+import time
+
+import numpy as np
+
+from PartSegCore.analysis.measurement_calculation import (
+    Diameter,
+    get_border,
+    iterative_double_normal,
+    min_distance,
+    min_distance_brute,
+)
+
+
+def ellipsoid(radius: int) -> np.ndarray:
+    z, y, x = np.ogrid[-radius // 2 : radius // 2 + 1, -radius : radius + 1, -2 * radius : 2 * radius + 1]
+    return (z / (radius / 2)) ** 2 + (y / radius) ** 2 + (x / (2 * radius)) ** 2 <= 1
+
+
+def diameter_reference(area_array, voxel_size):
+    pos = np.transpose(np.nonzero(get_border(area_array))).astype(float) * voxel_size
+    return np.sqrt(iterative_double_normal(pos)[0])
+
+
+def measure(fun, *args):
+    start = time.perf_counter()
+    res = fun(*args)
+    return res, time.perf_counter() - start
+
+
+def main():
+    radius = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    voxel_size = np.array([3.0, 1.0, 1.0])
+    mask = ellipsoid(radius)
+    print(f"{np.count_nonzero(mask)} voxels")
+    res, duration = measure(diameter_reference, mask, voxel_size)
+    print(f"reference diameter: {res:.2f} in {duration:.3f} s")
+    res, duration = measure(Diameter.calculate_property, mask, voxel_size, 1)
+    print(f"Diameter: {res:.2f} in {duration:.3f} s")
+
+    points1 = np.transpose(np.nonzero(get_border(mask))).astype(float)
+    points2 = np.transpose(np.nonzero(get_border(ellipsoid(radius // 2)))).astype(float)
+    points2[:, -1] += 5 * radius
+    print(f"{points1.shape[0]} and {points2.shape[0]} border points")
+    for fun in (min_distance_brute, min_distance):
+        res, duration = measure(fun, points1, points2)
+        print(f"{fun.__name__}: distance {res:.2f} in {duration:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compare time of calculation of all threshold methods one by one with :py:func:`compare_thresholds`
+which share histogram between methods.
+
+Run ``python benchmark_thresholds.py [size]``.
+"""
+import operator
+import sys
+import time
+
+import numpy as np
+
+from PartSegCore.segmentation.algorithm_base import SegmentationLimitException
+from PartSegCore.segmentation.threshold import ManualThreshold, ThresholdSelection, compare_thresholds
+
+
+def create_data(size: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    data = rng.normal(1000, 100, (size // 4, size, size))
+    data[:, size // 4 : 3 * size // 4, size // 4 : 3 * size // 4] += 2000
+    return data.astype(np.uint16)
+
+
+def one_by_one(data, mask):
+    res = {}
+    for name, method in ThresholdSelection.__register__.items():
+        if name == ManualThreshold.get_name():
+            continue
+        try:
+            res[name] = method.calculate_mask(data, mask, method.get_default_values(), operator.gt)[1]
+        except SegmentationLimitException:
+            continue
+    return res
+
+
+def measure(fun, *args):
+    start = time.perf_counter()
+    res = fun(*args)
+    return res, time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    data = create_data(size)
+    mask = np.ones(data.shape, dtype=np.uint8)
+    mask[:, :8] = 0
+    print(f"array {data.shape} {data.dtype}")
+    expected, reference_time = measure(one_by_one, data, mask)
+    res, duration = measure(compare_thresholds, data, mask, operator.gt)
+    print(f"one by one {reference_time:.3f} s, compare_thresholds {duration:.3f} s, same result: {res == expected}")
+    for name in ["Otsu", "Yen", "Triangle", "Moments", "Li"]:
+        method = ThresholdSelection[name]
+        _, duration = measure(method.calculate_mask, data, mask, method.get_default_values(), operator.gt)
+        print(f"{name}: {duration:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
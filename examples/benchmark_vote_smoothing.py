@@ -0,0 +1,82 @@
+"""
+Compare :py:class:`VoteSmoothing` and :py:class:`IterativeVoteSmoothing` with reference implementation
+based on :py:func:`numpy.roll` (previous implementation).
+
+Run ``python benchmark_vote_smoothing.py [size]``.
+"""
+import sys
+import time
+
+import numpy as np
+
+from PartSegCore.segmentation.border_smoothing import (
+    IterativeSmoothingParams,
+    IterativeVoteSmoothing,
+    VoteSmoothing,
+    VoteSmoothingParams,
+)
+from PartSegCore.segmentation.watershed import NeighType, get_neighbourhood
+
+
+def vote_reference(segmentation, neighbourhood_type, support_level, max_steps=1):
+    segmentation_bin = (segmentation > 0).astype(np.uint8)
+    count_array = np.zeros(segmentation_bin.shape, dtype=np.uint8)
+    neighbourhood = get_neighbourhood(segmentation_bin.squeeze().shape, neighbourhood_type)
+    segmentation = segmentation.copy()
+    count_point = np.count_nonzero(segmentation)
+    axis = tuple(range(len(segmentation_bin.shape)))
+    for _ in range(max_steps):
+        for shift in neighbourhood:
+            count_array += np.roll(segmentation_bin, shift, axis)
+        segmentation_bin[count_array < support_level] = 0
+        count_point2 = np.count_nonzero(segmentation_bin)
+        if count_point2 == count_point:
+            break
+        count_point = count_point2
+        count_array[:] = 0
+    segmentation[segmentation_bin.reshape(segmentation.shape) == 0] = 0
+    return segmentation
+
+
+def create_data(size: int) -> np.ndarray:
+    """Noisy ellipsoid in the middle of array, far from the array border"""
+    z, y, x = np.ogrid[-size // 4 : size // 4, -size:size, -size:size]
+    data = np.zeros((size, 3 * size, 3 * size), dtype=np.uint8)
+    ellipsoid = (z / (size / 5)) ** 2 + (y / (size * 0.8)) ** 2 + (x / (size * 0.8)) ** 2 <= 1
+    noise = np.random.default_rng(0).random(ellipsoid.shape) > 0.2
+    data[
+        size // 4 : size // 4 + ellipsoid.shape[0], size // 2 : size // 2 + 2 * size, size // 2 : size // 2 + 2 * size
+    ] = (ellipsoid & noise)
+    return data
+
+
+def measure(fun, *args):
+    start = time.perf_counter()
+    res = fun(*args)
+    return res, time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    data = create_data(size)
+    print(f"array {data.shape}, {np.count_nonzero(data)} labeled voxels")
+    for neighbourhood_type, support_level in [(NeighType.sides, 4), (NeighType.edges, 9), (NeighType.vertex, 14)]:
+        for max_steps in (1, 5):
+            expected, reference_time = measure(vote_reference, data, neighbourhood_type, support_level, max_steps)
+            if max_steps == 1:
+                params = VoteSmoothingParams(neighbourhood_type=neighbourhood_type, support_level=support_level)
+                res, duration = measure(VoteSmoothing.smooth, data, params)
+            else:
+                params = IterativeSmoothingParams(
+                    neighbourhood_type=neighbourhood_type, support_level=support_level, max_steps=max_steps
+                )
+                res, duration = measure(IterativeVoteSmoothing.smooth, data, params)
+            print(
+                f"{neighbourhood_type}, support {support_level}, steps {max_steps}: "
+                f"reference {reference_time:.3f} s, current {duration:.3f} s, "
+                f"same result: {np.array_equal(res, expected)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -56,7 +56,6 @@ from PartSegCore.mask.algorithm_description import MaskAlgorithmSelection
 from PartSegCore.mask.history_utils import create_history_element_from_segmentation_tuple
 from PartSegCore.mask.io_functions import LoadROI, LoadROIFromTIFF, LoadROIParameters, MaskProjectTuple, SaveROI
 from PartSegCore.project_info import HistoryElement, HistoryProblem, calculate_mask_from_project
-from PartSegCore.roi_info import ROIInfo
 from PartSegImage import Image, TiffImageReader
 
 CONFIG_FOLDER = os.path.join(state_store.save_folder, "mask")
@@ -86,18 +85,14 @@ class MaskDialog(MaskDialogBase):
 
     def prev_mask(self):
         history: HistoryElement = self.settings.history_pop()
-        history.arrays.seek(0)
-        seg = np.load(history.arrays)
-        history.arrays.seek(0)
-        # TODO Check me
-        # self.settings.roi = seg["segmentation"]
+        roi_info, mask = history.get_roi_info_and_mask()
         self.settings._set_roi_info(  # pylint: disable=W0212
-            ROIInfo(seg["segmentation"]),
+            roi_info,
             False,
             history.roi_extraction_parameters["selected"],
             history.roi_extraction_parameters["parameters"],
         )
-        self.settings.mask = seg["mask"] if "mask" in seg else None
+        self.settings.mask = mask
         self.close()
 
 
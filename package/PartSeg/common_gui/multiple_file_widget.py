@@ -1,5 +1,5 @@
 import os
-from collections import Counter, defaultdict
+from collections import Counter
 from functools import partial
 from pathlib import Path
 from typing import Dict, List, Tuple
@@ -32,6 +32,7 @@ from PartSeg.common_gui.exception_hooks import load_data_exception_hook
 from PartSeg.common_gui.waiting_dialog import ExecuteFunctionDialog
 from PartSegCore.io_utils import LoadBase
 from PartSegCore.project_info import ProjectInfoBase
+from PartSegCore.project_state_store import DEFAULT_MEMORY_LIMIT, ProjectStateStore
 
 
 class MultipleFilesTreeWidget(QTreeWidget):
@@ -118,7 +119,8 @@ class MultipleFileWidget(QWidget):
     def __init__(self, settings: BaseSettings, load_dict: Dict[str, LoadBase], compare_in_context_menu=False):
         super().__init__()
         self.settings = settings
-        self.state_dict: Dict[str, Dict[str, ProjectInfoBase]] = defaultdict(dict)
+        # states are stored under (file path, state name) keys
+        self.state_dict = ProjectStateStore(settings.get("multiple_files_memory_limit", DEFAULT_MEMORY_LIMIT))
         self.state_dict_count = Counter()
         self.file_list = []
         self.load_register = load_dict
@@ -228,13 +230,23 @@ class MultipleFileWidget(QWidget):
     def load_state(self, item, _column=1):
         if item.parent() is None:
             return
-        file_name = self.file_list[self.file_view.indexOfTopLevelItem(item.parent())]
+        index = self.file_view.indexOfTopLevelItem(item.parent())
+        file_name = self.file_list[index]
         state_name = item.text(0)
-        project_info = self.state_dict[file_name][state_name]
+        project_info = self.state_dict[file_name, state_name]
         try:
             self.parent().parent().parent().set_data(project_info)
         except AttributeError:
             self.settings.set_project_info(project_info)
+        self._prefetch_next(index, state_name)
+
+    def _prefetch_next(self, index: int, state_name: str):
+        """Start loading state of next file, if it was moved to disc"""
+        if index + 1 >= len(self.file_list):
+            return
+        next_file = self.file_list[index + 1]
+        key = (next_file, state_name) if (next_file, state_name) in self.state_dict else (next_file, "raw image")
+        self.state_dict.prefetch(key)
 
     def load_compare(self, item):
         if item.parent() is None:
@@ -244,7 +256,7 @@ class MultipleFileWidget(QWidget):
             QMessageBox.information(self, "Wrong file", "Please select same file as main")
             return
         state_name = item.text(0)
-        project_info = self.state_dict[file_name][state_name]
+        project_info = self.state_dict[file_name, state_name]
         if hasattr(self.settings, "set_segmentation_to_compare"):
             self.settings.set_segmentation_to_compare(project_info.roi_info)
 
@@ -259,13 +271,12 @@ class MultipleFileWidget(QWidget):
         if not isinstance(state, ProjectInfoBase):  # workaround for PointsInfo load
             return
         normed_file_path = os.path.normpath(state.file_path)
-        sub_dict = self.state_dict[normed_file_path]
         name = f"state {self.state_dict_count[normed_file_path]+1}"
         if custom_name:
             name, ok = QInputDialog.getText(self, "Save name", "Save name:", text=name)
             if not ok:
                 return
-            while name in sub_dict or name in ["raw image", "image with mask"]:
+            while (normed_file_path, name) in self.state_dict or name in ["raw image", "image with mask"]:
                 name, ok = QInputDialog.getText(self, "Save name", "Save name (previous in use):", text=name)
                 if not ok:
                     return
@@ -280,17 +291,17 @@ class MultipleFileWidget(QWidget):
             item.setToolTip(0, normed_file_path)
             self.file_list.append(normed_file_path)
             QTreeWidgetItem(item, ["raw image"])
-            sub_dict["raw image"] = state.get_raw_copy()
+            self.state_dict[normed_file_path, "raw image"] = state.get_raw_copy()
             if state.is_masked():
                 QTreeWidgetItem(item, ["image with mask"])
-                sub_dict["image with mask"] = state.get_raw_mask_copy()
+                self.state_dict[normed_file_path, "image with mask"] = state.get_raw_mask_copy()
 
         item.setExpanded(True)
         if state.is_raw():
             return
         it = QTreeWidgetItem(item, [name])
         self.file_view.setCurrentItem(it)
-        sub_dict[name] = state
+        self.state_dict[normed_file_path, name] = state
         self.state_dict_count[state.file_path] += 1
 
     def forget(self):
@@ -306,9 +317,9 @@ class MultipleFileWidget(QWidget):
         if isinstance(item.parent(), QTreeWidgetItem):
             index = self.file_view.indexOfTopLevelItem(item.parent())
             text = self.file_list[index]
-            if item.text(0) not in self.state_dict[text]:
+            if (text, item.text(0)) not in self.state_dict:
                 return
-            del self.state_dict[text][item.text(0)]
+            del self.state_dict[text, item.text(0)]
             parent = item.parent()
             parent.removeChild(item)
             if parent.childCount() == 0:
@@ -318,7 +329,8 @@ class MultipleFileWidget(QWidget):
         else:
             index = self.file_view.indexOfTopLevelItem(item)
             text = self.file_list[index]
-            del self.state_dict[text]
+            for key in [x for x in self.state_dict if x[0] == text]:
+                del self.state_dict[key]
             del self.state_dict_count[text]
             self.file_list.remove(text)
             self.file_view.takeTopLevelItem(index)
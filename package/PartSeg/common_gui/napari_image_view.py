@@ -30,7 +30,8 @@ from PartSeg.common_gui.advanced_tabs import RENDERING_LIST, RENDERING_MODE_NAME
 from PartSeg.common_gui.channel_control import ChannelProperty, ColorComboBoxGroup
 from PartSeg.common_gui.custom_buttons import SearchROIButton
 from PartSeg.common_gui.qt_modal import QtPopup
-from PartSegCore.image_operations import NoiseFilterType, bilateral, gaussian, median
+from PartSegCore.image_operations import FilteredArray, NoiseFilterType, bilateral, gaussian, median
+from PartSegCore.image_pyramid import build_pyramid, image_pyramids, level_count
 from PartSegCore.roi_info import ROIInfo
 from PartSegImage import Image
 
@@ -93,6 +94,8 @@ class ImageInfo:
     roi_info: ROIInfo = field(default_factory=lambda: ROIInfo(None))
     roi_count: int = 0
     highlight: Optional[Labels] = None
+    channel_levels: List[list] = field(default_factory=list)
+    """pyramid levels of each channel, single level for small images"""
 
     def coords_in(self, coords: Union[List[int], np.ndarray]) -> bool:
         if not self.layers:
@@ -346,7 +349,9 @@ class ImageView(QWidget):
             if not image_info.coords_in(cords):
                 continue
             moved_coords = image_info.translated_coords(cords)
-            bright_array.extend(layer.data[tuple(moved_coords)] for layer in image_info.layers if layer.visible)
+            bright_array.extend(
+                _full_resolution(layer)[tuple(moved_coords)] for layer in image_info.layers if layer.visible
+            )
 
             if (
                 image_info.roi_info.roi is not None
@@ -426,7 +431,12 @@ class ImageView(QWidget):
             return
         else:
             image_info.roi_info = roi_info
-            image_info.roi.data = roi_info.alternative.get(self.roi_alternative_selection, roi_info.roi)
+            self._set_labels_data(
+                image_info,
+                "roi",
+                _label_placeholder(roi_info.alternative.get(self.roi_alternative_selection, roi_info.roi)),
+            )
+            self._update_label_levels(image_info, "roi")
             image_info.roi.visible = True
             self.search_roi_btn.setDisabled(False)
 
@@ -499,7 +509,8 @@ class ImageView(QWidget):
             only_border = self.settings.get_from_profile(f"{self.name}.image_state.only_border", True)
             alternative = image_info.roi.metadata.get("alternative", self.roi_alternative_selection)
             if alternative != self.roi_alternative_selection:
-                image_info.roi.data = roi
+                self._set_labels_data(image_info, "roi", _label_placeholder(roi))
+                self._update_label_levels(image_info, "roi")
             image_info.roi.contour = border_thick if only_border else 0
             image_info.roi.metadata["alternative"] = self.roi_alternative_selection
 
@@ -530,8 +541,10 @@ class ImageView(QWidget):
         }
 
         only_border = self.settings.get_from_profile(f"{self.name}.image_state.only_border", True)
-        image_info.roi = self.viewer.add_labels(roi, **kwargs)
+        roi = _label_placeholder(roi)
+        image_info.roi = self.viewer.add_labels(roi, multiscale=isinstance(roi, list), **kwargs)
         image_info.roi.contour = border_thick if only_border else 0
+        self._update_label_levels(image_info, "roi")
 
     def set_mask(self, mask: Optional[np.ndarray] = None, image: Optional[Image] = None) -> None:
         image = self.get_image(image)
@@ -547,13 +560,18 @@ class ImageView(QWidget):
                 image_info.mask.metadata["valid"] = False
                 self._toggle_mask_chk_visibility()
             return
-        mask_marker = mask == 0
+        mask_marker = _label_placeholder(mask == 0)
         if image_info.mask is None:
             image_info.mask = self.viewer.add_labels(
-                mask_marker, scale=image.normalized_scaling(), blending="translucent", name="Mask"
+                mask_marker,
+                scale=image.normalized_scaling(),
+                blending="translucent",
+                name="Mask",
+                multiscale=isinstance(mask_marker, list),
             )
         else:
-            image_info.mask.data = mask_marker
+            self._set_labels_data(image_info, "mask", mask_marker)
+        self._update_label_levels(image_info, "mask")
         image_info.mask.metadata["valid"] = True
         image_info.mask.color = self.mask_color()
         image_info.mask.opacity = self.mask_opacity()
@@ -593,6 +611,28 @@ class ImageView(QWidget):
             return bilateral(array, parameters[1])
         return median(array, int(parameters[1]))
 
+    @staticmethod
+    def lazy_filter(levels: list, parameters: Tuple[NoiseFilterType, float]) -> Union[list, np.ndarray, FilteredArray]:
+        """
+        Filtered view of channel used for display. Filter is calculated only for parts of data
+        requested by napari (see :py:class:`FilteredArray`). For pyramid levels radius
+        is reduced together with resolution of level.
+
+        :param levels: levels of channel, single element list if channel is not shown as pyramid
+        :return: list of levels or single array if there is only one level
+        """
+        levels = [x.array if isinstance(x, FilteredArray) else x for x in levels]
+        filter_type, radius = parameters
+        if filter_type != NoiseFilterType.No and radius != 0:
+            res = []
+            for i, level in enumerate(levels):
+                level_radius = radius / 2**i
+                if filter_type == NoiseFilterType.Median:
+                    level_radius = max(1, int(level_radius))
+                res.append(FilteredArray(level, filter_type, level_radius))
+            levels = res
+        return levels if len(levels) > 1 else levels[0]
+
     def _remove_worker(self, sender=None):
         if sender is None:
             sender = self.sender()
@@ -622,6 +662,58 @@ class ImageView(QWidget):
         if data_ is not None:
             layer_.data = data_
 
+    def _set_labels_data(self, image_info: ImageInfo, name: str, data: Union[list, np.ndarray]):
+        """
+        Set data of ``roi`` or ``mask`` labels layer of image. ``Labels.data`` setter does not support
+        multiscale data, so then layer is replaced with new one with same properties.
+        """
+        layer: Labels = getattr(image_info, name)
+        if not layer.multiscale and not isinstance(data, list):
+            layer.data = data
+            return
+        new_layer = Labels(
+            data,
+            multiscale=isinstance(data, list),
+            name=layer.name,
+            scale=layer.scale,
+            translate=layer.translate,
+            blending=layer.blending,
+            opacity=layer.opacity,
+            visible=layer.visible,
+            metadata=dict(layer.metadata),
+        )
+        new_layer.contour = layer.contour
+        if hasattr(layer, "rendering"):
+            new_layer.rendering = layer.rendering
+        if layer in self.viewer.layers:
+            index = self.viewer.layers.index(layer)
+            self.viewer.layers.remove(layer)
+            self.viewer.layers.insert(index, new_layer)
+        setattr(image_info, name, new_layer)
+        if name == "roi":
+            self.set_roi_colormap(image_info)
+        else:
+            new_layer.color = self.mask_color()
+
+    def _update_label_levels(self, image_info: ImageInfo, name: str):
+        """Replace placeholder levels of multiscale ``roi`` or ``mask`` layer with levels calculated in background"""
+        layer: Labels = getattr(image_info, name)
+        if not layer.multiscale:
+            return
+        worker = calc_label_levels(_full_resolution(layer))
+        worker.returned.connect(partial(self._update_label_levels_end, image_info, name, layer))
+        worker.finished.connect(self._remove_worker)
+        self.worker_list.append(worker)
+        worker.start()
+
+    def _update_label_levels_end(self, image_info: ImageInfo, name: str, layer: Labels, levels: list):
+        if (
+            self.image_info.get(image_info.image.file_path) is image_info
+            and getattr(image_info, name) is layer
+            and _full_resolution(layer) is levels[0]
+        ):
+            self._set_labels_data(image_info, name, levels)
+
     def _add_image(self, image_data: Tuple[ImageInfo, bool]):
         image_info, replace = image_data
         image = image_info.image
@@ -641,6 +733,7 @@ class ImageView(QWidget):
 
         self.image_info[image.file_path].filter_info = filters
         self.image_info[image.file_path].layers = image_info.layers
+        self.image_info[image.file_path].channel_levels = image_info.channel_levels
         self.current_image = image.file_path
         mask_layer = self.image_info[image.file_path].mask
         if mask_layer is not None and mask_layer not in self.viewer.layers:
@@ -760,9 +853,12 @@ class ImageView(QWidget):
                     image_info.layers[index].gamma = self.channel_control.get_gamma()[index]
                     filter_type = self.channel_control.get_filter()[index]
                     if filter_type != image_info.filter_info[index]:
-                        image_info.layers[index].data = self.calculate_filter(
-                            image_info.image.get_channel(index), filter_type
+                        levels = (
+                            image_info.channel_levels[index]
+                            if image_info.channel_levels
+                            else [image_info.image.get_channel(index)]
                         )
+                        image_info.layers[index].data = self.lazy_filter(levels, filter_type)
                         image_info.filter_info[index] = filter_type
 
     def reset_image_size(self):
@@ -1003,15 +1099,15 @@ class ImageParameters:
 
 def _prepare_layers(image: Image, param: ImageParameters, replace: bool) -> Tuple[ImageInfo, bool]:
     image_layers = []
-    for i in range(image.channels):
+    pyramids = image_pyramids(image)
+    for i, levels in enumerate(pyramids):
         lim = list(param.limits[i])
         if lim[1] == lim[0]:
             lim[1] += 1
         blending = "additive" if i != 0 else "translucent"
-        data = image.get_channel(i)
-
         layer = NapariImage(
-            data,
+            levels if len(levels) > 1 else levels[0],
+            multiscale=len(levels) > 1,
             colormap=param.colormaps[i],
             visible=param.visibility[i],
             blending=blending,
@@ -1021,7 +1117,7 @@ def _prepare_layers(image: Image, param: ImageParameters, replace: bool) -> Tupl
             name=f"channel {i}; {param.layers + i}",
         )
         image_layers.append(layer)
-    return ImageInfo(image, image_layers, []), replace
+    return ImageInfo(image, image_layers, [], channel_levels=pyramids), replace
 
 
 prepare_layers = thread_worker(_prepare_layers)
@@ -1030,12 +1126,35 @@ prepare_layers = thread_worker(_prepare_layers)
 def _calc_layer_filter(layer: NapariImage, filter_type: NoiseFilterType, radius: float):
     if filter_type == NoiseFilterType.No or radius == 0:
         return None, layer
-    return ImageView.calculate_filter(layer.data, parameters=(filter_type, radius)), layer
+    levels = list(layer.data) if layer.multiscale else [layer.data]
+    return ImageView.lazy_filter(levels, parameters=(filter_type, radius)), layer
 
 
 calc_layer_filter = thread_worker(_calc_layer_filter)
 
 
+def _full_resolution(layer: Layer):
+    return layer.data[0] if layer.multiscale else layer.data
+
+
+def _label_placeholder(array: np.ndarray) -> Union[list, np.ndarray]:
+    """
+    Pyramid of labels with levels being strided views of array for big arrays, array for small ones.
+    Used until levels calculated with mode pooling are ready (see :py:meth:`ImageView._update_label_levels`).
+    """
+    count = level_count(array.shape)
+    if count == 1:
+        return array
+    return [array] + [array[..., :: 2**i, :: 2**i] for i in range(1, count)]
+
+
+def _calc_label_levels(array: np.ndarray) -> List[np.ndarray]:
+    return build_pyramid(array, labels=True)
+
+
+calc_label_levels = thread_worker(_calc_label_levels)
+
+
 def _print_dict(dkt: MutableMapping, indent="") -> str:
     if not isinstance(dkt, MutableMapping):  # pragma: no cover
         logging.error("%s instead of dict passed to _print_dict", type(dkt))
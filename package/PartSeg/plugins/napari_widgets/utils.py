@@ -1,7 +1,11 @@
+import copy
 import inspect
 import itertools
 import typing
+import weakref
+from collections import OrderedDict
 
+import numpy as np
 from magicgui.widgets import Widget, create_widget
 from napari import Viewer
 from napari.layers import Image as NapariImage
@@ -14,6 +18,11 @@ from PartSegCore import UNIT_SCALE, Units
 from PartSegCore.algorithm_describe_base import AlgorithmProperty
 from PartSegImage import Channel, Image
 
+_IMAGE_CACHE_SIZE = 4
+_image_cache: typing.MutableMapping[
+    Viewer, typing.MutableMapping[tuple, typing.Tuple[tuple, Image]]
+] = weakref.WeakKeyDictionary()
+
 
 class QtNapariAlgorithmProperty(QtAlgorithmProperty):
     @classmethod
@@ -58,22 +67,49 @@ class NapariFormDialog(FormDialog):
         self.widget.reset_choices()
 
 
-def generate_image(viewer: Viewer, *layer_names):
+def _layer_signature(layer: NapariImage) -> tuple:
+    return id(layer), id(layer.data), tuple(layer.scale[-3:])
+
+
+def _layer_range(layer: NapariImage) -> typing.Optional[typing.Tuple[float, float]]:
+    """Data range known by napari. For small integer types napari uses limits of dtype, so it is not used."""
+    data_range = tuple(layer.contrast_limits_range)
+    if np.issubdtype(layer.dtype, np.integer):
+        info = np.iinfo(layer.dtype)
+        if data_range == (info.min, info.max):
+            return None
+    return data_range
+
+
+def generate_image(viewer: Viewer, *layer_names) -> Image:
+    """
+    Create multichannel image from viewer layers. Layers data are not copied and ranges of channels
+    are taken from layers contrast limits range when possible, so image creation does not scan data.
+    Image is cached per layer set until data or scale of any layer changes.
+
+    :param viewer: viewer with layers
+    :param layer_names: names of image layers used as channels (duplicates are ignored)
+    :return: image with one channel per layer
+    """
+    names = tuple(dict.fromkeys(layer_names))
+    layers = [viewer.layers[name] for name in names]
+    signature = tuple(_layer_signature(layer) for layer in layers)
+    cache = _image_cache.setdefault(viewer, OrderedDict())
+    if names in cache and cache[names][0] == signature:
+        cache.move_to_end(names)
+        # copy, so changes of metadata (like mask) are not visible in cached image
+        return copy.copy(cache[names][1])
     axis_order = Image.axis_order.replace("C", "")
-    image_list = []
-    for name in dict.fromkeys(layer_names):
-        image_layer = viewer.layers[name]
-        data_scale = image_layer.scale[-3:] / UNIT_SCALE[Units.nm.value]
-        image_list.append(
-            Image(
-                image_layer.data,
-                data_scale,
-                axes_order=axis_order[-image_layer.data.ndim :],
-                channel_names=[image_layer.name],
-            )
-        )
-    res_image = image_list[0]
-    for image in image_list[1:]:
-        res_image = res_image.merge(image, "C")
-
-    return res_image
+    ndim = layers[0].data.ndim
+    image = Image.from_channels(
+        [layer.data for layer in layers],
+        layers[0].scale[-3:] / UNIT_SCALE[Units.nm.value],
+        axes_order=axis_order[-ndim:],
+        channel_names=[layer.name for layer in layers],
+        ranges=[_layer_range(layer) for layer in layers],
+    )
+    cache[names] = signature, image
+    cache.move_to_end(names)
+    while len(cache) > _IMAGE_CACHE_SIZE:
+        cache.popitem(last=False)
+    return copy.copy(image)
@@ -23,15 +23,17 @@ Calculation hierarchy:
 import json
 import logging
 import os
+import sqlite3
 import threading
 import traceback
 import uuid
 from collections import OrderedDict
 from enum import Enum
+from functools import partial
 from os import path
 from queue import Queue
 from traceback import StackSummary
-from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type, Union
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type, Union
 
 import numpy as np
 import pandas as pd
@@ -41,7 +43,9 @@ import xlsxwriter
 
 from PartSegCore.algorithm_describe_base import ROIExtractionProfile
 from PartSegCore.analysis.algorithm_description import AnalysisAlgorithmSelection
-from PartSegCore.analysis.batch_processing.parallel_backend import BatchManager, SubprocessOrder
+from PartSegCore.analysis.batch_processing.calculation_cache import CalculationCache
+from PartSegCore.analysis.batch_processing.parallel_backend import BatchManager, PoolBatchManager, SubprocessOrder
+from PartSegCore.analysis.batch_processing.shared_arrays import SharedArrayRegistry
 from PartSegCore.analysis.calculation_plan import (
     BaseCalculation,
     Calculation,
@@ -70,7 +74,7 @@ from PartSegCore.mask_create import calculate_mask
 from PartSegCore.project_info import AdditionalLayerDescription, HistoryElement
 from PartSegCore.roi_info import ROIInfo
 from PartSegCore.segmentation import RestartableAlgorithm
-from PartSegCore.segmentation.algorithm_base import ROIExtractionAlgorithm, report_empty_fun
+from PartSegCore.segmentation.algorithm_base import ROIExtractionAlgorithm, ROIExtractionResult, report_empty_fun
 from PartSegCore.utils import iterate_names
 from PartSegImage import Image, TiffImageReader
 
@@ -134,19 +138,31 @@ class CalculationProcess:
         self.history: List[HistoryElement] = []
         self.algorithm_parameters: dict = {}
         self.results: CalculationResultList = []
+        self.cache: Optional[CalculationCache] = None
+        self.shared_arrays: Optional[SharedArrayRegistry] = None
+        self.image_key: Optional[str] = None
 
-    def do_calculation(self, calculation: FileCalculation) -> CalculationResultList:
+    def load_projects(self, calculation: FileCalculation) -> List[ProjectTuple]:
         """
-        Main function for calculation process
+        Load data from file. If calculation has cache set then loaded data are taken from/stored in cache.
 
         :param calculation: calculation to do.
-        :return:
+        :return: list of loaded projects
         """
-        self.calculation = calculation
-        self.reused_mask = calculation.calculation_plan.get_reused_mask()
-        self.mask_dict = {}
-        self.measurement = []
-        self.results = []
+        operation = calculation.calculation_plan.execution_tree.operation
+        cache: Optional[CalculationCache] = calculation.cache
+        if cache is None:
+            return self._load_projects(calculation)
+        key = cache.make_key("load", cache.file_key(calculation.file_path), operation, calculation.voxel_size)
+        projects = cache.get(key)
+        if projects is None:
+            projects = self._load_projects(calculation)
+            cache.set(key, projects)
+        self.image_key = key
+        return projects
+
+    @staticmethod
+    def _load_projects(calculation: FileCalculation) -> List[ProjectTuple]:
         operation = calculation.calculation_plan.execution_tree.operation
         ext = path.splitext(calculation.file_path)[1]
         metadata = {"default_spacing": calculation.voxel_size}
@@ -170,11 +186,41 @@ class CalculationProcess:
 
         if isinstance(projects, ProjectTuple):
             projects = [projects]
-        for project in projects:
+        return projects
+
+    def do_calculation(self, calculation: FileCalculation) -> CalculationResultList:
+        """
+        Main function for calculation process
+
+        :param calculation: calculation to do.
+        :return:
+        """
+        self.calculation = calculation
+        self.reused_mask = calculation.calculation_plan.get_reused_mask()
+        self.mask_dict = {}
+        self.measurement = []
+        self.results = []
+        self.cache = calculation.cache
+        self.shared_arrays = calculation.shared_arrays
+        self.image_key = None
+        try:
+            return self._do_calculation(calculation)
+        finally:
+            if self.shared_arrays is not None:
+                self.mask = None
+                self.shared_arrays.close()
+
+    def _do_calculation(self, calculation: FileCalculation) -> CalculationResultList:
+        operation = calculation.calculation_plan.execution_tree.operation
+        projects = self.load_projects(calculation)
+        load_key = self.image_key
+        for i, project in enumerate(projects):
             project: ProjectTuple
             self.image = project.image
             if calculation.overwrite_voxel_size:
                 self.image.set_spacing(calculation.voxel_size)
+            if load_key is not None:
+                self.image_key = self.cache.make_key(load_key, i, self.image.spacing)
             if operation == RootType.Mask_project:
                 self.mask = project.mask
             if operation == RootType.Project:
@@ -220,15 +266,10 @@ class CalculationProcess:
             raise ValueError("Empty path to mask.")
         if not os.path.exists(mask_path):
             raise OSError(f"Mask file {mask_path} does not exists")
-        with tifffile.TiffFile(mask_path) as mask_file:
-            mask = mask_file.asarray()
-            mask = TiffImageReader.update_array_shape(mask, mask_file.series[0].axes)
-            if "C" in TiffImageReader.image_class.axis_order:
-                pos: List[Union[slice, int]] = [slice(None) for _ in range(mask.ndim)]
-                pos[TiffImageReader.image_class.axis_order.index("C")] = 0
-                mask = mask[tuple(pos)]
-
-        mask = (mask > 0).astype(np.uint8)
+        if self.shared_arrays is not None:
+            mask = self.shared_arrays.get_or_publish(mask_path, partial(self.read_mask, mask_path))
+        else:
+            mask = self.read_mask(mask_path)
         try:
             mask = self.image.fit_array_to_image(mask)[0]
             # TODO fix this time bug fix
@@ -239,6 +280,23 @@ class CalculationProcess:
         self.iterate_over(children)
         self.mask = old_mask
 
+    @staticmethod
+    def read_mask(mask_path: str) -> np.ndarray:
+        """
+        Read mask from tiff file.
+
+        :param mask_path: path to mask file
+        :return: binary mask with image axes order, without channel axis
+        """
+        with tifffile.TiffFile(mask_path) as mask_file:
+            mask = mask_file.asarray()
+            mask = TiffImageReader.update_array_shape(mask, mask_file.series[0].axes)
+            if "C" in TiffImageReader.image_class.axis_order:
+                pos: List[Union[slice, int]] = [slice(None) for _ in range(mask.ndim)]
+                pos[TiffImageReader.image_class.axis_order.index("C")] = 0
+                mask = mask[tuple(pos)]
+        return (mask > 0).astype(np.uint8)
+
     def step_segmentation(self, operation: ROIExtractionProfile, children: List[CalculationTree]):
         """
         Perform segmentation and iterate over ``children`` nodes
@@ -246,6 +304,24 @@ class CalculationProcess:
         :param ROIExtractionProfile operation: Specification of segmentation operation
         :param List[CalculationTree] children: list of nodes to iterate over after perform segmentation
         """
+        key = None
+        result = None
+        if self.cache is not None and self.image_key is not None:
+            mask = self.mask if self.mask is not None else b""
+            key = self.cache.make_key("segmentation", self.image_key, mask, operation.algorithm, operation.values)
+            result = self.cache.get(key)
+        if result is None:
+            result = self._calculate_segmentation(operation)
+            if key is not None:
+                self.cache.set(key, result)
+        backup_data = self.roi_info, self.additional_layers, self.algorithm_parameters
+        self.roi_info = ROIInfo(result.roi, result.roi_annotation, result.alternative_representation)
+        self.additional_layers = result.additional_layers
+        self.algorithm_parameters = {"algorithm_name": operation.algorithm, "values": operation.values}
+        self.iterate_over(children)
+        self.roi_info, self.additional_layers, self.algorithm_parameters = backup_data
+
+    def _calculate_segmentation(self, operation: ROIExtractionProfile) -> ROIExtractionResult:
         segmentation_class = AnalysisAlgorithmSelection.get(operation.algorithm)
         if segmentation_class is None:  # pragma: no cover
             raise ValueError(f"Segmentation class {operation.algorithm} do not found")
@@ -256,13 +332,7 @@ class CalculationProcess:
             segmentation_algorithm.set_parameters(operation.values)
         else:
             segmentation_algorithm.set_parameters(**operation.values)
-        result = segmentation_algorithm.calculation_run(report_empty_fun)
-        backup_data = self.roi_info, self.additional_layers, self.algorithm_parameters
-        self.roi_info = ROIInfo(result.roi, result.roi_annotation, result.alternative_representation)
-        self.additional_layers = result.additional_layers
-        self.algorithm_parameters = {"algorithm_name": operation.algorithm, "values": operation.values}
-        self.iterate_over(children)
-        self.roi_info, self.additional_layers, self.algorithm_parameters = backup_data
+        return segmentation_algorithm.calculation_run(report_empty_fun)
 
     def step_mask_use(self, operation: MaskUse, children: List[CalculationTree]):
         """
@@ -366,11 +436,9 @@ class CalculationProcess:
         # FIXME use additional information
         old_mask = self.image.mask
         self.image.set_mask(self.mask)
+        # files are processed in parallel, so components are calculated in single thread
         measurement = operation.measurement_profile.calculate(
-            self.image,
-            channel,
-            self.roi_info,
-            operation.units,
+            self.image, channel, self.roi_info, operation.units, stream_components=True, workers=1
         )
         self.measurement.append(measurement)
         self.image.set_mask(old_mask)
@@ -416,16 +484,19 @@ class CalculationManager:
     """
     This class manage batch processing in PartSeg.
 
+    :param batch_manager_class: class used to run calculation in parallel.
+        :py:class:`.BatchManager` or :py:class:`.PoolBatchManager`
     """
 
-    def __init__(self):
-        self.batch_manager = BatchManager()
+    def __init__(self, batch_manager_class: Type[Union[BatchManager, PoolBatchManager]] = BatchManager):
+        self.batch_manager = batch_manager_class()
         self.calculation_queue = Queue()
         self.calculation_dict: Dict[uuid.UUID, Calculation] = OrderedDict()
         self.calculation_sizes = []
         self.calculation_size = 0
         self.calculation_done = 0
         self.counter_dict = OrderedDict()
+        self.cancelled_calculations = set()
         self.errors_list = []
         self.writer = DataWriter()
 
@@ -447,6 +518,13 @@ class CalculationManager:
 
     def cancel_calculation(self, calculation: Calculation):
         self.batch_manager.cancel_work(calculation)
+        self.cancelled_calculations.add(calculation.uuid)
+        self._release_shared_arrays(calculation)
+
+    @staticmethod
+    def _release_shared_arrays(calculation: Calculation):
+        if calculation.shared_arrays is not None:
+            calculation.shared_arrays.unlink()
 
     def add_calculation(self, calculation: Calculation):
         """
@@ -454,6 +532,10 @@ class CalculationManager:
         """
         self.calculation_dict[calculation.uuid] = calculation
         self.counter_dict[calculation.uuid] = 0
+        if calculation.shared_arrays is None:
+            shared_mask_paths = calculation.get_shared_mask_paths()
+            if shared_mask_paths:
+                calculation.shared_arrays = SharedArrayRegistry(calculation.uuid.hex[:8], shared_mask_paths)
         size = len(calculation.file_list)
         self.calculation_sizes.append(size)
         self.calculation_size += size
@@ -471,6 +553,8 @@ class CalculationManager:
 
     def kill_jobs(self):
         self.batch_manager.kill_jobs()
+        for calculation in self.calculation_dict.values():
+            self._release_shared_arrays(calculation)
 
     def set_number_of_workers(self, val: int):
         """
@@ -507,6 +591,10 @@ class CalculationManager:
                 if self.counter_dict[uuid_id] == len(calculation.file_list):
                     errors = self.writer.calculation_finished(calculation)
                     new_errors.extend(("", err) for err in errors)
+                    self._release_shared_arrays(calculation)
+            if uuid_id in self.cancelled_calculations:
+                # file processed when calculation was cancelled could publish shared array again
+                self._release_shared_arrays(calculation)
         return BatchResultDescription(new_errors, self.calculation_done, self.counter_dict.copy())
 
 
@@ -519,18 +607,22 @@ class FileType(Enum):
 class SheetData:
     """
     Store single sheet information
+
+    Rows are kept in memory only until they are transferred to :py:class:`SheetStore`
+    with :py:meth:`get_new_rows`.
     """
 
-    def __init__(self, name: str, columns: List[Tuple[str, str]], raw=False):
+    def __init__(self, name: str, columns: List[Tuple[str, str]], raw=False, storage_name: str = ""):
         if len(columns) != len(set(columns)):
             raise ValueError(f"Columns should be unique: {columns}")
         self.name = name
+        self.storage_name = storage_name
         if raw:
             self.columns = pd.MultiIndex.from_tuples(columns)
         else:
             self.columns = pd.MultiIndex.from_tuples([("name", "units"), *columns])
-        self.data_frame = pd.DataFrame([], columns=self.columns)
-        self.row_list: List[Any] = []
+        self.row_list: List[Tuple[int, list]] = []
+        self._row_count = 0
 
     def add_data(self, data, ind):
         if len(data) != len(self.columns):
@@ -539,28 +631,107 @@ class SheetData:
                 f"{len(self.columns)} {data} for columns {self.columns.values}"
             )
         if ind is None:
-            ind = len(self.row_list)
+            ind = self._row_count
+        self._row_count += 1
         self.row_list.append((ind, data))
 
     def add_data_list(self, data, ind):
         if ind is None:
-            ind = len(self.row_list)
+            ind = self._row_count
         for x in data:
             self.add_data(x, ind)
 
-    def get_data_to_write(self) -> Tuple[str, pd.DataFrame]:
+    def get_new_rows(self) -> List[Tuple[int, list]]:
         """
-        Get data for write
+        Get rows added since last call, sorted by element index.
 
-        :return: sheet name and data to write
-        :rtype: Tuple[str, pd.DataFrame]
+        :return: list of pairs (element index, row)
         """
-        sorted_row = [x[1] for x in sorted(self.row_list)]
-        df = pd.DataFrame(sorted_row, columns=self.columns)
-        df2 = pd.concat((self.data_frame, df), axis=0)
-        self.data_frame = df2.reset_index(drop=True)
+        rows = sorted(self.row_list, key=lambda x: x[0])
         self.row_list = []
-        return self.name, self.data_frame
+        return rows
+
+
+class SheetStore:
+    """
+    Append only storage of measurement results backed by sqlite database.
+
+    Every sheet is stored in separated table. Rows are only appended, so cost of
+    write depends only on number of new rows. The whole result file is created
+    from this storage by :py:class:`FileData`. If the program is interrupted,
+    all rows already added are still available in the database (table ``sheets``
+    contains sheet names and columns of stored tables).
+
+    Only one thread could use instance of this class.
+
+    :param str db_path: path to database file
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sheets (storage_name TEXT PRIMARY KEY, sheet_name TEXT, columns TEXT)"
+            )
+            self._connection.execute('CREATE TABLE IF NOT EXISTS "errors" (file_path TEXT, description TEXT)')
+        return self._connection
+
+    def create_sheet(self, storage_name: str, sheet_name: str, columns: List[Tuple[str, str]]):
+        columns_def = ", ".join(f"c{i}" for i in range(len(columns)))
+        with self.connection as conn:
+            conn.execute(f'CREATE TABLE "{storage_name}" (ind INTEGER, {columns_def})')
+            conn.execute(
+                "INSERT INTO sheets VALUES (?, ?, ?)",
+                (storage_name, sheet_name, json.dumps([list(x) for x in columns])),
+            )
+
+    def remove_sheet(self, storage_name: str):
+        with self.connection as conn:
+            conn.execute(f'DROP TABLE IF EXISTS "{storage_name}"')
+            conn.execute("DELETE FROM sheets WHERE storage_name = ?", (storage_name,))
+
+    def append(self, storage_name: str, rows: List[Tuple[int, list]]):
+        if not rows:
+            return
+        placeholders = ", ".join("?" * (len(rows[0][1]) + 1))
+        with self.connection as conn:
+            conn.executemany(
+                f'INSERT INTO "{storage_name}" VALUES ({placeholders})',
+                [(ind, *map(_to_sql_value, row)) for ind, row in rows],
+            )
+
+    def append_errors(self, errors: List[Tuple[str, str]]):
+        if errors:
+            with self.connection as conn:
+                conn.executemany('INSERT INTO "errors" VALUES (?, ?)', errors)
+
+    def read_sheet(self, storage_name: str, columns: pd.MultiIndex) -> pd.DataFrame:
+        """Read all rows of sheet ordered by element index"""
+        cursor = self.connection.execute(f'SELECT * FROM "{storage_name}" ORDER BY ind, rowid')
+        return pd.DataFrame([row[1:] for row in cursor], columns=columns)
+
+    def read_errors(self) -> List[Tuple[str, str]]:
+        return self.connection.execute('SELECT * FROM "errors" ORDER BY rowid').fetchall()
+
+    def close(self, remove: bool = False):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if remove and path.exists(self.db_path):
+            os.remove(self.db_path)
+
+
+def _to_sql_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    return str(value)
 
 
 class FileData:
@@ -570,17 +741,22 @@ class FileData:
     This class run separate thread for writing purpose.
     This need additional synchronisation. but not freeze
 
+    New rows are appended to :py:class:`SheetStore` placed next to the result file
+    (``<name>_partial.sqlite``). The result file is created from the store when
+    calculation is finished (:py:meth:`export_data`), so writing of intermediate results
+    does not require rewriting whole file. The store is removed in :py:meth:`finish`.
+
     :param BaseCalculation calculation: calculation information
-    :param int write_threshold: every how many lines of data are written to disk
+    :param int write_threshold: every how many results new rows are appended to disk
     :cvar component_str: separator for per component sheet information
     """
 
     component_str = "_comp_"  #: separator for per component sheet information
 
-    def __init__(self, calculation: BaseCalculation, write_threshold: int = 40):
+    def __init__(self, calculation: BaseCalculation, write_threshold: int = 1):
         """
         :param BaseCalculation calculation: calculation information
-        :param int write_threshold: every how many lines of data are written to disk
+        :param int write_threshold: every how many results new rows are appended to disk
         """
         self.file_path = calculation.measurement_file_path
         ext = path.splitext(calculation.measurement_file_path)[1]
@@ -600,6 +776,13 @@ class FileData:
         self.sheet_set = {"Errors"}
         self.new_count = 0
         self.write_threshold = write_threshold
+        self._sheet_counter = 0
+        self._data_version = 0
+        self._exported_version = 0
+        self._export_failed = False
+        self.store = SheetStore(f"{path.splitext(self.file_path)[0]}_partial.sqlite")
+        if path.exists(self.store.db_path):
+            os.remove(self.store.db_path)
         self.wrote_queue = Queue()
         self.error_queue = Queue()
         self.write_thread = threading.Thread(target=self.wrote_data_to_file)
@@ -639,8 +822,11 @@ class FileData:
                 if sheet is None:
                     continue
                 self.sheet_set.remove(sheet.name)
+                self.wrote_queue.put(partial(self.store.remove_sheet, sheet.storage_name))
             self.sheet_set.remove(calculation.sheet_name)
+            self.wrote_queue.put(partial(self.store.remove_sheet, self.sheet_dict[calculation.uuid][0].storage_name))
             del self.sheet_dict[calculation.uuid]
+            self._data_version += 1
 
         if calculation.uuid in self.calculation_info:
             del self.calculation_info[calculation.uuid]
@@ -692,14 +878,23 @@ class FileData:
             header_list.append(local_header)
 
         self.sheet_dict[calculation.uuid] = (
-            SheetData(calculation.sheet_name, main_header),
-            [SheetData(name, header_list[i]) if name is not None else None for i, name in enumerate(sheet_list)],
+            self._create_sheet(calculation.sheet_name, main_header),
+            [
+                self._create_sheet(name, header_list[i]) if name is not None else None
+                for i, name in enumerate(sheet_list)
+            ],
             component_information,
         )
         self.sheet_set.add(calculation.sheet_name)
         self.sheet_set.update(sheet_list)
         self.calculation_info[calculation.uuid] = calculation.calculation_plan
 
+    def _create_sheet(self, name: str, columns: List[Tuple[str, str]]) -> SheetData:
+        self._sheet_counter += 1
+        sheet = SheetData(name, columns, storage_name=f"sheet_{self._sheet_counter}")
+        self.wrote_queue.put(partial(self.store.create_sheet, sheet.storage_name, name, list(sheet.columns)))
+        return sheet
+
     def wrote_data(self, uuid_id: uuid.UUID, data: ResponseData, ind: Optional[int] = None):
         """
         Add information to be stored in output file
@@ -725,17 +920,70 @@ class FileData:
     def wrote_errors(self, file_path, error_description):
         self.new_count += 1
         self._error_info.append((file_path, str(error_description)))
+        if self.new_count >= self.write_threshold:
+            self.dump_data()
+            self.new_count = 0
 
     def dump_data(self):
         """
-        Fire writing data to disc
+        Fire appending new rows to disc
         """
-        data = []
         for main_sheet, component_sheets, _ in self.sheet_dict.values():
-            data.append(main_sheet.get_data_to_write())
-            data.extend(sheet.get_data_to_write() for sheet in component_sheets if sheet is not None)
-
-        self.wrote_queue.put((data, list(self.calculation_info.values()), self._error_info[:]))
+            for sheet in (main_sheet, *component_sheets):
+                if sheet is None:
+                    continue
+                rows = sheet.get_new_rows()
+                if rows:
+                    self.wrote_queue.put(partial(self.store.append, sheet.storage_name, rows))
+                    self._data_version += 1
+        if self._error_info:
+            self.wrote_queue.put(partial(self.store.append_errors, self._error_info))
+            self._error_info = []
+            self._data_version += 1
+
+    def export_data(self):
+        """
+        Fire writing of result file from data already appended to disc.
+        """
+        sheets = []
+        for main_sheet, component_sheets, _ in self.sheet_dict.values():
+            sheets.extend(
+                (sheet.name, sheet.storage_name, sheet.columns)
+                for sheet in (main_sheet, *component_sheets)
+                if sheet is not None
+            )
+        self.wrote_queue.put(partial(self._write_result_file, sheets, list(self.calculation_info.values())))
+        self._exported_version = self._data_version
+
+    def _write_result_file(self, sheets: List[Tuple[str, str, pd.MultiIndex]], plans: List[CalculationPlan]):
+        data = (
+            [
+                (sheet_name, self.store.read_sheet(storage_name, columns))
+                for sheet_name, storage_name, columns in sheets
+            ],
+            plans,
+            self.store.read_errors(),
+        )
+        self._export_failed = True
+        if self.file_type == FileType.text_file:
+            base_path, ext = path.splitext(self.file_path)
+            for sheet_name, data_frame in data[0]:
+                data_frame.to_csv(f"{base_path}_{sheet_name}{ext}")
+            self._export_failed = False
+            return
+        file_path = self.file_path
+        i = 0
+        while i < 100:
+            i += 1
+            try:
+                self.write_to_excel(file_path, data)
+                break
+            except OSError:
+                base, ext = path.splitext(self.file_path)
+                file_path = f"{base}({i}){ext}"
+        if i == 100:  # pragma: no cover
+            raise PermissionError(f"Fail to write result excel {self.file_path}")
+        self._export_failed = False
 
     def wrote_data_to_file(self):
         """
@@ -743,28 +991,13 @@ class FileData:
         It is executed in separate thread.
         """
         while True:
-            data = self.wrote_queue.get()
-            if data == "finish":
+            task = self.wrote_queue.get()
+            if task == "finish":
+                self.store.close(remove=not self._export_failed)
                 break
             self.writing = True
             try:
-                if self.file_type == FileType.text_file:
-                    base_path, ext = path.splitext(self.file_path)
-                    for sheet_name, data_frame in data[0]:
-                        data_frame.to_csv(f"{base_path}_{sheet_name}{ext}")
-                    continue
-                file_path = self.file_path
-                i = 0
-                while i < 100:
-                    i += 1
-                    try:
-                        self.write_to_excel(file_path, data)
-                        break
-                    except OSError:
-                        base, ext = path.splitext(self.file_path)
-                        file_path = f"{base}({i}){ext}"
-                if i == 100:  # pragma: no cover
-                    raise PermissionError(f"Fail to write result excel {self.file_path}")
+                task()
             except Exception as e:  # pragma: no cover   # pylint: disable=W0703
                 logging.error("[batch_backend] %s", e)
                 self.error_queue.put(prepare_error_data(e))
@@ -830,6 +1063,10 @@ class FileData:
         return res
 
     def finish(self):
+        """Write not exported data and close storage"""
+        self.dump_data()
+        if self._data_version != self._exported_version:
+            self.export_data()
         self.wrote_queue.put("finish")
 
     def is_empty_sheet(self, sheet_name) -> bool:
@@ -901,7 +1138,7 @@ class DataWriter:
 
     def calculation_finished(self, calculation) -> List[ErrorInfo]:
         """
-        Force write data for given calculation.
+        Force write data for given calculation and create result file.
 
         :raises ValueError: when measurement is not added with :py:meth:`.add_data_part`
         :return: list of errors during write.
@@ -909,4 +1146,5 @@ class DataWriter:
         if calculation.measurement_file_path not in self.file_dict:
             raise ValueError("Unknown measurement file")
         self.file_dict[calculation.measurement_file_path].dump_data()
+        self.file_dict[calculation.measurement_file_path].export_data()
         return self.file_dict[calculation.measurement_file_path].get_errors()
@@ -0,0 +1,146 @@
+"""
+On-disk cache of intermediate results of batch processing.
+
+Entries are addressed by hash of content of input file and parameters of steps
+used to produce them, so they could be shared between calculation plans
+and between runs. Size of cache is limited, least recently used entries are removed first.
+"""
+import hashlib
+import json
+import os
+import pickle  # nosec
+import tempfile
+import typing
+from contextlib import suppress
+
+import numpy as np
+
+from PartSegCore.json_hooks import PartSegEncoder
+
+DEFAULT_CACHE_SIZE = 10 * 2**30  #: default limit of cache size in bytes
+_HASH_BLOCK_SIZE = 2**20
+_ENTRY_SUFFIX = ".pickle"
+
+
+class CalculationCache:
+    """
+    Content-addressed on-disk cache with size-bounded LRU eviction.
+    Multiple processes could use the same directory.
+
+    :param directory: path to directory where entries are stored
+    :param max_size: maximum size of all entries in bytes
+    """
+
+    def __init__(self, directory: typing.Union[str, os.PathLike], max_size: int = DEFAULT_CACHE_SIZE):
+        self.directory = os.fspath(directory)
+        self.max_size = max_size
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(directory={self.directory!r}, max_size={self.max_size})"
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        Calculate key from given parts. Parts could be numpy arrays, bytes or objects serializable by
+        :py:class:`PartSegCore.json_hooks.PartSegEncoder`.
+        """
+        hasher = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                hasher.update(f"array{part.dtype.str}{part.shape}".encode())
+                hasher.update(np.ascontiguousarray(part).data)
+            elif isinstance(part, bytes):
+                hasher.update(part)
+            else:
+                hasher.update(json.dumps(part, cls=PartSegEncoder, sort_keys=True).encode())
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def file_key(self, file_path: typing.Union[str, os.PathLike]) -> str:
+        """
+        Hash of content of file. Hash is remembered for path, size and modification time
+        to not read the same file again.
+        """
+        stat = os.stat(file_path)
+        stat_key = self.make_key("file", os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self.get(stat_key)
+        if content_hash is None:
+            hasher = hashlib.sha256()
+            with open(file_path, "rb") as f_p:
+                for block in iter(lambda: f_p.read(_HASH_BLOCK_SIZE), b""):
+                    hasher.update(block)
+            content_hash = hasher.hexdigest()
+            self.set(stat_key, content_hash)
+        return content_hash
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + _ENTRY_SUFFIX)
+
+    def get(self, key: str, default=None):
+        """Get value stored under key. Mark entry as recently used."""
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as f_p:
+                value = pickle.load(f_p)  # nosec
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+        with suppress(OSError):
+            os.utime(entry_path)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._entry_path(key))
+
+    def set(self, key: str, value):
+        """Store value under key and remove least recently used entries if cache is too big."""
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f_p:
+                pickle.dump(value, f_p, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+        except Exception:
+            with suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def _entries(self) -> typing.List[typing.Tuple[float, int, str]]:
+        res = []
+        if not os.path.isdir(self.directory):
+            return res
+        for sub_dir in os.scandir(self.directory):
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir.path):
+                if not entry.name.endswith(_ENTRY_SUFFIX):
+                    continue
+                with suppress(OSError):
+                    stat = entry.stat()
+                    res.append((stat.st_mtime, stat.st_size, entry.path))
+        return res
+
+    @property
+    def size(self) -> int:
+        """Total size of entries in bytes"""
+        return sum(x[1] for x in self._entries())
+
+    def evict(self):
+        """Remove least recently used entries until cache size is below limit"""
+        entries = self._entries()
+        total = sum(x[1] for x in entries)
+        if total <= self.max_size:
+            return
+        for _, size, entry_path in sorted(entries):
+            with suppress(OSError):
+                os.remove(entry_path)
+            total -= size
+            if total <= self.max_size:
+                break
+
+    def clear(self):
+        """Remove all entries"""
+        for _, _, entry_path in self._entries():
+            with suppress(OSError):
+                os.remove(entry_path)
@@ -7,10 +7,14 @@ Main workflow is to add work with :py:meth:`BatchManager.add_work`
 and consume results (:py:meth:`BatchManager.get_result`) until
 :py:attr:`BatchManager.has_work` is evaluating to true
 
+:py:class:`PoolBatchManager` is alternative implementation with the same interface,
+which does not use :py:class:`multiprocessing.Manager` server process for communication.
+
 .. graphviz::
 
    digraph foo {
       "BatchManager" -> "BatchWorker"[arrowhead="crow"];
+      "PoolBatchManager" -> "PoolBatchWorker"[arrowhead="crow"];
    }
 
 """
@@ -25,12 +29,15 @@ from contextlib import suppress
 from enum import Enum
 from queue import Empty, Queue
 from threading import RLock, Timer
-from typing import Any, Callable, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 __author__ = "Grzegorz Bokota"
 
 from PartSegCore.plugins import register_if_need
 
+WORKER_IDLE_CHECK_INTERVAL = 1
+"""Time in seconds after which idle :py:class:`PoolBatchWorker` checks its orders"""
+
 
 class SubprocessOrder(Enum):
     """
@@ -40,6 +47,7 @@ class SubprocessOrder(Enum):
     kill = 1
     wait = 2
     cancel_job = 3
+    add_job = 4
 
 
 class BatchManager:
@@ -215,6 +223,14 @@ class BatchWorker:
         self.calculation_dict = calculation_dict
         self.canceled_tasks = set()
 
+    def get_calculation(self, task_uuid: uuid.UUID) -> Optional[Tuple[Any, Callable[[Any, Any], Any]]]:
+        """
+        Get global parameters and function of work.
+
+        :return: tuple (global_parameters, function) or None if work is canceled
+        """
+        return self.calculation_dict.get(task_uuid)
+
     def calculate_task(self, val: Tuple[Any, uuid.UUID]):
         """
         Calculate single task.
@@ -222,9 +238,10 @@ class BatchWorker:
         function and global parameters are obtained from :py:attr:`.calculation_dict`
         """
         data, task_uuid = val
-        calc = self.calculation_dict.get(task_uuid)
+        calc = self.get_calculation(task_uuid)
         if calc is None:
             self.result_queue.put((task_uuid, (-1, [SubprocessOrder.cancel_job])))
+            return
         global_data, fun = calc
         try:
             res = fun(data, global_data)
@@ -262,6 +279,245 @@ class BatchWorker:
         logging.info("Process %s ended", os.getpid())
 
 
+class PoolBatchManager:
+    """
+    This class is used for manage pending works. It has same interface as :py:class:`BatchManager`,
+    but use :py:class:`.PoolBatchWorker` and plain :py:class:`multiprocessing.Queue`
+    for communication instead of :py:class:`multiprocessing.Manager` proxies.
+
+    Tasks are put in one queue shared by all workers. Global parameters of work
+    are sent once to each worker using its private order queue.
+    Workers are blocked on queue when there is nothing to do.
+
+    :type task_queue: multiprocessing.Queue
+    :type result_queue: multiprocessing.Queue
+    :type calculation_dict: dict
+    :type process_list: list[tuple[multiprocessing.Process, multiprocessing.Queue]]
+    """
+
+    def __init__(self):
+        self.task_queue = multiprocessing.Queue()
+        self.result_queue = multiprocessing.Queue()
+        self.calculation_dict: Dict[uuid.UUID, Tuple[Any, Callable[[Any, Any], Any]]] = {}
+        self.canceled_jobs: Set[uuid.UUID] = set()
+        self.job_tasks: Dict[uuid.UUID, int] = {}
+        self.number_off_available_process = 1
+        self.work_task = 0
+        self.process_list: List[Tuple[multiprocessing.Process, multiprocessing.Queue]] = []
+        self.stopped_process_list: List[multiprocessing.Process] = []
+        self.locker = RLock()
+
+    def get_result(self) -> List[Tuple[uuid.UUID, Any]]:
+        """
+        Clean result queue and return it as list
+
+        :return: List of results as tuple where first element is uuid of job and second is
+            function result or tuple with exception as first argument and second is traceback
+        """
+        res = []
+        with suppress(Empty):
+            while True:
+                res.append(self.result_queue.get_nowait())
+        with self.locker:
+            for task_uuid, _ in res:
+                self.job_tasks[task_uuid] -= 1
+                if self.job_tasks[task_uuid] == 0:
+                    del self.job_tasks[task_uuid]
+                    self.calculation_dict.pop(task_uuid, None)
+                    self.canceled_jobs.discard(task_uuid)
+            self.work_task -= len(res)
+            if res and self.work_task == 0:
+                logging.debug("computation finished")
+                self._stop_workers()
+        return res
+
+    def add_work(self, individual_parameters_list: List, global_parameters, fun: Callable[[Any, Any], Any]) -> str:
+        """
+        This function add next works to internal structures.
+        Number of works is length of ``individual_parameters_list``
+
+        :param individual_parameters_list: list of individual parameters for fun.
+            For each element ``fun`` will be called with element as first argument
+        :param global_parameters: second argument of fun. If has field uuid then it is used as work uuid
+        :param fun: two argument function which will be used to run calculation.
+            First argument is task specific, second is const for whole work.
+        :return: work uuid
+        """
+        task_uuid = global_parameters.uuid if hasattr(global_parameters, "uuid") else uuid.uuid4()
+        with self.locker:
+            self.calculation_dict[task_uuid] = global_parameters, fun
+            self.job_tasks[task_uuid] = self.job_tasks.get(task_uuid, 0) + len(individual_parameters_list)
+            self.work_task += len(individual_parameters_list)
+            # global parameters need to be known by workers before they get task
+            for _, order_queue in self.process_list:
+                order_queue.put((SubprocessOrder.add_job, task_uuid, (global_parameters, fun)))
+            for el in individual_parameters_list:
+                self.task_queue.put((el, task_uuid))
+            for _ in range(self.number_off_available_process - len(self.process_list)):
+                self._spawn_process()
+        return task_uuid
+
+    def _spawn_process(self):
+        with self.locker:
+            order_queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=spawn_pool_worker,
+                args=(
+                    self.task_queue,
+                    order_queue,
+                    self.result_queue,
+                    dict(self.calculation_dict),
+                    set(self.canceled_jobs),
+                ),
+            )
+            process.start()
+            self.process_list.append((process, order_queue))
+
+    def _stop_workers(self):
+        """Stop all workers. Should be called when all work is done"""
+        with self.locker:
+            for process, order_queue in self.process_list:
+                order_queue.put((SubprocessOrder.kill, None, None))
+                self.stopped_process_list.append(process)
+            self.process_list = []
+        self.join_all()
+
+    @property
+    def has_work(self) -> bool:
+        """Check if Manager has pending or processed work and if all results are consumed"""
+        return self.work_task > 0
+
+    def kill_jobs(self):
+        for p, _ in self.process_list:
+            p.terminate()
+        for p in self.stopped_process_list:
+            p.terminate()
+
+    def set_number_of_process(self, num: int):
+        """
+        Change number of workers which should be used for calculation
+
+        :param num: target number of process
+        """
+        logging.debug("[set_number_of_process] process diff: %s", num - self.number_off_available_process)
+        self.number_off_available_process = num
+        if not self.has_work:
+            return
+        with self.locker:
+            for _ in range(num - len(self.process_list)):
+                self._spawn_process()
+            while len(self.process_list) > num:
+                logging.debug("[set_number_of_process] process kill")
+                process, order_queue = self.process_list.pop()
+                order_queue.put((SubprocessOrder.kill, None, None))
+                self.stopped_process_list.append(process)
+        self.join_all()
+
+    def cancel_work(self, global_parameters):
+        task_uuid = global_parameters.uuid
+        with self.locker:
+            if task_uuid not in self.calculation_dict:
+                return
+            del self.calculation_dict[task_uuid]
+            self.canceled_jobs.add(task_uuid)
+            for _, order_queue in self.process_list:
+                order_queue.put((SubprocessOrder.cancel_job, task_uuid, None))
+
+    def join_all(self):
+        """Join already stopped processes"""
+        with self.locker:
+            for p in [x for x in self.stopped_process_list if not x.is_alive()]:
+                p.join()
+                self.stopped_process_list.remove(p)
+        if self.stopped_process_list:
+            Timer(1, self.join_all).start()
+
+    @property
+    def finished(self):
+        """Check if any process is running"""
+        return len(self.process_list) + len(self.stopped_process_list) == 0
+
+
+class PoolBatchWorker(BatchWorker):
+    """
+    Worker spawned by :py:class:`PoolBatchManager` instance.
+
+    :param task_queue: Queue with task data shared by all workers
+    :param order_queue: Private queue of worker with global parameters of works and additional orders
+    :param result_queue: Queue to put result
+    :param calculation_dict: global parameters of works known at worker start
+    :param canceled_jobs: uuids of works canceled before worker start
+    """
+
+    def __init__(
+        self,
+        task_queue: Queue,
+        order_queue: Queue,
+        result_queue: Queue,
+        calculation_dict: Dict[uuid.UUID, Tuple[Any, Callable[[Any, Any], Any]]],
+        canceled_jobs: Set[uuid.UUID],
+    ):
+        super().__init__(task_queue, order_queue, result_queue, calculation_dict)
+        self.canceled_tasks = canceled_jobs
+        self.stop = False
+
+    def process_order(self, order: Tuple[SubprocessOrder, Optional[uuid.UUID], Any]):
+        order_type, task_uuid, data = order
+        logging.debug("Order message: %s %s", order_type, task_uuid)
+        if order_type == SubprocessOrder.kill:
+            self.stop = True
+        elif order_type == SubprocessOrder.add_job:
+            self.calculation_dict[task_uuid] = data
+        elif order_type == SubprocessOrder.cancel_job:
+            self.calculation_dict.pop(task_uuid, None)
+            self.canceled_tasks.add(task_uuid)
+
+    def process_orders(self):
+        """Process all orders available in order queue without waiting"""
+        with suppress(Empty):
+            while True:
+                self.process_order(self.order_queue.get_nowait())
+
+    def wait_for_job(self, task_uuid: uuid.UUID):
+        """
+        Global parameters of work are put in order queue before tasks, but they may arrive later.
+        Wait until information about work arrive or worker is stopped.
+        """
+        self.process_orders()
+        while not self.stop and task_uuid not in self.calculation_dict and task_uuid not in self.canceled_tasks:
+            self.process_order(self.order_queue.get())
+
+    def run(self):
+        """Worker main loop"""
+        logging.debug("Process started %s", os.getpid())
+        while not self.stop:
+            try:
+                task = self.task_queue.get(timeout=WORKER_IDLE_CHECK_INTERVAL)
+            except Empty:
+                self.process_orders()
+                continue
+            self.wait_for_job(task[1])
+            if self.stop:
+                # give back task to other workers
+                self.task_queue.put(task)
+                break
+            try:
+                self.calculate_task(task)
+            except (MemoryError, OSError):  # pragma: no cover
+                pass
+            except Exception as ex:  # pragma: no cover # pylint: disable=W0703
+                logging.warning("Unsupported exception %s", ex)
+        logging.info("Process %s ended", os.getpid())
+
+
+def _register_plugins():
+    register_if_need()
+    with suppress(ImportError):
+        from PartSeg.plugins import register_if_need as register
+
+        register()
+
+
 def spawn_worker(task_queue: Queue, order_queue: Queue, result_queue: Queue, calculation_dict: Dict[uuid.UUID, Any]):
     """
     Function for spawning worker. Designed as argument for :py:meth:`multiprocessing.Process`.
@@ -271,10 +527,27 @@ def spawn_worker(task_queue: Queue, order_queue: Queue, result_queue: Queue, cal
     :param result_queue: Queue for calculation result
     :param calculation_dict: dict with global parameters
     """
-    register_if_need()
-    with suppress(ImportError):
-        from PartSeg.plugins import register_if_need as register
-
-        register()
+    _register_plugins()
     worker = BatchWorker(task_queue, order_queue, result_queue, calculation_dict)
     worker.run()
+
+
+def spawn_pool_worker(
+    task_queue: Queue,
+    order_queue: Queue,
+    result_queue: Queue,
+    calculation_dict: Dict[uuid.UUID, Any],
+    canceled_jobs: Set[uuid.UUID],
+):
+    """
+    Function for spawning :py:class:`PoolBatchWorker`. Designed as argument for :py:meth:`multiprocessing.Process`.
+
+    :param task_queue: Queue with tasks
+    :param order_queue: Private queue with global parameters of works and additional orders (like kill)
+    :param result_queue: Queue for calculation result
+    :param calculation_dict: dict with global parameters of works known at spawn time
+    :param canceled_jobs: set of canceled works
+    """
+    _register_plugins()
+    worker = PoolBatchWorker(task_queue, order_queue, result_queue, calculation_dict, canceled_jobs)
+    worker.run()
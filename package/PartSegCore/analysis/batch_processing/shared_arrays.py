@@ -0,0 +1,121 @@
+"""
+Sharing of read only arrays between batch processing workers.
+
+First process which needs array publishes it in :py:class:`multiprocessing.shared_memory.SharedMemory` block
+with name derived from key. Other processes attach to this block without copying data.
+Blocks are removed by :py:meth:`SharedArrayRegistry.unlink` called by process which started calculation.
+"""
+import hashlib
+import json
+import typing
+from contextlib import suppress
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_HEADER_SIZE = 512
+_READY = 1
+
+
+class SharedArrayRegistry:
+    """
+    Registry of arrays shared between processes. Only arrays with keys from ``keys`` are shared.
+    Pickled registry (send to worker) does not contain attached blocks.
+
+    :param prefix: prefix of shared memory blocks names, should be unique for calculation
+    :param keys: keys of arrays which should be shared
+    """
+
+    def __init__(self, prefix: str, keys: typing.Iterable[str] = ()):
+        self.prefix = prefix
+        self.keys = set(keys)
+        self._blocks: typing.Dict[str, shared_memory.SharedMemory] = {}
+
+    def __getstate__(self):
+        return {"prefix": self.prefix, "keys": self.keys}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys
+
+    def block_name(self, key: str) -> str:
+        """Name of shared memory block for given key. It is short because of limits on macOS."""
+        return f"ps{self.prefix}_{hashlib.sha1(key.encode()).hexdigest()[:12]}"  # nosec
+
+    def get(self, key: str) -> typing.Optional[np.ndarray]:
+        """
+        Get read only view on shared array.
+
+        :return: array or None if array is not published or is during publication
+        """
+        if key not in self.keys:
+            return None
+        if key not in self._blocks:
+            try:
+                block = shared_memory.SharedMemory(name=self.block_name(key))
+            except FileNotFoundError:
+                return None
+            if block.buf[0] != _READY:
+                block.close()
+                return None
+            self._blocks[key] = block
+        return self._array_from_block(self._blocks[key])
+
+    def publish(self, key: str, array: np.ndarray) -> np.ndarray:
+        """
+        Copy array to shared memory if key should be shared.
+
+        :return: read only view on shared array, or ``array`` if it is not shared
+        """
+        if key not in self.keys:
+            return array
+        array = np.ascontiguousarray(array)
+        header = json.dumps({"dtype": array.dtype.str, "shape": array.shape}).encode()
+        try:
+            block = shared_memory.SharedMemory(
+                name=self.block_name(key), create=True, size=_HEADER_SIZE + max(array.nbytes, 1)
+            )
+        except FileExistsError:
+            shared = self.get(key)
+            return array if shared is None else shared
+        block.buf[1 : len(header) + 1] = header
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, offset=_HEADER_SIZE)[...] = array
+        block.buf[0] = _READY
+        self._blocks[key] = block
+        return self._array_from_block(block)
+
+    def get_or_publish(self, key: str, fun: typing.Callable[[], np.ndarray]) -> np.ndarray:
+        """Get shared array or calculate it with ``fun`` and publish"""
+        array = self.get(key)
+        if array is None:
+            array = self.publish(key, fun())
+        return array
+
+    @staticmethod
+    def _array_from_block(block: shared_memory.SharedMemory) -> np.ndarray:
+        header = bytes(block.buf[1:_HEADER_SIZE]).rstrip(b"\0")
+        info = json.loads(header)
+        array = np.ndarray(tuple(info["shape"]), dtype=np.dtype(info["dtype"]), buffer=block.buf, offset=_HEADER_SIZE)
+        array.flags.writeable = False
+        return array
+
+    def close(self):
+        """
+        Detach from all blocks in current process. Block cannot be detached
+        if arrays using it still exist, then it will be detached when they are removed.
+        """
+        for block in self._blocks.values():
+            with suppress(BufferError):
+                block.close()
+        self._blocks = {}
+
+    def unlink(self):
+        """Remove all blocks of this registry. Should be called once, after calculation finished."""
+        self.close()
+        for key in self.keys:
+            with suppress(FileNotFoundError):
+                block = shared_memory.SharedMemory(name=self.block_name(key))
+                block.close()
+                block.unlink()
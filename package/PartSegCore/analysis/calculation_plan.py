@@ -5,6 +5,8 @@ import textwrap
 import typing
 import uuid
 from abc import abstractmethod
+from collections import Counter
+from contextlib import suppress
 from copy import copy, deepcopy
 from enum import Enum
 
@@ -13,6 +15,8 @@ from pydantic import BaseModel as PydanticBaseModel
 
 from PartSegCore.algorithm_describe_base import ROIExtractionProfile
 from PartSegCore.analysis import AnalysisAlgorithmSelection
+from PartSegCore.analysis.batch_processing.calculation_cache import CalculationCache
+from PartSegCore.analysis.batch_processing.shared_arrays import SharedArrayRegistry
 from PartSegCore.analysis.measurement_calculation import MeasurementProfile
 from PartSegCore.mask_create import MaskProperty
 from PartSegCore.universal_const import Units
@@ -258,6 +262,7 @@ class MaskFile(MaskMapper):
         if not os.path.exists(self.path_to_file):  # pragma: no cover
             logging.error("File does not exists: %s", self.path_to_file)
             raise ValueError(f"File for mapping mask does not exists: {self.path_to_file}")
+        name_dict = {}
         with open(self.path_to_file, encoding="utf-8") as map_file:
             dir_name = os.path.dirname(self.path_to_file)
             for i, line in enumerate(map_file):
@@ -268,11 +273,10 @@ class MaskFile(MaskMapper):
                     continue
                 file_name = file_name.strip()
                 mask_name = mask_name.strip()
-                if not os.path.abspath(file_name):
-                    file_name = os.path.normpath(os.path.join(dir_name, file_name))
-                if not os.path.abspath(mask_name):
-                    mask_name = os.path.normpath(os.path.join(dir_name, mask_name))
-                self.name_dict[file_name] = mask_name
+                file_name = os.path.normpath(os.path.join(dir_name, file_name))
+                mask_name = os.path.normpath(os.path.join(dir_name, mask_name))
+                name_dict[file_name] = mask_name
+        self.name_dict = name_dict
 
 
 class Operations(Enum):
@@ -338,6 +342,8 @@ class BaseCalculation:
     :ivar CalculationPlan ~.calculation_plan: plan of calculation
     :ivar str uuid: ~.uuid of whole calculation
     :ivar ~.voxel_size: default voxel size (for files which do not contains this information in metadata
+    :ivar ~.cache: cache of loaded images and segmentation results, if None then cache is not used
+    :ivar ~.shared_arrays: registry of arrays shared between workers, if None then arrays are not shared
     """
 
     def __init__(
@@ -349,6 +355,8 @@ class BaseCalculation:
         calculation_plan: "CalculationPlan",
         voxel_size: typing.Sequence[float],
         overwrite_voxel_size: bool = False,
+        cache: typing.Optional[CalculationCache] = None,
+        shared_arrays: typing.Optional[SharedArrayRegistry] = None,
     ):
         self.base_prefix = base_prefix
         self.result_prefix = result_prefix
@@ -358,6 +366,8 @@ class BaseCalculation:
         self.uuid = uuid.uuid4()
         self.voxel_size = voxel_size
         self.overwrite_voxel_size = overwrite_voxel_size
+        self.cache = cache
+        self.shared_arrays = shared_arrays
 
     def __repr__(self):
         return (
@@ -380,6 +390,8 @@ class Calculation(BaseCalculation):
     :ivar str uuid: ~.uuid of whole calculation
     :ivar ~.voxel_size: default voxel size (for files which do not contains this information in metadata
     :ivar typing.List[str] ~.file_list: list of files to be proceed
+    :ivar ~.cache: cache of loaded images and segmentation results, if None then cache is not used
+    :ivar ~.shared_arrays: registry of arrays shared between workers, if None then arrays are not shared
     """
 
     def __init__(
@@ -392,6 +404,8 @@ class Calculation(BaseCalculation):
         calculation_plan,
         voxel_size,
         overwrite_voxel_size=False,
+        cache=None,
+        shared_arrays=None,
     ):
         super().__init__(
             base_prefix,
@@ -401,6 +415,8 @@ class Calculation(BaseCalculation):
             calculation_plan,
             voxel_size,
             overwrite_voxel_size,
+            cache,
+            shared_arrays,
         )
         self.file_list: typing.List[str] = file_list
 
@@ -414,6 +430,8 @@ class Calculation(BaseCalculation):
             self.calculation_plan,
             self.voxel_size,
             self.overwrite_voxel_size,
+            self.cache,
+            self.shared_arrays,
         )
         base.uuid = self.uuid
         return base
@@ -422,6 +440,19 @@ class Calculation(BaseCalculation):
     def measurement(self):
         return self.calculation_plan.get_measurements()
 
+    def get_shared_mask_paths(self) -> typing.Set[str]:
+        """Paths of mask files which are used by more than one file from :py:attr:`file_list`"""
+        counter = Counter()
+        mask_mappers = self.calculation_plan.get_list_file_mask()
+        for file_path in self.file_list:
+            paths = set()
+            for mask_mapper in mask_mappers:
+                with suppress(ValueError, OSError):
+                    paths.add(mask_mapper.get_mask_path(file_path))
+            paths.discard("")
+            counter.update(paths)
+        return {path for path, count in counter.items() if count > 1}
+
 
 class FileCalculation:
     """
@@ -462,6 +493,16 @@ class FileCalculation:
         """overwrite voxel size"""
         return self.calculation.overwrite_voxel_size
 
+    @property
+    def cache(self):
+        """cache of loaded images and segmentation results"""
+        return self.calculation.cache
+
+    @property
+    def shared_arrays(self):
+        """registry of arrays shared between workers"""
+        return self.calculation.shared_arrays
+
     def __repr__(self):
         return f"FileCalculation(file_path={self.file_path}, calculation={self.calculation})"
 
@@ -12,7 +12,8 @@ from PartSegCore.roi_info import ROIInfo
 from PartSegCore.utils import numpy_repr
 from PartSegImage import Image
 
-project_version_info = packaging.version.Version("1.1")
+project_version_info = packaging.version.Version("1.2")
+"""Version 1.2 projects are saved in chunked container (:py:mod:`PartSegCore.project_container`)"""
 
 if sys.version_info[:3] == (3, 9, 7):
     ProjectInfoBase = object
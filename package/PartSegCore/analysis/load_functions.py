@@ -32,10 +32,12 @@ from PartSegCore.io_utils import (
 )
 from PartSegCore.json_hooks import partseg_object_hook
 from PartSegCore.mask.io_functions import LoadROIImage
+from PartSegCore.project_container import ContainerReader, is_container
 from PartSegCore.project_info import HistoryElement
 from PartSegCore.roi_info import ROIInfo
 from PartSegCore.universal_const import UNIT_SCALE, Units
-from PartSegImage import GenericImageReader
+from PartSegImage import GenericImageReader, Image
+from PartSegImage.lazy_array import LazyArray
 
 __all__ = [
     "LoadStackImage",
@@ -48,10 +50,103 @@ __all__ = [
 ]
 
 
+def _history_from_json(history_json, read_arrays: typing.Callable[[int], bytes]) -> typing.List[HistoryElement]:
+    history = []
+    for el in history_json:
+        history_buffer = BytesIO(read_arrays(el["index"]))
+        el = update_algorithm_dict(el)
+        segmentation_parameters = {"algorithm_name": el["algorithm_name"], "values": el["values"]}
+        history.append(
+            HistoryElement(
+                roi_extraction_parameters=segmentation_parameters,
+                mask_property=el["mask_property"],
+                arrays=history_buffer,
+                annotations=el.get("annotations", {}),
+            )
+        )
+    return history
+
+
+def _project_tuple(file_path, image, roi_info, mask, history, algorithm_dict, version) -> ProjectTuple:
+    image.set_mask(mask)
+    if version <= project_version_info:
+        return ProjectTuple(
+            file_path=file_path,
+            image=image,
+            roi_info=roi_info,
+            mask=mask,
+            history=history,
+            algorithm_parameters=algorithm_dict,
+        )
+
+    print("This project is from new version of PartSeg:", version, project_version_info, file=sys.stderr)
+    return ProjectTuple(
+        file_path=file_path,
+        image=image,
+        roi_info=roi_info,
+        mask=mask,
+        history=history,
+        algorithm_parameters=algorithm_dict,
+        errors="This project is from new version of PartSeg. It may load incorrect.",
+    )
+
+
+def _load_image_from_container(container: ContainerReader) -> Image:
+    """
+    Create image from channels stored in container by :py:func:`.save_project`.
+    If container is opened from path, then channels are read lazily (only chunks of requested parts),
+    with own reader which is closed when image is garbage collected.
+    """
+    channel_names = sorted((x for x in container.array_names() if x.startswith("image/")), key=lambda x: int(x[6:]))
+    if not channel_names:
+        raise WrongFileTypeException()
+    attrs = container.attrs(channel_names[0])
+    shift = tuple(attrs["shift"])
+    if container.file_path:
+        channels_container = ContainerReader(container.file_path)
+        channels = [LazyArray(channels_container.array(x)) for x in channel_names]
+    else:
+        channels = [container.read_array(x) for x in channel_names]
+    return Image(
+        channels,
+        tuple(attrs["spacing"]),
+        file_path=container.file_path,
+        channel_names=attrs["channel_names"],
+        axes_order="C" + attrs["axes_order"],
+        shift=(0,) * (3 - len(shift)) + shift,
+        name=attrs["name"],
+    )
+
+
+def _load_project_container(file: typing.Union[str, Path, BufferedIOBase, RawIOBase, IOBase]) -> ProjectTuple:
+    with ContainerReader(file) as container:
+        if "algorithm.json" not in container:
+            raise WrongFileTypeException()
+        image = _load_image_from_container(container)
+        algorithm_dict = update_algorithm_dict(load_metadata(container.read_bytes("algorithm.json").decode("utf8")))
+        metadata = json.loads(container.read_bytes("metadata.json"), object_hook=partseg_object_hook)
+        version = parse_version(metadata["project_version_info"])
+        roi = container.read_array("roi")
+        mask = container.read_array("mask") if "mask" in container else None
+        alternative = {
+            name[12:]: container.read_array(name) for name in container.array_names() if name.startswith("alternative/")
+        }
+        history = []
+        if "history/history.json" in container:
+            history = _history_from_json(
+                load_metadata(container.read_bytes("history/history.json").decode("utf8")),
+                lambda i: container.read_bytes(f"history/arrays_{i}.npz"),
+            )
+    roi_info = ROIInfo(roi, annotations=metadata.get("roi_annotations"), alternative=alternative)
+    return _project_tuple(container.file_path, image, roi_info, mask, history, algorithm_dict, version)
+
+
 def load_project(
     file: typing.Union[str, Path, tarfile.TarFile, TextIOBase, BufferedIOBase, RawIOBase, IOBase]
 ) -> ProjectTuple:
-    """Load project from archive"""
+    """Load project from archive. Both chunked container and old tar archive are supported."""
+    if is_container(file):
+        return _load_project_container(file)
     tar_file, file_path = open_tar_file(file)
     try:
         if check_segmentation_type(tar_file) != SegmentationType.analysis:
@@ -92,47 +187,15 @@ def load_project(
         history = []
         with suppress(KeyError):
             history_buff = tar_file.extractfile(tar_file.getmember("history/history.json")).read()
-            history_json = load_metadata(history_buff)
-            for el in history_json:
-                history_buffer = BytesIO()
-                history_buffer.write(tar_file.extractfile(f"history/arrays_{el['index']}.npz").read())
-                history_buffer.seek(0)
-                el = update_algorithm_dict(el)
-                segmentation_parameters = {"algorithm_name": el["algorithm_name"], "values": el["values"]}
-                history.append(
-                    HistoryElement(
-                        roi_extraction_parameters=segmentation_parameters,
-                        mask_property=el["mask_property"],
-                        arrays=history_buffer,
-                        annotations=el.get("annotations", {}),
-                    )
-                )
+            history = _history_from_json(
+                load_metadata(history_buff), lambda i: tar_file.extractfile(f"history/arrays_{i}.npz").read()
+            )
 
     finally:
         if isinstance(file, (str, Path)):
             tar_file.close()
-    image.set_mask(mask)
     roi_info = ROIInfo(roi, annotations=metadata.get("roi_annotations"), alternative=alternative)
-    if version <= project_version_info:
-        return ProjectTuple(
-            file_path=file_path,
-            image=image,
-            roi_info=roi_info,
-            mask=mask,
-            history=history,
-            algorithm_parameters=algorithm_dict,
-        )
-
-    print("This project is from new version of PartSeg:", version, project_version_info, file=sys.stderr)
-    return ProjectTuple(
-        file_path=file_path,
-        image=image,
-        roi_info=roi_info,
-        mask=mask,
-        history=history,
-        algorithm_parameters=algorithm_dict,
-        errors="This project is from new version of PartSeg. It may load incorrect.",
-    )
+    return _project_tuple(file_path, image, roi_info, mask, history, algorithm_dict, version)
 
 
 class LoadProject(LoadBase):
@@ -278,6 +341,10 @@ class LoadMask(LoadBase):
 def _mask_data_outside_mask(file_path):
     if not isinstance(file_path, str):
         return False
+    if is_container(file_path):
+        with ContainerReader(file_path) as container:
+            metadata = load_metadata_base(container.read_bytes("metadata.json").decode("utf8"))
+        return metadata.get("keep_data_outside_mask", False)
     with tarfile.open(file_path, "r:*") as tar_file:
         metadata = load_metadata_base(tar_file.extractfile("metadata.json").read().decode("utf8"))
         return metadata.get("keep_data_outside_mask", False)
@@ -379,6 +379,20 @@ class MeasurementMethodBase(AlgorithmDescribeBase, ABC):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def calculate_per_component(cls, statistics, **kwargs) -> Optional[np.ndarray]:
+        """
+        Calculate measurement for all components in single pass over data.
+        If measurement cannot be calculated in this way, then ``None`` should be returned
+        and :py:meth:`calculate_property` will be called for each component separately.
+
+        :param statistics: per component statistics of selected area and channel
+            (:py:class:`PartSegCore.analysis.measurement_calculation.ComponentStatistics`)
+        :param kwargs: same arguments as for :py:meth:`calculate_property`
+        :return: array with measurement values in order of ``statistics.components`` or ``None``
+        """
+        return None
+
     @classmethod
     def get_starting_leaf(cls) -> Leaf:
         """This leaf is put on default list"""
@@ -1,8 +1,10 @@
+import os
 import warnings
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
 from enum import Enum
-from functools import reduce
+from functools import cached_property, reduce
 from math import pi
 from typing import (
     Any,
@@ -26,6 +28,7 @@ import SimpleITK
 from mahotas.features import haralick
 from nme import register_class, rename_key
 from pydantic import Field
+from scipy.spatial import cKDTree
 from scipy.spatial.distance import cdist
 from sympy import Rational, symbols
 
@@ -92,6 +95,106 @@ class ComponentsInfo(NamedTuple):
         return all(len(x) for x in self.components_translation.values())
 
 
+class ComponentStatistics:
+    """
+    Lazy calculated statistics of channel for all components of labeled array.
+    Each statistic is calculated in one pass over foreground voxels for all components at once.
+
+    :ivar numpy.ndarray components: components for which statistics are calculated
+    """
+
+    def __init__(self, labels: np.ndarray, channel: Optional[np.ndarray], components: Sequence[int]):
+        if channel is not None and channel.shape != labels.shape:
+            if channel.size != labels.size:  # pragma: no cover
+                raise ValueError(f"channel ({channel.shape}) and mask ({labels.shape}) do not fit each other")
+            channel = channel.reshape(labels.shape)
+        self.components = np.asarray(components, dtype=np.intp)
+        self._label_array = labels
+        self._channel = channel
+
+    @cached_property
+    def _foreground(self) -> np.ndarray:
+        return self._label_array > 0
+
+    @cached_property
+    def _labels(self) -> np.ndarray:
+        return self._label_array[self._foreground].astype(np.intp)
+
+    @cached_property
+    def _length(self) -> int:
+        return max(int(np.max(self.components, initial=0)), int(np.max(self._labels, initial=0))) + 1
+
+    @cached_property
+    def values(self) -> np.ndarray:
+        """channel values of foreground voxels"""
+        return self._channel[self._foreground]
+
+    @cached_property
+    def counts(self) -> np.ndarray:
+        """number of voxels of each component"""
+        return np.bincount(self._labels, minlength=self._length)[self.components]
+
+    @cached_property
+    def sums(self) -> np.ndarray:
+        """sum of channel values of each component"""
+        sums = np.bincount(self._labels, weights=self.values, minlength=self._length)[self.components]
+        # keep same type as numpy sum for integer data
+        return sums.astype(np.sum(self.values[:0]).dtype)
+
+    @cached_property
+    def means(self) -> np.ndarray:
+        """mean of channel values of each component"""
+        return self._safe_divide(self.sums, self.counts)
+
+    @cached_property
+    def std(self) -> np.ndarray:
+        """standard deviation of channel values of each component"""
+        means = np.zeros(self._length)
+        means[self.components] = self.means
+        square_diff = np.bincount(
+            self._labels, weights=(self.values - means[self._labels]) ** 2, minlength=self._length
+        )[self.components]
+        return np.sqrt(self._safe_divide(square_diff, self.counts))
+
+    @cached_property
+    def _sorted(self) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.lexsort((self.values, self._labels))
+        sorted_labels = self._labels[order]
+        return np.searchsorted(sorted_labels, self.components), self.values[order]
+
+    @property
+    def minimum(self) -> np.ndarray:
+        """minimum of channel values of each component"""
+        starts, values = self._sorted
+        return self._select(values, starts)
+
+    @property
+    def maximum(self) -> np.ndarray:
+        """maximum of channel values of each component"""
+        starts, values = self._sorted
+        return self._select(values, starts + self.counts - 1)
+
+    @property
+    def median(self) -> np.ndarray:
+        """median of channel values of each component"""
+        starts, values = self._sorted
+        lower = self._select(values, starts + (self.counts - 1) // 2).astype(float)
+        upper = self._select(values, starts + self.counts // 2)
+        return (lower + upper) / 2
+
+    def _select(self, values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        res = np.zeros(self.components.size, dtype=values.dtype)
+        non_empty = self.counts > 0
+        res[non_empty] = values[positions[non_empty]]
+        return res
+
+    @staticmethod
+    def _safe_divide(nominator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+        res = np.zeros(nominator.size)
+        np.divide(nominator, denominator, out=res, where=denominator > 0)
+        return res
+
+
 def empty_fun(_a0=None, _a1=None):
     """This function is being used as dummy reporting function."""
 
@@ -102,6 +205,7 @@ MeasurementResultInputType = Tuple[MeasurementValueType, str, Tuple[PerComponent
 
 
 FILE_NAME_STR = "File name"
+TIME_POINT_STR = "Time point"
 
 
 class MeasurementResult(MutableMapping[str, MeasurementResultType]):
@@ -163,6 +267,17 @@ class MeasurementResult(MutableMapping[str, MeasurementResultType]):
         self._units_dict[FILE_NAME_STR] = ""
         self._data_dict.move_to_end(FILE_NAME_STR, False)
 
+    def set_time(self, time: int):
+        """
+        Set time point of measurement. It is presented after file name.
+        """
+        self._data_dict[TIME_POINT_STR] = time
+        self._type_dict[TIME_POINT_STR] = PerComponent.No, AreaType.ROI
+        self._units_dict[TIME_POINT_STR] = ""
+        self._data_dict.move_to_end(TIME_POINT_STR, False)
+        if FILE_NAME_STR in self._data_dict:
+            self._data_dict.move_to_end(FILE_NAME_STR, False)
+
     def get_component_info(self, all_components: bool = False) -> Tuple[bool, bool]:
         """
         Get information which type of components are in storage.
@@ -193,7 +308,7 @@ class MeasurementResult(MutableMapping[str, MeasurementResultType]):
             return list(self.keys())
         has_mask_components, has_segmentation_components = self.get_component_info(all_components)
         labels = list(self._data_dict.keys())
-        index = 1 if FILE_NAME_STR in self._data_dict else 0
+        index = len(self._leading_keys())
         if has_mask_components:
             labels.insert(index, "Mask component")
         if has_segmentation_components:
@@ -234,16 +349,16 @@ class MeasurementResult(MutableMapping[str, MeasurementResultType]):
             return [(0, x) for x in self.components_info.mask_components]
         return [(x, 0) for x in self.components_info.roi_components]
 
+    def _leading_keys(self) -> List[str]:
+        """keys of file name and time point which are presented before components numbers"""
+        return [x for x in self._data_dict if x in {FILE_NAME_STR, TIME_POINT_STR}][:2]
+
     def _prepare_res_iterator(self, counts):
-        if FILE_NAME_STR in self._data_dict:
-            name = self._data_dict[FILE_NAME_STR]
-            res = [[name] for _ in range(counts)]
-            iterator = iter(self._data_dict.keys())
-            with suppress(StopIteration):
-                next(iterator)  # skipcq: PTC-W0063`
-        else:
-            res = [[] for _ in range(counts)]
-            iterator = iter(self._data_dict.keys())
+        leading_keys = self._leading_keys()
+        res = [[self._data_dict[x] for x in leading_keys] for _ in range(counts)]
+        iterator = iter(self._data_dict.keys())
+        for _ in leading_keys:
+            next(iterator)  # skipcq: PTC-W0063`
         return res, iterator
 
     def get_separated(self, all_components=False) -> List[List[MeasurementValueType]]:
@@ -415,6 +530,25 @@ class MeasurementProfile(BaseModel):
             kw2["roi_alternative"][name] = array[bounds]
         return kw2
 
+    @staticmethod
+    def _get_component_statistics(kw, node: Leaf, components: Sequence[int]) -> ComponentStatistics:
+        """
+        Get cached statistics of all components of current area.
+        Components are marked in same way as in :py:meth:`_clip_arrays`.
+        """
+        method: MeasurementMethodBase = MEASUREMENT_DICT[node.name]
+        hash_str = hash_fun_call_name(
+            ComponentStatistics, {}, method.area_type(node.area), node.per_component, kw["channel_num"], NO_COMPONENT
+        )
+        help_dict = kw["help_dict"]
+        if hash_str not in help_dict:
+            if node.per_component == PerComponent.Per_Mask_component:
+                labels = np.where(kw["area_array"] > 0, kw["mask"], 0)
+            else:
+                labels = kw["area_array"]
+            help_dict[hash_str] = ComponentStatistics(labels, kw["channel"], components)
+        return help_dict[hash_str]
+
     def _calculate_leaf_value(
         self, node: Union[Node, Leaf], segmentation_mask_map: ComponentsInfo, kwargs: dict
     ) -> Union[float, np.ndarray]:
@@ -425,15 +559,16 @@ class MeasurementProfile(BaseModel):
             return method.calculate_property(**kw)
         # TODO use cache for per component calculate
         # kw["_cache"] = False
-        val = []
         if method.area_type(node.area) == AreaType.ROI and node.per_component != PerComponent.Per_Mask_component:
             components = segmentation_mask_map.roi_components
         else:
             components = segmentation_mask_map.mask_components
-        for i in components:
-            kw2 = self._clip_arrays(kw, node, method, i)
-            val.append(method.calculate_property(**kw2))
-        val = np.array(val)
+        val = None
+        if not method.need_full_data():
+            statistics = self._get_component_statistics(kw, node, components)
+            val = method.calculate_per_component(statistics=statistics, **kw)
+        if val is None:
+            val = np.array([method.calculate_property(**self._clip_arrays(kw, node, method, i)) for i in components])
         if node.per_component == PerComponent.Mean:
             val = np.mean(val) if val.size else 0
         return val
@@ -565,6 +700,8 @@ class MeasurementProfile(BaseModel):
         range_changed: Callable[[int, int], Any] = empty_fun,
         step_changed: Callable[[int], Any] = empty_fun,
         time: int = 0,
+        stream_components: bool = False,
+        workers: Optional[int] = None,
     ) -> MeasurementResult:
         """
         Calculate measurements on given set of parameters
@@ -575,10 +712,20 @@ class MeasurementProfile(BaseModel):
         :param range_changed: callback function to set information about steps range
         :param step_changed: callback function fo set information about steps done
         :param time: which data point should be measured
+        :param stream_components: if all measurements are per ROI component
+            (:py:meth:`supports_component_stream`) then calculate them with :py:meth:`calculate_components`
+        :param workers: number of threads used by :py:meth:`calculate_components`
         :return: measurements
         """
 
         segmentation_mask_map = self.get_segmentation_mask_map(image, roi, time)
+        if stream_components and self.supports_component_stream():
+            range_changed(0, 1)
+            result = self._calculate_from_components(
+                image, channel_num, roi, result_units, segmentation_mask_map, time, workers
+            )
+            step_changed(1)
+            return result
         result = MeasurementResult(segmentation_mask_map)
         range_changed(0, len(self.chosen_fields))
         for i, (name, data) in enumerate(
@@ -597,6 +744,40 @@ class MeasurementProfile(BaseModel):
 
         return result
 
+    def _prepare_kwargs(
+        self,
+        image: Image,
+        channel: np.ndarray,
+        roi: ROIInfo,
+        result_units: Units,
+        get_time: Callable[[Optional[np.ndarray]], Optional[np.ndarray]],
+    ) -> dict:
+        """Prepare arguments shared by all measurements. ``get_time`` select time point from 4d arrays."""
+        mask_bound_info = None
+        if isinstance(image.mask, np.ndarray):
+            mask_bound_info = {
+                k: v.del_dim(image.time_pos) if len(v.lower) == 4 else v
+                for k, v in ROIInfo(image.mask).fit_to_image(image).bound_info.items()
+            }
+        kw = {
+            "image": image,
+            "channel": get_time(channel),
+            "segmentation": get_time(roi.roi),
+            "roi": get_time(roi.roi),
+            "bounds_info": {
+                k: v.del_dim(image.time_pos) if len(v.lower) == 4 else v for k, v in roi.bound_info.items()
+            },
+            "mask_bound_info": mask_bound_info,
+            "mask": get_time(image.mask),
+            "voxel_size": image.spacing,
+            "result_scalar": UNIT_SCALE[result_units.value],
+            "roi_alternative": {name: get_time(array) for name, array in roi.alternative.items()},
+            "roi_annotation": roi.annotations,
+        }
+        for num in self.get_channels_num():
+            kw[f"channel_{num}"] = get_time(image.get_channel(num))
+        return kw
+
     def calculate_yield(
         self,
         image: Image,
@@ -626,35 +807,9 @@ class MeasurementProfile(BaseModel):
             raise ValueError("measurement need mask")
         channel = image.get_channel(channel_num).astype(float)
         cache_dict = {}
-        result_scalar = UNIT_SCALE[result_units.value]
         if isinstance(roi, np.ndarray):
             roi = ROIInfo(roi).fit_to_image(image)
-        mask_bound_info = None
-        if isinstance(image.mask, np.ndarray):
-            mask_bound_info = {
-                k: v.del_dim(image.time_pos) if len(v.lower) == 4 else v
-                for k, v in ROIInfo(image.mask).fit_to_image(image).bound_info.items()
-            }
-        roi_alternative = {}
-        for name, array in roi.alternative.items():
-            roi_alternative[name] = get_time(array)
-        kw = {
-            "image": image,
-            "channel": get_time(channel),
-            "segmentation": get_time(roi.roi),
-            "roi": get_time(roi.roi),
-            "bounds_info": {
-                k: v.del_dim(image.time_pos) if len(v.lower) == 4 else v for k, v in roi.bound_info.items()
-            },
-            "mask_bound_info": mask_bound_info,
-            "mask": get_time(image.mask),
-            "voxel_size": image.spacing,
-            "result_scalar": result_scalar,
-            "roi_alternative": roi_alternative,
-            "roi_annotation": roi.annotations,
-        }
-        for num in self.get_channels_num():
-            kw[f"channel_{num}"] = get_time(image.get_channel(num))
+        kw = self._prepare_kwargs(image, channel, roi, result_units, get_time)
         if any(self._need_mask_without_segmentation(el.calculation_tree) for el in self.chosen_fields):
             mm = kw["mask"].copy()
             mm[kw["segmentation"] > 0] = 0
@@ -690,6 +845,163 @@ class MeasurementProfile(BaseModel):
         except ProhibitedDivision as e:  # pragma: no cover
             return e.args[0], "", component_and_area
 
+    def _is_roi_component_tree(self, node: Union[Node, Leaf]) -> bool:
+        if isinstance(node, Leaf):
+            return (
+                node.per_component == PerComponent.Yes
+                and node.area == AreaType.ROI
+                and MEASUREMENT_DICT[node.name].area_type(node.area) == AreaType.ROI
+            )
+        return node.op == "/" and self._is_roi_component_tree(node.left) and self._is_roi_component_tree(node.right)
+
+    def supports_component_stream(self) -> bool:
+        """
+        Check if all measurements are calculated per ROI component,
+        so :py:meth:`calculate_components` could be used
+        """
+        return all(self._is_roi_component_tree(el.calculation_tree) for el in self.chosen_fields)
+
+    def _component_tree_unit(self, node: Union[Node, Leaf], ndim: int) -> symbols:
+        if isinstance(node, Node):
+            return self._component_tree_unit(node.left, ndim) / self._component_tree_unit(node.right, ndim)
+        unit = MEASUREMENT_DICT[node.name].get_units(ndim)
+        return pow(unit, Rational(node.power)) if node.power != 1 else unit
+
+    def _cut_component_kwargs(self, kw: dict, component: int) -> Tuple[dict, np.ndarray]:
+        """Cut all arrays to bounding box of component, like :py:meth:`_clip_arrays` but once for all measurements"""
+        bounds = tuple(kw["bounds_info"][component].get_slices(margin=1))
+        kw2 = dict(kw, help_dict={})
+        for name in ["channel", "segmentation", "roi", "mask"] + [f"channel_{num}" for num in self.get_channels_num()]:
+            if kw[name] is not None:
+                kw2[name] = kw[name][bounds]
+        # only cut part of default channel is converted to float
+        kw2["channel"] = kw2["channel"].astype(float)
+        kw2["roi_alternative"] = {name: array[bounds] for name, array in kw["roi_alternative"].items()}
+        im_bounds = list(bounds)
+        im_bounds.insert(kw["image"].time_pos, slice(None))
+        kw2["image"] = kw["image"].cut_image(tuple(im_bounds))
+        area_array = kw2["segmentation"].copy()
+        area_array[area_array != component] = 0
+        return kw2, area_array
+
+    def _calculate_component_tree(
+        self, node: Union[Node, Leaf], component: int, kw: dict, cut_kw: dict, area_array: np.ndarray
+    ):
+        if isinstance(node, Node):
+            left = self._calculate_component_tree(node.left, component, kw, cut_kw, area_array)
+            right = self._calculate_component_tree(node.right, component, kw, cut_kw, area_array)
+            # same behaviour as division of arrays of all components
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.divide(left, right)
+        method: MeasurementMethodBase = MEASUREMENT_DICT[node.name]
+        if method.need_full_data():
+            leaf_kw = self._prepare_leaf_kw(node, kw, method, AreaType.ROI)
+            leaf_kw = self._clip_arrays(leaf_kw, node, method, component)
+            if node.channel is None:
+                leaf_kw["channel"] = leaf_kw["channel"].astype(float)
+        else:
+            leaf_kw = self._prepare_leaf_kw(node, cut_kw, method, AreaType.ROI)
+            leaf_kw["area_array"] = area_array
+            leaf_kw["_component_num"] = component
+        val = method.calculate_property(**leaf_kw)
+        return pow(val, node.power) if node.power != 1 else val
+
+    def _calculate_component(self, kw: dict, component: int) -> Tuple[int, Dict[str, MeasurementValueType]]:
+        cut_kw, area_array = self._cut_component_kwargs(kw, component)
+        kw = dict(kw, help_dict=cut_kw["help_dict"])
+        res = {}
+        for entry in self.chosen_fields:
+            try:
+                res[self.name_prefix + entry.name] = self._calculate_component_tree(
+                    entry.calculation_tree, component, kw, cut_kw, area_array
+                )
+            except ZeroDivisionError:  # pragma: no cover
+                res[self.name_prefix + entry.name] = "Div by zero"
+        return component, res
+
+    def calculate_components(
+        self,
+        image: Image,
+        channel_num: int,
+        roi: Union[np.ndarray, ROIInfo],
+        result_units: Units,
+        time: int = 0,
+        workers: Optional[int] = None,
+    ) -> Generator[Tuple[int, Dict[str, MeasurementValueType]], None, None]:
+        """
+        Calculate measurements separately for each ROI component.
+        Arrays are only cut to bounding box of component, and only this part of channel is converted to float,
+        so no full size copies of image are created. Components are calculated in thread pool and only
+        limited number of them wait for consumer, so memory usage does not depend on number of components.
+
+        :param image: image on which measurements should be calculated
+        :param channel_num: default channel
+        :param roi: array with segmentation labeled as positive integers
+        :param result_units: units which should be used to present results.
+        :param time: which data point should be measured
+        :param workers: number of threads, default number of cpu
+        :return: pairs of component number and mapping from measurement name to value,
+            in order of bounding boxes (sorted by lower corner)
+        :raises ValueError: if profile contains measurements which are not calculated per ROI component
+            (see :py:meth:`supports_component_stream`)
+        """
+
+        def get_time(array: np.ndarray):
+            if array is not None and array.ndim == 4:
+                # view instead of copy used by take
+                return array[(slice(None),) * image.time_pos + (time,)]
+            return array
+
+        if not self.supports_component_stream():
+            raise ValueError("All measurements need to be calculated per ROI component")
+        if self._need_mask and image.mask is None:
+            raise ValueError("measurement need mask")
+        if isinstance(roi, np.ndarray):
+            roi = ROIInfo(roi).fit_to_image(image)
+        kw = self._prepare_kwargs(image, image.get_channel(channel_num), roi, result_units, get_time)
+        bounds_info = kw["bounds_info"]
+        if roi.roi.ndim == 4:
+            # only components present in selected time point
+            bounds_info = {
+                num: bound
+                for num, bound in bounds_info.items()
+                if roi.bound_info[num].lower[image.time_pos] <= time <= roi.bound_info[num].upper[image.time_pos]
+                and np.any(kw["segmentation"][tuple(bound.get_slices())] == num)
+            }
+        order = sorted(bounds_info, key=lambda x: tuple(bounds_info[x].lower))
+        workers = workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(workers) as executor:
+            pending = deque()
+            for component in order:
+                pending.append(executor.submit(self._calculate_component, kw, component))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _calculate_from_components(
+        self,
+        image: Image,
+        channel_num: int,
+        roi: Union[np.ndarray, ROIInfo],
+        result_units: Units,
+        segmentation_mask_map: ComponentsInfo,
+        time: int,
+        workers: Optional[int] = None,
+    ) -> MeasurementResult:
+        values = dict(self.calculate_components(image, channel_num, roi, result_units, time, workers))
+        ndim = 3 if image.is_stack else 2
+        result = MeasurementResult(segmentation_mask_map)
+        for entry in self.chosen_fields:
+            name = self.name_prefix + entry.name
+            unit = self._component_tree_unit(entry.calculation_tree, ndim)
+            result[name] = (
+                [values[num][name] for num in segmentation_mask_map.roi_components],
+                str(unit).format(str(result_units)),
+                (PerComponent.Yes, AreaType.ROI),
+            )
+        return result
+
 
 def calculate_main_axis(area_array: np.ndarray, channel: np.ndarray, voxel_size):
     # TODO check if it produces good values
@@ -697,18 +1009,15 @@ def calculate_main_axis(area_array: np.ndarray, channel: np.ndarray, voxel_size)
         if channel.shape[0] != 1:
             raise ValueError("This measurements do not support time data")
         channel = channel[0]
-    cut_img = np.copy(channel)
-    cut_img[area_array == 0] = 0
-    if np.all(cut_img == 0):
+    try:
+        orientation_matrix, _ = af.find_density_orientation(channel, voxel_size, 1, mask=area_array)
+    except ValueError:
+        # less than two voxels above cutoff
+        return (0,) * len(voxel_size)
+    extent = af.projected_extent(channel, orientation_matrix, voxel_size, mask=area_array)
+    if extent is None:
         return (0,) * len(voxel_size)
-    orientation_matrix, _ = af.find_density_orientation(cut_img, voxel_size, 1)
-    center_of_mass = af.density_mass_center(cut_img, voxel_size)
-    positions = np.array(np.nonzero(cut_img), dtype=np.float64)
-    for i, v in enumerate(reversed(voxel_size), start=1):
-        positions[-i] *= v
-        positions[-i] -= center_of_mass[i - 1]
-    centered = np.dot(orientation_matrix.T, positions)
-    return np.max(centered, axis=1) - np.min(centered, axis=1)
+    return extent
 
 
 def get_main_axis_length(
@@ -760,6 +1069,10 @@ class Volume(MeasurementMethodBase):
     def calculate_property(cls, area_array, voxel_size, result_scalar, **_):  # pylint: disable=W0221
         return np.count_nonzero(area_array) * pixel_volume(voxel_size, result_scalar)
 
+    @classmethod
+    def calculate_per_component(cls, statistics, voxel_size, result_scalar, **_):  # pylint: disable=W0221
+        return statistics.counts * pixel_volume(voxel_size, result_scalar)
+
     @classmethod
     def get_units(cls, ndim):
         return symbols("{}") ** ndim
@@ -772,6 +1085,10 @@ class Voxels(MeasurementMethodBase):
     def calculate_property(cls, area_array, **_):  # pylint: disable=W0221
         return np.count_nonzero(area_array)
 
+    @classmethod
+    def calculate_per_component(cls, statistics, **_):  # pylint: disable=W0221
+        return statistics.counts
+
     @classmethod
     def get_units(cls, ndim):
         return symbols("1")
@@ -831,19 +1148,38 @@ def iterative_double_normal(points_positions: np.ndarray):
     return delta, dn
 
 
+def convex_hull_candidates(array: np.ndarray) -> np.ndarray:
+    """
+    Positions of first and last nonzero voxel in each row along last axis.
+    Vertices of convex hull of nonzero voxels are always on this list,
+    so it could be used to reduce number of points when searching for farthest points.
+
+    :param array: array to find points
+    :return: points array of size (points_num, number of dimensions)
+    """
+    array = array > 0
+    rows_index = np.nonzero(np.any(array, axis=-1))
+    rows = array[rows_index]
+    first = np.argmax(rows, axis=-1)
+    last = array.shape[-1] - 1 - np.argmax(rows[:, ::-1], axis=-1)
+    rows_pos = np.transpose(rows_index)
+    return np.concatenate([np.column_stack((rows_pos, first)), np.column_stack((rows_pos, last))])
+
+
 class Diameter(MeasurementMethodBase):
     """
     Class for calculate diameter of ROI in fast way.
     From Malandain, G., & Boissonnat, J. (2002). Computing the diameter of a point set,
     12(6), 489-509. https://doi.org/10.1142/S0218195902001006
 
+    Only border points which could be vertices of convex hull are checked (see :py:func:`convex_hull_candidates`).
     """
 
     text_info = "Diameter", "Diameter of area"
 
     @staticmethod
     def calculate_property(area_array, voxel_size, result_scalar, **_):  # pylint: disable=W0221
-        pos = np.transpose(np.nonzero(get_border(area_array))).astype(float)
+        pos = convex_hull_candidates(get_border(area_array)).astype(float)
         if pos.size == 0:
             return 0
         for i, val in enumerate((x * result_scalar for x in reversed(voxel_size)), start=1):
@@ -889,6 +1225,10 @@ class PixelBrightnessSum(MeasurementMethodBase):
                 raise ValueError(f"channel ({channel.shape}) and mask ({area_array.shape}) do not fit each other")
         return np.sum(channel[area_array > 0]) if np.any(area_array) else 0
 
+    @classmethod
+    def calculate_per_component(cls, statistics, **_):  # pylint: disable=W0221
+        return statistics.sums
+
     @classmethod
     def get_units(cls, ndim):
         return symbols("Pixel_brightness")
@@ -919,6 +1259,10 @@ class MaximumPixelBrightness(MeasurementMethodBase):
             raise ValueError(f"channel ({channel.shape}) and mask ({area_array.shape}) do not fit each other")
         return np.max(channel[area_array > 0]) if np.any(area_array) else 0
 
+    @classmethod
+    def calculate_per_component(cls, statistics, **_):  # pylint: disable=W0221
+        return statistics.maximum
+
     @classmethod
     def get_units(cls, ndim):
         return symbols("Pixel_brightness")
@@ -937,6 +1281,10 @@ class MinimumPixelBrightness(MeasurementMethodBase):
             raise ValueError("channel and mask do not fit each other")
         return np.min(channel[area_array > 0]) if np.any(area_array) else 0
 
+    @classmethod
+    def calculate_per_component(cls, statistics, **_):  # pylint: disable=W0221
+        return statistics.minimum
+
     @classmethod
     def get_units(cls, ndim):
         return symbols("Pixel_brightness")
@@ -955,6 +1303,10 @@ class MeanPixelBrightness(MeasurementMethodBase):
             raise ValueError("channel and mask do not fit each other")
         return np.mean(channel[area_array > 0]) if np.any(area_array) else 0
 
+    @classmethod
+    def calculate_per_component(cls, statistics, **_):  # pylint: disable=W0221
+        return statistics.means
+
     @classmethod
     def get_units(cls, ndim):
         return symbols("Pixel_brightness")
@@ -973,6 +1325,10 @@ class MedianPixelBrightness(MeasurementMethodBase):
             raise ValueError("channel and mask do not fit each other")
         return np.median(channel[area_array > 0]) if np.any(area_array) else 0
 
+    @classmethod
+    def calculate_per_component(cls, statistics, **_):  # pylint: disable=W0221
+        return statistics.median
+
     @classmethod
     def get_units(cls, ndim):
         return symbols("Pixel_brightness")
@@ -994,6 +1350,10 @@ class StandardDeviationOfPixelBrightness(MeasurementMethodBase):
             raise ValueError("channel and mask do not fit each other")
         return np.std(channel[area_array > 0]) if np.any(area_array) else 0
 
+    @classmethod
+    def calculate_per_component(cls, statistics, **_):  # pylint: disable=W0221
+        return statistics.std
+
     @classmethod
     def get_units(cls, ndim):
         return symbols("Pixel_brightness")
@@ -1012,11 +1372,7 @@ class Moment(MeasurementMethodBase):
             if channel.shape[0] != 1:  # pragma: no cover
                 raise ValueError("This measurements do not support time data")
             channel = channel[0]
-        img = np.copy(channel)
-        img[area_array == 0] = 0
-        if np.all(img == 0):
-            return 0
-        return af.calculate_density_momentum(img, voxel_size)
+        return af.calculate_density_momentum(channel, voxel_size, mask=area_array)
 
     @classmethod
     def get_units(cls, ndim):
@@ -1250,9 +1606,7 @@ class DistanceMaskROI(MeasurementMethodBase):
             for i, val in enumerate((x * result_scalar for x in reversed(voxel_size)), start=1):
                 area_pos[:, -i] *= val
         elif point_type == DistancePoint.Mass_center:
-            im = np.copy(channel)
-            im[area_array == 0] = 0
-            area_pos = np.array([af.density_mass_center(im, voxel_size) * result_scalar])
+            area_pos = np.array([af.density_mass_center(channel, voxel_size, mask=area_array) * result_scalar])
         else:
             area_pos = np.array([af.density_mass_center(area_array > 0, voxel_size) * result_scalar])
         return area_pos
@@ -1278,13 +1632,7 @@ class DistanceMaskROI(MeasurementMethodBase):
             return 0
         mask_pos = cls.calculate_points(channel, mask, voxel_size, result_scalar, distance_from_mask)
         seg_pos = cls.calculate_points(channel, area_array, voxel_size, result_scalar, distance_to_roi)
-        if 1 in {mask_pos.shape[0], seg_pos.shape[0]}:
-            return np.min(cdist(mask_pos, seg_pos))
-
-        min_val = np.inf
-        for i in range(seg_pos.shape[0]):
-            min_val = min(min_val, np.min(cdist(mask_pos, np.array([seg_pos[i]]))))
-        return min_val
+        return min_distance(mask_pos, seg_pos)
 
     @classmethod
     def get_starting_leaf(cls):
@@ -1602,6 +1950,10 @@ class ComponentBoundingBox(MeasurementMethodBase):
     def calculate_property(bounds_info, _component_num, **kwargs):  # pylint: disable=W0221
         return str(bounds_info[_component_num])
 
+    @classmethod
+    def calculate_per_component(cls, statistics, bounds_info, **kwargs):  # pylint: disable=W0221
+        return np.array([str(bounds_info[num]) for num in statistics.components])
+
     @classmethod
     def get_starting_leaf(cls):
         return super().get_starting_leaf().replace_(area=AreaType.ROI, per_component=PerComponent.Yes)
@@ -1623,6 +1975,10 @@ class GetROIAnnotationType(MeasurementMethodBase):
     def calculate_property(roi_annotation, name, _component_num, **kwargs):  # pylint: disable=W0221
         return str(roi_annotation.get(_component_num, {}).get(name, ""))
 
+    @classmethod
+    def calculate_per_component(cls, statistics, roi_annotation, name, **kwargs):  # pylint: disable=W0221
+        return np.array([str(roi_annotation.get(num, {}).get(name, "")) for num in statistics.components])
+
     @classmethod
     def get_units(cls, ndim):
         return "str"
@@ -1714,6 +2070,34 @@ def get_border(array):
     return SimpleITK.GetArrayFromImage(SimpleITK.LabelContour(SimpleITK.GetImageFromArray(array)))
 
 
+def min_distance(points1: np.ndarray, points2: np.ndarray) -> float:
+    """
+    Minimum distance between two sets of points. Distances are queried from KD-tree
+    build on bigger set.
+
+    :param points1: points array of size (points_num, number of dimensions)
+    :param points2: points array of size (points_num, number of dimensions)
+    """
+    if 1 in {points1.shape[0], points2.shape[0]}:
+        return np.min(cdist(points1, points2))
+    if points1.shape[0] < points2.shape[0]:
+        points1, points2 = points2, points1
+    distances, _ = cKDTree(points1).query(points2, k=1)
+    return np.min(distances)
+
+
+def min_distance_brute(points1: np.ndarray, points2: np.ndarray) -> float:  # pragma: no cover
+    """
+    Reference implementation of :py:func:`min_distance`
+    """
+    if 1 in {points1.shape[0], points2.shape[0]}:
+        return np.min(cdist(points1, points2))
+    min_val = np.inf
+    for i in range(points2.shape[0]):
+        min_val = min(min_val, np.min(cdist(points1, np.array([points2[i]]))))
+    return min_val
+
+
 def calc_diam(array, voxel_size):  # pragma: no cover
     pos = np.transpose(np.nonzero(array)).astype(float)
     for i, val in enumerate(voxel_size):
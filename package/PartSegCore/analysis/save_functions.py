@@ -1,18 +1,19 @@
+import importlib.util
 import json
 import os.path
-import tarfile
 import typing
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, TextIOBase
 from pathlib import Path
 
 import h5py
 import numpy as np
-import tifffile
 
 from PartSegCore.algorithm_describe_base import AlgorithmProperty, Register
 from PartSegCore.analysis.io_utils import ProjectTuple, project_version_info
-from PartSegCore.io_utils import NotSupportedImage, SaveBase, SaveMaskAsTiff, SaveROIAsNumpy, SaveROIAsTIFF, get_tarinfo
+from PartSegCore.io_utils import NotSupportedImage, SaveBase, SaveMaskAsTiff, SaveROIAsNumpy, SaveROIAsTIFF
 from PartSegCore.json_hooks import PartSegEncoder
+from PartSegCore.project_container import ContainerWriter
 from PartSegCore.project_info import HistoryElement
 from PartSegCore.roi_info import ROIInfo
 from PartSegCore.universal_const import UNIT_SCALE, Units
@@ -22,78 +23,72 @@ __all__ = [
     "SaveProject",
     "SaveCmap",
     "SaveXYZ",
+    "SaveXYZNumpy",
+    "SaveXYZParquet",
+    "SaveXYZPly",
     "SaveAsTiff",
     "SaveAsNumpy",
     "save_dict",
 ]
 
 
+def _image_attrs(image: Image) -> dict:
+    return {
+        "spacing": list(image.spacing),
+        "shift": list(image.shift),
+        "channel_names": image.channel_names,
+        "axes_order": image.array_axis_order,
+        "name": image.name,
+    }
+
+
+def _history_info(history: typing.List[HistoryElement]) -> typing.List[dict]:
+    return [
+        {
+            "index": i,
+            "algorithm_name": el.roi_extraction_parameters["algorithm_name"],
+            "values": el.roi_extraction_parameters["values"],
+            "mask_property": el.mask_property,
+            "annotations": el.annotations,
+        }
+        for i, el in enumerate(history)
+    ]
+
+
 # TODO add progress function to io
 def save_project(
-    file_path: str,
+    file_path: typing.Union[str, Path, BytesIO],
     image: Image,
     roi_info: ROIInfo,
     mask: typing.Optional[np.ndarray],
     history: typing.List[HistoryElement],
     algorithm_parameters: dict,
 ):
-    # TODO add support for binary objects
-    ext = os.path.splitext(file_path)[1]
-    tar_mod = "w:bz2" if ext.lower() in [".bz2", ".tbz2"] else "w:gz"
-    with tarfile.open(file_path, tar_mod) as tar:
-        segmentation_buff = BytesIO()
-        # noinspection PyTypeChecker
-        tifffile.imwrite(segmentation_buff, roi_info.roi)
-        segmentation_tar = get_tarinfo("segmentation.tif", segmentation_buff)
-        tar.addfile(segmentation_tar, fileobj=segmentation_buff)
-        if roi_info.alternative:
-            alternative_buff = BytesIO()
-            np.savez(alternative_buff, **roi_info.alternative)
-            alternative_tar = get_tarinfo("alternative.npz", alternative_buff)
-            tar.addfile(alternative_tar, fileobj=alternative_buff)
+    """
+    Save project in chunked container (:py:mod:`PartSegCore.project_container`).
+    Each channel of image, ROI, mask and alternative ROI are stored as separate arrays.
+    """
+    with ContainerWriter(file_path) as container:
+        attrs = _image_attrs(image)
+        for i in range(image.channels):
+            container.write_array(f"image/{i}", image.get_channel(i), attrs=attrs)
+        container.write_array("roi", roi_info.roi)
+        for name, array in roi_info.alternative.items():
+            container.write_array(f"alternative/{name}", array)
         if mask is not None:
-            if mask.dtype == bool:
-                mask = mask.astype(np.uint8)
-            segmentation_buff = BytesIO()
-            # noinspection PyTypeChecker
-            tifffile.imwrite(segmentation_buff, mask)
-            segmentation_tar = get_tarinfo("mask.tif", segmentation_buff)
-            tar.addfile(segmentation_tar, fileobj=segmentation_buff)
-        image_buff = BytesIO()
-        ImageWriter.save(image, image_buff, compression=None)
-        tar_image = get_tarinfo("image.tif", image_buff)
-        tar.addfile(tarinfo=tar_image, fileobj=image_buff)
-        para_str = json.dumps(algorithm_parameters, cls=PartSegEncoder)
-        parameters_buff = BytesIO(para_str.encode("utf-8"))
-        tar_algorithm = get_tarinfo("algorithm.json", parameters_buff)
-        tar.addfile(tar_algorithm, parameters_buff)
-        meta_str = json.dumps(
-            {"project_version_info": str(project_version_info), "roi_annotations": roi_info.annotations},
-            cls=PartSegEncoder,
+            container.write_array("mask", mask)
+        container.write_json("algorithm.json", algorithm_parameters)
+        container.write_json(
+            "metadata.json",
+            {
+                "project_version_info": str(project_version_info),
+                "roi_annotations": roi_info.annotations,
+            },
         )
-        meta_buff = BytesIO(meta_str.encode("utf-8"))
-        tar_meta = get_tarinfo("metadata.json", meta_buff)
-        tar.addfile(tar_meta, meta_buff)
-        el_info = []
         for i, el in enumerate(history):
-            el_info.append(
-                {
-                    "index": i,
-                    "algorithm_name": el.roi_extraction_parameters["algorithm_name"],
-                    "values": el.roi_extraction_parameters["values"],
-                    "mask_property": el.mask_property,
-                    "annotations": el.annotations,
-                }
-            )
-            el.arrays.seek(0)
-            hist_info = get_tarinfo(f"history/arrays_{i}.npz", el.arrays)
-            el.arrays.seek(0)
-            tar.addfile(hist_info, el.arrays)
-        if el_info:
-            hist_str = json.dumps(el_info, cls=PartSegEncoder)
-            hist_buff = BytesIO(hist_str.encode("utf-8"))
-            tar_algorithm = get_tarinfo("history/history.json", hist_buff)
-            tar.addfile(tar_algorithm, hist_buff)
+            container.write_bytes(f"history/arrays_{i}.npz", el.arrays.getvalue())
+        if history:
+            container.write_json("history/history.json", _history_info(history))
 
 
 def _save_cmap(
@@ -245,7 +240,53 @@ class SaveCmap(SaveBase):
             save_cmap(save_location, data, spacing, segmentation, reverse_base, parameters)
 
 
+_POINTS_BLOCK_SIZE = 2**22
+"""Maximum number of voxels of mask processed at once during points export"""
+_TEXT_CHUNK = 2**16
+
+
+def _iter_points(
+    channel_image: np.ndarray,
+    mask: np.ndarray,
+    shift: np.ndarray,
+    bounding_box: typing.Optional[typing.Tuple[slice, ...]] = None,
+    label: typing.Optional[int] = None,
+) -> typing.Iterator[typing.Tuple[np.ndarray, np.ndarray]]:
+    """
+    Iterate over blocks of points of mask. Mask is processed in blocks along first axis,
+    so memory usage is limited.
+
+    :param channel_image: source of values
+    :param mask: mask or labels array
+    :param shift: shift subtracted from positions (in reversed axis order)
+    :param bounding_box: if provided only this part of mask is checked
+    :param label: if provided only voxels with this label are exported, else all non zero voxels
+    :return: iterator over positions (reversed axis order, x first) and values
+    """
+    if bounding_box is None:
+        bounding_box = tuple(slice(0, x) for x in mask.shape)
+    start = bounding_box[0].start
+    stop = bounding_box[0].stop
+    step = max(1, _POINTS_BLOCK_SIZE // max(1, int(np.prod([x.stop - x.start for x in bounding_box[1:]]))))
+    for block_start in range(start, stop, step):
+        block = (slice(block_start, min(block_start + step, stop)),) + bounding_box[1:]
+        sub_mask = mask[block]
+        sub_mask = sub_mask > 0 if label is None else sub_mask == label
+        positions = np.nonzero(sub_mask)
+        if positions[0].size == 0:
+            continue
+        values = channel_image[block][positions]
+        positions = np.transpose(positions)
+        positions += [x.start for x in block]
+        yield np.flip(positions, 1) - shift, values
+
+
 class SaveXYZ(SaveBase):
+    """
+    Save voxels of ROI as list of points with coordinates (in reversed axis order) and brightness.
+    Subclasses change output format by overriding :py:meth:`_write_points`.
+    """
+
     @classmethod
     def get_name(cls):
         return "XYZ text (*.xyz *.txt)"
@@ -263,16 +304,66 @@ class SaveXYZ(SaveBase):
         ]
 
     @classmethod
-    def _save(cls, save_location, channel_image, segmentation_mask, shift):
-        positions = np.transpose(np.nonzero(segmentation_mask))
-        positions = np.flip(positions, 1)
-        positions -= shift
-        values = channel_image[segmentation_mask]
-        values = values.reshape(values.size, 1)
-        data = np.append(positions, values, axis=1)
-        fm = "%d" if np.issubdtype(channel_image.dtype, np.integer) else "%f"
-        # noinspection PyTypeChecker
-        np.savetxt(save_location, data, fmt=["%d"] * channel_image.ndim + [fm], delimiter=" ")
+    def _write_points(
+        cls,
+        file_obj: typing.Union[typing.BinaryIO, typing.TextIO],
+        points: typing.Iterable[typing.Tuple[np.ndarray, np.ndarray]],
+        count: int,
+        ndim: int,
+        dtype: np.dtype,
+    ):
+        """
+        Write points to opened file. Text format accepts binary and text files,
+        binary formats of subclasses require binary file.
+
+        :param file_obj: opened file
+        :param points: iterable of blocks of positions (shape ``(n, ndim)``) and values
+        :param count: total number of points
+        :param ndim: number of coordinates
+        :param dtype: type of values
+        """
+        value_format = "%d" if np.issubdtype(dtype, np.integer) else "%f"
+        line_format = " ".join(["%d"] * ndim + [value_format]) + "\n"
+        text_file = isinstance(file_obj, TextIOBase)
+        for positions, values in points:
+            data = np.column_stack([positions, values])
+            for i in range(0, data.shape[0], _TEXT_CHUNK):
+                chunk = data[i : i + _TEXT_CHUNK]
+                text = (line_format * chunk.shape[0]) % tuple(chunk.ravel().tolist())
+                file_obj.write(text if text_file else text.encode("ascii"))
+
+    @classmethod
+    def _save(
+        cls,
+        save_location,
+        channel_image: np.ndarray,
+        mask: np.ndarray,
+        shift: np.ndarray,
+        bounding_box: typing.Optional[typing.Tuple[slice, ...]] = None,
+        label: typing.Optional[int] = None,
+    ):
+        if bounding_box is None:
+            count = np.count_nonzero(mask)
+        else:
+            count = np.count_nonzero(mask[bounding_box] == label)
+        points = _iter_points(channel_image, mask, shift, bounding_box, label)
+        if isinstance(save_location, (str, Path)):
+            with open(save_location, "wb") as f_p:
+                cls._write_points(f_p, points, count, mask.ndim, channel_image.dtype)
+        else:
+            cls._write_points(save_location, points, count, mask.ndim, channel_image.dtype)
+
+    @staticmethod
+    def _component_bounds(project_info: ProjectTuple, roi: np.ndarray) -> typing.Dict[int, typing.Tuple[slice, ...]]:
+        bound_info = project_info.roi_info.bound_info
+        full_roi = project_info.roi_info.roi
+        time_pos = project_info.image.time_pos
+        if full_roi.ndim == roi.ndim + 1 and full_roi.shape[time_pos] == 1:
+            bound_info = {k: v.del_dim(time_pos) for k, v in bound_info.items()}
+        elif full_roi.ndim != roi.ndim:
+            # bounds of all time points are not bounds of selected one
+            bound_info = ROIInfo.calc_bounds(roi)
+        return {k: tuple(bound_info[k].get_slices()) for k in sorted(bound_info)}
 
     @classmethod
     def save(
@@ -291,25 +382,129 @@ class SaveXYZ(SaveBase):
             raise ValueError("Saving components to buffer not supported")
         if project_info.image.shape[project_info.image.time_pos] != 1 and "time" not in parameters:
             raise NotSupportedImage("This save method o not support time data")
-        channel_image = project_info.image.get_data_by_axis(c=parameters["channel"], t=parameters.get("time", 0))
-
-        segmentation_mask = np.array(project_info.roi_info.roi > 0)
-        segmentation_mask = project_info.image.clip_array(segmentation_mask, t=parameters.get("time", 0))
-        if parameters.get("clip", False):
-            positions = np.transpose(np.nonzero(segmentation_mask))
-            positions = np.flip(positions, 1)
-            shift = np.min(positions, 0)
+        time = parameters.get("time", 0)
+        channel_image = project_info.image.get_data_by_axis(c=parameters["channel"], t=time)
+        roi = project_info.image.clip_array(project_info.roi_info.roi, t=time)
+        bounds = cls._component_bounds(project_info, roi)
+        if parameters.get("clip", False) and bounds:
+            shift = np.flip(np.min([[x.start for x in cut] for cut in bounds.values()], axis=0))
         else:
-            shift = np.array([0] * segmentation_mask.ndim)
-        cls._save(save_location, channel_image, segmentation_mask, shift)
+            shift = np.zeros(roi.ndim, dtype=int)
+        tasks = [(save_location, None, None)]
         if parameters.get("separated_objects", False):
-            components_count = np.bincount(project_info.roi_info.roi.flat)
-            for i, size in enumerate(components_count[1:], 1):
-                if size > 0:
-                    segmentation_mask = np.array(project_info.roi_info.roi == i)[parameters.get("time", 0)]
-                    base_path, ext = os.path.splitext(save_location)
-                    new_save_location = f"{base_path}_part{i}{ext}"
-                    cls._save(new_save_location, channel_image, segmentation_mask, shift)
+            base_path, ext = os.path.splitext(save_location)
+            tasks.extend((f"{base_path}_part{i}{ext}", cut, i) for i, cut in bounds.items())
+        with ThreadPoolExecutor() as executor:
+            futures = [
+                executor.submit(cls._save, location, channel_image, roi, shift, cut, label)
+                for location, cut, label in tasks
+            ]
+            for future in futures:
+                future.result()
+
+
+def _ply_type(dtype: np.dtype) -> str:
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f":
+        return "float" if dtype.itemsize <= 4 else "double"
+    if dtype.kind == "b":
+        return "uchar"
+    types = {1: "char", 2: "short", 4: "int"} if dtype.kind == "i" else {1: "uchar", 2: "ushort", 4: "uint"}
+    # PLY has no 8 byte integers, so such values are stored as double
+    return types.get(dtype.itemsize, "double")
+
+
+_PLY_DTYPES = {
+    "char": "i1",
+    "uchar": "u1",
+    "short": "<i2",
+    "ushort": "<u2",
+    "int": "<i4",
+    "uint": "<u4",
+    "float": "<f4",
+    "double": "<f8",
+}
+
+
+class SaveXYZPly(SaveXYZ):
+    """Save ROI points as binary PLY point cloud with ``value`` property"""
+
+    @classmethod
+    def get_name(cls):
+        return "XYZ binary PLY (*.ply)"
+
+    @classmethod
+    def get_short_name(cls):
+        return "xyz_ply"
+
+    @classmethod
+    def _write_points(cls, file_obj, points, count, ndim, dtype):
+        names = ["x", "y", "z"] + [f"coord{i}" for i in range(3, ndim)]
+        ply_value_type = _ply_type(dtype)
+        row_dtype = np.dtype(
+            [(name, "<i4") for name in names[: max(ndim, 3)]] + [("value", _PLY_DTYPES[ply_value_type])]
+        )
+        header = ["ply", "format binary_little_endian 1.0", f"element vertex {count}"]
+        header.extend(f"property int {name}" for name in names[: max(ndim, 3)])
+        header.extend([f"property {ply_value_type} value", "end_header"])
+        file_obj.write(("\n".join(header) + "\n").encode("ascii"))
+        for positions, values in points:
+            data = np.zeros(positions.shape[0], dtype=row_dtype)
+            for i in range(ndim):
+                data[names[i]] = positions[:, i]
+            data["value"] = values
+            file_obj.write(data.tobytes())
+
+
+class SaveXYZNumpy(SaveXYZ):
+    """Save ROI points as numpy array of shape ``(points, ndim + 1)``, last column contains values"""
+
+    @classmethod
+    def get_name(cls):
+        return "XYZ numpy (*.npy)"
+
+    @classmethod
+    def get_short_name(cls):
+        return "xyz_npy"
+
+    @classmethod
+    def _write_points(cls, file_obj, points, count, ndim, dtype):
+        array_dtype = np.result_type(np.int64, dtype)
+        header = {
+            "descr": np.lib.format.dtype_to_descr(array_dtype),
+            "fortran_order": False,
+            "shape": (count, ndim + 1),
+        }
+        np.lib.format.write_array_header_2_0(file_obj, header)
+        for positions, values in points:
+            file_obj.write(np.column_stack([positions, values]).astype(array_dtype).tobytes())
+
+
+class SaveXYZParquet(SaveXYZ):
+    """
+    Save ROI points as parquet table, one row group per block of points.
+    Requires ``pyarrow``, registered in :py:data:`save_dict` only if it is installed.
+    """
+
+    @classmethod
+    def get_name(cls):
+        return "XYZ parquet (*.parquet)"
+
+    @classmethod
+    def get_short_name(cls):
+        return "xyz_parquet"
+
+    @classmethod
+    def _write_points(cls, file_obj, points, count, ndim, dtype):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        names = ["x", "y", "z"][:ndim] + [f"coord{i}" for i in range(3, ndim)]
+        schema = pa.schema([(name, pa.int64()) for name in names] + [("value", pa.from_numpy_dtype(np.dtype(dtype)))])
+        with pq.ParquetWriter(file_obj, schema) as writer:
+            for positions, values in points:
+                columns = [pa.array(positions[:, i]) for i in range(ndim)] + [pa.array(values)]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
 
 
 class SaveAsTiff(SaveBase):
@@ -412,6 +607,8 @@ save_dict = Register(
     SaveProject,
     SaveCmap,
     SaveXYZ,
+    SaveXYZPly,
+    SaveXYZNumpy,
     SaveAsTiff,
     SaveMaskAsTiff,
     SaveAsNumpy,
@@ -419,3 +616,6 @@ save_dict = Register(
     SaveROIAsNumpy,
     class_methods=SaveBase.need_functions,
 )
+
+if importlib.util.find_spec("pyarrow") is not None:  # pragma: no cover
+    save_dict.register(SaveXYZParquet)
@@ -0,0 +1,137 @@
+"""
+Calculation of segmentation and measurements independently for each time point of image.
+
+Time points are processed in pool of processes. Only limited number of time points
+is send to workers at once, so memory usage does not depend on number of time points
+(if image data are loaded lazily, see :py:class:`PartSegImage.TiffImageReader`).
+"""
+import os
+import typing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from PartSegCore.algorithm_describe_base import ROIExtractionProfile
+from PartSegCore.analysis.algorithm_description import AnalysisAlgorithmSelection
+from PartSegCore.analysis.batch_processing.parallel_backend import _register_plugins
+from PartSegCore.analysis.calculate_pipeline import calculate_segmentation_step
+from PartSegCore.analysis.measurement_calculation import MeasurementProfile, MeasurementResult
+from PartSegCore.universal_const import Units
+from PartSegImage import Image
+
+
+class TimePointTask(typing.NamedTuple):
+    """Data needed to calculate single time point"""
+
+    time: int
+    image: Image
+    mask: typing.Optional[np.ndarray]
+    segmentation_profile: ROIExtractionProfile
+    measurement_profile: MeasurementProfile
+    channel: int
+    units: Units
+
+
+def get_time_point(image: Image, time: int, mask: typing.Optional[np.ndarray] = None):
+    """
+    Extract single time point from image and mask.
+
+    :param image: image to cut
+    :param time: time point
+    :param mask: optional mask in shape of image
+    :return: image with single time point and corresponding part of mask
+    """
+    slices = [slice(None)] * len(image.array_axis_order)
+    slices[image.time_pos] = slice(time, time + 1)
+    time_image = image.cut_image(slices, frame=0)
+    time_image.file_path = image.file_path
+    if mask is not None:
+        mask = image.clip_array(mask, t=slice(time, time + 1))
+    return time_image, mask
+
+
+def get_measurement_channel(segmentation_profile: ROIExtractionProfile, channel: int) -> int:
+    """
+    Resolve channel used for measurement. Value -1 means channel used by segmentation algorithm.
+    """
+    if channel != -1:
+        return channel
+    segmentation_class = AnalysisAlgorithmSelection[segmentation_profile.algorithm]
+    if segmentation_class.__new_style__:
+        return getattr(segmentation_profile.values, segmentation_class.get_channel_parameter_name())
+    return segmentation_profile.values[segmentation_class.get_channel_parameter_name()]
+
+
+def calculate_time_point(task: TimePointTask) -> MeasurementResult:
+    """
+    Calculate segmentation and measurement for single time point.
+
+    :param task: description of calculation
+    :return: measurement result with time point set
+    """
+    result, _ = calculate_segmentation_step(task.segmentation_profile, task.image, task.mask)
+    roi_info = result.roi_info.fit_to_image(task.image)
+    task.image.set_mask(task.mask)
+    measurement = task.measurement_profile.calculate(task.image, task.channel, roi_info, task.units)
+    measurement.set_time(task.time)
+    return measurement
+
+
+def iterate_time_points(
+    image: Image,
+    segmentation_profile: ROIExtractionProfile,
+    measurement_profile: MeasurementProfile,
+    channel: int = -1,
+    units: Units = Units.nm,
+    mask: typing.Optional[np.ndarray] = None,
+    workers_num: typing.Optional[int] = None,
+    max_pending: typing.Optional[int] = None,
+) -> typing.Iterator[MeasurementResult]:
+    """
+    Run segmentation and measurement for each time point of image in pool of processes.
+    Results are yielded in order of time points.
+
+    :param image: image to process
+    :param segmentation_profile: segmentation to be applied on each time point
+    :param measurement_profile: measurements to be calculated on each time point
+    :param channel: channel for measurement, -1 means channel used by segmentation
+    :param units: units of measurement result
+    :param mask: optional mask in shape of image
+    :param workers_num: number of processes, default number of CPUs
+    :param max_pending: maximum number of time points sent to workers and not yet consumed,
+        default twice ``workers_num``
+    :return: iterator over measurement results with time point set
+    """
+    workers_num = workers_num or os.cpu_count() or 1
+    max_pending = max(max_pending or 2 * workers_num, 1)
+    channel = get_measurement_channel(segmentation_profile, channel)
+    if mask is None:
+        mask = image.mask
+    with ProcessPoolExecutor(workers_num, initializer=_register_plugins) as executor:
+        pending: typing.Deque[Future] = deque()
+        for time in range(image.times):
+            time_image, time_mask = get_time_point(image, time, mask)
+            task = TimePointTask(time, time_image, time_mask, segmentation_profile, measurement_profile, channel, units)
+            pending.append(executor.submit(calculate_time_point, task))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def time_points_to_dataframe(results: typing.Iterable[MeasurementResult], all_components=False) -> pd.DataFrame:
+    """
+    Collect results of :py:func:`iterate_time_points` in single table.
+
+    :param results: measurement results with time point set
+    :param all_components: passed to :py:meth:`MeasurementResult.get_separated`
+    """
+    return pd.concat(
+        [
+            pd.DataFrame(x.get_separated(all_components), columns=x.get_labels(all_components=all_components))
+            for x in results
+        ],
+        ignore_index=True,
+    )
@@ -1,9 +1,14 @@
+import itertools
+import typing
 from math import acos, pi, sqrt
 
 import numpy as np
 
+_BLOCK_SIZE = 2**22
+"""Maximum number of elements processed at once"""
 
-def find_density_orientation(img, voxel_size, cutoff=1):
+
+def find_density_orientation(img, voxel_size, cutoff=1, mask=None):
     """
     Identify axis of point set.
 
@@ -11,28 +16,24 @@ def find_density_orientation(img, voxel_size, cutoff=1):
         img (3D array): value in x, y, z
         voxel_size (len 3 vector): self explanatory
         cutoff (float): minimum value of value in image to take into account
+        mask (3D array): if provided, only voxels with non zero mask are taken into account
     Returns:
         3x3 numpy array of eigen vectors
+    Raises:
+        ValueError: if there is less than two voxels above cutoff
     """
-
-    points_l = np.nonzero(np.array(img > cutoff))
-    weights = img[points_l]
-    points_l = np.transpose(points_l).astype(np.float64)
-    if len(voxel_size) >= 3:
-        points_l[:, 0] *= voxel_size[-3]
-    points_l[:, 1] *= voxel_size[-2]
-    points_l[:, 2] *= voxel_size[-1]
-    points = points_l.astype(np.float64)
-    punkty_wazone = np.empty(points.shape)
-    for i in range(3):
-        punkty_wazone[:, i] = points[:, i] * weights
-    mean = np.sum(punkty_wazone, axis=0) / np.sum(weights)
-    points_shifted = points - mean
-    wheighted_points_shifted = np.copy(points_shifted)
-    for i in range(3):
-        wheighted_points_shifted[:, i] *= weights
-    cov = np.dot(wheighted_points_shifted.transpose(), points_shifted) * 1 / (len(weights) - 1)
-    # cov variable is weighted covariance matrix
+    voxel_size = np.array(
+        [voxel_size[-3] if len(voxel_size) >= 3 else 1, voxel_size[-2], voxel_size[-1]], dtype=np.float64
+    )
+    count, mass, first, _ = _second_order_moments(img, mask, cutoff, second_order=False)
+    if count < 2:
+        raise ValueError("At least two voxels above cutoff are required")
+    # second pass in coordinates relative to mean, for numerical stability
+    _, mass, first, second = _second_order_moments(img, mask, cutoff, center=first / mass)
+    first = first * voxel_size
+    second = second * np.outer(voxel_size, voxel_size)
+    # weighted covariance matrix
+    cov = (second - np.outer(first, first) / mass) / (count - 1)
     values, vectors = np.linalg.eig(cov)
     sorted_values = sorted(((values[i], vectors[:, i]) for i in range(3)), key=lambda y: y[0], reverse=True)
     values = [x[0] for x in sorted_values]
@@ -60,10 +61,143 @@ def get_rotation_parameters(isometric_matrix):
     return isometric_matrix, np.array((x, y, z)), angel
 
 
-def density_mass_center(image, voxel_size=(1.0, 1.0, 1.0)):
+def _blocks(shape: typing.Sequence[int]) -> typing.Iterator[slice]:
+    """Split first axis on blocks with at most :py:data:`_BLOCK_SIZE` elements (at least one plane)"""
+    step = max(1, _BLOCK_SIZE // max(1, int(np.prod(shape[1:]))))
+    for start in range(0, shape[0], step):
+        yield slice(start, start + step)
+
+
+def _prepare_mask(image: np.ndarray, mask: typing.Optional[np.ndarray]) -> typing.Optional[np.ndarray]:
+    if mask is None or mask.shape == image.shape:
+        return mask
+    return mask.reshape(image.shape)
+
+
+def _voxel_size_array(ndim: int, voxel_size) -> np.ndarray:
+    """Voxel size aligned to last axes, missing leading values are set to 1"""
+    res = np.ones(ndim)
+    for i, v in enumerate(reversed(voxel_size), start=1):
+        if i <= ndim:
+            res[-i] = v
+    return res
+
+
+def _weights(image: np.ndarray, mask: typing.Optional[np.ndarray], block: slice) -> np.ndarray:
+    """Copy of block of image as float64 with voxels outside mask set to 0"""
+    weights = image[block].astype(np.float64)
+    if mask is not None:
+        weights[mask[block] == 0] = 0
+    return weights
+
+
+def axis_projections(image: np.ndarray, mask: typing.Optional[np.ndarray] = None) -> typing.List[np.ndarray]:
+    """
+    Calculate sum of image values over all axes except one, for each axis.
+    Image is processed in blocks, so additional memory is limited.
+
+    :param image: array of weights
+    :param mask: if provided, only voxels with non zero mask are taken into account
+    :return: list of 1d arrays, one for each axis of image
+    """
+    mask = _prepare_mask(image, mask)
+    res = [np.zeros(x, dtype=np.float64) for x in image.shape]
+    axes = range(image.ndim)
+    for block in _blocks(image.shape):
+        weights = _weights(image, mask, block)
+        for axis in axes:
+            projection = weights.sum(axis=tuple(x for x in axes if x != axis))
+            if axis == 0:
+                res[0][block] += projection
+            else:
+                res[axis] += projection
+    return res
+
+
+def _second_order_moments(
+    image: np.ndarray,
+    mask: typing.Optional[np.ndarray] = None,
+    cutoff: typing.Optional[float] = None,
+    center: typing.Optional[np.ndarray] = None,
+    second_order: bool = True,
+) -> typing.Tuple[int, float, np.ndarray, np.ndarray]:
+    """
+    Calculate raw moments (in voxel coordinates) up to second order.
+    Cross moments are calculated from projections on pair of axes, so additional memory is limited.
+
+    :param cutoff: if provided, only voxels with value above cutoff are taken into account
+    :param center: if provided, moments are calculated in coordinates shifted by center
+    :param second_order: if False, matrix of second order moments is not calculated
+    :return: number of voxels, sum of weights, first order moments, matrix of second order moments
+    """
+    mask = _prepare_mask(image, mask)
+    ndim = image.ndim
+    count = 0
+    mass = 0.0
+    first = np.zeros(ndim)
+    second = np.zeros((ndim, ndim))
+    pairs = (
+        list(itertools.combinations_with_replacement(range(ndim), 2)) if second_order else [(i, i) for i in range(ndim)]
+    )
+    for block in _blocks(image.shape):
+        weights = _weights(image, mask, block)
+        if cutoff is not None:
+            weights[weights <= cutoff] = 0
+        count += np.count_nonzero(weights)
+        mass += weights.sum()
+        coords = [np.arange(x, dtype=np.float64) for x in weights.shape]
+        coords[0] += block.start
+        if center is not None:
+            coords = [coord - value for coord, value in zip(coords, center)]
+        for i, j in pairs:
+            projection = weights.sum(axis=tuple(x for x in range(ndim) if x not in (i, j)))
+            if i == j:
+                first[i] += projection @ coords[i]
+                if second_order:
+                    second[i, i] += projection @ coords[i] ** 2
+            else:
+                second[i, j] += coords[i] @ projection @ coords[j]
+                second[j, i] = second[i, j]
+    return count, mass, first, second
+
+
+def projected_extent(
+    image: np.ndarray, vectors: np.ndarray, voxel_size, mask: typing.Optional[np.ndarray] = None
+) -> typing.Optional[np.ndarray]:
+    """
+    Calculate extent (max - min) of non zero voxels projected on given vectors.
+
+    :param image: array, non zero voxels are taken into account
+    :param vectors: matrix with vectors in columns
+    :param voxel_size: size of voxel, aligned to last axes of image
+    :param mask: if provided, only voxels with non zero mask are taken into account
+    :return: extent for each vector or None if there is no non zero voxel
+    """
+    mask = _prepare_mask(image, mask)
+    scale = _voxel_size_array(image.ndim, voxel_size)
+    lower = np.full(vectors.shape[1], np.inf)
+    upper = np.full(vectors.shape[1], -np.inf)
+    for block in _blocks(image.shape):
+        selected = image[block] != 0
+        if mask is not None:
+            selected &= mask[block] != 0
+        positions = np.transpose(np.nonzero(selected)).astype(np.float64)
+        if positions.size == 0:
+            continue
+        positions[:, 0] += block.start
+        projected = (positions * scale) @ vectors
+        lower = np.minimum(lower, projected.min(axis=0))
+        upper = np.maximum(upper, projected.max(axis=0))
+    if np.isinf(lower[0]):
+        return None
+    return upper - lower
+
+
+def density_mass_center(image, voxel_size=(1.0, 1.0, 1.0), mask=None):
     """
     Args:
         image: 3d numpy array
+        mask: if provided, only voxels with non zero mask are taken into account
 
     Returns:
         x, y, z: three floats tuple with mass center coords
@@ -72,7 +206,6 @@ def density_mass_center(image, voxel_size=(1.0, 1.0, 1.0)):
     :return np.ndarray
 
     """
-    single_dim = tuple(i for i, x in enumerate(image.shape) if x == 1)
     iter_dim = [i for i, x in enumerate(image.shape) if x > 1]
     res = [0] * image.ndim
 
@@ -85,25 +218,112 @@ def density_mass_center(image, voxel_size=(1.0, 1.0, 1.0)):
     else:
         voxel_size_array = voxel_size
 
-    denominator = float(np.sum(image))
-    for i, item in enumerate(iter_dim):
-        ax = single_dim + tuple(iter_dim[:i] + iter_dim[i + 1 :])
-        m = np.sum(np.sum(image, axis=ax) * np.arange(image.shape[item]))
+    projections = axis_projections(image, mask)
+    denominator = float(np.sum(projections[0]))
+    for item in iter_dim:
+        m = np.sum(projections[item] * np.arange(image.shape[item]))
         res[item] = m / denominator
 
     return np.array(res) * voxel_size_array
 
 
-def calculate_density_momentum(image: np.ndarray, voxel_size=None, mass_center=None):
-    """Calculates image momentum."""
+def calculate_density_momentum(image: np.ndarray, voxel_size=None, mass_center=None, mask=None):
+    """
+    Calculates image momentum. It is calculated from projections of image on axes,
+    so no coordinates array is created.
+
+    :param image: array of weights
+    :param voxel_size: size of voxel, aligned to last axes of image
+    :param mass_center: mass center in physical coordinates (of squeezed image), calculated if not provided
+    :param mask: if provided, only voxels with non zero mask are taken into account
+    """
     if voxel_size is None:
         voxel_size = np.array([1.0, 1.0, 1.0])
+    if mask is not None:
+        mask = mask.reshape(image.shape).squeeze()
     image = image.squeeze()
-    if not mass_center:
-        mass_center = density_mass_center(image, voxel_size)
-    mass_center = np.array(mass_center)
-    points = np.transpose(np.nonzero(np.ones(image.shape, dtype=np.uint8))).astype(np.float64)
-    for i, v in enumerate(reversed(voxel_size), start=1):
-        points[:, -i] *= v
-    weights = np.sum((points - mass_center) ** 2, axis=1)
-    return float(np.sum(weights * image.flatten()))
+    if image.ndim == 0:
+        return 0.0
+    projections = axis_projections(image, mask)
+    mass = float(np.sum(projections[0]))
+    if mass == 0:
+        return 0.0
+    coords = [np.arange(x) * v for x, v in zip(image.shape, _voxel_size_array(image.ndim, voxel_size))]
+    if mass_center is None:
+        mass_center = [projection @ coord / mass for projection, coord in zip(projections, coords)]
+    return float(sum(projection @ (coord - c) ** 2 for projection, coord, c in zip(projections, coords, mass_center)))
+
+
+def _component_moments(
+    image: np.ndarray, labels: np.ndarray, components_num: typing.Optional[int] = None
+) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculate sum of weights and per axis sums of first and second powers of coordinates
+    for each component in single pass over image.
+
+    :return: arrays of shape (components_num + 1,), (components_num + 1, ndim), (components_num + 1, ndim)
+    """
+    labels = _prepare_mask(image, labels)
+    if components_num is None:
+        components_num = int(labels.max()) if labels.size else 0
+    size = components_num + 1
+    mass = np.zeros(size)
+    first = np.zeros((size, image.ndim))
+    second = np.zeros((size, image.ndim))
+    for block in _blocks(image.shape):
+        block_labels = labels[block]
+        weights = image[block].astype(np.float64)
+        weights[block_labels == 0] = 0
+        flat_labels = block_labels.ravel()
+        mass += np.bincount(flat_labels, weights.ravel(), minlength=size)[:size]
+        for axis in range(image.ndim):
+            shape = [1] * image.ndim
+            shape[axis] = weights.shape[axis]
+            coord = np.arange(weights.shape[axis], dtype=np.float64).reshape(shape)
+            if axis == 0:
+                coord += block.start
+            weighted = weights * coord
+            first[:, axis] += np.bincount(flat_labels, weighted.ravel(), minlength=size)[:size]
+            weighted *= coord
+            second[:, axis] += np.bincount(flat_labels, weighted.ravel(), minlength=size)[:size]
+    return mass, first, second
+
+
+def density_mass_center_components(
+    image: np.ndarray, labels: np.ndarray, voxel_size, components_num: typing.Optional[int] = None
+) -> np.ndarray:
+    """
+    Calculate mass center of each component in single pass over image.
+
+    :param image: array of weights
+    :param labels: array with components labels, same shape as image
+    :param voxel_size: size of voxel, aligned to last axes of image
+    :param components_num: maximum label, calculated if not provided
+    :return: array of shape (components_num + 1, ndim), row ``i`` contains mass center of component ``i``.
+        Rows of empty components (and background, row 0) are filled with nan.
+    """
+    mass, first, _ = _component_moments(image, labels, components_num)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        res = first / mass[:, np.newaxis] * _voxel_size_array(image.ndim, voxel_size)
+    res[mass == 0] = np.nan
+    return res
+
+
+def calculate_density_momentum_components(
+    image: np.ndarray, labels: np.ndarray, voxel_size, components_num: typing.Optional[int] = None
+) -> np.ndarray:
+    """
+    Calculate momentum (as in :py:func:`calculate_density_momentum`) of each component in single pass over image.
+
+    :param image: array of weights
+    :param labels: array with components labels, same shape as image
+    :param voxel_size: size of voxel, aligned to last axes of image
+    :param components_num: maximum label, calculated if not provided
+    :return: array of shape (components_num + 1,), value for background (index 0) is 0
+    """
+    mass, first, second = _component_moments(image, labels, components_num)
+    scale = _voxel_size_array(image.ndim, voxel_size) ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        res = np.sum((second - first**2 / mass[:, np.newaxis]) * scale, axis=1)
+    res[mass == 0] = 0
+    return np.maximum(res, 0)
@@ -1,98 +1,131 @@
+"""
+Replace components of ROI with their convex hulls.
+
+Hull is calculated only from points of component and rasterized only in its bounding box.
+Voxels are selected with scanline approach: for each line along last axis, interval of
+voxels which satisfy all hull inequalities is calculated, so no full size coordinate arrays are created.
+Components are processed in thread pool (Qhull releases GIL).
+"""
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from scipy.spatial import ConvexHull
 
+from PartSegCore.roi_info import ROIInfo
+
 try:
     from scipy.spatial import QhullError
 except ImportError:
     # Scipy bellow 1.8.0
     from scipy.spatial.qhull import QhullError
-# this two functions are from
-# https://stackoverflow.com/questions/37117878/generating-a-filled-polygon-inside-a-numpy-array/37123933#37123933
 
+_TOLERANCE = 1e-6
 
-def check(p1, p2, idxs):
-    """
-    Uses the line defined by p1 and p2 to check array of
-    input indices against interpolated value
 
-    Returns boolean array, with True inside and False outside of shape
+def _fill_lines(shape: typing.Sequence[int], equations: np.ndarray, prefix: typing.Sequence[int] = ()) -> np.ndarray:
     """
-    p1 = p1.astype(float)
-    p2 = p2.astype(float)
-
-    # Calculate max column idx for each row idx based on interpolated line between two points
-    if p1[0] == p2[0]:
-        max_col_idx = (idxs[0] - p1[0]) * idxs.shape[1]
-        sign = np.sign(p2[1] - p1[1])
-    else:
-        max_col_idx = (idxs[0] - p1[0]) / (p2[0] - p1[0]) * (p2[1] - p1[1]) + p1[1]
-        sign = np.sign(p2[0] - p1[0])
-    return idxs[1] * sign <= max_col_idx * sign
-
+    Select points of grid of ``shape`` (with ``prefix`` coordinates prepended) which
+    satisfy ``equations[:, :-1] @ point + equations[:, -1] <= 0`` for all equations.
 
-def create_polygon(shape, vertices):
+    :param shape: shape of grid, last axis is scanline axis
+    :param equations: hull equations in format returned by :py:attr:`scipy.spatial.ConvexHull.equations`
+    :param prefix: coordinates of fixed leading axes
+    :return: boolean array of ``shape``
     """
-    Creates np.array with dimensions defined by shape
-    Fills polygon defined by vertices with ones, all other values zero"""
-    idxs = np.indices(shape)  # Create 3D array of indices
-    base_array = np.zeros(shape, dtype=float)  # Initialize your array of zeros
+    prefix = np.asarray(prefix, dtype=float)
+    normals = equations[:, len(prefix) : -1]
+    offset = equations[:, -1] + equations[:, : len(prefix)] @ prefix
+    lead = np.indices(shape[:-1]).reshape(len(shape) - 1, -1).T
+    # value of equation with last coordinate equal to 0, shape (lines, equations)
+    base = lead @ normals[:, :-1].T + offset - _TOLERANCE
+    last = normals[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bound = -base / last
+    lower = np.max(np.where(last < 0, bound, -np.inf), axis=1, initial=-np.inf)
+    upper = np.min(np.where(last > 0, bound, np.inf), axis=1, initial=np.inf)
+    # equations which do not depend on last coordinate
+    outside = np.any((last == 0) & (base > 0), axis=1)
+    lower = np.ceil(lower)
+    upper = np.floor(upper)
+    upper[outside] = -1
+    columns = np.arange(shape[-1])
+    return ((columns >= lower[:, np.newaxis]) & (columns <= upper[:, np.newaxis])).reshape(shape)
 
-    fill = np.ones(base_array.shape) * True  # Initialize boolean array defining shape fill
 
-    # Create check array for each edge segment, combine into fill array
-    for k in range(vertices.shape[0]):
-        fill = np.all([fill, check(vertices[k - 1], vertices[k], idxs)], axis=0)
-
-    # Set all values inside polygon to one
-    base_array[fill] = 1
+def _hull_fill(points: np.ndarray, shape: typing.Sequence[int]) -> typing.Optional[np.ndarray]:
+    """Rasterize convex hull of ``points`` on grid of ``shape``. Return None if hull is degenerated."""
+    try:
+        hull = ConvexHull(points)
+    except (QhullError, ValueError):
+        return None
+    equations = hull.equations
+    hull.close()
+    if len(shape) == 2:
+        return _fill_lines(shape, equations)
+    res = np.zeros(shape, dtype=bool)
+    for i in range(int(points[:, 0].min()), int(points[:, 0].max()) + 1):
+        res[i] = _fill_lines(shape[1:], equations, (i,))
+    return res
 
-    return base_array
 
+def _convex_fill(array: np.ndarray) -> typing.Optional[np.ndarray]:
+    """
+    Calculate convex hull of non zero voxels of 2d array.
 
-def _convex_fill(array: np.ndarray):
+    :return: boolean array with filled hull or None if hull cannot be calculated
+    """
     if array.ndim != 2:
         raise ValueError("Convex fill need to be called on 2d array.")
-    points = np.transpose(np.nonzero(array))
-    try:
-        convex = ConvexHull(points)
-        convex_points = points[convex.vertices]
-        convex.close()
-        return create_polygon(array.shape, convex_points[::-1])
-    except (QhullError, ValueError):
-        return None
+    return _hull_fill(np.transpose(np.nonzero(array)), array.shape)
+
+
+def _component_fill(component: np.ndarray, hull_3d: bool) -> np.ndarray:
+    """Convex fill of single component cut to its bounding box. Layers for which hull cannot be calculated are kept."""
+    if component.ndim == 2 or hull_3d:
+        res = _hull_fill(np.transpose(np.nonzero(component)), component.shape)
+        if res is not None:
+            return res | component
+        if component.ndim == 2:
+            return component
+    res = np.copy(component)
+    for layer, layer_res in zip(component, res):
+        fill = _convex_fill(layer)
+        if fill is not None:
+            layer_res |= fill
+    return res
 
 
-def convex_fill(array: np.ndarray):
+def convex_fill(array: np.ndarray, hull_3d: bool = False, workers: typing.Optional[int] = None) -> np.ndarray:
+    """
+    Replace each component of ``array`` with its convex hull. Array is modified in place.
+    Components are processed in order of labels, so the hull of component with bigger label
+    overwrites components with smaller labels.
+
+    :param array: labeled array (2d or 3d after squeeze)
+    :param hull_3d: for 3d data use 3d convex hull instead of filling each layer separately
+    :param workers: number of threads, default as in :py:class:`ThreadPoolExecutor`
+    :return: array with filled components
+    """
     arr_shape = array.shape
     array = np.squeeze(array)
     if array.ndim not in [2, 3]:
         raise ValueError("Convex hull support only 2 and 3 dimension images")
-    components = np.bincount(array.flat)
-    for i in range(1, components.size):
-        if components[i] == 0:
-            continue
-        component: np.ndarray = array == i
-        points = np.nonzero(component)
-        if len(points) == 0 or len(points[0]) == 0:  # pylint: disable=R1714
-            continue
-        lower_bound = np.min(points, axis=1)
-        upper_bound = np.max(points, axis=1)
-        cut_area = tuple(slice(x, y + 1) for x, y in zip(lower_bound, upper_bound))
-        if array.ndim == 3:
-            cut_area = (slice(None),) + cut_area[1:]
-        component = component[cut_area]
-        if array.ndim == 2:
-            res = _convex_fill(component)
-            if res is None:
-                continue
-            array[cut_area][res > 0] = i
-        elif array.ndim == 3:
-            for j in range(lower_bound[0], upper_bound[0] + 1):
-                res = _convex_fill(component[j])
-                if res is None:
-                    continue
-                new_cut = (j,) + cut_area[1:]
-                tmp = array[new_cut]
-                tmp[res > 0] = i
-                array[new_cut] = tmp
+    bound_info = ROIInfo.calc_bounds(array)
+    cuts = {num: tuple(bound.get_slices()) for num, bound in bound_info.items()}
+
+    def _fill(num):
+        return _component_fill(array[cuts[num]] == num, hull_3d)
+
+    order = sorted(cuts)
+    with ThreadPoolExecutor(workers) as executor:
+        # hulls are calculated from input array, so they are stored only after all are calculated
+        results = list(executor.map(_fill, order))
+    sizes = np.bincount(array.flat)
+    for num, fill in zip(order, results):
+        component_area = array[cuts[num]]
+        if np.count_nonzero(component_area == num) != sizes[num]:
+            # component was partially covered by hull of previous component
+            fill = _component_fill(component_area == num, hull_3d)
+        component_area[fill] = num
     return array.reshape(arr_shape)
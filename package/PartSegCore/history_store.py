@@ -0,0 +1,383 @@
+"""
+Memory efficient storage of arrays for history of operations (undo/redo).
+
+Each :py:class:`HistoryArrays` keeps only bounding box of voxels which changed in comparison with
+previously created or restored state (its base). Both new and old values are kept, so neighbour states
+could be restored from last restored state in time proportional to number of changed voxels.
+After :py:data:`MAX_CHAIN` deltas full state (key frame) is stored.
+
+Compressed data is kept in :py:class:`HistoryStore`. When store exceeds its memory budget
+least recently used data is moved to temporary file.
+"""
+import tempfile
+import threading
+import typing
+import weakref
+import zlib
+from collections import OrderedDict, deque
+from io import BytesIO
+
+import numpy as np
+
+MAX_CHAIN = 16
+"""Maximum number of deltas between key frames"""
+DEFAULT_MEMORY_LIMIT = 256 * 2**20
+SPILL_COMPACT_SIZE = 16 * 2**20
+"""Temporary file is compacted when it has more removed than kept data and removed data exceeds this size"""
+_COMPRESSION_LEVEL = 1
+
+_Bounds = typing.Tuple[typing.Tuple[int, int], ...]
+
+
+class HistoryStore:
+    """
+    Storage of compressed history data with memory budget.
+
+    :param max_memory: maximum size (in bytes) of data kept in memory. Above this limit least recently
+        used data is moved to temporary file.
+    :param spill_dir: directory for temporary file, default from :py:mod:`tempfile`
+
+    :py:meth:`discard` is called from finalizers, which may be run by garbage collector
+    while store is locked by the same thread. So keys are queued and removed when lock is available.
+    """
+
+    def __init__(self, max_memory: int = DEFAULT_MEMORY_LIMIT, spill_dir: typing.Optional[str] = None):
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self._memory: typing.MutableMapping[int, bytes] = OrderedDict()
+        self._spilled: typing.Dict[int, typing.Tuple[int, int]] = {}
+        self._spill_file = None
+        self._spill_end = 0
+        self._spill_removed = 0
+        self._next_key = 0
+        self._discarded: typing.Deque[int] = deque()
+        self._lock = threading.Lock()
+        self.memory_usage = 0
+
+    @property
+    def spilled_size(self) -> int:
+        """Size of data moved to temporary file"""
+        return sum(x[1] for x in self._spilled.values())
+
+    def __len__(self):
+        return len(self._memory) + len(self._spilled)
+
+    def __contains__(self, key: int):
+        return key in self._memory or key in self._spilled
+
+    def put(self, data: bytes) -> int:
+        """Store data and return key"""
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._memory[key] = data
+            self.memory_usage += len(data)
+            self._spill()
+            self._remove_discarded()
+        return key
+
+    def get(self, key: int) -> bytes:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            offset, size = self._spilled[key]
+            self._spill_file.seek(offset)
+            return self._spill_file.read(size)
+
+    def discard(self, key: int):
+        """Remove data. If store is locked, then data is removed on next :py:meth:`put` or :py:meth:`discard`."""
+        self._discarded.append(key)
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._remove_discarded()
+        finally:
+            self._lock.release()
+
+    def _remove_discarded(self):
+        while self._discarded:
+            key = self._discarded.popleft()
+            if key in self._memory:
+                self.memory_usage -= len(self._memory.pop(key))
+            elif key in self._spilled:
+                self._spill_removed += self._spilled.pop(key)[1]
+        if self._spill_file is None or not self._spill_removed:
+            return
+        if not self._spilled:
+            self._spill_file.truncate(0)
+            self._spill_end = 0
+            self._spill_removed = 0
+        elif self._spill_removed > max(SPILL_COMPACT_SIZE, self._spill_end - self._spill_removed):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite kept spilled data to new temporary file"""
+        new_file = tempfile.TemporaryFile(dir=self.spill_dir)  # pylint: disable=R1732
+        offset = 0
+        for key, (old_offset, size) in sorted(self._spilled.items(), key=lambda x: x[1][0]):
+            self._spill_file.seek(old_offset)
+            new_file.write(self._spill_file.read(size))
+            self._spilled[key] = (offset, size)
+            offset += size
+        self._spill_file.close()
+        self._spill_file = new_file
+        self._spill_end = offset
+        self._spill_removed = 0
+
+    def _spill(self):
+        while self.memory_usage > self.max_memory and self._memory:
+            key, data = self._memory.popitem(last=False)
+            self.memory_usage -= len(data)
+            if self._spill_file is None:
+                self._spill_file = tempfile.TemporaryFile(dir=self.spill_dir)  # pylint: disable=R1732
+            self._spill_file.seek(self._spill_end)
+            self._spill_file.write(data)
+            self._spilled[key] = (self._spill_end, len(data))
+            self._spill_end += len(data)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._spilled.clear()
+            self._discarded.clear()
+            self.memory_usage = 0
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+            self._spill_end = 0
+            self._spill_removed = 0
+
+
+history_store = HistoryStore()
+"""Default store used by :py:class:`HistoryArrays`. Set ``history_store.max_memory`` to change budget."""
+
+
+class _ArrayEntry(typing.NamedTuple):
+    """
+    Description of single array in state. If ``bounds`` is None then ``new`` contains whole array
+    and ``old`` is None. If ``new`` is None then array is same as in base.
+    """
+
+    shape: typing.Tuple[int, ...]
+    dtype: np.dtype
+    bounds: typing.Optional[_Bounds] = None
+    new: typing.Optional[int] = None
+    old: typing.Optional[int] = None
+
+
+def _changed_bounds(array1: np.ndarray, array2: np.ndarray) -> typing.Optional[_Bounds]:
+    diff = array1 != array2
+    if not diff.any():
+        return None
+    bounds = []
+    for axis in range(diff.ndim):
+        project = np.flatnonzero(diff.any(axis=tuple(x for x in range(diff.ndim) if x != axis)))
+        bounds.append((int(project[0]), int(project[-1]) + 1))
+    return tuple(bounds)
+
+
+def _slices(bounds: _Bounds) -> typing.Tuple[slice, ...]:
+    return tuple(slice(start, stop) for start, stop in bounds)
+
+
+class HistoryArrays:
+    """
+    Immutable set of named arrays stored as delta to previously used state.
+    Use :py:meth:`create` to build instance.
+    """
+
+    _cursor: typing.Optional[typing.Tuple["weakref.ref[HistoryArrays]", typing.Dict[str, np.ndarray]]] = None
+    _cursor_lock = threading.RLock()
+
+    def __init__(
+        self,
+        entries: typing.Dict[str, _ArrayEntry],
+        base: typing.Optional["HistoryArrays"],
+        store: HistoryStore,
+        metadata: typing.Optional[dict] = None,
+    ):
+        self._entries = entries
+        self.base = base
+        self.depth = 0 if base is None else base.depth + 1
+        self.store = store
+        self.metadata = {} if metadata is None else metadata
+        keys = [x for entry in entries.values() for x in (entry.new, entry.old) if x is not None]
+        weakref.finalize(self, _discard_keys, store, keys)
+
+    @property
+    def names(self) -> typing.List[str]:
+        return list(self._entries)
+
+    @property
+    def is_key_frame(self) -> bool:
+        return self.base is None
+
+    @property
+    def nbytes(self) -> int:
+        """Size of compressed data stored by this state (without base)"""
+        return sum(
+            len(self.store.get(x)) for entry in self._entries.values() for x in (entry.new, entry.old) if x is not None
+        )
+
+    @classmethod
+    def create(
+        cls,
+        arrays: typing.Dict[str, np.ndarray],
+        metadata: typing.Optional[dict] = None,
+        store: typing.Optional[HistoryStore] = None,
+    ) -> "HistoryArrays":
+        """
+        Create state from arrays. If last used state has arrays with same names, shapes and types
+        then only difference to it is stored.
+
+        :param arrays: arrays to store. Arrays are copied.
+        :param metadata: additional data kept in memory with state
+        :param store: store for compressed data, default :py:data:`history_store`
+        """
+        store = history_store if store is None else store
+        arrays = {name: np.array(array, copy=True) for name, array in arrays.items()}
+        if any(array.dtype.hasobject for array in arrays.values()):
+            raise ValueError("Arrays of objects are not supported")
+        with cls._cursor_lock:
+            base, base_arrays = cls._get_cursor()
+            if (
+                base is None
+                or base.store is not store
+                or base.depth + 1 >= MAX_CHAIN
+                or not cls._same_layout(base_arrays, arrays)
+            ):
+                res = cls._key_frame(arrays, store, metadata)
+            else:
+                res = cls._delta(arrays, base, base_arrays, store, metadata)
+            cls._set_cursor(res, arrays)
+        return res
+
+    @staticmethod
+    def _same_layout(arrays1: typing.Dict[str, np.ndarray], arrays2: typing.Dict[str, np.ndarray]) -> bool:
+        return arrays1.keys() == arrays2.keys() and all(
+            arrays1[x].shape == arrays2[x].shape and arrays1[x].dtype == arrays2[x].dtype for x in arrays1
+        )
+
+    @staticmethod
+    def _compress(store: HistoryStore, array: np.ndarray) -> int:
+        return store.put(zlib.compress(np.ascontiguousarray(array).tobytes(), _COMPRESSION_LEVEL))
+
+    @staticmethod
+    def _decompress(store: HistoryStore, key: int, dtype: np.dtype, shape) -> np.ndarray:
+        return np.frombuffer(zlib.decompress(store.get(key)), dtype=dtype).reshape(shape)
+
+    @classmethod
+    def _key_frame(cls, arrays, store, metadata) -> "HistoryArrays":
+        entries = {
+            name: _ArrayEntry(array.shape, array.dtype, new=cls._compress(store, array))
+            for name, array in arrays.items()
+        }
+        return cls(entries, None, store, metadata)
+
+    @classmethod
+    def _delta(cls, arrays, base, base_arrays, store, metadata) -> "HistoryArrays":
+        changes = {name: _changed_bounds(array, base_arrays[name]) for name, array in arrays.items()}
+        changed_size = sum(np.prod([y - x for x, y in bounds]) for bounds in changes.values() if bounds is not None)
+        if 2 * changed_size > sum(array.size for array in arrays.values()):
+            # delta keeps old and new values, so it is bigger than key frame
+            return cls._key_frame(arrays, store, metadata)
+        entries = {}
+        for name, array in arrays.items():
+            bounds = changes[name]
+            if bounds is None:
+                entries[name] = _ArrayEntry(array.shape, array.dtype)
+                continue
+            slices = _slices(bounds)
+            entries[name] = _ArrayEntry(
+                array.shape,
+                array.dtype,
+                bounds,
+                cls._compress(store, array[slices]),
+                cls._compress(store, base_arrays[name][slices]),
+            )
+        return cls(entries, base, store, metadata)
+
+    @classmethod
+    def _get_cursor(cls) -> typing.Tuple[typing.Optional["HistoryArrays"], typing.Dict[str, np.ndarray]]:
+        if cls._cursor is None:
+            return None, {}
+        state = cls._cursor[0]()
+        if state is None:
+            cls._cursor = None
+            return None, {}
+        return state, cls._cursor[1]
+
+    @classmethod
+    def _set_cursor(cls, state: "HistoryArrays", arrays: typing.Dict[str, np.ndarray]):
+        cls._cursor = (weakref.ref(state), arrays)
+
+    @classmethod
+    def reset_cursor(cls):
+        """Drop last used state. Next created state will be key frame."""
+        with cls._cursor_lock:
+            cls._cursor = None
+
+    def _apply(self, arrays: typing.Dict[str, np.ndarray], forward: bool):
+        """Change arrays of base state to arrays of this state (``forward``) or in opposite direction"""
+        for name, entry in self._entries.items():
+            if entry.bounds is None:
+                continue
+            slices = _slices(entry.bounds)
+            shape = tuple(stop - start for start, stop in entry.bounds)
+            arrays[name][slices] = self._decompress(self.store, entry.new if forward else entry.old, entry.dtype, shape)
+
+    def _full_arrays(self) -> typing.Dict[str, np.ndarray]:
+        return {
+            name: self._decompress(self.store, entry.new, entry.dtype, entry.shape).copy()
+            for name, entry in self._entries.items()
+        }
+
+    def _ancestors(self) -> typing.List["HistoryArrays"]:
+        res = [self]
+        while res[-1].base is not None:
+            res.append(res[-1].base)
+        return res
+
+    def get(self) -> typing.Dict[str, np.ndarray]:
+        """
+        Restore arrays. If this state is close to last restored state then only changed parts are decompressed.
+
+        :return: dict with copies of arrays
+        """
+        with self._cursor_lock:
+            cursor, arrays = self._get_cursor()
+            ancestors = self._ancestors()
+            if cursor is self:
+                pass
+            elif cursor is not None and cursor in ancestors:
+                for state in reversed(ancestors[: ancestors.index(cursor)]):
+                    state._apply(arrays, forward=True)
+            elif cursor is not None and self in (cursor_ancestors := cursor._ancestors()):
+                for state in cursor_ancestors[: cursor_ancestors.index(self)]:
+                    state._apply(arrays, forward=False)
+            else:
+                arrays = ancestors[-1]._full_arrays()
+                for state in reversed(ancestors[:-1]):
+                    state._apply(arrays, forward=True)
+            self._set_cursor(self, arrays)
+            return {name: array.copy() for name, array in arrays.items()}
+
+    def getvalue(self) -> bytes:
+        """Arrays serialized with :py:func:`numpy.savez_compressed`, like content of :py:class:`io.BytesIO`"""
+        buffer = BytesIO()
+        np.savez_compressed(buffer, **self.get())
+        return buffer.getvalue()
+
+    def __reduce__(self):
+        return _history_arrays_from_npz, (self.getvalue(), self.metadata)
+
+
+def _discard_keys(store: HistoryStore, keys: typing.List[int]):
+    for key in keys:
+        store.discard(key)
+
+
+def _history_arrays_from_npz(data: bytes, metadata: dict) -> HistoryArrays:
+    with np.load(BytesIO(data)) as arrays:
+        return HistoryArrays.create(dict(arrays.items()), metadata)
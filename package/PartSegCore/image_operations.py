@@ -1,3 +1,7 @@
+import itertools
+import threading
+import typing
+from collections import OrderedDict
 from enum import Enum
 from typing import Iterable, List, Union
 
@@ -5,6 +9,8 @@ import numpy as np
 import SimpleITK as sitk
 from nme import register_class
 
+from PartSegImage.lazy_array import normalize_key
+
 
 @register_class
 class RadiusType(Enum):
@@ -137,3 +143,131 @@ def erode(image, radius, layer=True):
 def to_binary_image(image):
     """Convert image to binary. All positive values are set to 1."""
     return np.array(image > 0).astype(np.uint8)
+
+
+_GAUSS_MAX_KERNEL_WIDTH = 32
+"""Default maximum kernel width of :py:func:`SimpleITK.DiscreteGaussian`"""
+_BILATERAL_DOMAIN_MU = 2.5
+"""Default domain mu (kernel radius in sigmas) of :py:func:`SimpleITK.Bilateral`"""
+
+
+def filter_margin(filter_type: NoiseFilterType, radius: float) -> int:
+    """
+    Number of pixels around region which influence result of filter in region.
+
+    :param NoiseFilterType filter_type: filter
+    :param float radius: radius of filter
+    """
+    if filter_type == NoiseFilterType.No or radius == 0:
+        return 0
+    if filter_type == NoiseFilterType.Gauss:
+        return _GAUSS_MAX_KERNEL_WIDTH
+    if filter_type == NoiseFilterType.Bilateral:
+        return int(np.ceil(_BILATERAL_DOMAIN_MU * radius)) + 1
+    return int(radius)
+
+
+class FilteredArray:
+    """
+    Read only array-like view on array with noise filter applied to each plane (two last axes) separately,
+    same as filter functions of this module with ``layer=True``.
+    Filter is calculated on indexing and only for requested region extended by :py:func:`filter_margin`,
+    so showing single plane (or its part) cost filtering of single plane. Last results are kept in LRU cache.
+    Whole array is filtered only by :py:func:`numpy.asarray`.
+
+    :param array: array-like object with ``shape``, ``dtype`` and ``__getitem__``
+    :param NoiseFilterType filter_type: filter to apply
+    :param float radius: radius of filter
+    :param int cache_size: number of filtered regions kept in memory
+    """
+
+    def __init__(self, array, filter_type: NoiseFilterType, radius: float, cache_size: int = 8):
+        if array.ndim < 2:
+            raise ValueError("Array need to have at least two dimensions")
+        self.array = array
+        self.filter_type = filter_type
+        self.radius = radius
+        self.cache_size = cache_size
+        self.margin = filter_margin(filter_type, radius)
+        self._cache: typing.MutableMapping[tuple, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.dtype = self._filter(np.zeros((3, 3), dtype=array.dtype)).dtype
+
+    @property
+    def shape(self) -> typing.Tuple[int, ...]:
+        return tuple(self.array.shape)
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f"FilteredArray(shape={self.shape}, dtype={self.dtype}, filter={self.filter_type}, radius={self.radius})"
+
+    def _filter(self, plane: np.ndarray) -> np.ndarray:
+        if self.filter_type == NoiseFilterType.No or self.radius == 0:
+            return plane
+        if self.filter_type == NoiseFilterType.Gauss:
+            return gaussian(plane, self.radius)
+        if self.filter_type == NoiseFilterType.Bilateral:
+            return bilateral(plane, self.radius)
+        return median(plane, int(self.radius))
+
+    def _filtered_region(self, plane_index: tuple, bounds: typing.Tuple[typing.Tuple[int, int], ...]) -> np.ndarray:
+        key = (plane_index, bounds)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        extended = [
+            (max(0, start - self.margin), min(size, stop + self.margin))
+            for (start, stop), size in zip(bounds, self.shape[-2:])
+        ]
+        data = np.asarray(self.array[plane_index + tuple(slice(start, stop) for start, stop in extended)])
+        crop = tuple(
+            slice(start - ext_start, stop - ext_start) for (start, stop), (ext_start, _) in zip(bounds, extended)
+        )
+        res = self._filter(data)[crop]
+        with self._lock:
+            self._cache[key] = res
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return res
+
+    def __getitem__(self, key):
+        norm_key = normalize_key(key, self.ndim)
+        if norm_key is None:
+            return np.asarray(self)[key]
+        ranges = [range(size)[sub_key] for sub_key, size in zip(norm_key, self.shape)]
+        bounds = []
+        local_key = []
+        for selected in ranges[-2:]:
+            if not isinstance(selected, range):
+                bounds.append((selected, selected + 1))
+                local_key.append(0)
+            elif len(selected) == 0:
+                return np.empty([len(x) for x in ranges if isinstance(x, range)], dtype=self.dtype)
+            else:
+                start = min(selected[0], selected[-1])
+                bounds.append((start, max(selected[0], selected[-1]) + 1))
+                local_key.append(slice(None, None, selected.step))
+        leading = [x if isinstance(x, range) else range(x, x + 1) for x in ranges[:-2]]
+        bounds = tuple(bounds)
+        planes = [self._filtered_region(index, bounds) for index in itertools.product(*leading)]
+        res = np.empty(tuple(len(x) for x in leading) + tuple(stop - start for start, stop in bounds), dtype=self.dtype)
+        for index, plane in zip(itertools.product(*(range(len(x)) for x in leading)), planes):
+            res[index] = plane
+        return res[tuple(slice(None) if isinstance(x, range) else 0 for x in ranges[:-2]) + tuple(local_key)]
+
+    def __array__(self, dtype=None, copy=None):
+        res = self[...]
+        if dtype is not None:
+            res = res.astype(dtype, copy=False)
+        return res
@@ -0,0 +1,235 @@
+"""
+Multiscale pyramids of big images used for display.
+
+Each level is two times smaller than previous one along ``y`` and ``x`` (two last axes), other axes are kept.
+Levels of intensity images are calculated with mean pooling. Levels of labels (ROI, mask) are calculated with
+mode pooling (most common value in 2x2 block), so no new labels are created and small components are not lost
+in favour of background.
+
+Levels of image loaded from file are cached in container (see :py:mod:`PartSegCore.project_container`)
+stored next to the file, so the pyramid is calculated only on first opening.
+"""
+import logging
+import os
+import tempfile
+import threading
+import typing
+import zlib
+from collections import defaultdict
+from contextlib import suppress
+
+import numpy as np
+
+from PartSegCore.project_container import ContainerReader, ContainerWriter
+from PartSegImage import Image
+
+PYRAMID_MIN_SIZE = 4096
+"""Pyramid is created only for planes bigger than this value along ``y`` or ``x``"""
+PYRAMID_TOP_SIZE = 1024
+"""Levels are added until plane of last level fits in this size"""
+CACHE_SUFFIX = ".pyramid"
+_CACHE_VERSION = 1
+_CACHE_INFO = "pyramid.json"
+_TILE_SIZE = 1024
+_cache_locks: typing.DefaultDict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+def need_pyramid(shape: typing.Sequence[int], min_size: int = PYRAMID_MIN_SIZE) -> bool:
+    """Check if array of given shape is big enough to be shown with pyramid"""
+    return len(shape) >= 2 and max(shape[-2:]) > min_size
+
+
+def level_count(shape: typing.Sequence[int], min_size: int = PYRAMID_MIN_SIZE, top_size: int = PYRAMID_TOP_SIZE) -> int:
+    """Number of pyramid levels (including full resolution) for array of given shape"""
+    if not need_pyramid(shape, min_size):
+        return 1
+    size = max(shape[-2:])
+    count = 1
+    while size > top_size:
+        size = -(-size // 2)
+        count += 1
+    return count
+
+
+def _pad_even(array: np.ndarray) -> np.ndarray:
+    """Extend odd ``y`` and ``x`` axes by repeating last row/column"""
+    pad = [(0, 0)] * (array.ndim - 2) + [(0, array.shape[-2] % 2), (0, array.shape[-1] % 2)]
+    if any(x[1] for x in pad):
+        return np.pad(array, pad, mode="edge")
+    return array
+
+
+def _blocks(array: np.ndarray) -> typing.List[np.ndarray]:
+    array = _pad_even(array)
+    return [array[..., i::2, j::2] for i in (0, 1) for j in (0, 1)]
+
+
+def downsample_mean(array: np.ndarray) -> np.ndarray:
+    """
+    Reduce size of two last axes two times. Each value is mean of 2x2 block.
+
+    :param array: array to reduce
+    :return: array of same dtype as input
+    """
+    array = np.asarray(array)
+    blocks = _blocks(array)
+    res = blocks[0].astype(np.result_type(array.dtype, np.float32))
+    for block in blocks[1:]:
+        res += block
+    res /= 4
+    if np.issubdtype(array.dtype, np.integer):
+        np.rint(res, out=res)
+    return res.astype(array.dtype, copy=False)
+
+
+def downsample_mode(array: np.ndarray) -> np.ndarray:
+    """
+    Reduce size of two last axes two times. Each value is most common value of 2x2 block.
+    In case of tie non zero label is preferred over background, then first in block.
+
+    :param array: labels array to reduce
+    :return: array of same dtype as input
+    """
+    blocks = _blocks(np.asarray(array))
+    res = blocks[0].copy()
+    best = None
+    for block in blocks:
+        count = sum((block == other).astype(np.uint8) for other in blocks)
+        if best is None:
+            best = count
+            continue
+        better = (count > best) | ((count == best) & (res == 0))
+        res[better] = block[better]
+        np.maximum(best, count, out=best)
+    return res
+
+
+def build_pyramid(
+    array: np.ndarray,
+    labels: bool = False,
+    min_size: int = PYRAMID_MIN_SIZE,
+    top_size: int = PYRAMID_TOP_SIZE,
+) -> typing.List[np.ndarray]:
+    """
+    Calculate pyramid levels. Each level is calculated from previous one.
+
+    :param array: full resolution data
+    :param labels: use mode pooling (for labels) instead of mean pooling
+    :param min_size: minimum size of plane for which levels are created
+    :param top_size: size of plane of last level
+    :return: list of levels, first element is ``array``. Single element list for small arrays.
+    """
+    downsample = downsample_mode if labels else downsample_mean
+    res = [array]
+    for _ in range(level_count(array.shape, min_size, top_size) - 1):
+        res.append(downsample(res[-1]))
+    return res
+
+
+def data_fingerprint(array: np.ndarray) -> int:
+    """Checksum of regular sample of array, used to detect that cached pyramid belongs to other data"""
+    steps = [max(1, -(-x // 8)) for x in array.shape[:-2]] + [max(1, -(-x // 256)) for x in array.shape[-2:]]
+    sample = np.ascontiguousarray(array[tuple(slice(None, None, x) for x in steps)])
+    return zlib.crc32(sample.tobytes())
+
+
+def cache_path(image: Image) -> str:
+    """Path of pyramid cache for image. Empty string if image is not loaded from file."""
+    if not image.file_path or not os.path.isfile(image.file_path):
+        return ""
+    return image.file_path + CACHE_SUFFIX
+
+
+def _cache_description(image: Image, min_size: int, top_size: int) -> dict:
+    stat = os.stat(image.file_path)
+    return {
+        "version": _CACHE_VERSION,
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime_ns,
+        "shape": list(image.shape),
+        "dtype": image.dtype.str,
+        "channels": [data_fingerprint(image.get_channel(i)) for i in range(image.channels)],
+        "min_size": min_size,
+        "top_size": top_size,
+    }
+
+
+def _level_name(channel: int, level: int) -> str:
+    return f"channel_{channel}/level_{level}"
+
+
+def _read_cache(path: str, description: dict) -> typing.Optional[ContainerReader]:
+    if not os.path.exists(path):
+        return None
+    try:
+        reader = ContainerReader(path)
+    except (OSError, ValueError) as e:
+        logging.warning("Cannot read pyramid cache %s: %s", path, e)
+        return None
+    try:
+        if _CACHE_INFO in reader and reader.read_json(_CACHE_INFO) == description:
+            return reader
+    except (KeyError, ValueError):  # pragma: no cover
+        pass
+    reader.close()
+    return None
+
+
+def _write_cache(path: str, description: dict, pyramids: typing.List[typing.List[np.ndarray]]):
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=CACHE_SUFFIX)
+    except OSError as e:
+        logging.info("Pyramid cache not saved for %s: %s", path, e)
+        return
+    try:
+        with os.fdopen(fd, "wb") as f_p, ContainerWriter(f_p, compression_level=1) as writer:
+            for channel, levels in enumerate(pyramids):
+                for level, array in enumerate(levels[1:], start=1):
+                    chunks = (1,) * (array.ndim - 2) + tuple(min(_TILE_SIZE, x) for x in array.shape[-2:])
+                    writer.write_array(_level_name(channel, level), array, chunks=chunks)
+            writer.write_json(_CACHE_INFO, description)
+        os.replace(tmp_path, path)
+    except OSError as e:  # pragma: no cover
+        logging.warning("Pyramid cache not saved for %s: %s", path, e)
+        with suppress(OSError):
+            os.remove(tmp_path)
+
+
+def image_pyramids(
+    image: Image,
+    use_cache: bool = True,
+    min_size: int = PYRAMID_MIN_SIZE,
+    top_size: int = PYRAMID_TOP_SIZE,
+) -> typing.List[typing.List[np.ndarray]]:
+    """
+    Pyramids of all channels of image. For images loaded from file levels are read lazily
+    from cache stored next to the file. If cache does not exist or is outdated then levels are calculated
+    and cache is written (if directory is writable). Cache file is closed when all levels read from it
+    are garbage collected.
+
+    :param image: image to process
+    :param use_cache: use cache stored next to image file
+    :param min_size: minimum size of plane for which levels are created
+    :param top_size: size of plane of last level
+    :return: list of levels for each channel, first level is :py:meth:`Image.get_channel`.
+        Single element lists if image is small.
+    """
+    channels = [image.get_channel(i) for i in range(image.channels)]
+    count = level_count(channels[0].shape, min_size, top_size)
+    if count == 1:
+        return [[x] for x in channels]
+    path = cache_path(image) if use_cache else ""
+    if not path:
+        return [build_pyramid(x, min_size=min_size, top_size=top_size) for x in channels]
+    with _cache_locks[path]:
+        description = _cache_description(image, min_size, top_size)
+        reader = _read_cache(path, description)
+        if reader is not None:
+            return [
+                [channel] + [reader.array(_level_name(i, level)) for level in range(1, count)]
+                for i, channel in enumerate(channels)
+            ]
+        res = [build_pyramid(x, min_size=min_size, top_size=top_size) for x in channels]
+        _write_cache(path, description, res)
+    return res
@@ -6,6 +6,7 @@ import tarfile
 import typing
 import warnings
 from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from contextlib import suppress
 from functools import partial
 from io import BufferedIOBase, BytesIO, IOBase, RawIOBase, TextIOBase
@@ -34,11 +35,12 @@ from PartSegCore.io_utils import (
     tar_to_buff,
 )
 from PartSegCore.json_hooks import PartSegEncoder
+from PartSegCore.project_container import ContainerReader, ContainerWriter, is_container
 from PartSegCore.project_info import AdditionalLayerDescription, HistoryElement
 from PartSegCore.roi_info import ROIInfo
 from PartSegCore.utils import BaseModel
 from PartSegImage import BaseImageWriter, GenericImageReader, Image, IMAGEJImageWriter, ImageWriter, TiffImageReader
-from PartSegImage.image import FRAME_THICKNESS, reduce_array
+from PartSegImage.image import reduce_array
 
 try:
     from napari_builtins.io import napari_write_points
@@ -139,9 +141,7 @@ def _save_mask_roi(project: MaskProjectTuple, tar_file: tarfile.TarFile, paramet
     tar_file.addfile(segmentation_tar, fileobj=segmentation_buff)
 
 
-def _save_mask_roi_metadata(
-    project: MaskProjectTuple, tar_file: tarfile.TarFile, parameters: SaveROIOptions, file_data
-):
+def _mask_roi_metadata(project: MaskProjectTuple, parameters: SaveROIOptions, file_data) -> dict:
     metadata = {
         "components": [int(x) for x in project.selected_components],
         "parameters": {str(k): v for k, v in project.roi_extraction_parameters.items()},
@@ -160,6 +160,13 @@ def _save_mask_roi_metadata(
             metadata["base_file"] = os.path.relpath(file_path, os.path.dirname(file_data))
         else:
             metadata["base_file"] = file_path
+    return metadata
+
+
+def _save_mask_roi_metadata(
+    project: MaskProjectTuple, tar_file: tarfile.TarFile, parameters: SaveROIOptions, file_data
+):
+    metadata = _mask_roi_metadata(project, parameters, file_data)
     metadata_buff = BytesIO(json.dumps(metadata, cls=PartSegEncoder).encode("utf-8"))
     metadata_tar = get_tarinfo("metadata.json", metadata_buff)
     tar_file.addfile(metadata_tar, metadata_buff)
@@ -182,28 +189,50 @@ def _save_mask_alternative(project: MaskProjectTuple, tar_file: tarfile.TarFile)
     tar_file.addfile(alternative_tar, fileobj=alternative_buff)
 
 
+def _mask_history_info(history: typing.List[HistoryElement]) -> typing.List[dict]:
+    return [
+        {
+            "index": i,
+            "mask_property": hist.mask_property,
+            "segmentation_parameters": hist.roi_extraction_parameters,
+            "annotations": hist.annotations,
+        }
+        for i, hist in enumerate(history)
+    ]
+
+
 def _save_mask_history(project: MaskProjectTuple, tar_file: tarfile.TarFile):
-    el_info = []
     for i, hist in enumerate(project.history):
-        el_info.append(
-            {
-                "index": i,
-                "mask_property": hist.mask_property,
-                "segmentation_parameters": hist.roi_extraction_parameters,
-                "annotations": hist.annotations,
-            }
-        )
-        hist.arrays.seek(0)
-        hist_info = get_tarinfo(f"history/arrays_{i}.npz", hist.arrays)
-        hist.arrays.seek(0)
-        tar_file.addfile(hist_info, hist.arrays)
-    if el_info:
-        hist_str = json.dumps(el_info, cls=PartSegEncoder)
+        arrays = BytesIO(hist.arrays.getvalue())
+        hist_info = get_tarinfo(f"history/arrays_{i}.npz", arrays)
+        tar_file.addfile(hist_info, arrays)
+    if project.history:
+        hist_str = json.dumps(_mask_history_info(project.history), cls=PartSegEncoder)
         hist_buff = BytesIO(hist_str.encode("utf-8"))
         tar_algorithm = get_tarinfo("history/history.json", hist_buff)
         tar_file.addfile(tar_algorithm, hist_buff)
 
 
+def _save_mask_container(
+    project: MaskProjectTuple, container: ContainerWriter, parameters: SaveROIOptions, file_data, step_changed
+):
+    spacing = project.image.spacing if isinstance(project.image, Image) else parameters.spacing
+    container.write_array("roi", project.roi_info.roi, attrs={"spacing": list(spacing)})
+    step_changed(2)
+    container.write_json("metadata.json", _mask_roi_metadata(project, parameters, file_data))
+    step_changed(3)
+    if project.mask is not None:
+        container.write_array("mask", project.mask)
+    for name, array in project.roi_info.alternative.items():
+        container.write_array(f"alternative/{name}", array)
+    step_changed(4)
+    for i, hist in enumerate(project.history):
+        container.write_bytes(f"history/arrays_{i}.npz", hist.arrays.getvalue())
+    if project.history:
+        container.write_json("history/history.json", _mask_history_info(project.history))
+    step_changed(5)
+
+
 def save_stack_segmentation(
     file_data: typing.Union[tarfile.TarFile, str, Path, TextIOBase, BufferedIOBase, RawIOBase, IOBase],
     segmentation_info: MaskProjectTuple,
@@ -211,34 +240,88 @@ def save_stack_segmentation(
     range_changed=empty_fun,
     step_changed=empty_fun,
 ):
+    """
+    Save ROI project. Project is saved in chunked container (:py:mod:`PartSegCore.project_container`)
+    unless ``file_data`` is :py:class:`tarfile.TarFile`.
+    """
     range_changed(0, 7)
-    tar_file, _file_path = open_tar_file(file_data, "w")
     step_changed(1)
-    try:
-        _save_mask_roi(segmentation_info, tar_file, parameters)
+    if not isinstance(file_data, tarfile.TarFile):
+        with ContainerWriter(file_data) as container:
+            _save_mask_container(segmentation_info, container, parameters, file_data, step_changed)
+        step_changed(6)
+        return
+    tar_file = file_data
+    _save_mask_roi(segmentation_info, tar_file, parameters)
+    step_changed(2)
+    _save_mask_roi_metadata(segmentation_info, tar_file, parameters, file_data)
+    step_changed(3)
+    if segmentation_info.mask is not None:
+        _save_mask_mask(segmentation_info, tar_file)
+    if segmentation_info.roi_info.alternative:
+        _save_mask_alternative(segmentation_info, tar_file)
+    step_changed(4)
+    _save_mask_history(segmentation_info, tar_file)
+    step_changed(5)
+    step_changed(6)
+
+
+def _mask_history_from_json(history_json, read_arrays: typing.Callable[[int], bytes]) -> typing.List[HistoryElement]:
+    return [
+        HistoryElement(
+            roi_extraction_parameters=el["segmentation_parameters"],
+            mask_property=el["mask_property"],
+            arrays=BytesIO(read_arrays(el["index"])),
+            annotations=el.get("annotations", {}),
+        )
+        for el in history_json
+    ]
+
+
+def _load_stack_segmentation_container(file_data, step_changed) -> MaskProjectTuple:
+    with ContainerReader(file_data) as container:
+        if "algorithm.json" in container or "metadata.json" not in container:
+            raise WrongFileTypeException()
+        step_changed(1)
+        metadata = load_metadata(container.read_bytes("metadata.json").decode("utf8"))
         step_changed(2)
-        _save_mask_roi_metadata(segmentation_info, tar_file, parameters, file_data)
-        step_changed(3)
-        if segmentation_info.mask is not None:
-            _save_mask_mask(segmentation_info, tar_file)
-        if segmentation_info.roi_info.alternative:
-            _save_mask_alternative(segmentation_info, tar_file)
+        roi = container.read_array("roi")
+        spacing = container.attrs("roi")["spacing"]
         step_changed(4)
-        _save_mask_history(segmentation_info, tar_file)
+        mask = container.read_array("mask") if "mask" in container else None
+        alternative = {
+            name[12:]: container.read_array(name) for name in container.array_names() if name.startswith("alternative/")
+        }
+        roi_info = ROIInfo(reduce_array(roi), annotations=metadata.get("annotations", {}), alternative=alternative)
         step_changed(5)
-
-    finally:
-        if isinstance(file_data, (str, Path)):
-            tar_file.close()
-    step_changed(6)
+        history = []
+        if "history/history.json" in container:
+            history = _mask_history_from_json(
+                load_metadata(container.read_bytes("history/history.json").decode("utf8")),
+                lambda i: container.read_bytes(f"history/arrays_{i}.npz"),
+            )
+        step_changed(6)
+    return MaskProjectTuple(
+        file_path=file_data if isinstance(file_data, str) else "",
+        image=metadata["base_file"] if "base_file" in metadata else None,
+        roi_info=roi_info,
+        selected_components=metadata["components"],
+        mask=mask,
+        roi_extraction_parameters=metadata["parameters"] if "parameters" in metadata else None,
+        history=history,
+        spacing=[10 ** (-9), *spacing],
+    )
 
 
 def load_stack_segmentation(file_data: typing.Union[str, Path], range_changed=None, step_changed=None):
+    """Load ROI project. Both chunked container and old tar archive are supported."""
     if range_changed is None:
         range_changed = empty_fun
     if step_changed is None:
         step_changed = empty_fun
     range_changed(0, 7)
+    if is_container(file_data):
+        return _load_stack_segmentation_container(file_data, step_changed)
     tar_file = open_tar_file(file_data)[0]
     try:
         if check_segmentation_type(tar_file) != SegmentationType.mask:
@@ -280,19 +363,9 @@ def load_stack_segmentation(file_data: typing.Union[str, Path], range_changed=No
         history = []
         with suppress(KeyError):
             history_buff = tar_file.extractfile(tar_file.getmember("history/history.json")).read()
-            history_json = load_metadata(history_buff)
-            for el in history_json:
-                history_buffer = BytesIO()
-                history_buffer.write(tar_file.extractfile(f"history/arrays_{el['index']}.npz").read())
-                history_buffer.seek(0)
-                history.append(
-                    HistoryElement(
-                        roi_extraction_parameters=el["segmentation_parameters"],
-                        mask_property=el["mask_property"],
-                        arrays=history_buffer,
-                        annotations=el.get("annotations", {}),
-                    )
-                )
+            history = _mask_history_from_json(
+                load_metadata(history_buff), lambda i: tar_file.extractfile(f"history/arrays_{i}.npz").read()
+            )
         step_changed(6)
     finally:
         if isinstance(file_data, (str, Path)):
@@ -383,16 +456,21 @@ class LoadROIParameters(LoadBase):
                     )
                 return MaskProjectTuple(file_path=file_data, image=None, roi_extraction_parameters=parameters)
 
-        tar_file, _ = open_tar_file(file_data)
-        try:
-            project_metadata = load_metadata(tar_file.extractfile("metadata.json").read().decode("utf8"))
-            parameters = defaultdict(
-                lambda: None,
-                [(int(k), v) for k, v in project_metadata["parameters"].items()],
-            )
-        finally:
-            if isinstance(file_data, (str, Path)):
-                tar_file.close()
+        if is_container(file_data):
+            with ContainerReader(file_data) as container:
+                metadata_str = container.read_bytes("metadata.json").decode("utf8")
+        else:
+            tar_file, _ = open_tar_file(file_data)
+            try:
+                metadata_str = tar_file.extractfile("metadata.json").read().decode("utf8")
+            finally:
+                if isinstance(file_data, (str, Path)):
+                    tar_file.close()
+        project_metadata = load_metadata(metadata_str)
+        parameters = defaultdict(
+            lambda: None,
+            [(int(k), v) for k, v in project_metadata["parameters"].items()],
+        )
         return MaskProjectTuple(file_path=file_data, image=None, roi_extraction_parameters=parameters)
 
 
@@ -554,6 +632,72 @@ class SaveComponentsOptions(BaseModel):
     )
 
 
+_COMPONENT_WRITERS = 4
+"""Maximum number of threads used for writing components files"""
+
+
+class _ComponentCut(typing.NamedTuple):
+    number: int
+    image: Image
+    points: typing.Optional[np.ndarray]
+    slices: typing.Tuple[slice, ...]
+
+
+def _iter_component_cuts(
+    image: Image,
+    components: typing.Iterable[int],
+    roi_info: ROIInfo,
+    parameters: SaveComponentsOptions,
+    points: typing.Optional[np.ndarray] = None,
+) -> typing.Iterator[_ComponentCut]:
+    """
+    Cut components from image. Only bounding box of component (with frame) is processed,
+    so cost of each cut does not depend on size of whole image.
+
+    :param roi_info: roi information fitted to image
+    """
+    important_axis = "XY" if image.is_2d else "XYZ"
+    index_to_frame = image.calc_index_to_frame(image.array_axis_order, important_axis)
+    points_casted = points.astype(np.uint16) if points is not None else None
+    for i in components:
+        bound = roi_info.bound_info[i]
+        slices = bound.get_slices()
+        for j in index_to_frame:
+            slices[j] = slice(max(slices[j].start - parameters.frame, 0), slices[j].stop + parameters.frame)
+        slices = tuple(slices)
+        component_area = image.cut_image(slices, frame=0)
+        im = component_area.cut_image(
+            roi_info.roi[slices] == i,
+            replace_mask=True,
+            frame=parameters.frame,
+            zero_out_cut_area=parameters.mask_data,
+        )
+        filtered_points = None
+        if points is not None and points_casted is not None:
+            inside = np.all((points_casted >= bound.lower) & (points_casted <= bound.upper), axis=1)
+            points_mask = np.zeros(points.shape[0], dtype=bool)
+            points_mask[inside] = roi_info.roi[tuple(points_casted[inside].T)] == i
+            filtered_points = points[points_mask]
+            filtered_points[:, 1] = np.round(filtered_points[:, 1])
+            if parameters.mask_data:
+                # image is cut to bounding box and padded with frame
+                lower_bound = bound.lower.astype(np.intp)
+                lower_bound[index_to_frame] -= parameters.frame
+            else:
+                lower_bound = np.array([x.start for x in slices])
+            filtered_points = filtered_points - lower_bound
+        yield _ComponentCut(i, im, filtered_points, slices)
+
+
+def _prepare_components_save(image: Image, components: list, dir_path: str, roi_info: ROIInfo):
+    roi_info = roi_info.fit_to_image(image)
+    os.makedirs(dir_path, exist_ok=True)
+    file_name = os.path.splitext(os.path.basename(image.file_path))[0]
+    if not components:
+        components = list(roi_info.bound_info.keys())
+    return roi_info, file_name, components
+
+
 def save_components(
     image: Image,
     components: list,
@@ -565,6 +709,12 @@ def save_components(
     step_changed=None,
     writer_class: typing.Type[BaseImageWriter] = ImageWriter,
 ):
+    """
+    Save each component in separated files (image, mask and points if present).
+    Components are cut in current thread and files are written in thread pool
+    with at most :py:data:`_COMPONENT_WRITERS` threads.
+    Number of components waiting for write is limited, so memory usage does not grow with number of components.
+    """
     if range_changed is None:
         range_changed = empty_fun
     if step_changed is None:
@@ -573,36 +723,78 @@ def save_components(
     if parameters is None:
         parameters = SaveComponentsOptions()
 
-    roi_info = roi_info.fit_to_image(image)
-    os.makedirs(dir_path, exist_ok=True)
-
-    file_name = os.path.splitext(os.path.basename(image.file_path))[0]
-    important_axis = "XY" if image.is_2d else "XYZ"
-    index_to_frame_points = image.calc_index_to_frame(image.axis_order, important_axis)
-    points_casted = points.astype(np.uint16) if points is not None else None
-    if not components:
-        components = list(roi_info.bound_info.keys())
+    roi_info, file_name, components = _prepare_components_save(image, components, dir_path, roi_info)
     range_changed(0, 2 * len(components))
-    for i in components:
-        components_mark = np.array(roi_info.roi == i)
-        im = image.cut_image(
-            components_mark, replace_mask=True, frame=parameters.frame, zero_out_cut_area=parameters.mask_data
-        )
-        if points is not None and points_casted is not None:
-            points_mask = components_mark[tuple(points_casted.T)]
-            filtered_points = points[points_mask]
-            filtered_points[:, 1] = np.round(filtered_points[:, 1])
-            lower_bound = np.min(np.nonzero(components_mark), axis=1)
-            for j in index_to_frame_points:
-                lower_bound[j] -= FRAME_THICKNESS
-            napari_write_points(
-                os.path.join(dir_path, f"{file_name}_component{i}.csv"), filtered_points - lower_bound, {}
-            )
+    workers = min(_COMPONENT_WRITERS, os.cpu_count() or 1)
+    step = 0
+    with ThreadPoolExecutor(workers) as executor:
+        pending = set()
+        for cut in _iter_component_cuts(image, components, roi_info, parameters, points):
+            if cut.points is not None:
+                napari_write_points(os.path.join(dir_path, f"{file_name}_component{cut.number}.csv"), cut.points, {})
+            base_path = os.path.join(dir_path, f"{file_name}_component{cut.number}")
+            pending.add(executor.submit(writer_class.save, cut.image, f"{base_path}.tif"))
+            pending.add(executor.submit(writer_class.save_mask, cut.image, f"{base_path}_mask.tif"))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    step += 1
+                    step_changed(step)
+        for future in as_completed(pending):
+            future.result()
+            step += 1
+            step_changed(step)
+
+
+def save_components_bundle(
+    image: Image,
+    components: list,
+    dir_path: str,
+    roi_info: ROIInfo,
+    parameters: typing.Optional[SaveComponentsOptions] = None,
+    points: typing.Optional[np.ndarray] = None,
+    range_changed=None,
+    step_changed=None,
+):
+    """
+    Save all components in single OME TIFF file ``<name>_components.ome.tif``.
+    Each component is stored as two series (image and mask).
+    Index ``<name>_components.json`` contains for each component indices of its series,
+    its bounding box (with frame) in source image and points (if present).
+    """
+    if range_changed is None:
+        range_changed = empty_fun
+    if step_changed is None:
+        step_changed = empty_fun
 
-        writer_class.save(im, os.path.join(dir_path, f"{file_name}_component{i}.tif"))
-        step_changed(2 * i + 1)
-        writer_class.save_mask(im, os.path.join(dir_path, f"{file_name}_component{i}_mask.tif"))
-        step_changed(2 * i + 2)
+    if parameters is None:
+        parameters = SaveComponentsOptions()
+
+    roi_info, file_name, components = _prepare_components_save(image, components, dir_path, roi_info)
+    range_changed(0, len(components))
+    index = []
+
+    def _images():
+        for num, cut in enumerate(_iter_component_cuts(image, components, roi_info, parameters, points), start=1):
+            entry = {
+                "component": cut.number,
+                "lower_bound": [x.start for x in cut.slices],
+                "upper_bound": [min(x.stop, y) for x, y in zip(cut.slices, roi_info.roi.shape)],
+                "axes": image.array_axis_order,
+            }
+            if cut.points is not None:
+                entry["points"] = cut.points
+            index.append(entry)
+            yield f"component{cut.number}", cut.image
+            step_changed(num)
+
+    series = ImageWriter.save_bundle(_images(), os.path.join(dir_path, f"{file_name}_components.ome.tif"))
+    for entry, (image_series, mask_series) in zip(index, series):
+        entry["image_series"] = image_series
+        entry["mask_series"] = mask_series
+    with open(os.path.join(dir_path, f"{file_name}_components.json"), "w", encoding="utf-8") as f_p:
+        json.dump({"file": f"{file_name}_components.ome.tif", "components": index}, f_p, cls=PartSegEncoder, indent=2)
 
 
 class SaveComponents(SaveBase):
@@ -676,6 +868,43 @@ class SaveComponentsImagej(SaveBase):
         return "Components Imagej Tiff"
 
 
+class SaveComponentsBundle(SaveBase):
+    """
+    Save selected components in single OME TIFF file with json index.
+    """
+
+    __argument_class__ = SaveComponentsOptions
+
+    @classmethod
+    def get_short_name(cls):
+        return "comp_bundle"
+
+    @classmethod
+    @update_argument("parameters")
+    def save(
+        cls,
+        save_location: typing.Union[str, BytesIO, Path],
+        project_info: MaskProjectTuple,
+        parameters: SaveComponentsOptions,
+        range_changed=None,
+        step_changed=None,
+    ):
+        save_components_bundle(
+            project_info.image,
+            project_info.selected_components,
+            save_location,
+            project_info.roi_info,
+            parameters,
+            project_info.points,
+            range_changed,
+            step_changed,
+        )
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "Components OME Tiff bundle"
+
+
 class SaveParametersJSON(SaveBase):
     """
     Save parameters of roi mask segmentation
@@ -757,7 +986,9 @@ load_dict = Register(
     LoadStackImage, LoadROIImage, LoadStackImageWithMask, LoadPoints, class_methods=LoadBase.need_functions
 )
 save_parameters_dict = Register(SaveParametersJSON, class_methods=SaveBase.need_functions)
-save_components_dict = Register(SaveComponents, SaveComponentsImagej, class_methods=SaveBase.need_functions)
+save_components_dict = Register(
+    SaveComponents, SaveComponentsImagej, SaveComponentsBundle, class_methods=SaveBase.need_functions
+)
 save_segmentation_dict = Register(
     SaveROI, SaveMaskAsTiff, SaveROIAsTIFF, SaveROIAsNumpy, class_methods=SaveBase.need_functions
 )
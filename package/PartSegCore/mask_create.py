@@ -1,10 +1,12 @@
 import typing
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import SimpleITK as sitk
 from nme import register_class
 
 from PartSegCore.image_operations import RadiusType, dilate, erode
+from PartSegCore.roi_info import BoundInfo, ROIInfo
 from PartSegCore.utils import BaseModel
 from PartSegImage.image import minimal_dtype
 
@@ -140,12 +142,16 @@ def calculate_mask(
     final_shape = list(mask.shape)
     final_shape[time_axis] = 1
     final_shape = tuple(final_shape)
-    res = []
-    for i in range(mask.shape[time_axis]):
-        slices[time_axis] = i
-        t_slices = tuple(slices)
+
+    def _calculate_time_point(i):
+        t_slices = tuple(slices[:time_axis] + [i] + slices[time_axis + 1 :])
         _old_mask = old_mask[t_slices] if old_mask is not None else None
-        res.append(_calculate_mask(mask_description, dilate_radius, mask[t_slices], _old_mask).reshape(final_shape))
+        return _calculate_mask(mask_description, dilate_radius, mask[t_slices], _old_mask).reshape(final_shape)
+
+    if mask.shape[time_axis] == 1:
+        return _calculate_time_point(0)
+    with ThreadPoolExecutor() as executor:
+        res = list(executor.map(_calculate_time_point, range(mask.shape[time_axis])))
     return np.concatenate(res, axis=time_axis)
 
 
@@ -172,26 +178,26 @@ def _calculate_mask(
 
 
 def _cut_components(
-    mask: np.ndarray, image: np.ndarray, borders: int = 0
-) -> typing.Iterator[typing.Tuple[np.ndarray, typing.List[slice], int]]:
-    sizes = np.bincount(mask.flat)
-    for i, size in enumerate(sizes[1:], 1):
-        if size > 0:
-            points = np.nonzero(mask == i)
-            lower_bound = np.min(points, axis=1)
-            upper_bound = np.max(points, axis=1)
-            new_cut = tuple(slice(x, y + 1) for x, y in zip(lower_bound, upper_bound))
-            new_size = [y - x + 1 + 2 * borders for x, y in zip(lower_bound, upper_bound)]
-            if borders > 0:
-                res = np.zeros(new_size, dtype=image.dtype)
-                res_cut = tuple(slice(borders, x - borders) for x in tuple(res.shape))
-                tmp_res = np.copy(image[new_cut])
-                tmp_res[mask[new_cut] != i] = 0
-                res[res_cut] = tmp_res
-            else:
-                res = image[new_cut]
-                res[mask[new_cut] != i] = 0
-            yield res, tuple(new_cut), i
+    mask: np.ndarray,
+    image: np.ndarray,
+    borders: int = 0,
+    bound_info: typing.Optional[typing.Dict[int, BoundInfo]] = None,
+) -> typing.Iterator[typing.Tuple[np.ndarray, typing.Tuple[slice, ...], int]]:
+    """
+    Iterate over components of ``mask``. For each component yield copy of bounding box of ``image``
+    (extended by ``borders`` zeros) with voxels outside component set to 0,
+    slices of bounding box and component number.
+
+    :param bound_info: bounding boxes of components, calculated with :py:meth:`ROIInfo.calc_bounds` if not provided
+    """
+    if bound_info is None:
+        bound_info = ROIInfo.calc_bounds(mask)
+    for num in sorted(bound_info):
+        new_cut = tuple(bound_info[num].get_slices())
+        res = np.zeros([x.stop - x.start + 2 * borders for x in new_cut], dtype=image.dtype)
+        res_cut = tuple(slice(borders, borders + x.stop - x.start) for x in new_cut)
+        res[res_cut] = np.where(mask[new_cut] == num, image[new_cut], 0)
+        yield res, new_cut, num
 
 
 def _fill_holes(mask_description: MaskProperty, mask: np.ndarray) -> np.ndarray:
@@ -226,27 +232,17 @@ def fill_holes_in_mask(mask: np.ndarray, volume: int) -> np.ndarray:
     :return: modified mask
     """
     holes_mask = (mask == 0).astype(np.uint8)
-    component_mask = sitk.GetArrayFromImage(
-        sitk.RelabelComponent(sitk.ConnectedComponent(sitk.GetImageFromArray(holes_mask)))
-    )
+    component_mask = sitk.GetArrayFromImage(sitk.ConnectedComponent(sitk.GetImageFromArray(holes_mask)))
+    components_num = int(component_mask.max())
     border_set: typing.Set[int] = set()
     for dim_num in range(component_mask.ndim):
-        border_set.update(list(np.unique(np.take(component_mask, [0, -1], axis=dim_num))))
-    if 0 in border_set:
-        border_set.remove(0)
-    components_num = component_mask.max()
-    if component_mask.dtype.type(components_num) >= component_mask.dtype.type(components_num + 1):
-        raise ValueError("overflow error")
-    for num in border_set:
-        component_mask[component_mask == num] = components_num + 1
+        border_set.update(np.unique(np.take(component_mask, [0, -1], axis=dim_num)).tolist())
+    # lookup table: True for mask and for holes which should be filled
+    fill_lut = np.ones(components_num + 1, dtype=bool)
     if volume > 0:
-        sizes = np.bincount(component_mask.flat)
-        for i, v in enumerate(sizes[1:], 1):
-            if v <= volume and i < components_num + 1:
-                component_mask[component_mask == i] = 0
-    else:
-        component_mask[component_mask <= components_num] = 0
-    return component_mask == 0
+        fill_lut[1:] = np.bincount(component_mask.flat, minlength=components_num + 1)[1:] <= volume
+    fill_lut[[x for x in border_set if x != 0]] = False
+    return fill_lut[component_mask]
 
 
 def fill_2d_holes_in_mask(mask: np.ndarray, volume: int) -> np.ndarray:
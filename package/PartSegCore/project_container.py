@@ -0,0 +1,376 @@
+"""
+Indexed container for project files.
+
+Container is a zip archive. Each array is split on chunks which are compressed independently
+with :py:mod:`zlib` and stored without additional zip compression, so single array or single
+chunk can be read without decompression of the rest of file. Description of arrays
+(dtype, shape, chunk shape, attributes) is stored in ``index.json`` member.
+Chunks are compressed and decompressed in thread pool (:py:mod:`zlib` releases GIL).
+
+Old projects are tar archives. Use :py:func:`is_container` to decide which loader should be used.
+"""
+import itertools
+import json
+import os
+import stat
+import tempfile
+import threading
+import typing
+import weakref
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BufferedIOBase, IOBase, RawIOBase
+from pathlib import Path
+
+import numpy as np
+
+from PartSegCore.json_hooks import PartSegEncoder
+from PartSegImage.lazy_array import normalize_key
+
+CONTAINER_VERSION = 1
+CHUNK_SIZE = 2**22
+"""Default size of uncompressed chunk in bytes"""
+INDEX_NAME = "index.json"
+_ZIP_MAGIC = b"PK\x03\x04"
+
+_FileData = typing.Union[str, Path, BufferedIOBase, RawIOBase, IOBase]
+
+
+def is_container(file_data) -> bool:
+    """Check if file (path or opened binary file) is chunked container. Position in opened file is not changed."""
+    if isinstance(file_data, (str, Path)):
+        with open(file_data, "rb") as f_p:
+            return f_p.read(len(_ZIP_MAGIC)) == _ZIP_MAGIC
+    if isinstance(file_data, IOBase) and file_data.seekable():
+        pos = file_data.tell()
+        try:
+            return file_data.read(len(_ZIP_MAGIC)) == _ZIP_MAGIC
+        finally:
+            file_data.seek(pos)
+    return False
+
+
+def default_chunks(shape: typing.Sequence[int], itemsize: int, chunk_size: int = CHUNK_SIZE) -> typing.Tuple[int, ...]:
+    """
+    Calculate chunk shape. Chunks contain whole trailing axes (planes) when they fit in ``chunk_size`` bytes.
+
+    :param shape: shape of array
+    :param itemsize: size of single element
+    :param chunk_size: maximum size of chunk in bytes
+    """
+    chunks = [1] * len(shape)
+    size = itemsize
+    for axis in range(len(shape) - 1, -1, -1):
+        if size * shape[axis] > chunk_size:
+            chunks[axis] = max(1, min(shape[axis], chunk_size // size))
+            break
+        chunks[axis] = max(shape[axis], 1)
+        size *= max(shape[axis], 1)
+    return tuple(chunks)
+
+
+def _set_file_mode(path: str, target_path: str):
+    """Set permissions of temporary file to ones of target file or default for new files"""
+    if os.path.exists(target_path):
+        mode = stat.S_IMODE(os.stat(target_path).st_mode)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    os.chmod(path, mode)
+
+
+def _chunk_name(name: str, index: typing.Sequence[int]) -> str:
+    return f"arrays/{name}/" + (".".join(str(x) for x in index) or "0")
+
+
+def _chunk_grid(shape: typing.Sequence[int], chunks: typing.Sequence[int]) -> typing.Tuple[int, ...]:
+    return tuple(-(-size // chunk) for size, chunk in zip(shape, chunks))
+
+
+class ContainerWriter:
+    """
+    Write arrays and other members to container.
+    When path is given, container is written to temporary file which replaces target file on :py:meth:`close`,
+    so arrays lazily read from previous version of file (see :py:meth:`ContainerReader.array`) are not broken.
+
+    :param file_data: path or opened binary file
+    :param workers: number of threads used for compression, default as in :py:class:`ThreadPoolExecutor`
+    :param compression_level: :py:mod:`zlib` compression level
+    """
+
+    def __init__(self, file_data: _FileData, workers: typing.Optional[int] = None, compression_level: int = 6):
+        self._target_path = ""
+        if isinstance(file_data, (str, Path)):
+            self._target_path = os.fspath(file_data)
+            fd, file_data = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self._target_path)), suffix=".tmp")
+            os.close(fd)
+        self._zip = zipfile.ZipFile(file_data, "w")
+        self._workers = workers
+        self.compression_level = compression_level
+        self._arrays: typing.Dict[str, dict] = {}
+
+    def write_array(
+        self,
+        name: str,
+        array: np.ndarray,
+        chunks: typing.Optional[typing.Sequence[int]] = None,
+        attrs: typing.Optional[dict] = None,
+    ):
+        """
+        Split array on chunks, compress them in parallel and write to container.
+
+        :param name: name of array
+        :param array: array to save
+        :param chunks: shape of chunk, default from :py:func:`default_chunks`
+        :param attrs: additional json serializable information stored in index
+        """
+        if name in self._arrays:
+            raise ValueError(f"Array {name} already saved")
+        array = np.asarray(array)
+        if array.dtype.hasobject:
+            raise ValueError("Arrays of objects are not supported")
+        if chunks is None:
+            chunks = default_chunks(array.shape, array.dtype.itemsize)
+        chunks = tuple(int(x) for x in chunks)
+        if len(chunks) != array.ndim or any(x < 1 for x in chunks):
+            raise ValueError(f"Wrong chunks {chunks} for array of shape {array.shape}")
+        indices = list(itertools.product(*(range(x) for x in _chunk_grid(array.shape, chunks))))
+
+        def compress(index):
+            key = tuple(slice(i * c, (i + 1) * c) for i, c in zip(index, chunks))
+            return zlib.compress(np.ascontiguousarray(array[key]).tobytes(), self.compression_level)
+
+        if len(indices) > 1:
+            with ThreadPoolExecutor(self._workers) as executor:
+                compressed = executor.map(compress, indices)
+                for index, data in zip(indices, compressed):
+                    self._zip.writestr(_chunk_name(name, index), data, compress_type=zipfile.ZIP_STORED)
+        else:
+            for index in indices:
+                self._zip.writestr(_chunk_name(name, index), compress(index), compress_type=zipfile.ZIP_STORED)
+        self._arrays[name] = {
+            "dtype": array.dtype.str,
+            "shape": array.shape,
+            "chunks": chunks,
+            "compression": "zlib",
+            "attrs": attrs or {},
+        }
+
+    def write_bytes(self, name: str, data: bytes, compress: bool = False):
+        """Write raw member. Use ``compress`` for data which is not already compressed."""
+        self._zip.writestr(name, data, compress_type=zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+
+    def write_json(self, name: str, data):
+        """Serialize data with :py:class:`PartSegEncoder` and write as member"""
+        self.write_bytes(name, json.dumps(data, cls=PartSegEncoder).encode("utf-8"), compress=True)
+
+    def close(self):
+        """Write index and close file"""
+        if self._zip.fp is None:
+            return
+        try:
+            self.write_json(INDEX_NAME, {"version": CONTAINER_VERSION, "arrays": self._arrays})
+        except Exception:
+            self._abort()
+            raise
+        self._zip.close()
+        if self._target_path:
+            _set_file_mode(self._zip.filename, self._target_path)
+            os.replace(self._zip.filename, self._target_path)
+
+    def _abort(self):
+        self._zip.close()
+        if self._target_path:
+            os.remove(self._zip.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+
+
+class ContainerReader:
+    """
+    Read members of container. Arrays could be read whole (:py:meth:`read_array`)
+    or lazily (:py:meth:`array`), then only chunks needed for requested part are decompressed.
+    File is closed by :py:meth:`close` or when reader and all its lazy arrays are garbage collected.
+    Reader opened from path could be pickled, then file is opened again.
+
+    :param file_data: path or opened binary file
+    :param workers: number of threads used for decompression
+    """
+
+    def __init__(self, file_data: _FileData, workers: typing.Optional[int] = None):
+        self._zip = zipfile.ZipFile(file_data, "r")
+        self._finalizer = weakref.finalize(self, self._zip.close)
+        self._lock = threading.Lock()
+        self._workers = workers
+        try:
+            self.index = json.loads(self._zip.read(INDEX_NAME))
+        except KeyError:
+            self._finalizer()
+            raise ValueError("File is not PartSeg container") from None
+        if isinstance(file_data, (str, Path)):
+            self.file_path = os.fspath(file_data)
+        else:
+            self.file_path = ""
+
+    @property
+    def version(self) -> int:
+        return self.index["version"]
+
+    def names(self) -> typing.List[str]:
+        """Names of non array members"""
+        return [x for x in self._zip.namelist() if not x.startswith("arrays/") and x != INDEX_NAME]
+
+    def array_names(self) -> typing.List[str]:
+        return list(self.index["arrays"])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index["arrays"] or name in self.names()
+
+    def read_bytes(self, name: str) -> bytes:
+        with self._lock:
+            return self._zip.read(name)
+
+    def read_json(self, name: str):
+        """Read member written with :py:meth:`ContainerWriter.write_json` as plain json"""
+        return json.loads(self.read_bytes(name))
+
+    def array(self, name: str) -> "ChunkedArray":
+        """Lazy array, data is read on indexing"""
+        try:
+            info = self.index["arrays"][name]
+        except KeyError:
+            raise KeyError(f"There is no array {name} in container") from None
+        return ChunkedArray(self, name, info)
+
+    def read_array(self, name: str) -> np.ndarray:
+        return np.asarray(self.array(name))
+
+    def attrs(self, name: str) -> dict:
+        return self.index["arrays"][name]["attrs"]
+
+    def _map(self, fun, iterable):
+        iterable = list(iterable)
+        if len(iterable) < 2:
+            return [fun(x) for x in iterable]
+        with ThreadPoolExecutor(self._workers) as executor:
+            return list(executor.map(fun, iterable))
+
+    def close(self):
+        self._finalizer()
+
+    def __getstate__(self):
+        if not self.file_path:
+            raise TypeError("Only container opened from path could be pickled")
+        return {"file_data": self.file_path, "workers": self._workers}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ChunkedArray:
+    """
+    Array-like access to array stored in container. Indexing with integers and slices
+    decompress only chunks which overlap with requested part.
+    It could be used as data source for :py:class:`PartSegImage.lazy_array.LazyArray`.
+    """
+
+    def __init__(self, container: ContainerReader, name: str, info: dict):
+        self.container = container
+        self.name = name
+        self.dtype = np.dtype(info["dtype"])
+        self.shape: typing.Tuple[int, ...] = tuple(info["shape"])
+        self.chunks: typing.Tuple[int, ...] = tuple(info["chunks"])
+        self.attrs: dict = info.get("attrs", {})
+        if info.get("compression", "zlib") != "zlib":  # pragma: no cover
+            raise ValueError(f"Unknown compression {info['compression']}")
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    @property
+    def chunk_grid(self) -> typing.Tuple[int, ...]:
+        """Number of chunks along each axis"""
+        return _chunk_grid(self.shape, self.chunks)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f"ChunkedArray(name={self.name!r}, shape={self.shape}, dtype={self.dtype}, chunks={self.chunks})"
+
+    def read_chunk(self, index: typing.Sequence[int]) -> np.ndarray:
+        """Read single chunk. Chunks on border of array could be smaller than :py:attr:`chunks`"""
+        shape = [min(c, s - i * c) for i, c, s in zip(index, self.chunks, self.shape)]
+        data = zlib.decompress(self.container.read_bytes(_chunk_name(self.name, index)))
+        return np.frombuffer(data, dtype=self.dtype).reshape(shape)
+
+    def _read_region(self, bounds: typing.Sequence[typing.Tuple[int, int]]) -> np.ndarray:
+        result = np.empty([stop - start for start, stop in bounds], dtype=self.dtype)
+        if result.size == 0:
+            return result
+        chunk_ranges = [range(start // c, -(-stop // c)) for (start, stop), c in zip(bounds, self.chunks)]
+        indices = list(itertools.product(*chunk_ranges))
+
+        def copy_chunk(index):
+            chunk = self.read_chunk(index)
+            src = []
+            dst = []
+            for i, c, (start, stop) in zip(index, self.chunks, bounds):
+                begin = max(start, i * c)
+                end = min(stop, (i + 1) * c)
+                src.append(slice(begin - i * c, end - i * c))
+                dst.append(slice(begin - start, end - start))
+            result[tuple(dst)] = chunk[tuple(src)]
+
+        self.container._map(copy_chunk, indices)
+        return result
+
+    def __getitem__(self, key):
+        norm_key = normalize_key(key, self.ndim)
+        if norm_key is None:
+            return np.asarray(self)[key]
+        bounds = []
+        local_key = []
+        for sub_key, size in zip(norm_key, self.shape):
+            selected = range(size)[sub_key]
+            if not isinstance(selected, range):
+                bounds.append((selected, selected + 1))
+                local_key.append(0)
+            elif len(selected) == 0:
+                bounds.append((0, 0))
+                local_key.append(slice(None))
+            else:
+                start = min(selected[0], selected[-1])
+                bounds.append((start, max(selected[0], selected[-1]) + 1))
+                local_key.append(slice(None, None, selected.step))
+        return self._read_region(bounds)[tuple(local_key)]
+
+    def __array__(self, dtype=None, copy=None):
+        data = self._read_region([(0, x) for x in self.shape])
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return data
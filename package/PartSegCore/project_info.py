@@ -4,6 +4,7 @@ from typing import Any, Dict, List, Optional, Protocol, Tuple, Union, runtime_ch
 
 import numpy as np
 
+from PartSegCore.history_store import HistoryArrays
 from PartSegCore.mask_create import MaskProperty, calculate_mask
 from PartSegCore.roi_info import ROIInfo
 from PartSegCore.utils import BaseModel, numpy_repr
@@ -32,10 +33,18 @@ class AdditionalLayerDescription:
 
 
 class HistoryElement(BaseModel):
+    """
+    State of project before mask creation.
+
+    :ivar arrays: ROI, alternative ROI and mask. Elements created with :py:meth:`create` store them
+        as :py:class:`HistoryArrays` (difference to previous state), elements loaded from file
+        as :py:func:`numpy.savez_compressed` content.
+    """
+
     roi_extraction_parameters: Dict[str, Any]
     annotations: Optional[Dict[int, Any]]
     mask_property: MaskProperty
-    arrays: BytesIO
+    arrays: Union[HistoryArrays, BytesIO]
 
     class Config:
         arbitrary_types_allowed = True
@@ -50,15 +59,13 @@ class HistoryElement(BaseModel):
     ):
         if "name" in roi_extraction_parameters:  # pragma: no cover
             raise ValueError("name")
-        arrays = BytesIO()
-        arrays_dict = {"roi": roi_info.roi}
+        arrays_dict = {} if roi_info.roi is None else {"roi": roi_info.roi}
         for name, array in roi_info.alternative.items():
             arrays_dict[name] = array
         if mask is not None:
             arrays_dict["mask"] = mask
 
-        np.savez_compressed(arrays, **arrays_dict)
-        arrays.seek(0)
+        arrays = HistoryArrays.create(arrays_dict, {"bound_info": roi_info.bound_info, "sizes": roi_info.sizes})
         return cls(
             roi_extraction_parameters=roi_extraction_parameters,
             mask_property=mask_property,
@@ -67,11 +74,22 @@ class HistoryElement(BaseModel):
         )
 
     def get_roi_info_and_mask(self) -> Tuple[ROIInfo, Optional[np.ndarray]]:
-        self.arrays.seek(0)
-        seg = np.load(self.arrays)
-        self.arrays.seek(0)
+        if isinstance(self.arrays, HistoryArrays):
+            seg = self.arrays.get()
+            bounds = self.arrays.metadata
+        else:
+            self.arrays.seek(0)
+            seg = np.load(self.arrays)
+            self.arrays.seek(0)
+            bounds = {}
         alternative = {name: array for name, array in seg.items() if name not in {"roi", "mask"}}
-        roi_info = ROIInfo(seg["roi"], annotations=self.annotations, alternative=alternative)
+        roi_info = ROIInfo(
+            seg["roi"] if "roi" in seg else None,
+            annotations=self.annotations,
+            alternative=alternative,
+            bound_info=bounds.get("bound_info"),
+            sizes=bounds.get("sizes"),
+        )
         mask = seg["mask"] if "mask" in seg else None
         return roi_info, mask
 
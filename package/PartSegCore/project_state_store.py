@@ -0,0 +1,345 @@
+"""
+Storage of project states (:py:class:`PartSegCore.project_info.ProjectInfoBase`) with memory budget.
+
+When arrays of states kept in memory exceed the budget, least recently used states are saved to temporary
+project containers (see :py:mod:`PartSegCore.project_container`) and removed from memory.
+States which share arrays (like raw image and states calculated on it) are saved together to one file,
+so arrays are not duplicated when states are loaded back. Saving is done in background thread,
+state stays available from memory until it is saved.
+Saved state is loaded back on access or in background with :py:meth:`ProjectStateStore.prefetch`.
+
+States are serialized with :py:mod:`pickle`. Buffers of arrays are stored out of band as separate
+container arrays, so they are not copied to pickle stream and are compressed in parallel.
+"""
+import logging
+import os
+import pickle  # nosec
+import shutil
+import tempfile
+import threading
+import typing
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from PartSegCore.project_container import ContainerReader, ContainerWriter
+from PartSegImage import Image
+
+DEFAULT_MEMORY_LIMIT = 2 * 2**30
+"""Default size (in bytes) of arrays of states kept in memory"""
+_STATE_NAME = "state.pickle"
+
+_Key = typing.Hashable
+_LoadTask = typing.Tuple[str, typing.List[_Key], typing.Dict[_Key, Future]]
+
+
+def _memory_owner(array: np.ndarray) -> np.ndarray:
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def state_arrays(state) -> typing.List[np.ndarray]:
+    """
+    Arrays of state which are kept in memory (without :py:class:`numpy.memmap` and lazy arrays).
+    Views are replaced with arrays which own memory, so arrays shared by states could be counted once.
+    """
+    candidates = [getattr(state, "mask", None), getattr(state, "points", None)]
+    image = getattr(state, "image", None)
+    if isinstance(image, Image):
+        candidates.extend(image.get_channel(i) for i in range(image.channels))
+        candidates.append(image.mask)
+    roi_info = getattr(state, "roi_info", None)
+    if roi_info is not None:
+        candidates.append(roi_info.roi)
+        candidates.extend(roi_info.alternative.values())
+    candidates.extend(getattr(x, "data", None) for x in getattr(state, "additional_layers", {}).values())
+    res = {}
+    for array in candidates:
+        if not isinstance(array, np.ndarray):
+            continue
+        owner = _memory_owner(array)
+        if not isinstance(owner, np.memmap):
+            res[id(owner)] = owner
+    return list(res.values())
+
+
+def save_state(file_path: str, state):
+    """Save state to project container"""
+    buffers = []
+    data = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+    with ContainerWriter(file_path, compression_level=1) as writer:
+        for i, buffer in enumerate(buffers):
+            writer.write_array(f"buffers/{i}", np.frombuffer(buffer.raw(), dtype=np.uint8))
+        writer.write_bytes(_STATE_NAME, data, compress=True)
+
+
+def load_state(file_path: str):
+    """Load state saved with :py:func:`save_state`"""
+    with ContainerReader(file_path) as reader:
+        buffers = [reader.read_array(f"buffers/{i}") for i in range(len(reader.array_names()))]
+        return pickle.loads(reader.read_bytes(_STATE_NAME), buffers=buffers)  # nosec
+
+
+class ProjectStateStore(typing.MutableMapping[_Key, typing.Any]):
+    """
+    Mapping of project states with memory budget. Least recently used states
+    above the budget are moved to temporary files and loaded back on access.
+    Most recently used state is always kept in memory.
+
+    :param max_memory: maximum size (in bytes) of arrays of states kept in memory
+    :param spill_dir: directory for temporary files, default from :py:mod:`tempfile`
+    """
+
+    def __init__(self, max_memory: int = DEFAULT_MEMORY_LIMIT, spill_dir: typing.Optional[str] = None):
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self._memory: typing.MutableMapping[_Key, typing.Any] = OrderedDict()
+        self._spilled: typing.Dict[_Key, str] = {}
+        self._files: typing.Dict[str, typing.List[_Key]] = {}
+        self._saving: typing.Dict[_Key, typing.Any] = {}
+        self._loading: typing.Dict[_Key, Future] = {}
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._directory: typing.Optional[str] = None
+        self._finalizer = None
+
+    @property
+    def memory_usage(self) -> int:
+        """Size of arrays of states kept in memory. Arrays shared between states are counted once."""
+        with self._lock:
+            return self._memory_usage(self._memory.values())
+
+    @staticmethod
+    def _memory_usage(states) -> int:
+        arrays = {id(array): array for state in states for array in state_arrays(state)}
+        return sum(array.nbytes for array in arrays.values())
+
+    def is_spilled(self, key: _Key) -> bool:
+        """Check if state is saved on disc"""
+        with self._lock:
+            return key in self._spilled
+
+    def wait(self):
+        """Wait until states selected for saving on disc are saved"""
+        while True:
+            with self._lock:
+                if not self._saving:
+                    return
+            self._executor.submit(lambda: None).result()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._memory) + len(self._spilled)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._memory) + list(self._spilled))
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._memory or key in self._spilled
+
+    def __setitem__(self, key: _Key, state):
+        with self._lock:
+            self._remove_spilled(key)
+            self._saving.pop(key, None)
+            self._memory[key] = state
+            self._memory.move_to_end(key)
+            self._spill()
+
+    def __getitem__(self, key: _Key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if key not in self._spilled:
+                raise KeyError(key)
+            future, task = self._start_loading(key)
+        if task is not None:
+            self._load(key, *task, prefetch=False)
+        state = future.result()
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+        return state
+
+    def __delitem__(self, key: _Key):
+        with self._lock:
+            if key in self._memory:
+                del self._memory[key]
+                self._saving.pop(key, None)
+            elif key in self._spilled:
+                self._remove_spilled(key)
+            else:
+                raise KeyError(key)
+
+    def prefetch(self, key: _Key) -> typing.Optional[Future]:
+        """
+        Load saved state in background thread.
+
+        :return: future with state or None if state is already in memory or there is no such key
+        """
+        with self._lock:
+            if key not in self._spilled:
+                return None
+            future, task = self._start_loading(key)
+        if task is not None:
+            self._executor.submit(self._load, key, *task, True)
+        return future
+
+    def _start_loading(self, key: _Key) -> typing.Tuple[Future, typing.Optional[_LoadTask]]:
+        """
+        Register futures for all states saved in file with state of ``key``.
+
+        :return: future of state and arguments of :py:meth:`_load` (None if file is already loading)
+        """
+        if key in self._loading:
+            return self._loading[key], None
+        file_path = self._spilled[key]
+        keys = list(self._files[file_path])
+        futures = {x: Future() for x in keys if self._spilled.get(x) == file_path}
+        self._loading.update(futures)
+        return futures[key], (file_path, keys, futures)
+
+    def _load(
+        self, key: _Key, file_path: str, keys: typing.List[_Key], futures: typing.Dict[_Key, Future], prefetch: bool
+    ):
+        try:
+            states = dict(zip(keys, load_state(file_path)))
+        except Exception as e:  # pylint: disable=W0703
+            with self._lock:
+                self._finish_loading(futures)
+            for future in futures.values():
+                future.set_exception(e)
+            return
+        with self._lock:
+            self._finish_loading(futures)
+            previous = next(reversed(self._memory), None)
+            restored = [x for x in states if self._spilled.get(x) == file_path]
+            for name in restored:
+                self._remove_spilled(name)
+                self._memory[name] = states[name]
+            if key in restored:
+                self._memory.move_to_end(key)
+            if restored:
+                if prefetch and previous is not None:
+                    # prefetched state should not push out currently used one
+                    self._memory.move_to_end(previous)
+                self._spill(keep=key)
+        for name, future in futures.items():
+            future.set_result(states[name])
+
+    def _finish_loading(self, futures: typing.Dict[_Key, Future]):
+        for name, future in futures.items():
+            if self._loading.get(name) is future:
+                del self._loading[name]
+
+    def _remove_spilled(self, key: _Key):
+        file_path = self._spilled.pop(key, None)
+        if file_path is None or any(self._spilled.get(x) == file_path for x in self._files[file_path]):
+            return
+        del self._files[file_path]
+        try:
+            os.remove(file_path)
+        except OSError:  # pragma: no cover
+            logging.warning("Cannot remove temporary state file %s", file_path)
+
+    def _spill_directory(self) -> str:
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="partseg_states_", dir=self.spill_dir)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._directory, True)
+        return self._directory
+
+    @staticmethod
+    def _owners(states: typing.Mapping[_Key, typing.Any]) -> typing.Dict[_Key, typing.Set[int]]:
+        return {key: {id(x) for x in state_arrays(state)} for key, state in states.items()}
+
+    @staticmethod
+    def _sharing_group(key: _Key, owners: typing.Dict[_Key, typing.Set[int]]) -> typing.List[_Key]:
+        """Keys of states which share arrays with state of ``key`` directly or through other states"""
+        group = {key}
+        arrays = set(owners[key])
+        changed = True
+        while changed:
+            changed = False
+            for name, ids in owners.items():
+                if name not in group and ids & arrays:
+                    group.add(name)
+                    arrays |= ids
+                    changed = True
+        return [x for x in owners if x in group]
+
+    def _spill(self, keep: typing.Optional[_Key] = None):
+        """
+        Select least recently used states above memory budget and save them in background.
+        States sharing arrays are saved together, as saving only some of them does not free memory.
+        """
+        if not self._memory:
+            return
+        protected = {next(reversed(self._memory))}
+        if keep is not None:
+            protected.add(keep)
+        resident = OrderedDict((k, v) for k, v in self._memory.items() if k not in self._saving)
+        owners = self._owners(resident)
+        candidates = [x for x in resident if x not in protected]
+        while candidates and self._memory_usage(resident.values()) > self.max_memory:
+            group = self._sharing_group(candidates[0], owners)
+            candidates = [x for x in candidates if x not in group]
+            if protected.intersection(group) or not any(owners[x] for x in group):
+                continue
+            states = [resident.pop(x) for x in group]
+            for name in group:
+                del owners[name]
+            self._saving.update(zip(group, states))
+            self._executor.submit(self._save, group, states, self._spill_directory())
+
+    def _save(self, keys: typing.List[_Key], states: list, directory: str):
+        try:
+            fd, file_path = tempfile.mkstemp(dir=directory, suffix=".partseg_state")
+            os.close(fd)
+        except OSError as e:
+            logging.info("States %s kept in memory: %s", keys, e)
+            file_path = None
+        else:
+            try:
+                save_state(file_path, states)
+            except (pickle.PicklingError, TypeError, AttributeError, OSError) as e:
+                logging.info("States %s kept in memory: %s", keys, e)
+                os.remove(file_path)
+                file_path = None
+        with self._lock:
+            valid = file_path is not None and self._can_drop(keys, states)
+            for name, state in zip(keys, states):
+                if self._saving.get(name) is state:
+                    del self._saving[name]
+            if not valid:
+                if file_path is not None:
+                    os.remove(file_path)
+                return
+            for name in keys:
+                del self._memory[name]
+                self._spilled[name] = file_path
+            self._files[file_path] = keys
+
+    def _can_drop(self, keys: typing.List[_Key], states: list) -> bool:
+        """Check if saved states were not changed, used or shared by other states in the meantime"""
+        if any(self._saving.get(x) is not y or self._memory.get(x) is not y for x, y in zip(keys, states)):
+            return False
+        if next(reversed(self._memory)) in keys:
+            return False
+        arrays = {id(x) for state in states for x in state_arrays(state)}
+        return not any(
+            arrays.intersection(id(x) for x in state_arrays(state))
+            for name, state in self._memory.items()
+            if name not in keys
+        )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._saving.clear()
+            for key in list(self._spilled):
+                self._remove_spilled(key)
@@ -33,13 +33,16 @@ class BoundInfo(NamedTuple):
 class ROIInfo:
     """
     Object to storage meta information about given segmentation.
-    Segmentation array is only referenced, not copied.
+    Segmentation array is copied, so later changes of passed array do not affect it.
 
     :ivar numpy.ndarray ~.roi: reference to segmentation
     :ivar Dict[int,BoundInfo] bound_info: mapping from component number to bounding box
     :ivar numpy.ndarray sizes: array with sizes of components
     :ivar Dict[int, Any] annotations: annotations of roi
     :ivar Dict[str, np.ndarray] alternative: alternative representation of roi
+
+    If ``bound_info`` or ``sizes`` are known (for example from previous calculation)
+    they could be passed to constructor to avoid iteration over whole array.
     """
 
     def __init__(
@@ -47,6 +50,8 @@ class ROIInfo:
         roi: Optional[np.ndarray],
         annotations: Optional[Dict[int, Any]] = None,
         alternative: Optional[Dict[str, np.ndarray]] = None,
+        bound_info: Optional[Dict[int, BoundInfo]] = None,
+        sizes: Optional[np.ndarray] = None,
     ):
         annotations = {} if annotations is None else annotations
         self.annotations = {int(k): v for k, v in annotations.items()}
@@ -56,19 +61,36 @@ class ROIInfo:
             self.bound_info = {}
             self.sizes = []
             return
-        max_val = np.max(roi)
+        max_val = len(sizes) - 1 if sizes is not None else np.max(roi)
         dtype = minimal_dtype(max_val)
         roi = roi.astype(dtype)
         self.roi = roi
-        self.bound_info = self.calc_bounds(roi)
-        self.sizes = np.bincount(roi.flat)
+        self.bound_info = self.calc_bounds(roi) if bound_info is None else bound_info
+        self.sizes = np.bincount(roi.flat) if sizes is None else sizes
 
     def fit_to_image(self, image: Image) -> "ROIInfo":
         if self.roi is None:
             return ROIInfo(self.roi, self.annotations, self.alternative)
         roi = image.fit_array_to_image(self.roi)
         alternatives = {k: image.fit_array_to_image(v) for k, v in self.alternative.items()}
-        return ROIInfo(roi, self.annotations, alternatives)
+        return ROIInfo(
+            roi, self.annotations, alternatives, bound_info=self._fit_bound_info(roi.shape), sizes=self.sizes
+        )
+
+    def _fit_bound_info(self, shape) -> Dict[int, BoundInfo]:
+        """Adjust bounding boxes to roi with inserted axes of length 1"""
+        if tuple(shape) == self.roi.shape:
+            return self.bound_info
+        new_axes = [i for i, x in enumerate(shape) if x != 1]
+        old_axes = [i for i, x in enumerate(self.roi.shape) if x != 1]
+        res = {}
+        for num, bound in self.bound_info.items():
+            lower = np.zeros(len(shape), dtype=bound.lower.dtype)
+            upper = np.zeros(len(shape), dtype=bound.upper.dtype)
+            lower[new_axes] = bound.lower[old_axes]
+            upper[new_axes] = bound.upper[old_axes]
+            res[num] = BoundInfo(lower=lower, upper=upper)
+        return res
 
     def __str__(self):
         return f"ROIInfo; components: {len(self.bound_info)}, sizes: {self.sizes}"
@@ -1,3 +1,5 @@
+import itertools
+import typing
 import warnings
 from abc import ABC
 
@@ -5,9 +7,10 @@ import numpy as np
 import SimpleITK as sitk
 from nme import update_argument
 from pydantic import Field
+from scipy.ndimage import correlate1d
 
 from PartSegCore.algorithm_describe_base import AlgorithmDescribeBase, AlgorithmSelection
-from PartSegCore.segmentation.watershed import NeighType, get_neighbourhood
+from PartSegCore.segmentation.watershed import NeighType
 from PartSegCore.utils import BaseModel
 
 
@@ -62,6 +65,98 @@ class VoteSmoothingParams(BaseModel):
     )
 
 
+_LINE = np.ones(3, dtype=np.uint8)
+
+
+def _neighbour_count(mask: np.ndarray, neighbourhood_type: NeighType) -> np.ndarray:
+    """
+    Count labeled neighbours of each voxel with separable sums along axes.
+    Voxels outside array are treated as not labeled.
+
+    :param mask: array with 0 and 1 values, of type np.uint8
+    :param neighbourhood_type: sides - neighbours with one shifted coordinate,
+        edges - with at most two shifted coordinates, vertex - all neighbours in 3x3(x3) box
+    :return: array of np.uint8 with number of labeled neighbours (voxel itself is not counted)
+    """
+    ndim = mask.ndim
+    lines = [correlate1d(mask, _LINE, axis=i, mode="constant") for i in range(ndim)]
+    sides = sum(lines[1:], lines[0]) - ndim * mask
+    if neighbourhood_type == NeighType.sides:
+        return sides
+    if neighbourhood_type == NeighType.vertex or ndim <= 2:
+        box = lines[0]
+        for i in range(1, ndim):
+            box = correlate1d(box, _LINE, axis=i, mode="constant")
+        return box - mask
+    # sum of 3x3 boxes on each pair of axes counts voxel itself ndim*(ndim-1)/2 times,
+    # neighbours by side ndim-1 times and neighbours by edge once
+    planes = sum(
+        correlate1d(lines[i], _LINE, axis=j, mode="constant") for i, j in itertools.combinations(range(ndim), 2)
+    )
+    return planes - (ndim * (ndim - 1) // 2) * mask - (ndim - 2) * sides
+
+
+def _neighbour_offsets(shape: typing.Sequence[int], neighbourhood_type: NeighType) -> np.ndarray:
+    """Offsets of neighbours in flattened array of given shape"""
+    max_shifted = {NeighType.sides: 1, NeighType.edges: 2, NeighType.vertex: len(shape)}[neighbourhood_type]
+    strides = np.cumprod((1,) + tuple(shape[:0:-1]))[::-1]
+    shifts = [x for x in itertools.product((-1, 0, 1), repeat=len(shape)) if 0 < np.count_nonzero(x) <= max_shifted]
+    return np.array(shifts, dtype=np.intp) @ strides
+
+
+def _foreground_bounding_box(segmentation: np.ndarray) -> typing.Optional[typing.Tuple[slice, ...]]:
+    """Bounding box of non zero voxels or None if array is empty"""
+    res = []
+    for axis in range(segmentation.ndim):
+        positions = np.flatnonzero(np.any(segmentation, axis=tuple(x for x in range(segmentation.ndim) if x != axis)))
+        if positions.size == 0:
+            return None
+        res.append(slice(positions[0], positions[-1] + 1))
+    return tuple(res)
+
+
+def vote_smooth(
+    segmentation: np.ndarray, neighbourhood_type: NeighType, support_level: int, max_steps: int = 1
+) -> np.ndarray:
+    """
+    Remove voxels of segmentation which have less than ``support_level`` labeled neighbours.
+    Calculation is limited to bounding box of foreground. After first step only neighbours
+    of removed voxels are reevaluated.
+
+    :param segmentation: labeled array, axes of length 1 are ignored
+    :param neighbourhood_type: type of neighbourhood
+    :param support_level: minimal number of labeled neighbours needed to preserve voxel
+    :param max_steps: maximum number of steps
+    :return: copy of segmentation with removed voxels
+    """
+    segmentation = segmentation.copy()
+    squeezed = segmentation.reshape([x for x in segmentation.shape if x > 1])
+    bounding_box = _foreground_bounding_box(squeezed)
+    if bounding_box is None or squeezed.ndim == 0 or max_steps < 1:
+        return segmentation
+    area = squeezed[bounding_box]
+    # one voxel margin, so neighbours of foreground voxels never leave array
+    foreground = np.pad(area > 0, 1).astype(np.uint8)
+    padded_shape = foreground.shape
+    count = _neighbour_count(foreground, neighbourhood_type)
+    removed = np.flatnonzero(foreground & (count < support_level))
+    foreground = foreground.ravel()
+    count = count.ravel()
+    offsets = _neighbour_offsets(padded_shape, neighbourhood_type)
+    for step in range(max_steps):
+        if removed.size == 0:
+            break
+        foreground[removed] = 0
+        if step == max_steps - 1:
+            break
+        neighbours, neighbours_count = np.unique((removed[:, np.newaxis] + offsets).ravel(), return_counts=True)
+        count[neighbours] = count[neighbours] - neighbours_count
+        removed = neighbours[(foreground[neighbours] > 0) & (count[neighbours] < support_level)]
+    inner = tuple(slice(1, -1) for _ in padded_shape)
+    area[foreground.reshape(padded_shape)[inner] == 0] = 0
+    return segmentation
+
+
 class VoteSmoothing(BaseSmoothing):
     __argument_class__ = VoteSmoothingParams
 
@@ -72,16 +167,7 @@ class VoteSmoothing(BaseSmoothing):
     @classmethod
     @update_argument("arguments")
     def smooth(cls, segmentation: np.ndarray, arguments: VoteSmoothingParams) -> np.ndarray:
-        segmentation_bin = (segmentation > 0).astype(np.uint8)
-        count_array = np.zeros(segmentation_bin.shape, dtype=segmentation.dtype)
-        neighbourhood = get_neighbourhood(segmentation_bin.squeeze().shape, arguments.neighbourhood_type)
-        axis = tuple(range(len(segmentation_bin.shape)))
-        for shift in neighbourhood:
-            count_array += np.roll(segmentation_bin, shift, axis)
-        segmentation = segmentation.copy()
-        count_array = count_array.reshape(segmentation.shape)
-        segmentation[count_array < arguments.support_level] = 0
-        return segmentation
+        return vote_smooth(segmentation, arguments.neighbourhood_type, arguments.support_level)
 
 
 class IterativeSmoothingParams(VoteSmoothingParams):
@@ -100,23 +186,7 @@ class IterativeVoteSmoothing(BaseSmoothing):
     @classmethod
     @update_argument("arguments")
     def smooth(cls, segmentation: np.ndarray, arguments: IterativeSmoothingParams) -> np.ndarray:
-        segmentation_bin = (segmentation > 0).astype(np.uint8)
-        count_array = np.zeros(segmentation_bin.shape, dtype=segmentation.dtype)
-        neighbourhood = get_neighbourhood(segmentation_bin.squeeze().shape, arguments.neighbourhood_type)
-        segmentation = segmentation.copy()
-        count_point = np.count_nonzero(segmentation)
-        axis = tuple(range(len(segmentation_bin.shape)))
-        for _ in range(arguments.max_steps):
-            for shift in neighbourhood:
-                count_array += np.roll(segmentation_bin, shift, axis)
-            segmentation_bin[count_array < arguments.support_level] = 0
-            count_point2 = np.count_nonzero(segmentation_bin)
-            if count_point2 == count_point:
-                break
-            count_point = count_point2
-            count_array[:] = 0
-        segmentation[segmentation_bin.reshape(segmentation.shape) == 0] = 0
-        return segmentation
+        return vote_smooth(segmentation, arguments.neighbourhood_type, arguments.support_level, arguments.max_steps)
 
 
 class SmoothAlgorithmSelection(AlgorithmSelection, class_methods=["smooth"], suggested_base_class=BaseSmoothing):
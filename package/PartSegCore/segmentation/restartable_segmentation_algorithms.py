@@ -14,6 +14,7 @@ from PartSegCore.algorithm_describe_base import ROIExtractionProfile
 from PartSegCore.mask_partition_utils import BorderRim as BorderRimBase
 from PartSegCore.mask_partition_utils import MaskDistanceSplit as MaskDistanceSplitBase
 from PartSegCore.project_info import AdditionalLayerDescription
+from PartSegCore.roi_info import BoundInfo, ROIInfo
 from PartSegCore.segmentation.algorithm_base import (
     ROIExtractionAlgorithm,
     ROIExtractionResult,
@@ -29,12 +30,15 @@ from PartSegCore.segmentation.threshold import (
     ManualThreshold,
     SingleThresholdParams,
     ThresholdSelection,
+    ThresholdStatistics,
+    apply_threshold,
 )
 from PartSegCore.segmentation.watershed import BaseWatershed, FlowMethodSelection, calculate_distances_array, get_neigh
 from PartSegCore.universal_const import Units
 from PartSegCore.utils import BaseModel, bisect
 from PartSegCore_compiled_backend.multiscale_opening import PyMSO, calculate_mu_mid
 from PartSegImage import Channel
+from PartSegImage.image import minimal_dtype
 
 REQUIRE_MASK_STR = "Need mask"
 
@@ -188,7 +192,11 @@ class ThresholdBaseAlgorithm(RestartableAlgorithm, ABC):
         super().__init__()
         self.cleaned_image = None
         self.threshold_image = None
+        self._threshold_statistics: typing.Optional[
+            typing.Tuple[np.ndarray, typing.Optional[np.ndarray], ThresholdStatistics]
+        ] = None
         self._sizes_array = []
+        self._bound_info: typing.Optional[typing.Dict[int, BoundInfo]] = None
         self.components_num = 0
         self.threshold_info = None
         self.old_threshold_info = None
@@ -226,9 +234,36 @@ class ThresholdBaseAlgorithm(RestartableAlgorithm, ABC):
             roi_annotation=annotation,
         )
 
+    def _prepare_size_filtered_result(self, roi: np.ndarray) -> ROIExtractionResult:
+        """
+        Collect data for result of size filtering. Sizes and bounding boxes
+        of components are taken from cache, so cost does not depend on size of ``roi``.
+
+        :param roi: :py:attr:`segmentation` with components above :py:attr:`components_num` removed
+        :return: algorithm result description
+        """
+        sizes = np.array(self._sizes_array[: self.components_num + 1])
+        sizes[0] = roi.size - np.sum(sizes[1:])
+        if self._bound_info is None:
+            self._bound_info = ROIInfo.calc_bounds(self.segmentation)
+        bound_info = {k: v for k, v in self._bound_info.items() if k <= self.components_num}
+        annotation = {i: {"component": i, "voxels": size} for i, size in enumerate(sizes[1:], 1)}
+        return ROIExtractionResult(
+            roi=roi,
+            parameters=self.get_segmentation_profile(),
+            additional_layers=self.get_additional_layers(),
+            roi_annotation=annotation,
+            roi_info=ROIInfo(roi, annotation, bound_info=bound_info, sizes=sizes),
+        )
+
     def set_image(self, image):
         super().set_image(image)
         self.threshold_info = None
+        self._threshold_statistics = None
+
+    def set_mask(self, mask):
+        super().set_mask(mask)
+        self._threshold_statistics = None
 
     def get_info_text(self):
         return f"Threshold: {self.threshold_info}\nSizes: " + ", ".join(
@@ -281,19 +316,24 @@ class ThresholdBaseAlgorithm(RestartableAlgorithm, ABC):
             )
             self.segmentation = SimpleITK.GetArrayFromImage(SimpleITK.RelabelComponent(connect))
             self._sizes_array = np.bincount(self.segmentation.flat)
+            self._bound_info = None
             return True
         return False
 
     def _filter_by_size(self, restarted: bool) -> typing.Optional[np.ndarray]:
-        """Filter components by size if size filter is changed"""
-        if restarted or self.new_parameters.minimum_size != self.parameters["size_filter"]:
+        """
+        Filter components by size if size filter is changed.
+        Components are sorted by size, so filtering is done with lookup table
+        which zero labels above number of components bigger than minimum size.
+        """
+        if restarted or self.new_parameters.minimum_size != self.parameters["minimum_size"]:
             self.parameters["minimum_size"] = self.new_parameters.minimum_size
             minimum_size = self.new_parameters.minimum_size
             ind = bisect(self._sizes_array[1:], minimum_size, operator.gt)
-            finally_segment = np.copy(self.segmentation)
-            finally_segment[finally_segment > ind] = 0
             self.components_num = ind
-            return finally_segment
+            lut = np.zeros(len(self._sizes_array), dtype=minimal_dtype(ind))
+            lut[: ind + 1] = np.arange(ind + 1)
+            return lut[self.segmentation]
         return None
 
     def calculation_run(
@@ -325,7 +365,7 @@ class ThresholdBaseAlgorithm(RestartableAlgorithm, ABC):
                 )
             else:
                 info_text = ""
-            res = self.prepare_result(finally_segment)
+            res = self._prepare_size_filtered_result(finally_segment)
             return dataclasses.replace(res, info_text=info_text)
 
         return None
@@ -334,14 +374,35 @@ class ThresholdBaseAlgorithm(RestartableAlgorithm, ABC):
         super().clean()
         self.parameters: typing.Dict[str, typing.Optional[typing.Any]] = defaultdict(lambda: None)
         self.cleaned_image = None
+        self._threshold_statistics = None
         self.mask = None
 
+    def _get_threshold_statistics(self, image: np.ndarray) -> ThresholdStatistics:
+        """
+        Statistics of image used by threshold methods. They are kept as long as image and mask are same,
+        so change of threshold method or its parameters does not repeat calculation of histogram.
+        Use :py:attr:`ThresholdStatistics.mask` as threshold mask, as :py:attr:`mask` returns new view on each call.
+        Only histograms are kept between calls, see :py:meth:`_apply_threshold`.
+        """
+        if (
+            self._threshold_statistics is None
+            or self._threshold_statistics[0] is not image
+            or self._threshold_statistics[1] is not self._mask
+        ):
+            self._threshold_statistics = (image, self._mask, ThresholdStatistics(image, self.mask))
+        return self._threshold_statistics[2]
+
+    def _apply_threshold(self, thr: typing.Type[BaseThreshold], image: np.ndarray, arguments, threshold_operator):
+        statistics = self._get_threshold_statistics(image)
+        try:
+            return apply_threshold(thr, image, statistics.mask, arguments, threshold_operator, statistics)
+        finally:
+            statistics.release_arrays()
+
     def _threshold(self, image, thr=None):
         if thr is None:
             thr: BaseThreshold = ThresholdSelection[self.new_parameters.threshold.name]
-        mask, thr_val = thr.calculate_mask(
-            image, self.mask, self.new_parameters.threshold.values, self.threshold_operator
-        )
+        mask, thr_val = self._apply_threshold(thr, image, self.new_parameters.threshold.values, self.threshold_operator)
         self.threshold_info = thr_val
         return mask
 
@@ -431,7 +492,7 @@ class RangeThresholdAlgorithm(ThresholdBaseAlgorithm):
     def _threshold(self, image, thr=None):
         if thr is None:
             thr: BaseThreshold = DoubleThresholdSelection[self.new_parameters.threshold.name]
-        mask, thr_val = thr.calculate_mask(image, self.mask, self.new_parameters.threshold.values, operator.ge)
+        mask, thr_val = self._apply_threshold(thr, image, self.new_parameters.threshold.values, operator.ge)
         mask[mask == 2] = 0
         self.threshold_info = thr_val
         return mask
@@ -449,9 +510,7 @@ class TwoLevelThresholdBaseAlgorithm(ThresholdBaseAlgorithm, ABC):
     def _threshold(self, image, thr=None):
         if thr is None:
             thr: BaseThreshold = DoubleThresholdSelection[self.new_parameters.threshold.name]
-        mask, thr_val = thr.calculate_mask(
-            image, self.mask, self.new_parameters.threshold.values, self.threshold_operator
-        )
+        mask, thr_val = self._apply_threshold(thr, image, self.new_parameters.threshold.values, self.threshold_operator)
         self.threshold_info = thr_val
         self.sprawl_area = (mask >= 1).astype(np.uint8)
         return (mask == 2).astype(np.uint8)
@@ -12,7 +12,13 @@ from PartSegCore.project_info import AdditionalLayerDescription
 from PartSegCore.segmentation.algorithm_base import ROIExtractionAlgorithm, ROIExtractionResult
 from PartSegCore.segmentation.border_smoothing import NoneSmoothing, OpeningSmoothing, SmoothAlgorithmSelection
 from PartSegCore.segmentation.noise_filtering import NoiseFilterSelection
-from PartSegCore.segmentation.threshold import BaseThreshold, DoubleThresholdSelection, ThresholdSelection
+from PartSegCore.segmentation.threshold import (
+    BaseThreshold,
+    DoubleThresholdSelection,
+    ThresholdSelection,
+    ThresholdStatistics,
+    apply_threshold,
+)
 from PartSegCore.segmentation.watershed import BaseWatershed, FlowMethodSelection
 from PartSegCore.utils import BaseModel, bisect
 from PartSegImage import Channel
@@ -397,14 +403,14 @@ class AutoThresholdAlgorithm(BaseSingleThresholdAlgorithm):
         return "Auto Threshold"
 
     def _threshold_image(self, image: np.ndarray) -> np.ndarray:
-        sitk_image = sitk.GetImageFromArray(image)
-        sitk_mask = sitk.ThresholdMaximumConnectedComponents(sitk_image, self.new_parameters.suggested_size)
+        statistics = ThresholdStatistics(image)
+        sitk_mask = sitk.ThresholdMaximumConnectedComponents(statistics.sitk_image, self.new_parameters.suggested_size)
         # TODO what exactly it returns. Maybe it is already segmented.
         mask = sitk.GetArrayFromImage(sitk_mask)
         min_val = np.min(image[mask > 0])
         threshold_algorithm: BaseThreshold = ThresholdSelection[self.new_parameters.threshold.name]
-        mask2, thr_val = threshold_algorithm.calculate_mask(
-            image, None, self.new_parameters.threshold.values, operator.le
+        mask2, thr_val = apply_threshold(
+            threshold_algorithm, image, None, self.new_parameters.threshold.values, operator.le, statistics
         )
         return mask if thr_val < min_val else mask2
 
@@ -1,6 +1,8 @@
+import inspect
 import typing
 import warnings
 from abc import ABC
+from functools import lru_cache
 
 import numpy as np
 import SimpleITK as sitk
@@ -35,6 +37,168 @@ class MultipleOtsuThresholdParams(BaseModel):
     bins: int = Field(128, title="Number of histogram bins", ge=8, le=2**16)
 
 
+_HISTOGRAM_MARGINAL_SCALE = 100
+"""Same as in ITK. Upper bound of histogram is moved by ``1 / scale`` of bin width to include maximum in last bin"""
+_HISTOGRAM_LEVELS_LIMIT = 2**20
+
+
+class ThresholdStatistics:
+    """
+    Data shared by threshold methods applied to the same array and mask. Values selected by mask,
+    histograms and SimpleITK images are calculated on first use and then reused,
+    so applying multiple threshold methods (or comparing them, see :py:func:`compare_thresholds`)
+    does not repeat this work. Data and mask should not be modified when statistics are in use.
+
+    Histograms are calculated in the same way as in SimpleITK threshold filters.
+
+    :param data: array to threshold
+    :param mask: optional mask of area for which threshold is calculated
+    """
+
+    def __init__(self, data: np.ndarray, mask: typing.Optional[np.ndarray] = None):
+        self.data = data
+        self.mask = mask
+        self._cache: typing.Dict[typing.Hashable, typing.Any] = {}
+
+    def is_for(self, data: np.ndarray, mask: typing.Optional[np.ndarray]) -> bool:
+        """Check if statistics were created for given arrays"""
+        return self.data is data and self.mask is mask
+
+    def _cached(self, key: typing.Hashable, fun: typing.Callable[[], typing.Any]):
+        if key not in self._cache:
+            self._cache[key] = fun()
+        return self._cache[key]
+
+    def release_arrays(self):
+        """
+        Drop cached copies of data (SimpleITK images, masked and sorted values).
+        Histograms and values ranges are kept, so statistics may be stored between threshold calls
+        without keeping additional copies of data in memory.
+        """
+        for key in ("sitk_image", "sitk_mask", "values", "sorted"):
+            self._cache.pop(key, None)
+
+    @property
+    def sitk_image(self) -> sitk.Image:
+        return self._cached("sitk_image", lambda: sitk.GetImageFromArray(self.data))
+
+    @property
+    def sitk_mask(self) -> typing.Optional[sitk.Image]:
+        if self.mask is None:
+            return None
+        return self._cached("sitk_mask", lambda: sitk.GetImageFromArray(self._uint8_mask()))
+
+    def _uint8_mask(self) -> np.ndarray:
+        if self.mask.dtype == np.uint8:
+            return self.mask
+        return (self.mask > 0).astype(np.uint8)
+
+    def values(self, apply_mask: bool = True) -> np.ndarray:
+        """
+        Values used for histogram calculation. Masked filters of SimpleITK use voxels where mask is equal 1.
+
+        :param apply_mask: if use only values from mask area
+        """
+        if not apply_mask or self.mask is None:
+            return self.data.ravel()
+        return self._cached("values", lambda: self.data[self._uint8_mask() == 1])
+
+    def value_range(self, apply_mask: bool = True) -> typing.Optional[typing.Tuple[float, float]]:
+        """Minimum and maximum of :py:meth:`values`. None if there is no values"""
+
+        def _range():
+            values = self.values(apply_mask)
+            if values.size == 0:
+                return None
+            return float(np.min(values)), float(np.max(values))
+
+        return self._cached(("range", apply_mask and self.mask is not None), _range)
+
+    def histogram(self, bins: int, apply_mask: bool = True) -> typing.Optional[typing.Tuple[np.ndarray, np.ndarray]]:
+        """
+        Histogram with same bins as used by SimpleITK threshold filters. For 8-bit integer types bins cover
+        whole type range, for other types range of values extended by small margin.
+
+        :param bins: number of bins
+        :param apply_mask: if use only values from mask area
+        :return: counts and bins edges, None if histogram cannot be calculated
+            (no values, constant values or unsupported type)
+        """
+        return self._cached(
+            ("histogram", bins, apply_mask and self.mask is not None), lambda: self._histogram(bins, apply_mask)
+        )
+
+    def _histogram(self, bins: int, apply_mask: bool):
+        dtype = self.data.dtype
+        value_range = self.value_range(apply_mask)
+        if value_range is None or dtype.kind not in "uif" or (dtype.kind in "ui" and dtype.itemsize > 4):
+            return None
+        # ITK keeps bins bounds in float32 for all types except float64
+        measurement = np.float64 if dtype == np.float64 else np.float32
+        if dtype.kind in "ui" and dtype.itemsize == 1:
+            info = np.iinfo(dtype)
+            lower, upper = measurement(info.min - 0.5), measurement(info.max + 0.5)
+        else:
+            lower, upper = (measurement(x) for x in value_range)
+            if lower == upper:
+                return None
+            upper = measurement(upper + (upper - lower) / measurement(bins) / measurement(_HISTOGRAM_MARGINAL_SCALE))
+        interval = (float(upper) - float(lower)) / bins
+        edges = (float(lower) + np.arange(bins + 1) * interval).astype(measurement)
+        edges[-1] = upper
+        values = self.values(apply_mask)
+
+        def bin_counts(array, weights=None):
+            # values equal or above upper bound are not counted
+            index = np.searchsorted(edges, array.astype(measurement, copy=False), side="right") - 1
+            in_range = index < bins
+            if weights is not None:
+                weights = weights[in_range]
+            return np.bincount(index[in_range], weights=weights, minlength=bins).astype(np.float64)
+
+        minimum, maximum = (int(x) for x in value_range) if dtype.kind in "ui" else (0, 0)
+        if dtype.kind in "ui" and maximum - minimum < _HISTOGRAM_LEVELS_LIMIT:
+            # count each level once instead of searching bin for each voxel
+            if dtype.kind == "u":
+                shifted = values - dtype.type(minimum)
+            else:
+                shifted = values.astype(np.int64) - minimum
+            level_counts = np.bincount(shifted, minlength=maximum - minimum + 1)
+            counts = bin_counts(np.arange(minimum, maximum + 1), level_counts)
+        else:
+            counts = bin_counts(values)
+        if not counts.any():
+            return None
+        return counts, edges
+
+    def cast_threshold(self, value: float):
+        """Cast threshold to type of data like SimpleITK do. For integer types value is truncated"""
+        dtype = self.data.dtype
+        if dtype.kind == "f":
+            return dtype.type(value)
+        info = np.iinfo(dtype)
+        return dtype.type(np.clip(np.trunc(value), info.min, info.max))
+
+    def sorted_values(self) -> np.ndarray:
+        """Sorted values of data in mask area (or whole data if there is no mask)"""
+
+        def _sorted():
+            values = self.data.ravel() if self.mask is None else self.data[self.mask != 0]
+            return np.sort(values)
+
+        return self._cached("sorted", _sorted)
+
+
+def _statistics_for(
+    statistics: typing.Optional[ThresholdStatistics], data: np.ndarray, mask: typing.Optional[np.ndarray]
+) -> ThresholdStatistics:
+    if statistics is None:
+        return ThresholdStatistics(data, mask)
+    if not statistics.is_for(data, mask):
+        raise ValueError("Threshold statistics are calculated for other data or mask")
+    return statistics
+
+
 class BaseThreshold(AlgorithmDescribeBase, ABC):
     @classmethod
     def calculate_mask(
@@ -43,7 +207,18 @@ class BaseThreshold(AlgorithmDescribeBase, ABC):
         mask: typing.Optional[np.ndarray],
         arguments: BaseModel,
         operator: typing.Callable[[object, object], bool],
+        statistics: typing.Optional[ThresholdStatistics] = None,
     ):
+        """
+        Calculate binary mask and threshold value.
+
+        :param data: array to threshold
+        :param mask: area of interest
+        :param arguments: parameters of method
+        :param operator: comparison operator which describes foreground
+        :param statistics: statistics shared with other threshold methods applied to ``data`` and ``mask``.
+            Use :py:func:`apply_threshold` to pass them also to methods which does not support them.
+        """
         raise NotImplementedError()
 
 
@@ -57,7 +232,12 @@ class ManualThreshold(BaseThreshold):
     @classmethod
     @update_argument("arguments")
     def calculate_mask(
-        cls, data: np.ndarray, mask: typing.Optional[np.ndarray], arguments: SingleThresholdParams, operator
+        cls,
+        data: np.ndarray,
+        mask: typing.Optional[np.ndarray],
+        arguments: SingleThresholdParams,
+        operator,
+        statistics: typing.Optional[ThresholdStatistics] = None,
     ):
         result = np.array(operator(data, arguments.threshold)).astype(np.uint8)
         if mask is not None:
@@ -66,33 +246,84 @@ class ManualThreshold(BaseThreshold):
 
 
 class SitkThreshold(BaseThreshold, ABC):
+    """
+    Base class for methods calculating threshold from histogram.
+    If :py:meth:`histogram_threshold` is implemented, then threshold is calculated with numpy
+    from histogram cached in :py:class:`ThresholdStatistics`, otherwise SimpleITK filter is used.
+    """
+
     __argument_class__ = SimpleITKThresholdParams128
 
     @classmethod
     @update_argument("arguments")
     def calculate_mask(
-        cls, data: np.ndarray, mask: typing.Optional[np.ndarray], arguments: SimpleITKThresholdParams128, operator
+        cls,
+        data: np.ndarray,
+        mask: typing.Optional[np.ndarray],
+        arguments: SimpleITKThresholdParams128,
+        operator,
+        statistics: typing.Optional[ThresholdStatistics] = None,
     ):
-        if mask is not None and mask.dtype != np.uint8 and arguments.apply_mask:
-            mask = (mask > 0).astype(np.uint8)
-        ob, bg, th_op = (0, 1, np.min) if operator(1, 0) else (1, 0, np.max)
-        image_sitk = sitk.GetImageFromArray(data)
-        if arguments.apply_mask and mask is not None:
-            mask_sitk = sitk.GetImageFromArray(mask)
-            calculated = cls.calculate_threshold(image_sitk, mask_sitk, ob, bg, arguments.bins, True, 1)
+        statistics = _statistics_for(statistics, data, mask)
+        split = cls.split_value(statistics, arguments)
+        if split is None:
+            result = cls._sitk_mask(statistics, arguments, operator)
         else:
-            calculated = cls.calculate_threshold(image_sitk, ob, bg, arguments.bins)
-        result = sitk.GetArrayFromImage(calculated)
+            result = (data > split if operator(1, 0) else data <= split).astype(np.uint8)
         if mask is not None:
             result[mask == 0] = 0
+        th_op = np.min if operator(1, 0) else np.max
         threshold = th_op(data[result > 0]) if np.any(result) else th_op(-data)
         return result, threshold
 
+    @classmethod
+    def split_value(
+        cls, statistics: ThresholdStatistics, arguments: SimpleITKThresholdParams128
+    ) -> typing.Optional[typing.Any]:
+        """
+        Calculate value which split data on background (values lower or equal) and foreground
+        from cached histogram.
+
+        :return: split value casted to data type or None if it cannot be calculated without SimpleITK
+        """
+        histogram = statistics.histogram(arguments.bins, arguments.apply_mask)
+        if histogram is None:
+            return None
+        value = cls.histogram_threshold(*histogram)
+        return None if value is None else statistics.cast_threshold(value)
+
+    @staticmethod
+    def histogram_threshold(counts: np.ndarray, edges: np.ndarray) -> typing.Optional[float]:
+        """
+        Calculate threshold from histogram in the same way as SimpleITK filter.
+        Values above threshold are foreground.
+
+        :param counts: histogram counts
+        :param edges: edges of histogram bins
+        :return: threshold or None if method is not implemented for numpy
+        """
+        return None
+
+    @classmethod
+    def _sitk_mask(cls, statistics: ThresholdStatistics, arguments: SimpleITKThresholdParams128, operator):
+        ob, bg = (0, 1) if operator(1, 0) else (1, 0)
+        if arguments.apply_mask and statistics.mask is not None:
+            calculated = cls.calculate_threshold(
+                statistics.sitk_image, statistics.sitk_mask, ob, bg, arguments.bins, True, 1
+            )
+        else:
+            calculated = cls.calculate_threshold(statistics.sitk_image, ob, bg, arguments.bins)
+        return sitk.GetArrayFromImage(calculated)
+
     @staticmethod
     def calculate_threshold(*args, **kwargs):
         raise NotImplementedError
 
 
+def _bin_centers(edges: np.ndarray) -> np.ndarray:
+    return ((edges[:-1].astype(np.float64) + edges[1:]) / 2).astype(edges.dtype)
+
+
 class OtsuThreshold(SitkThreshold):
     @classmethod
     def get_name(cls):
@@ -102,6 +333,20 @@ class OtsuThreshold(SitkThreshold):
     def calculate_threshold(*args, **kwargs):
         return sitk.OtsuThreshold(*args)
 
+    @staticmethod
+    def histogram_threshold(counts: np.ndarray, edges: np.ndarray) -> typing.Optional[float]:
+        # maximize between class variance, threshold is upper edge of last background bin
+        frequency = counts / counts.sum()
+        weighted = frequency * _bin_centers(edges)
+        weight_back = np.cumsum(frequency)[:-1]
+        sum_back = np.cumsum(weighted)[:-1]
+        weight_obj = 1 - weight_back
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_back = np.where(weight_back > 0, sum_back / weight_back, 0)
+            mean_obj = np.where(weight_obj > 0, (weighted.sum() - sum_back) / weight_obj, 0)
+        variance = weight_back * mean_back**2 + weight_obj * mean_obj**2
+        return edges[np.argmax(variance) + 1]
+
 
 class LiThreshold(SitkThreshold):
     __argument_class__ = SimpleITKThresholdParams256
@@ -162,6 +407,24 @@ class TriangleThreshold(SitkThreshold):
     def calculate_threshold(*args, **kwargs):
         return sitk.TriangleThreshold(*args)
 
+    @staticmethod
+    def histogram_threshold(counts: np.ndarray, edges: np.ndarray) -> typing.Optional[float]:
+        # line from histogram peak to 1% or 99% percentile, on side with longer tail
+        cumulative = np.cumsum(counts)
+        peak = int(np.argmax(counts))
+        low = int(np.searchsorted(cumulative, 0.01 * cumulative[-1]))
+        high = int(np.searchsorted(cumulative, 0.99 * cumulative[-1]))
+        if peak - low > high - peak:
+            index = np.arange(low, peak)
+            distance = counts[peak] / (peak - low) * (index - low) - counts[low:peak]
+        elif high > peak:
+            index = np.arange(peak, high)
+            distance = counts[peak] - counts[peak] / (high - peak) * (index - peak) - counts[peak:high]
+        else:
+            return None
+        split = index[np.argmax(distance)] + 1
+        return _bin_centers(edges)[split] if split < counts.size else None
+
 
 class YenThreshold(SitkThreshold):
     __argument_class__ = SimpleITKThresholdParams256
@@ -174,6 +437,20 @@ class YenThreshold(SitkThreshold):
     def calculate_threshold(*args, **kwargs):
         return sitk.YenThreshold(*args)
 
+    @staticmethod
+    def histogram_threshold(counts: np.ndarray, edges: np.ndarray) -> typing.Optional[float]:
+        frequency = counts / counts.sum()
+        cumulative = np.cumsum(frequency)
+        square_back = np.cumsum(frequency**2)
+        square_obj = np.append(np.cumsum(frequency[::-1] ** 2)[::-1][1:], 0)
+        square_product = square_back * square_obj
+        product = cumulative * (1 - cumulative)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            criterion = -np.where(square_product > 0, np.log(square_product), 0) + 2 * np.where(
+                product > 0, np.log(product), 0
+            )
+        return _bin_centers(edges)[np.argmax(criterion)]
+
 
 class HuangThreshold(SitkThreshold):
     __argument_class__ = SimpleITKThresholdParams256
@@ -244,6 +521,26 @@ class MomentsThreshold(SitkThreshold):
     def calculate_threshold(*args, **kwargs):
         return sitk.MomentsThreshold(*args)
 
+    @staticmethod
+    def histogram_threshold(counts: np.ndarray, edges: np.ndarray) -> typing.Optional[float]:
+        # preserve first three moments of histogram
+        frequency = counts / counts.sum()
+        index = np.arange(counts.size, dtype=np.float64)
+        moment1 = np.sum(index * frequency)
+        moment2 = np.sum(index**2 * frequency)
+        moment3 = np.sum(index**3 * frequency)
+        denominator = moment2 - moment1**2
+        coefficient0 = (moment1 * moment3 - moment2**2) / denominator
+        coefficient1 = (moment1 * moment2 - moment3) / denominator
+        delta = np.sqrt(coefficient1**2 - 4 * coefficient0)
+        z0 = (-coefficient1 - delta) / 2
+        z1 = (-coefficient1 + delta) / 2
+        p0 = (z1 - moment1) / (z1 - z0)
+        above = np.cumsum(frequency) > p0
+        if not np.any(above):
+            return None
+        return _bin_centers(edges)[np.argmax(above)]
+
 
 class MultipleOtsuThreshold(BaseThreshold):
     __argument_class__ = MultipleOtsuThresholdParams
@@ -255,9 +552,12 @@ class MultipleOtsuThreshold(BaseThreshold):
         mask: typing.Optional[np.ndarray],
         arguments: MultipleOtsuThresholdParams,
         operator: typing.Callable[[object, object], bool],
+        statistics: typing.Optional[ThresholdStatistics] = None,
     ):
-        cleaned_image_sitk = sitk.GetImageFromArray(data)
-        res = sitk.OtsuMultipleThresholds(cleaned_image_sitk, arguments.components, 0, arguments.bins, arguments.valley)
+        statistics = _statistics_for(statistics, data, mask)
+        res = sitk.OtsuMultipleThresholds(
+            statistics.sitk_image, arguments.components, 0, arguments.bins, arguments.valley
+        )
         res = sitk.GetArrayFromImage(res)
         if operator(1, 0):
             res = (res >= arguments.border_component).astype(np.uint8)
@@ -294,6 +594,76 @@ ThresholdSelection.register(MaximumEntropyThreshold)
 ThresholdSelection.register(MultipleOtsuThreshold)
 
 
+@lru_cache
+def _support_statistics(method: typing.Type[BaseThreshold]) -> bool:
+    return "statistics" in inspect.signature(method.calculate_mask).parameters
+
+
+def apply_threshold(
+    method: typing.Type[BaseThreshold],
+    data: np.ndarray,
+    mask: typing.Optional[np.ndarray],
+    arguments: typing.Union[BaseModel, dict],
+    operator: typing.Callable[[object, object], bool],
+    statistics: typing.Optional[ThresholdStatistics] = None,
+):
+    """
+    Call ``method.calculate_mask`` with shared statistics.
+    Statistics are not passed to methods (for example from plugins) which does not accept them.
+    """
+    if statistics is not None and _support_statistics(method):
+        return method.calculate_mask(data, mask, arguments, operator, statistics=statistics)
+    return method.calculate_mask(data, mask, arguments, operator)
+
+
+def compare_thresholds(
+    data: np.ndarray,
+    mask: typing.Optional[np.ndarray],
+    operator: typing.Callable[[object, object], bool],
+    methods: typing.Optional[typing.Iterable[str]] = None,
+    statistics: typing.Optional[ThresholdStatistics] = None,
+) -> typing.Dict[str, typing.Any]:
+    """
+    Calculate threshold values of multiple methods with their default parameters.
+    Methods calculated from histogram share it, and their values are found in sorted data
+    without creation of masks, so comparison cost is close to cost of single method.
+    Methods which cannot be calculated for given data (raise :py:class:`SegmentationLimitException`) are omitted.
+
+    :param data: array to threshold
+    :param mask: area of interest
+    :param operator: comparison operator which describes foreground
+    :param methods: names of methods from :py:class:`ThresholdSelection`, default all except manual threshold
+    :param statistics: statistics for ``data`` and ``mask``
+    :return: dict from method name to threshold value, same as returned by ``calculate_mask``
+    """
+    statistics = _statistics_for(statistics, data, mask)
+    if methods is None:
+        methods = [name for name in ThresholdSelection.__register__ if name != ManualThreshold.get_name()]
+    result = {}
+    for name in methods:
+        method = ThresholdSelection[name]
+        arguments = method.get_default_values()
+        if issubclass(method, SitkThreshold):
+            split = method.split_value(statistics, arguments)
+            if split is not None:
+                result[name] = _value_after_split(statistics, split, operator)
+                continue
+        try:
+            result[name] = apply_threshold(method, data, mask, arguments, operator, statistics)[1]
+        except SegmentationLimitException:
+            continue
+    return result
+
+
+def _value_after_split(statistics: ThresholdStatistics, split, operator):
+    """Threshold value returned by :py:meth:`SitkThreshold.calculate_mask` for given split value"""
+    values = statistics.sorted_values()
+    position = np.searchsorted(values, split, side="right")
+    if operator(1, 0):
+        return values[position] if position < values.size else np.min(-statistics.data)
+    return values[position - 1] if position > 0 else np.max(-statistics.data)
+
+
 class DoubleThresholdParams(BaseModel):
     core_threshold: ThresholdSelection = ThresholdSelection.get_default()
     base_threshold: ThresholdSelection = ThresholdSelection.get_default()
@@ -310,13 +680,19 @@ class DoubleThreshold(BaseThreshold):
     @classmethod
     @update_argument("arguments")
     def calculate_mask(
-        cls, data: np.ndarray, mask: typing.Optional[np.ndarray], arguments: DoubleThresholdParams, operator
+        cls,
+        data: np.ndarray,
+        mask: typing.Optional[np.ndarray],
+        arguments: DoubleThresholdParams,
+        operator,
+        statistics: typing.Optional[ThresholdStatistics] = None,
     ):
+        statistics = _statistics_for(statistics, data, mask)
         thr: BaseThreshold = ThresholdSelection[arguments.core_threshold.name]
-        mask1, thr_val1 = thr.calculate_mask(data, mask, arguments.core_threshold.values, operator)
+        mask1, thr_val1 = apply_threshold(thr, data, mask, arguments.core_threshold.values, operator, statistics)
 
         thr: BaseThreshold = ThresholdSelection[arguments.base_threshold.name]
-        mask2, thr_val2 = thr.calculate_mask(data, mask, arguments.base_threshold.values, operator)
+        mask2, thr_val2 = apply_threshold(thr, data, mask, arguments.base_threshold.values, operator, statistics)
         mask2[mask2 > 0] = 1
         mask2[mask1 > 0] = 2
         return mask2, (thr_val1, thr_val2)
@@ -343,9 +719,10 @@ class DoubleOtsu(BaseThreshold):
         mask: typing.Optional[np.ndarray],
         arguments: DoubleOtsuParams,
         operator: typing.Callable[[object, object], bool],
+        statistics: typing.Optional[ThresholdStatistics] = None,
     ):
-        cleaned_image_sitk = sitk.GetImageFromArray(data)
-        res = sitk.OtsuMultipleThresholds(cleaned_image_sitk, 2, 0, arguments.bins, arguments.valley)
+        statistics = _statistics_for(statistics, data, mask)
+        res = sitk.OtsuMultipleThresholds(statistics.sitk_image, 2, 0, arguments.bins, arguments.valley)
         res = sitk.GetArrayFromImage(res)
         thr1 = data[res == 2].min()
         thr2 = data[res == 1].min()
@@ -374,9 +751,12 @@ class MultipleOtsu(BaseThreshold):
         mask: typing.Optional[np.ndarray],
         arguments: MultipleOtsuDoubleThresholdParams,
         operator: typing.Callable[[object, object], bool],
+        statistics: typing.Optional[ThresholdStatistics] = None,
     ):
-        cleaned_image_sitk = sitk.GetImageFromArray(data)
-        res = sitk.OtsuMultipleThresholds(cleaned_image_sitk, arguments.components, 0, arguments.bins, arguments.valley)
+        statistics = _statistics_for(statistics, data, mask)
+        res = sitk.OtsuMultipleThresholds(
+            statistics.sitk_image, arguments.components, 0, arguments.bins, arguments.valley
+        )
         res = sitk.GetArrayFromImage(res)
         map_component = np.zeros(arguments.components + 1, dtype=np.uint8)
         map_component[: arguments.lower_component] = 0
@@ -7,6 +7,7 @@ from contextlib import suppress
 import numpy as np
 
 from PartSegImage import Channel
+from PartSegImage.lazy_array import LazyArray
 
 Spacing = typing.Tuple[typing.Union[float, int], ...]
 _IMAGE_DATA = typing.Union[typing.List[np.ndarray], np.ndarray]
@@ -15,6 +16,7 @@ _DEF = object()
 FRAME_THICKNESS = 2
 
 DEFAULT_SCALE_FACTOR = 10**9
+RANGE_SAMPLE_PLANES = 32  #: number of planes used to estimate ranges of memory mapped or lazy loaded channel
 
 
 def minimal_dtype(val: int):
@@ -67,12 +69,15 @@ class Image:
     """
     Base class for Images used in PartSeg
 
-    :param data: 5-dim array with order: time, z, y, x, channel
+    :param data: 5-dim array with order: time, z, y, x, channel. Beside numpy arrays it could be
+        chunked array-like (for example zarr or dask array). Such arrays are wrapped in
+        :py:class:`PartSegImage.lazy_array.LazyArray` and only requested parts are read.
     :param image_spacing: spacing for z, y, x
     :param file_path: path to image on disc
     :param mask: mask array in shape z,y,x
     :param default_coloring: default colormap - not used yet
-    :param ranges: default ranges for channels
+    :param ranges: default ranges for channels. Ranges which are not provided (or are None)
+        are calculated on first use, see :py:attr:`ranges`.
     :param channel_names: labels for channels
     :param axes_order: allow to create Image object form data with different axes order, or missed axes
 
@@ -117,6 +122,7 @@ class Image:
                 stacklevel=2,
             )
             axes_order = self.axis_order
+        data = [self._wrap_array(x) for x in data] if isinstance(data, list) else self._wrap_array(data)
         if (isinstance(data, list) and any(x.ndim + 1 != len(axes_order) for x in data)) or (
             not isinstance(data, list) and data.ndim != len(axes_order)
         ):
@@ -143,16 +149,162 @@ class Image:
             self.default_coloring = [np.array(x) for x in default_coloring]
 
         self._channel_names = self._prepare_channel_names(channel_names, self.channels)
-        if ranges is None:
-            self.ranges = list(
-                zip((np.min(c) for c in self._channel_arrays), (np.max(c) for c in self._channel_arrays))
-            )
-        else:
-            self.ranges = ranges
+        self._statistics: typing.Dict[typing.Tuple[int, typing.Hashable], typing.Any] = {}
+        self.ranges = ranges
         self._mask_array = self._prepare_mask(mask, data, axes_order)
         if self._mask_array is not None:
             self._mask_array = self.fit_mask_to_image(self._mask_array)
 
+    @classmethod
+    def from_channels(
+        cls,
+        channels: typing.Sequence[np.ndarray],
+        image_spacing: Spacing,
+        axes_order: str,
+        channel_names=None,
+        ranges=None,
+        **kwargs,
+    ) -> "Image":
+        """
+        Create multichannel image from separate channel arrays. In opposite to constructor,
+        arrays are not copied and their dtype is not unified, so channels are views of passed arrays
+        (:py:attr:`dtype` of image is common type of channels).
+
+        :param channels: data of channels, each with axes described by ``axes_order``
+        :param image_spacing: spacing of image
+        :param axes_order: axes of each channel array (without ``C``)
+        :param channel_names: names of channels
+        :param ranges: minimum and maximum of each channel (for example contrast limits range from viewer).
+            Ranges which are not provided (or are None) are calculated on first use.
+        :param kwargs: other arguments of constructor
+        """
+        if not channels:
+            raise ValueError("At least one channel is required")
+        if "C" in axes_order:
+            raise ValueError(f"Channel arrays cannot have channel axis (axes_order: {axes_order})")
+        if ranges is not None and len(ranges) != len(channels):
+            raise ValueError(f"Number of ranges ({len(ranges)}) is different than number of channels ({len(channels)})")
+        array_axis_order = cls.axis_order.replace("C", "")
+        arrays = [cls._reorder_axes(cls._wrap_array(x), axes_order, array_axis_order) for x in channels]
+        if any(x.shape != arrays[0].shape for x in arrays):
+            raise ValueError(f"Channels have different shapes: {[x.shape for x in arrays]}")
+        # single channel image keeps view of array, so it is used to prepare all metadata
+        image = cls(arrays[0], image_spacing, axes_order=array_axis_order, **kwargs)
+        image._channel_arrays = arrays
+        image._channel_names = cls._prepare_channel_names(channel_names, len(arrays))
+        image.ranges = ranges
+        return image
+
+    @property
+    def ranges(self) -> typing.List[typing.Tuple[typing.Any, typing.Any]]:
+        """
+        Minimum and maximum of each channel. Ranges which were not provided on image creation
+        are calculated on first use and cached.
+        """
+        return [
+            self._channel_statistic(i, "range", self._calculate_channel_range) if range_ is None else range_
+            for i, range_ in enumerate(self._ranges)
+        ]
+
+    @ranges.setter
+    def ranges(self, value):
+        value = [] if value is None else [None if x is None else tuple(x) for x in value]
+        missing = [None] * (self.channels - len(value))
+        self._ranges: typing.List[typing.Optional[typing.Tuple[typing.Any, typing.Any]]] = (
+            value[: self.channels] + missing
+        )
+
+    def _known_ranges(self) -> typing.List[typing.Optional[typing.Tuple[typing.Any, typing.Any]]]:
+        """Ranges provided or already calculated, None for ranges which are not calculated yet"""
+        return [
+            self._statistics.get((i, "range")) if range_ is None else range_ for i, range_ in enumerate(self._ranges)
+        ]
+
+    def _channel_statistic(
+        self, index: int, name: typing.Hashable, calculate: typing.Callable[[typing.Any], typing.Any]
+    ):
+        key = (index, name)
+        if key not in self._statistics:
+            self._statistics[key] = calculate(self._channel_arrays[index])
+        return self._statistics[key]
+
+    def _copy_statistics(self, image: "Image", channels_map: typing.Dict[int, int]):
+        """
+        Copy cached statistics of channels with same values from other image.
+
+        :param image: source image
+        :param channels_map: mapping from channel of this image to channel of source image
+        """
+        for (index, name), value in image._statistics.items():
+            for new_index, old_index in channels_map.items():
+                if old_index == index:
+                    self._statistics.setdefault((new_index, name), value)
+
+    def _channel_index(self, num: typing.Union[int, str, Channel]) -> int:
+        if isinstance(num, Channel):
+            num = num.value
+        if isinstance(num, str):
+            return self.channel_names.index(num)
+        return int(num)
+
+    def get_channel_histogram(
+        self, num: typing.Union[int, str, Channel], bins: int = 256
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Histogram of channel. It is calculated on first use and cached.
+
+        :param num: channel number or name
+        :param bins: number of bins, spread evenly between minimum and maximum of channel
+        :return: counts and bins edges, like :py:func:`numpy.histogram`
+        """
+        return self._channel_statistic(
+            self._channel_index(num), ("histogram", bins), lambda x: np.histogram(np.asarray(x), bins=bins)
+        )
+
+    def get_channel_mean_std(self, num: typing.Union[int, str, Channel]) -> typing.Tuple[float, float]:
+        """
+        Mean and standard deviation of channel. They are calculated on first use and cached.
+
+        :param num: channel number or name
+        """
+        return self._channel_statistic(self._channel_index(num), "mean_std", self._calculate_mean_std)
+
+    @staticmethod
+    def _calculate_mean_std(array) -> typing.Tuple[float, float]:
+        array = np.asarray(array)
+        return float(np.mean(array, dtype=np.float64)), float(np.std(array, dtype=np.float64))
+
+    @staticmethod
+    def _wrap_array(array) -> typing.Union[np.ndarray, LazyArray]:
+        """Wrap array-like objects which are not numpy arrays to read only requested data"""
+        if isinstance(array, (np.ndarray, LazyArray)):
+            return array
+        if all(hasattr(array, x) for x in ("shape", "dtype", "__getitem__")):
+            return LazyArray(array)
+        return np.asarray(array)
+
+    @classmethod
+    def _calculate_channel_range(cls, array) -> typing.Tuple[typing.Any, typing.Any]:
+        """
+        Calculate minimum and maximum of channel. For arrays which are not loaded in memory
+        (like :py:class:`numpy.memmap` or :py:class:`PartSegImage.lazy_array.LazyArray`)
+        ranges are estimated from :py:data:`RANGE_SAMPLE_PLANES` evenly distributed planes.
+        """
+        if type(array) is np.ndarray:  # pylint: disable=unidiomatic-typecheck
+            return np.min(array), np.max(array)
+        planes_axes = [cls.array_axis_order.index(x) for x in "TZ" if x in cls.array_axis_order]
+        planes_shape = [array.shape[x] for x in planes_axes]
+        planes_num = int(np.prod(planes_shape))
+        min_val, max_val = None, None
+        for plane in np.unique(np.linspace(0, planes_num - 1, min(planes_num, RANGE_SAMPLE_PLANES), dtype=np.int64)):
+            slices: typing.List[typing.Union[int, slice]] = [slice(None)] * array.ndim
+            for axis, val in zip(planes_axes, np.unravel_index(plane, planes_shape)):
+                slices[axis] = int(val)
+            data = np.asarray(array[tuple(slices)])
+            min_val = np.min(data) if min_val is None else min(min_val, np.min(data))
+            max_val = np.max(data) if max_val is None else max(max_val, np.max(data))
+        return min_val, max_val
+
     @classmethod
     def _prepare_mask(cls, mask, data, axes_order) -> typing.Optional[np.ndarray]:
         if mask is None:
@@ -187,14 +339,14 @@ class Image:
         if isinstance(data, list) and not axes_order.startswith("C"):  # pragma: no cover
             raise ValueError("When passing data as list of numpy arrays then Channel must be first axis.")
         if "C" not in axes_order:
-            assert isinstance(data, np.ndarray)  # nosec
+            assert not isinstance(data, list)  # nosec
             return [cls.reorder_axes(data, axes_order)]
         if axes_order.startswith("C"):
             if isinstance(data, list):
-                dtype = np.result_type(*data)
-                return [cls.reorder_axes(x, axes_order[1:]).astype(dtype) for x in data]
-            return [cls.reorder_axes(x, axes_order[1:]) for x in data]
-        assert isinstance(data, np.ndarray)  # nosec
+                dtype = np.result_type(*[x.dtype for x in data])
+                return [cls._astype(cls.reorder_axes(x, axes_order[1:]), dtype) for x in data]
+            return [cls.reorder_axes(data[i], axes_order[1:]) for i in range(data.shape[0])]
+        assert not isinstance(data, list)  # nosec
         pos: typing.List[typing.Union[slice, int]] = [slice(None) for _ in range(data.ndim)]
         c_pos = axes_order.index("C")
         res = []
@@ -203,6 +355,13 @@ class Image:
             res.append(cls.reorder_axes(data[tuple(pos)], axes_order.replace("C", "")))
         return res
 
+    @staticmethod
+    def _astype(array, dtype):
+        """Change dtype of channel array. Read only arrays of proper type are not copied."""
+        if type(array) is np.ndarray or array.dtype != dtype:  # pylint: disable=unidiomatic-typecheck
+            return array.astype(dtype)
+        return array
+
     @staticmethod
     def _merge_channel_names(
         base_channel_names: typing.List[str], new_channel_names: typing.List[str]
@@ -239,17 +398,25 @@ class Image:
                 self._channel_arrays + [self.reorder_axes(x, image.array_axis_order) for x in image._channel_arrays]
             )
             channel_names = self._merge_channel_names(self.channel_names, image.channel_names)
-        else:
-            index = self.array_axis_order.index(axis)
-            data = self._image_data_normalize(
-                [
-                    np.concatenate((y, self.reorder_axes(y, image.array_axis_order)), axis=index)
-                    for x, y in zip(self._channel_arrays, image._channel_arrays)
-                ]
+            res = self.substitute(
+                data=data, ranges=self._known_ranges() + image._known_ranges(), channel_names=channel_names
             )
-            channel_names = self.channel_names
-
-        return self.substitute(data=data, ranges=self.ranges + image.ranges, channel_names=channel_names)
+            res._copy_statistics(self, {i: i for i in range(self.channels)})
+            res._copy_statistics(image, {i + self.channels: i for i in range(image.channels)})
+            return res
+        index = self.array_axis_order.index(axis)
+        data = self._image_data_normalize(
+            [
+                np.concatenate((y, self.reorder_axes(y, image.array_axis_order)), axis=index)
+                for x, y in zip(self._channel_arrays, image._channel_arrays)
+            ]
+        )
+        # range of concatenated channels is known if ranges of both parts are known
+        ranges = [
+            None if x is None or y is None else (min(x[0], y[0]), max(x[1], y[1]))
+            for x, y in zip(self._known_ranges(), image._known_ranges())
+        ]
+        return self.substitute(data=data, ranges=ranges)
 
     @property
     def channel_names(self) -> typing.List[str]:
@@ -284,7 +451,9 @@ class Image:
     @property
     def dtype(self) -> np.dtype:
         """dtype of image array"""
-        return self._channel_arrays[0].dtype
+        if len(self._channel_arrays) == 1:
+            return self._channel_arrays[0].dtype
+        return np.result_type(*[x.dtype for x in self._channel_arrays])
 
     @staticmethod
     def _reorder_axes(array: np.ndarray, input_axes: str, return_axes) -> np.ndarray:
@@ -312,7 +481,7 @@ class Image:
 
     def get_dimension_number(self) -> int:
         """return number of nontrivial dimensions"""
-        return np.squeeze(self._channel_arrays[0]).ndim
+        return sum(x > 1 for x in self._channel_arrays[0].shape)
 
     def get_dimension_letters(self) -> str:
         """
@@ -330,15 +499,19 @@ class Image:
         ranges=None,
         channel_names=None,
     ) -> "Image":
-        """Create copy of image with substitution of not None elements"""
+        """
+        Create copy of image with substitution of not None elements.
+        Cached statistics (like calculated ranges) are kept only if ``data`` is not changed.
+        """
+        same_data = data is None
         data = self._channel_arrays if data is None else data
         image_spacing = self._image_spacing if image_spacing is None else image_spacing
         file_path = self.file_path if file_path is None else file_path
         mask = self._mask_array if mask is _DEF else mask
         default_coloring = self.default_coloring if default_coloring is None else default_coloring
-        ranges = self.ranges if ranges is None else ranges
+        ranges = self._ranges if ranges is None else ranges
         channel_names = self.channel_names if channel_names is None else channel_names
-        return self.__class__(
+        res = self.__class__(
             data=data,
             image_spacing=image_spacing,
             file_path=file_path,
@@ -348,6 +521,9 @@ class Image:
             channel_names=channel_names,
             axes_order=self.axis_order,
         )
+        if same_data:
+            res._copy_statistics(self, {i: i for i in range(self.channels)})
+        return res
 
     def set_mask(self, mask: typing.Optional[np.ndarray], axes: typing.Optional[str] = None):
         """
@@ -478,7 +654,10 @@ class Image:
         For example my be used to convert time image in 3d image.
         """
         image_array_list = [np.swapaxes(x, self.time_pos, self.stack_pos) for x in self._channel_arrays]
-        return self.substitute(data=self._image_data_normalize(image_array_list))
+        res = self.substitute(data=self._image_data_normalize(image_array_list))
+        # values are not changed, so statistics are still valid
+        res._copy_statistics(self, {i: i for i in range(self.channels)})
+        return res
 
     @classmethod
     def get_axis_positions(cls) -> typing.Dict[str, int]:
@@ -529,7 +708,7 @@ class Image:
         if isinstance(channel, str):
             channel = self._channel_names.index(channel)
         if isinstance(channel, int):
-            return self._channel_arrays[channel][slices_t]
+            return np.asarray(self._channel_arrays[channel][slices_t])
         return np.stack([x[slices_t] for x in self._channel_arrays[channel]], axis=axis_order.index("C"))
 
     def clip_array(self, array: np.ndarray, **kwargs: typing.Union[int, slice]) -> np.ndarray:
@@ -652,7 +831,7 @@ class Image:
     ) -> typing.Tuple[typing.List[np.ndarray], typing.Optional[np.ndarray]]:
         new_mask = None
         cut_area = self._frame_cut_area(cut_area, frame)
-        new_image = [x[tuple(cut_area)] for x in self._channel_arrays]
+        new_image = [np.asarray(x[tuple(cut_area)]) for x in self._channel_arrays]
         if self._mask_array is not None:
             new_mask = self._mask_array[tuple(cut_area)]
         return new_image, new_mask
@@ -701,6 +880,9 @@ class Image:
         :param int frame: additional frame around cut_area
         :param bool zero_out_cut_area:
         :return: Image
+
+        Ranges known by this image are kept. Other statistics are not calculated
+        for cut image until they are requested.
         """
         if isinstance(cut_area, np.ndarray):
             if zero_out_cut_area:
@@ -719,7 +901,7 @@ class Image:
             file_path=None,
             mask=new_mask,
             default_coloring=self.default_coloring,
-            ranges=self.ranges,
+            ranges=self._known_ranges(),
             channel_names=self.channel_names,
             axes_order=self.axis_order,
         )
@@ -772,7 +954,7 @@ class Image:
 
     def get_ranges(self) -> typing.List[typing.Tuple[float, float]]:
         """image brightness ranges for each channel"""
-        return self.ranges[:]
+        return self.ranges
 
     def __str__(self):
         return (
@@ -13,6 +13,7 @@ from defusedxml import ElementTree
 from oiffile import OifFile
 
 from PartSegImage.image import Image
+from PartSegImage.lazy_array import LazyArray, TiffPagesArray
 
 INCOMPATIBLE_IMAGE_MASK = "Incompatible shape of mask and image"
 
@@ -135,7 +136,7 @@ class BaseImageReader:
         if len(final_mapping) != len(set(final_mapping)):
             raise NotImplementedError("Data type not supported. Please contact with author for update code")
         if len(array.shape) < len(cls.return_order()):
-            array = np.reshape(array, array.shape + (1,) * (len(cls.return_order()) - len(array.shape)))
+            array = array.reshape(array.shape + (1,) * (len(cls.return_order()) - len(array.shape)))
 
         array = np.moveaxis(array, list(range(len(axes_li))), final_mapping)
         return array
@@ -326,18 +327,65 @@ class TiffImageReader(BaseImageReaderBuffer):
     """
     TIFF/LSM files reader. Base reading with :py:meth:`BaseImageReader.read_image`
 
+    In lazy mode image data is not loaded to memory. Uncompressed contiguous data are
+    memory mapped (:py:func:`tifffile.memmap`), other files are wrapped in
+    :py:class:`PartSegImage.lazy_array.LazyArray` which decode only requested pages.
+    Lazy mode is used only when image is read from file path.
+
     image_file: tifffile.TiffFile
     mask_file: tifffile.TiffFile
+
+    :param callback_function: function for provide information about progress in reading file
+    :param bool lazy: if image data should be loaded on demand
     """
 
-    def __init__(self, callback_function=None):
+    def __init__(self, callback_function=None, lazy: bool = False):
         super().__init__(callback_function)
+        self.lazy = lazy
         self.colors = None
         self.channel_names = None
         self.ranges = None
         self.shift = (0, 0, 0)
         self.name = ""
 
+    @classmethod
+    def read_image(
+        cls,
+        image_path: typing.Union[str, Path, BytesIO],
+        mask_path=None,
+        callback_function: typing.Optional[typing.Callable] = None,
+        default_spacing: typing.Optional[typing.Tuple[float, float, float]] = None,
+        lazy: bool = False,
+    ) -> Image:
+        """
+        read image file with optional mask file
+
+        :param image_path: path or opened file contains image
+        :param mask_path:
+        :param callback_function: function for provide information about progress in reading file (for progressbar)
+        :param default_spacing: used if file do not contains information about spacing
+            (or metadata format is not supported)
+        :param lazy: if image data should be loaded on demand (memory mapped or decoded per page)
+        :return: image
+        """
+        instance = cls(callback_function, lazy=lazy)
+        if default_spacing is not None:
+            instance.set_default_spacing(default_spacing)
+        return instance.read(image_path, mask_path)
+
+    @staticmethod
+    def read_lazy_data(image_path: typing.Union[str, Path]) -> typing.Union[np.memmap, LazyArray]:
+        """
+        Access data of first series without loading it to memory.
+
+        :param image_path: path to tiff file
+        :raises ValueError: if data cannot be accessed lazily
+        :return: memory mapped array if data are uncompressed and contiguous, lazy array otherwise
+        """
+        with suppress(ValueError):
+            return tifffile.memmap(image_path, mode="r")
+        return LazyArray(TiffPagesArray(image_path))
+
     def read(self, image_path: typing.Union[str, BytesIO, Path], mask_path=None, ext=None) -> Image:
         """
         Read tiff image from tiff_file
@@ -382,11 +430,17 @@ class TiffImageReader(BaseImageReaderBuffer):
                 mask_data = None
                 self.callback_function("max", total_pages_num)
 
-            image_file.report_func = report_func
-            try:
-                image_data = image_file.asarray()
-            except ValueError as e:  # pragma: no cover
-                raise TiffFileException(*e.args) from e
+            image_data = None
+            if self.lazy and isinstance(image_path, (str, Path)):
+                with suppress(ValueError):
+                    image_data = self.read_lazy_data(image_path)
+                    self.callback_function("step", total_pages_num)
+            if image_data is None:
+                image_file.report_func = report_func
+                try:
+                    image_data = image_file.asarray()
+                except ValueError as e:  # pragma: no cover
+                    raise TiffFileException(*e.args) from e
             image_data = self.update_array_shape(image_data, axes)
 
         if not isinstance(image_path, (str, Path)):
@@ -5,7 +5,7 @@ from itertools import product
 from pathlib import Path
 
 import numpy as np
-from tifffile import imwrite
+from tifffile import TiffWriter, imwrite
 
 from PartSegImage.image import Image, minimal_dtype
 
@@ -61,6 +61,29 @@ class ImageWriter(BaseImageWriter):
 
         return metadata
 
+    @classmethod
+    def _image_data(cls, image: Image) -> typing.Tuple[np.ndarray, dict]:
+        metadata = cls.prepare_metadata(image, image.channels)
+        metadata["Channel"] = {
+            "Name": image.channel_names,
+            "axes": "TZYXC",
+        }
+        return image.get_image_for_save(), metadata
+
+    @classmethod
+    def _mask_data(cls, image: Image) -> typing.Tuple[typing.Optional[np.ndarray], dict]:
+        mask = image.get_mask_for_save()
+        if mask is None:
+            return None, {}
+        mask_max = np.max(mask)
+        mask = mask.astype(minimal_dtype(mask_max))
+        metadata = cls.prepare_metadata(image, 1)
+        metadata["Channel"] = {
+            "Name": "Mask",
+            "axes": "TZYX",
+        }
+        return mask, metadata
+
     @classmethod
     def save(cls, image: Image, save_path: typing.Union[str, BytesIO, Path], compression="ADOBE_DEFLATE"):
         """
@@ -69,14 +92,7 @@ class ImageWriter(BaseImageWriter):
         :param image: image for save
         :param save_path: save location
         """
-        data = image.get_image_for_save()
-
-        metadata = cls.prepare_metadata(image, image.channels)
-
-        metadata["Channel"] = {
-            "Name": image.channel_names,
-            "axes": "TZYXC",
-        }
+        data, metadata = cls._image_data(image)
         cls._save(data, save_path, metadata, compression)
 
     @classmethod
@@ -87,18 +103,45 @@ class ImageWriter(BaseImageWriter):
         :param image: mast is obtain with :py:meth:`.Image.get_mask_for_save`
         :param save_path: save location
         """
-        mask = image.get_mask_for_save()
+        mask, metadata = cls._mask_data(image)
         if mask is None:
             return
-        mask_max = np.max(mask)
-        mask = mask.astype(minimal_dtype(mask_max))
-        metadata = cls.prepare_metadata(image, 1)
-        metadata["Channel"] = {
-            "Name": "Mask",
-            "axes": "TZYX",
-        }
         cls._save(mask, save_path, metadata, compression)
 
+    @classmethod
+    def save_bundle(
+        cls,
+        images: typing.Iterable[typing.Tuple[str, Image]],
+        save_path: typing.Union[str, BytesIO, Path],
+        compression="ADOBE_DEFLATE",
+    ) -> typing.List[typing.Tuple[int, typing.Optional[int]]]:
+        """
+        Save multiple images as series of single OME TIFF file.
+        For each image series with its data is written followed by series with its mask (if image has mask).
+        Images are consumed one by one, so they could be produced lazily.
+
+        :param images: pairs of series name and image
+        :param save_path: save location
+        :return: for each image index of series with image data and index of series with mask (or None)
+        """
+        res = []
+        series = 0
+        with TiffWriter(save_path, ome=True) as writer:
+            for name, image in images:
+                data, metadata = cls._image_data(image)
+                metadata["Name"] = name
+                writer.write(data, software="PartSeg", metadata=metadata, compression=compression)
+                mask, metadata = cls._mask_data(image)
+                if mask is None:
+                    res.append((series, None))
+                    series += 1
+                    continue
+                metadata["Name"] = f"{name}_mask"
+                writer.write(mask, software="PartSeg", metadata=metadata, compression=compression)
+                res.append((series, series + 1))
+                series += 2
+        return res
+
     @staticmethod
     def _save(data: np.ndarray, save_path, metadata=None, compression="ADOBE_DEFLATE"):
         # TODO change to ome TIFF
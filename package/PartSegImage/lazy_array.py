@@ -0,0 +1,254 @@
+"""
+Read only array-like objects which postpone reading of data until it is needed.
+
+:py:class:`LazyArray` is a view on any object which has ``shape``, ``dtype`` and which
+could be indexed with tuple of integers and slices (like :py:class:`numpy.memmap`,
+:py:class:`TiffPagesArray` or zarr arrays). Indexing and reordering of axes of
+:py:class:`LazyArray` produce new views without reading data.
+Data is read by :py:func:`numpy.asarray`.
+"""
+import itertools
+import threading
+import typing
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import tifffile
+
+__all__ = ("LazyArray", "TiffPagesArray", "normalize_key")
+
+_Index = typing.Union[int, range]
+
+
+def normalize_key(key, ndim: int) -> typing.Optional[typing.Tuple[typing.Union[int, slice], ...]]:
+    """
+    Expand ``key`` to tuple of length ``ndim``. Return None if key contains
+    elements other than integers, slices and Ellipsis.
+    """
+    if not isinstance(key, tuple):
+        key = (key,)
+    if any(not isinstance(x, (int, np.integer, slice)) and x is not Ellipsis for x in key):
+        return None
+    if sum(x is Ellipsis for x in key) > 1:  # pragma: no cover
+        raise IndexError("an index can only have a single ellipsis ('...')")
+    if Ellipsis in key:
+        pos = key.index(Ellipsis)
+        key = key[:pos] + (slice(None),) * (ndim - len(key) + 1) + key[pos + 1 :]
+    if len(key) > ndim:
+        raise IndexError(f"too many indices for array: array is {ndim}-dimensional, but {len(key)} were indexed")
+    return key + (slice(None),) * (ndim - len(key))
+
+
+class LazyArray:
+    """
+    Read only view on array-like source.
+
+    :param source: object with ``shape``, ``dtype`` and ``__getitem__``
+        accepting tuple of integers and slices.
+    """
+
+    def __init__(
+        self,
+        source,
+        index: typing.Optional[typing.Sequence[_Index]] = None,
+        axes: typing.Optional[typing.Sequence[typing.Optional[int]]] = None,
+    ):
+        self.source = source
+        self._index: typing.Tuple[_Index, ...] = (
+            tuple(range(x) for x in source.shape) if index is None else tuple(index)
+        )
+        # position in source for each axis of view, None for inserted axis of size 1
+        self._axes: typing.Tuple[typing.Optional[int], ...] = (
+            tuple(i for i, x in enumerate(self._index) if isinstance(x, range)) if axes is None else tuple(axes)
+        )
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(self.source.dtype)
+
+    @property
+    def shape(self) -> typing.Tuple[int, ...]:
+        return tuple(1 if x is None else len(self._index[x]) for x in self._axes)
+
+    @property
+    def ndim(self) -> int:
+        return len(self._axes)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f"LazyArray(shape={self.shape}, dtype={self.dtype}, source={type(self.source).__name__})"
+
+    def __getitem__(self, key):
+        norm_key = normalize_key(key, self.ndim)
+        if norm_key is None:
+            return np.asarray(self)[key]
+        index = list(self._index)
+        axes = []
+        for axis, sub_key in zip(self._axes, norm_key):
+            if axis is None:
+                selected = range(1)[sub_key]
+                if isinstance(selected, range):
+                    if len(selected) != 1:
+                        return np.asarray(self)[key]
+                    axes.append(None)
+                continue
+            selected = index[axis][sub_key]
+            if isinstance(selected, range):
+                if selected.step < 0:
+                    return np.asarray(self)[key]
+                axes.append(axis)
+            index[axis] = selected
+        return LazyArray(self.source, index, axes)
+
+    def transpose(self, *axes):
+        if not axes or axes == (None,):
+            axes = tuple(range(self.ndim))[::-1]
+        elif len(axes) == 1 and not isinstance(axes[0], (int, np.integer)):
+            axes = tuple(axes[0])
+        if sorted(axes) != list(range(self.ndim)):
+            raise ValueError("axes don't match array")
+        return LazyArray(self.source, self._index, [self._axes[i] for i in axes])
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def swapaxes(self, axis1: int, axis2: int):
+        axes = list(range(self.ndim))
+        axes[axis1], axes[axis2] = axes[axis2], axes[axis1]
+        return self.transpose(axes)
+
+    def take(self, indices, axis=None):
+        if axis is None or not isinstance(indices, (int, np.integer)):
+            return np.asarray(self).take(indices, axis=axis)
+        return self[(slice(None),) * (axis % self.ndim) + (indices,)]
+
+    def reshape(self, *shape, order="C"):
+        """Only adding or removing axes of length 1 is supported without reading data"""
+        if len(shape) == 1 and not isinstance(shape[0], (int, np.integer)):
+            shape = tuple(shape[0])
+        if tuple(shape) == self.shape:
+            return self
+        if -1 in shape or [x for x in shape if x != 1] != [x for x in self.shape if x != 1]:
+            return np.asarray(self).reshape(shape, order=order)
+        index = list(self._index)
+        old_axes = [x for x, size in zip(self._axes, self.shape) if size != 1]
+        for axis, size in zip(self._axes, self.shape):
+            if size == 1 and axis is not None:
+                index[axis] = index[axis][0]
+        old_iter = iter(old_axes)
+        axes = [None if size == 1 else next(old_iter) for size in shape]
+        return LazyArray(self.source, index, axes)
+
+    def squeeze(self, axis=None):
+        if axis is None:
+            axis = tuple(i for i, x in enumerate(self.shape) if x == 1)
+        elif isinstance(axis, (int, np.integer)):
+            axis = (axis,)
+        return self[tuple(0 if i in axis else slice(None) for i in range(self.ndim))]
+
+    def astype(self, dtype, copy=True):
+        return np.asarray(self).astype(dtype, copy=copy)
+
+    def __array__(self, dtype=None, copy=None):
+        key = tuple(x if isinstance(x, int) else slice(x.start, x.stop, x.step) for x in self._index)
+        if any(isinstance(x, range) and len(x) == 0 for x in self._index):
+            data = np.empty([len(x) for x in self._index if isinstance(x, range)], dtype=self.dtype)
+        else:
+            data = np.asarray(self.source[key])
+        source_axes = [i for i, x in enumerate(self._index) if isinstance(x, range)]
+        order = [source_axes.index(x) for x in self._axes if x is not None]
+        data = data.transpose(order).reshape(self.shape)
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return data
+
+
+class TiffPagesArray:
+    """
+    Array-like access to series of TIFF file which decode only requested pages.
+    Recently used pages are cached. File is closed by :py:meth:`close` or when object is garbage collected.
+
+    :param file_path: path to TIFF file
+    :param series: index of series in file
+    :param cache_size: maximum number of cached pages
+    :raises ValueError: if pages of series could not be mapped on series shape
+    """
+
+    def __init__(self, file_path: str, series: int = 0, cache_size: int = 64):
+        self.file_path = str(file_path)
+        self.series_index = series
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._tiff_file = tifffile.TiffFile(self.file_path)
+        self._finalizer = weakref.finalize(self, self._tiff_file.close)
+        try:
+            self._series = self._tiff_file.series[series]
+            self.shape: typing.Tuple[int, ...] = tuple(self._series.shape)
+            self.dtype = np.dtype(self._series.dtype)
+            self.axes: str = self._series.axes
+            self._pages = self._series.pages
+            self.page_shape: typing.Tuple[int, ...] = tuple(self._pages[0].shape)
+            page_ndim = len(self.page_shape)
+            if page_ndim > len(self.shape) or self.shape[len(self.shape) - page_ndim :] != self.page_shape:
+                raise ValueError(f"Pages of shape {self.page_shape} do not fit series shape {self.shape}")
+            self.pages_shape = self.shape[: len(self.shape) - page_ndim]
+            if int(np.prod(self.pages_shape)) != len(self._pages):
+                raise ValueError(f"Number of pages {len(self._pages)} does not fit series shape {self.shape}")
+        except Exception:
+            self._finalizer()
+            raise
+        self._cache: typing.MutableMapping[int, np.ndarray] = OrderedDict()
+
+    def get_page(self, num: int) -> np.ndarray:
+        """Decoded page of series. Recently used pages are returned from cache."""
+        with self._lock:
+            if num in self._cache:
+                self._cache.move_to_end(num)
+                return self._cache[num]
+            page = self._pages[num].asarray().reshape(self.page_shape)
+            self._cache[num] = page
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return page
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def __getitem__(self, key):
+        norm_key = normalize_key(key, self.ndim)
+        if norm_key is None:  # pragma: no cover
+            raise IndexError("Only integers and slices are supported")
+        pages_key = norm_key[: len(self.pages_shape)]
+        page_key = norm_key[len(self.pages_shape) :]
+        pages_index = [range(size)[x] for x, size in zip(pages_key, self.pages_shape)]
+        pages_ranges = [x if isinstance(x, range) else range(x, x + 1) for x in pages_index]
+        page_result_shape = np.broadcast_to(np.uint8(0), self.page_shape)[page_key].shape
+        result = np.empty([len(x) for x in pages_ranges] + list(page_result_shape), dtype=self.dtype)
+        for position, pages_position in zip(
+            itertools.product(*(range(len(x)) for x in pages_ranges)), itertools.product(*pages_ranges)
+        ):
+            page_num = int(np.ravel_multi_index(pages_position, self.pages_shape)) if self.pages_shape else 0
+            result[position] = self.get_page(page_num)[page_key]
+        return result.reshape([len(x) for x in pages_index if isinstance(x, range)] + list(page_result_shape))
+
+    def close(self):
+        self._finalizer()
+
+    def __getstate__(self):
+        return {"file_path": self.file_path, "series": self.series_index, "cache_size": self.cache_size}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
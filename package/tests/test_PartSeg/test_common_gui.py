@@ -106,6 +106,7 @@ from PartSegCore.algorithm_describe_base import (
 )
 from PartSegCore.analysis import AnalysisAlgorithmSelection
 from PartSegCore.analysis.calculation_plan import MaskSuffix
+from PartSegCore.analysis.io_utils import ProjectTuple
 from PartSegCore.analysis.load_functions import LoadProject, LoadStackImage, load_dict
 from PartSegCore.analysis.save_functions import SaveAsTiff, SaveProject, save_dict
 from PartSegCore.image_operations import RadiusType
@@ -580,6 +581,28 @@ class TestMultipleFileWidget:
         part_settings.load()
         assert part_settings.get_last_files_multiple() == file_list
 
+    def test_state_store(self, part_settings, qtbot, monkeypatch):
+        widget = MultipleFileWidget(part_settings, {})
+        qtbot.add_widget(widget)
+        widget.state_dict.max_memory = 1
+        images = [
+            Image(np.full((10, 10), i, dtype=np.uint8), image_spacing=(1, 1), axes_order="XY", file_path=f"img_{i}.tif")
+            for i in range(3)
+        ]
+        widget.add_states([ProjectTuple(x.file_path, x) for x in images])
+        assert widget.file_view.topLevelItemCount() == 3
+        widget.state_dict.wait()
+        assert widget.state_dict.is_spilled(("img_0.tif", "raw image"))
+        assert not widget.state_dict.is_spilled(("img_2.tif", "raw image"))
+        loaded = []
+        monkeypatch.setattr(part_settings, "set_project_info", loaded.append)
+        widget.load_state(widget.file_view.topLevelItem(0).child(0))
+        assert np.all(loaded[0].image.get_channel(0) == 0)
+        assert not widget.state_dict.is_spilled(("img_0.tif", "raw image"))
+        qtbot.waitUntil(lambda: not widget.state_dict.is_spilled(("img_1.tif", "raw image")))
+        widget.forget_action(widget.file_view.topLevelItem(2))
+        assert len(widget.state_dict) == 2
+
 
 class TestBaseMainWindow:
     def test_create(self, tmp_path, qtbot):
@@ -21,7 +21,8 @@ from PartSeg.common_gui.napari_image_view import (
     _calc_layer_filter,
     _print_dict,
 )
-from PartSegCore.image_operations import NoiseFilterType
+from PartSegCore.image_operations import FilteredArray, NoiseFilterType
+from PartSegCore.image_pyramid import build_pyramid
 from PartSegCore.roi_info import ROIInfo
 from PartSegImage import Image
 
@@ -341,6 +342,35 @@ class TestImageView:
         qtbot.wait(50)
 
 
+def test_big_image_multiscale(base_settings, image_view, monkeypatch, qtbot):
+    data = np.zeros((1, 1, 4200, 40), dtype=np.uint8)
+    data[..., 100:200, 10:20] = 1
+    base_settings.image = Image(data, (1, 1, 1), axes_order="TZYX")
+    layer = image_view.viewer.layers[0]
+    assert layer.multiscale
+    assert len(layer.data) == 4
+    roi = (data > 0).astype(np.uint8)
+    base_settings.roi = roi
+    base_settings.mask = roi
+    roi_layer = image_view.viewer.layers["ROI"]
+    assert roi_layer.multiscale
+    assert len(roi_layer.data) == 4
+    assert image_view.viewer.layers["Mask"].multiscale
+    qtbot.waitUntil(lambda: not image_view.worker_list)
+    roi_layer = image_view.viewer.layers["ROI"]
+    assert not np.shares_memory(roi_layer.data[1], roi_layer.data[0])
+    base_settings.roi = roi.copy()
+    qtbot.waitUntil(lambda: not image_view.worker_list)
+    roi_layer = image_view.viewer.layers["ROI"]
+    assert roi_layer is image_view.image_info[base_settings.image.file_path].roi
+    assert not np.shares_memory(roi_layer.data[1], roi_layer.data[0])
+    levels = build_pyramid(roi_layer.data[0], labels=True)
+    assert all(np.array_equal(x, y) for x, y in zip(roi_layer.data, levels))
+    monkeypatch.setattr(image_view, "_coordinates", lambda: (0, 0, 150, 15))
+    image_view.print_info()
+    assert image_view.components == [1]
+
+
 def test_search_component_modal(qtbot, image_view, monkeypatch):
     monkeypatch.setattr(image_view, "component_mark", MagicMock())
     monkeypatch.setattr(image_view, "component_zoom", MagicMock())
@@ -369,3 +399,13 @@ def test_calc_layer_filter():
 
     assert _calc_layer_filter(layer, NoiseFilterType.Gauss, 1)[0] is not None
     assert _calc_layer_filter(layer, NoiseFilterType.Gauss, 1)[0] is not layer.data
+
+
+@pytest.mark.parametrize("filter_type", [NoiseFilterType.Gauss, NoiseFilterType.Median])
+def test_calc_layer_filter_multiscale(filter_type):
+    levels = build_pyramid(np.random.default_rng(0).random((64, 64)), min_size=16, top_size=16)
+    layer = NapariImage(levels, multiscale=True, name="test", contrast_limits=(0, 1))
+    res = _calc_layer_filter(layer, filter_type, 2)[0]
+    assert all(isinstance(x, FilteredArray) for x in res)
+    assert [x.shape for x in res] == [x.shape for x in levels]
+    assert np.array_equal(res[0][10:20, 5:30], ImageView.calculate_filter(levels[0], (filter_type, 2))[10:20, 5:30])
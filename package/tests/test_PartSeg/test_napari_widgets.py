@@ -15,6 +15,7 @@ from PartSeg.plugins.napari_widgets import MaskCreate, ROIAnalysisExtraction, RO
 from PartSeg.plugins.napari_widgets.measurement_widget import update_properties
 from PartSeg.plugins.napari_widgets.roi_extraction_algorithms import ProfilePreviewDialog, QInputDialog
 from PartSeg.plugins.napari_widgets.search_label_widget import HIGHLIGHT_LABEL_NAME
+from PartSeg.plugins.napari_widgets.utils import generate_image
 from PartSegCore.algorithm_describe_base import ROIExtractionProfile
 from PartSegCore.analysis.algorithm_description import AnalysisAlgorithmSelection
 from PartSegCore.analysis.load_functions import LoadProfileFromJSON
@@ -225,6 +226,31 @@ def test_mask_create(make_napari_viewer, qtbot):
     assert "Mask" in viewer.layers
 
 
+def test_generate_image(make_napari_viewer):
+    viewer = make_napari_viewer()
+    data1 = np.zeros((3, 10, 10), dtype=np.uint8)
+    data1[1, 2:5, 2:5] = 7
+    data2 = np.ones((3, 10, 10), dtype=np.float32)
+    viewer.add_image(data1, name="image1", scale=(2, 1, 1))
+    viewer.add_image(data2, name="image2", scale=(2, 1, 1))
+    image = generate_image(viewer, "image1", "image2", "image1")
+    assert image.channel_names == ["image1", "image2"]
+    assert np.shares_memory(image.get_channel(0), data1)
+    assert np.shares_memory(image.get_channel(1), data2)
+    assert image.get_ranges()[0] == (0, 7)
+    assert image.spacing[0] == 2 * image.spacing[1]
+
+    image.set_mask(np.ones((3, 10, 10), dtype=np.uint8))
+    image2 = generate_image(viewer, "image1", "image2")
+    assert image2.mask is None
+    assert image2._channel_arrays[0] is image._channel_arrays[0]  # pylint: disable=protected-access
+
+    viewer.layers["image1"].data = data1 + 1
+    image3 = generate_image(viewer, "image1", "image2")
+    assert not np.shares_memory(image3.get_channel(0), data1)
+    assert np.all(image3.get_channel(0) >= 1)
+
+
 @pytest.fixture()
 def _shutdown_timers(monkeypatch):
     register = []
@@ -6,10 +6,20 @@ import pytest
 from PartSegCore.segmentation.algorithm_base import SegmentationLimitException
 from PartSegCore.segmentation.threshold import (
     BaseThreshold,
+    DoubleThreshold,
     DoubleThresholdSelection,
     IntermodesThreshold,
     KittlerIllingworthThreshold,
+    ManualThreshold,
+    MomentsThreshold,
+    OtsuThreshold,
+    SitkThreshold,
     ThresholdSelection,
+    ThresholdStatistics,
+    TriangleThreshold,
+    YenThreshold,
+    apply_threshold,
+    compare_thresholds,
 )
 
 square = np.zeros((21, 21))
@@ -52,3 +62,132 @@ def test_double_threshold(method: BaseThreshold, data, op, masking):
     assert isinstance(data, np.ndarray)
     assert isinstance(thr_info[0], (int, float))
     assert isinstance(thr_info[1], (int, float))
+
+
+def _bimodal_data(dtype, seed=0):
+    rng = np.random.default_rng(seed)
+    size = 4 * 30 * 30
+    data = np.concatenate([rng.normal(60, 10, size // 3), rng.normal(150, 20, size - size // 3)])
+    rng.shuffle(data)
+    if dtype == np.int16:
+        data -= 100
+    return data.clip(0 if dtype == np.uint8 else -1000, 255).astype(dtype).reshape(4, 30, 30)
+
+
+@pytest.mark.parametrize("method", [OtsuThreshold, YenThreshold, TriangleThreshold, MomentsThreshold])
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.int16, np.float32, np.float64])
+@pytest.mark.parametrize("op", [operator.lt, operator.gt])
+@pytest.mark.parametrize("masking", [True, False])
+@pytest.mark.parametrize("bins", [32, 128])
+def test_histogram_threshold_same_as_sitk(method, dtype, op, masking, bins, monkeypatch):
+    data = _bimodal_data(dtype)
+    mask = np.zeros(data.shape, dtype=bool)
+    mask[:, 3:-3, 3:-3] = True
+    mask = mask if masking else None
+    arguments = method.__argument_class__(bins=bins)
+    result, threshold = method.calculate_mask(data, mask, arguments, op)
+    monkeypatch.setattr(method, "histogram_threshold", SitkThreshold.histogram_threshold)
+    result_sitk, threshold_sitk = method.calculate_mask(data, mask, arguments, op)
+    assert np.array_equal(result, result_sitk)
+    assert threshold == threshold_sitk
+
+
+def test_statistics_shared(monkeypatch):
+    data = _bimodal_data(np.uint16)
+    mask = data > 10
+    statistics = ThresholdStatistics(data, mask)
+    arguments = OtsuThreshold.get_default_values()
+    OtsuThreshold.calculate_mask(data, mask, arguments, operator.gt, statistics=statistics)
+
+    def _fail(*_args):
+        raise AssertionError("histogram should be cached")
+
+    monkeypatch.setattr(statistics, "_histogram", _fail)
+    OtsuThreshold.calculate_mask(data, mask, arguments, operator.lt, statistics=statistics)
+    YenThreshold.calculate_mask(
+        data, mask, YenThreshold.__argument_class__(bins=arguments.bins), operator.gt, statistics
+    )
+    image = statistics.sitk_image
+    IntermodesThreshold.calculate_mask(data, mask, IntermodesThreshold.get_default_values(), operator.gt, statistics)
+    assert statistics.sitk_image is image
+    with pytest.raises(ValueError, match="other data"):
+        OtsuThreshold.calculate_mask(data.copy(), mask, arguments, operator.gt, statistics=statistics)
+
+
+def test_statistics_release_arrays(monkeypatch):
+    data = _bimodal_data(np.uint16)
+    mask = data > 10
+    statistics = ThresholdStatistics(data, mask)
+    arguments = OtsuThreshold.get_default_values()
+    _, thr = OtsuThreshold.calculate_mask(data, mask, arguments, operator.gt, statistics=statistics)
+    IntermodesThreshold.calculate_mask(data, mask, IntermodesThreshold.get_default_values(), operator.gt, statistics)
+    compare_thresholds(data, mask, operator.gt, methods=["Otsu"], statistics=statistics)
+    statistics.release_arrays()
+    assert not {"sitk_image", "sitk_mask", "values", "sorted"} & set(statistics._cache)
+
+    def _fail(*_args):
+        raise AssertionError("histogram should be cached")
+
+    monkeypatch.setattr(statistics, "_histogram", _fail)
+    assert OtsuThreshold.calculate_mask(data, mask, arguments, operator.gt, statistics=statistics)[1] == thr
+
+
+def test_statistics_histogram():
+    data = np.arange(100, dtype=np.uint16).reshape(10, 10)
+    mask = np.zeros(data.shape, dtype=np.uint8)
+    mask[:5] = 1
+    mask[0] = 2
+    statistics = ThresholdStatistics(data, mask)
+    counts, edges = statistics.histogram(10)
+    assert counts.sum() == 40
+    assert edges[0] == 10
+    assert edges[-1] > 49
+    counts, _ = statistics.histogram(10, apply_mask=False)
+    assert counts.sum() == 100
+    assert ThresholdStatistics(np.ones((5, 5))).histogram(10) is None
+    assert ThresholdStatistics(data, np.zeros(data.shape, dtype=bool)).histogram(10) is None
+
+
+@pytest.mark.parametrize("op", [operator.lt, operator.gt])
+@pytest.mark.parametrize("masking", [True, False])
+def test_compare_thresholds(op, masking):
+    data = _bimodal_data(np.uint16)
+    mask = (data > 50) if masking else None
+    result = compare_thresholds(data, mask, op)
+    assert ManualThreshold.get_name() not in result
+    for name, method in ThresholdSelection.__register__.items():
+        if name == ManualThreshold.get_name():
+            continue
+        try:
+            expected = method.calculate_mask(data, mask, method.get_default_values(), op)[1]
+        except SegmentationLimitException:
+            assert name not in result
+            continue
+        assert result[name] == expected, name
+    assert set(compare_thresholds(data, mask, op, methods=["Otsu", "Li"])) == {"Otsu", "Li"}
+
+
+def test_apply_threshold_without_statistics_support():
+    class PluginThreshold:
+        @classmethod
+        def calculate_mask(cls, data, mask, arguments, operator):
+            return operator(data, 5).astype(np.uint8), 5
+
+    data = np.arange(100, dtype=np.uint16).reshape(10, 10)
+    statistics = ThresholdStatistics(data)
+    res, thr = apply_threshold(PluginThreshold, data, None, {}, operator.gt, statistics)
+    assert thr == 5
+    assert np.count_nonzero(res) == 94
+    res, thr = apply_threshold(OtsuThreshold, data, None, OtsuThreshold.get_default_values(), operator.gt, statistics)
+    assert thr == OtsuThreshold.calculate_mask(data, None, OtsuThreshold.get_default_values(), operator.gt)[1]
+
+
+def test_double_threshold_shared_statistics():
+    data = _bimodal_data(np.float32)
+    mask = data > 10
+    arguments = DoubleThreshold.get_default_values()
+    statistics = ThresholdStatistics(data, mask)
+    res1, thr1 = DoubleThreshold.calculate_mask(data, mask, arguments, operator.gt, statistics=statistics)
+    res2, thr2 = DoubleThreshold.calculate_mask(data, mask, arguments, operator.gt)
+    assert np.array_equal(res1, res2)
+    assert thr1 == thr2
@@ -2,11 +2,13 @@
 
 import os
 import shutil
+import sqlite3
 import sys
 import time
 import warnings
 from glob import glob
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -18,12 +20,16 @@ from PartSegCore.analysis.batch_processing.batch_backend import (
     ResponseData,
     do_calculation,
 )
+from PartSegCore.analysis.batch_processing.calculation_cache import CalculationCache
+from PartSegCore.analysis.batch_processing.parallel_backend import BatchManager, PoolBatchManager
+from PartSegCore.analysis.batch_processing.shared_arrays import SharedArrayRegistry
 from PartSegCore.analysis.calculation_plan import (
     Calculation,
     CalculationPlan,
     CalculationTree,
     FileCalculation,
     MaskCreate,
+    MaskFile,
     MaskIntersection,
     MaskSuffix,
     MaskSum,
@@ -402,7 +408,8 @@ class TestCalculationProcess:
             assert isinstance(res[0], ResponseData)
 
     @pytest.mark.filterwarnings("ignore:This method will be removed")
-    def test_full_pipeline(self, tmpdir, data_test_dir, monkeypatch):
+    @pytest.mark.parametrize("batch_manager_class", [BatchManager, PoolBatchManager])
+    def test_full_pipeline(self, tmpdir, data_test_dir, monkeypatch, batch_manager_class):
         monkeypatch.setattr(batch_backend, "CalculationProcess", MockCalculationProcess)
         plan = self.create_calculation_plan()
         file_pattern = os.path.join(data_test_dir, "stack1_components", "stack1_component*[0-9].tif")
@@ -418,7 +425,7 @@ class TestCalculationProcess:
             voxel_size=(1, 1, 1),
         )
 
-        manager = CalculationManager()
+        manager = CalculationManager(batch_manager_class)
         manager.set_number_of_workers(3)
         manager.add_calculation(calc)
 
@@ -538,6 +545,154 @@ class TestCalculationProcess:
         assert isinstance(res, list)
         assert isinstance(res[0], ResponseData)
 
+    @staticmethod
+    def create_shared_mask_calculation(tmp_path, data_test_dir, plan):
+        file_paths = sorted(glob(os.path.join(data_test_dir, "stack1_components", "stack1_component*[0-9].tif")))[:4]
+        mask_path = os.path.join(data_test_dir, "stack1_components", "stack1_component1_mask.tif")
+        map_path = tmp_path / "map.txt"
+        map_path.write_text("".join(f"{x};{mask_path}\n" for x in file_paths))
+        plan.execution_tree.children[0].operation = MaskFile(name="", path_to_file=str(map_path))
+        return Calculation(
+            file_paths,
+            base_prefix=data_test_dir,
+            result_prefix=data_test_dir,
+            measurement_file_path=str(tmp_path / "test.xlsx"),
+            sheet_name="Sheet1",
+            calculation_plan=plan,
+            voxel_size=(1, 1, 1),
+        )
+
+    def test_do_calculation_shared_mask(self, tmp_path, data_test_dir, monkeypatch):
+        calc = self.create_shared_mask_calculation(tmp_path, data_test_dir, self.create_calculation_plan())
+        mask_path = os.path.join(data_test_dir, "stack1_components", "stack1_component1_mask.tif")
+        assert calc.get_shared_mask_paths() == {mask_path}
+        res1 = CalculationProcess().do_calculation(FileCalculation(calc.file_list[1], calc))
+        calc.shared_arrays = SharedArrayRegistry(calc.uuid.hex[:8], calc.get_shared_mask_paths())
+        try:
+            res2 = CalculationProcess().do_calculation(FileCalculation(calc.file_list[1], calc))
+            assert calc.shared_arrays.get(mask_path) is not None
+
+            def raise_fun(*_args, **_kwargs):
+                raise AssertionError("mask should be taken from shared memory")
+
+            monkeypatch.setattr(CalculationProcess, "read_mask", raise_fun)
+            res3 = CalculationProcess().do_calculation(FileCalculation(calc.file_list[2], calc))
+        finally:
+            calc.shared_arrays.unlink()
+        assert list(res1[0].values[0].get_separated()) == list(res2[0].values[0].get_separated())
+        assert isinstance(res3[0], ResponseData)
+
+    @pytest.mark.parametrize("batch_manager_class", [BatchManager, PoolBatchManager])
+    def test_full_pipeline_shared_mask(self, tmp_path, data_test_dir, batch_manager_class):
+        calc = self.create_shared_mask_calculation(tmp_path, data_test_dir, self.create_calculation_plan())
+        mask_path = os.path.join(data_test_dir, "stack1_components", "stack1_component1_mask.tif")
+        manager = CalculationManager(batch_manager_class)
+        manager.set_number_of_workers(2)
+        manager.add_calculation(calc)
+        assert mask_path in calc.shared_arrays
+
+        for _ in range(int(120 / 0.1)):
+            manager.get_results()
+            if manager.has_work:
+                time.sleep(0.1)
+            else:
+                break
+        else:  # pragma: no cover
+            manager.kill_jobs()
+            pytest.fail("jobs hanged")
+        manager.writer.finish()
+        assert not manager.errors_list
+        assert calc.shared_arrays.get(mask_path) is None
+
+    @pytest.mark.parametrize("stop_method", ["cancel", "kill"])
+    def test_stop_calculation_shared_mask(self, tmp_path, data_test_dir, monkeypatch, stop_method):
+        calc = self.create_shared_mask_calculation(tmp_path, data_test_dir, self.create_calculation_plan())
+        mask_path = os.path.join(data_test_dir, "stack1_components", "stack1_component1_mask.tif")
+        monkeypatch.setattr(BatchManager, "add_work", lambda *_args, **_kwargs: None)
+        manager = CalculationManager(BatchManager)
+        manager.add_calculation(calc)
+        calc.shared_arrays.publish(mask_path, np.ones((10, 10), dtype=np.uint8))
+        try:
+            assert calc.shared_arrays.get(mask_path) is not None
+            calc.shared_arrays.close()
+            if stop_method == "cancel":
+                manager.cancel_calculation(calc)
+            else:
+                manager.kill_jobs()
+            assert calc.shared_arrays.get(mask_path) is None
+        finally:
+            calc.shared_arrays.unlink()
+
+    def test_do_calculation_cache(self, tmp_path, data_test_dir, monkeypatch):
+        file_path = os.path.join(data_test_dir, "stack1_components", "stack1_component1.tif")
+        calc = Calculation(
+            [file_path],
+            base_prefix=data_test_dir,
+            result_prefix=data_test_dir,
+            measurement_file_path=str(tmp_path / "test.xlsx"),
+            sheet_name="Sheet1",
+            calculation_plan=self.create_calculation_plan3(),
+            voxel_size=(1, 1, 1),
+            cache=CalculationCache(tmp_path / "cache"),
+        )
+        res1 = CalculationProcess().do_calculation(FileCalculation(file_path, calc))
+        assert isinstance(res1[0], ResponseData)
+
+        def raise_fun(*_args, **_kwargs):
+            raise AssertionError("should use cache")
+
+        monkeypatch.setattr(CalculationProcess, "_load_projects", raise_fun)
+        monkeypatch.setattr(batch_backend, "AnalysisAlgorithmSelection", None)
+        res2 = CalculationProcess().do_calculation(FileCalculation(file_path, calc))
+        assert len(res1) == len(res2)
+        for resp1, resp2 in zip(res1, res2):
+            assert [list(x.get_separated()) for x in resp1.values] == [list(x.get_separated()) for x in resp2.values]
+
+    def test_do_calculation_cache_parameters_change(self, tmp_path, data_test_dir, monkeypatch):
+        file_path = os.path.join(data_test_dir, "stack1_components", "stack1_component1.tif")
+        cache = CalculationCache(tmp_path / "cache")
+        plan = self.create_calculation_plan3()
+        calc = Calculation(
+            [file_path],
+            base_prefix=data_test_dir,
+            result_prefix=data_test_dir,
+            measurement_file_path=str(tmp_path / "test.xlsx"),
+            sheet_name="Sheet1",
+            calculation_plan=plan,
+            voxel_size=(1, 1, 1),
+            cache=cache,
+        )
+        CalculationProcess().do_calculation(FileCalculation(file_path, calc))
+        entries_num = len(cache._entries())
+        segmentation_node = plan.execution_tree.children[0].children[0]
+        segmentation_node.operation = segmentation_node.operation.copy(
+            update={"values": segmentation_node.operation.values.copy(update={"minimum_size": 100})}
+        )
+
+        def raise_fun(*_args, **_kwargs):
+            raise AssertionError("should use cache")
+
+        monkeypatch.setattr(CalculationProcess, "_load_projects", raise_fun)
+        CalculationProcess().do_calculation(FileCalculation(file_path, calc))
+        assert len(cache._entries()) > entries_num
+
+    @pytest.mark.parametrize("cache_set", [True, False])
+    def test_calculation_cache_attribute(self, tmp_path, cache_set):
+        cache = CalculationCache(tmp_path) if cache_set else None
+        calc = Calculation(
+            [],
+            base_prefix="",
+            result_prefix="",
+            measurement_file_path="",
+            sheet_name="Sheet1",
+            calculation_plan=self.create_calculation_plan3(),
+            voxel_size=(1, 1, 1),
+            cache=cache,
+        )
+        assert calc.cache is cache
+        assert FileCalculation("", calc).cache is cache
+        assert calc.get_base_calculation().cache is cache
+
     @pytest.mark.parametrize(
         ("file_name", "root_type"),
         [
@@ -573,6 +728,49 @@ class TestCalculationProcess:
         assert isinstance(res, list)
         assert isinstance(res[0], ResponseData)
 
+    def test_do_calculation_component_stream(self, tmp_path, data_test_dir, monkeypatch):
+        plan = self.create_calculation_plan()
+        chosen_fields = [
+            MeasurementEntry(
+                name="Volume",
+                calculation_tree=Leaf(name="Volume", area=AreaType.ROI, per_component=PerComponent.Yes),
+            ),
+            MeasurementEntry(
+                name="Pixel brightness sum",
+                calculation_tree=Leaf(name="Pixel brightness sum", area=AreaType.ROI, per_component=PerComponent.Yes),
+            ),
+        ]
+        profile = MeasurementProfile(name="components", chosen_fields=chosen_fields, name_prefix="")
+        plan.execution_tree.children[0].children[0].children[0].operation = MeasurementCalculate(
+            channel=0, units=Units.µm, measurement_profile=profile, name_prefix=""
+        )
+        file_path = os.path.join(data_test_dir, "stack1_components", "stack1_component1.tif")
+        calc = Calculation(
+            [file_path],
+            base_prefix=data_test_dir,
+            result_prefix=data_test_dir,
+            measurement_file_path=str(tmp_path / "test.xlsx"),
+            sheet_name="Sheet1",
+            calculation_plan=plan,
+            voxel_size=(1, 1, 1),
+        )
+        calls = []
+        calculate_components = MeasurementProfile.calculate_components
+
+        def _calculate_components(self, *args):
+            calls.append(args)
+            yield from calculate_components(self, *args)
+
+        monkeypatch.setattr(MeasurementProfile, "calculate_components", _calculate_components)
+        streamed = CalculationProcess().do_calculation(FileCalculation(file_path, calc))[0].values[0]
+        assert len(calls) == 1
+        assert calls[0][-1] == 1
+        monkeypatch.setattr(MeasurementProfile, "supports_component_stream", lambda self: False)
+        expected = CalculationProcess().do_calculation(FileCalculation(file_path, calc))[0].values[0]
+        assert len(calls) == 1
+        assert streamed.get_labels() == expected.get_labels()
+        assert np.allclose([x[1:] for x in streamed.get_separated()], [x[1:] for x in expected.get_separated()])
+
     def test_do_calculation_calculation_process(self, tmpdir, data_test_dir):
         plan = self.create_calculation_plan3()
         file_path = os.path.join(data_test_dir, "stack1_components", "stack1_component1.tif")
@@ -658,3 +856,68 @@ class MockCalculationProcess(CalculationProcess):
         if os.path.basename(calculation.file_path) == "stack1_component1.tif":
             time.sleep(0.5)
         return super().do_calculation(calculation)
+
+
+def wait_for_writer(file_data: batch_backend.FileData, timeout=10):
+    for _ in range(int(timeout / 0.01)):
+        if file_data.finished():
+            break
+        time.sleep(0.01)
+    else:  # pragma: no cover
+        pytest.fail("writer hanged")
+    assert not file_data.get_errors()
+
+
+class TestSheetStore:
+    def test_append_and_read(self, tmp_path):
+        store = batch_backend.SheetStore(str(tmp_path / "data.sqlite"))
+        columns = pd.MultiIndex.from_tuples([("name", "units"), ("Volume", "µm**3"), ("Text", "str")])
+        store.create_sheet("sheet_1", "Sheet1", list(columns))
+        store.append("sheet_1", [(1, ["b", np.float64(2.5), "b"]), (3, ["d", np.int64(4), None])])
+        store.append("sheet_1", [(0, ["a", 1.5, 3]), (1, ["c", "Div by zero", [1, 2]])])
+        store.append_errors([("e.tif", "error")])
+        store.close()
+        assert os.path.exists(tmp_path / "data.sqlite")
+
+        df = store.read_sheet("sheet_1", columns)
+        assert list(df["name"]["units"]) == ["a", "b", "c", "d"]
+        assert list(df["Volume"]["µm**3"]) == [1.5, 2.5, "Div by zero", 4]
+        assert list(df["Text"]["str"]) == [3, "b", "[1, 2]", None]
+        assert store.read_errors() == [("e.tif", "error")]
+        store.remove_sheet("sheet_1")
+        store.close(remove=True)
+        assert not os.path.exists(tmp_path / "data.sqlite")
+
+
+class TestFileData:
+    def test_append_before_export(self, tmp_path):
+        calc = Calculation(
+            [],
+            base_prefix=str(tmp_path),
+            result_prefix=str(tmp_path),
+            measurement_file_path=str(tmp_path / "test.xlsx"),
+            sheet_name="Sheet1",
+            calculation_plan=TestCalculationProcess.create_calculation_plan(),
+            voxel_size=(1, 1, 1),
+        )
+        file_data = batch_backend.FileData(calc)
+        db_path = tmp_path / "test_partial.sqlite"
+        file_data.wrote_errors("file1.tif", "error 1")
+        file_data.wrote_errors("file2.tif", "error 2")
+        wait_for_writer(file_data)
+        assert not (tmp_path / "test.xlsx").exists()
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("SELECT * FROM errors").fetchall() == [
+                ("file1.tif", "error 1"),
+                ("file2.tif", "error 2"),
+            ]
+            assert conn.execute("SELECT sheet_name FROM sheets").fetchall() == [("Sheet1",)]
+
+        file_data.export_data()
+        wait_for_writer(file_data)
+        df = pd.read_excel(tmp_path / "test.xlsx", sheet_name="Errors", index_col=0, engine=ENGINE)
+        assert df.shape == (2, 2)
+
+        file_data.finish()
+        file_data.write_thread.join(timeout=10)
+        assert not db_path.exists()
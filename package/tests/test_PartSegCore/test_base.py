@@ -3,7 +3,7 @@
 import numpy as np
 import pytest
 
-from PartSegCore.image_operations import gaussian, median
+from PartSegCore.image_operations import FilteredArray, NoiseFilterType, bilateral, gaussian, median
 
 
 class TestImageOperation:
@@ -24,3 +24,53 @@ class TestImageOperation:
         data[slices] = 1
         res = method(data, 2, per_layer)
         assert not np.all(res == data)
+
+
+class TestFilteredArray:
+    @pytest.mark.parametrize(
+        ("filter_type", "method", "radius"),
+        [
+            (NoiseFilterType.Gauss, gaussian, 1),
+            (NoiseFilterType.Gauss, gaussian, 8),
+            (NoiseFilterType.Median, median, 2),
+            (NoiseFilterType.Bilateral, bilateral, 2),
+        ],
+    )
+    def test_same_as_full_filter(self, filter_type, method, radius):
+        data = (np.random.default_rng(0).random((2, 3, 120, 100)) * 1000).astype(np.uint16)
+        expected = method(data, radius)
+        filtered = FilteredArray(data, filter_type, radius)
+        assert filtered.shape == data.shape
+        assert filtered.dtype == expected.dtype
+        assert np.array_equal(filtered[1, 2], expected[1, 2])
+        assert np.array_equal(filtered[1, 2, 30:70, 40:90], expected[1, 2, 30:70, 40:90])
+        assert np.array_equal(filtered[:, 1, ::-3, 5:9], expected[:, 1, ::-3, 5:9])
+        assert filtered[0, 0, 10, 10] == expected[0, 0, 10, 10]
+        assert np.array_equal(np.asarray(filtered), expected)
+
+    def test_lazy(self):
+        class CountArray:
+            def __init__(self, array):
+                self.array = array
+                self.shape = array.shape
+                self.dtype = array.dtype
+                self.ndim = array.ndim
+                self.calls = 0
+
+            def __getitem__(self, item):
+                self.calls += 1
+                return self.array[item]
+
+        source = CountArray(np.ones((10, 50, 50), dtype=np.uint8))
+        filtered = FilteredArray(source, NoiseFilterType.Gauss, 1, cache_size=2)
+        assert source.calls == 0
+        assert filtered[3].shape == (50, 50)
+        assert source.calls == 1
+        filtered[3]
+        assert source.calls == 1
+        filtered[4]
+        filtered[5]
+        filtered[3]
+        assert source.calls == 4
+        assert filtered[2:4, 10:20].shape == (2, 10, 50)
+        assert filtered[2:2].shape == (0, 50, 50)
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+from PartSegCore.analysis.batch_processing.calculation_cache import CalculationCache
+from PartSegCore.universal_const import Units
+
+
+class TestCalculationCache:
+    def test_set_get(self, tmp_path):
+        cache = CalculationCache(tmp_path)
+        key = cache.make_key("test", 1)
+        assert key not in cache
+        assert cache.get(key) is None
+        assert cache.get(key, 5) == 5
+        cache.set(key, {"a": np.arange(5)})
+        assert key in cache
+        assert np.all(cache.get(key)["a"] == np.arange(5))
+        assert cache.size > 0
+        cache.clear()
+        assert key not in cache
+        assert cache.size == 0
+
+    def test_make_key(self):
+        arr = np.arange(10, dtype=np.uint8)
+        key = CalculationCache.make_key(arr, {"a": 1, "b": Units.nm})
+        assert key == CalculationCache.make_key(arr.copy(), {"b": Units.nm, "a": 1})
+        assert key != CalculationCache.make_key(arr.astype(np.uint16), {"a": 1, "b": Units.nm})
+        assert key != CalculationCache.make_key(arr.reshape(2, 5), {"a": 1, "b": Units.nm})
+        assert key != CalculationCache.make_key(arr, {"a": 2, "b": Units.nm})
+        assert CalculationCache.make_key(b"ab", b"c") != CalculationCache.make_key(b"a", b"bc")
+
+    def test_file_key(self, tmp_path, monkeypatch):
+        base_open = open
+        cache = CalculationCache(tmp_path / "cache")
+        file_path = tmp_path / "data.bin"
+        file_path.write_bytes(b"1234")
+        key = cache.file_key(file_path)
+        file_path2 = tmp_path / "data2.bin"
+        file_path2.write_bytes(b"1234")
+        assert cache.file_key(file_path2) == key
+
+        def check_open(path, *args, **kwargs):
+            if os.fspath(path) == os.fspath(file_path):
+                raise AssertionError("file should not be read")
+            return base_open(path, *args, **kwargs)
+
+        with monkeypatch.context() as m:
+            m.setattr("builtins.open", check_open)
+            assert cache.file_key(file_path) == key
+        file_path.write_bytes(b"12345")
+        assert cache.file_key(file_path) != key
+
+    def test_eviction(self, tmp_path):
+        cache = CalculationCache(tmp_path, max_size=int(3.5 * 2**18))
+        keys = [cache.make_key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.set(key, np.zeros(2**18, dtype=np.uint8))
+            os.utime(cache._entry_path(key), (i, i))
+        assert all(key in cache for key in keys)
+        cache.get(keys[0])
+        cache.set(cache.make_key(5), np.zeros(2**18, dtype=np.uint8))
+        assert keys[0] in cache
+        assert keys[1] not in cache
+        assert keys[2] in cache
+        assert cache.size <= cache.max_size
@@ -0,0 +1,185 @@
+import gc
+import pickle
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from PartSegCore import history_store as history_store_module
+from PartSegCore.history_store import HistoryArrays, HistoryStore
+from PartSegCore.mask_create import MaskProperty
+from PartSegCore.project_info import HistoryElement
+from PartSegCore.roi_info import ROIInfo
+
+
+@pytest.fixture(autouse=True)
+def _reset_cursor():
+    HistoryArrays.reset_cursor()
+    yield
+    HistoryArrays.reset_cursor()
+
+
+def _states(count=5):
+    roi = np.zeros((10, 50, 50), dtype=np.uint8)
+    mask = np.zeros((10, 50, 50), dtype=bool)
+    res = []
+    for i in range(count):
+        roi = roi.copy()
+        mask = mask.copy()
+        roi[1:3, 5 * i : 5 * i + 4, 5:10] = i + 1
+        mask[:, 5 * i : 5 * i + 5] = True
+        res.append({"roi": roi, "mask": mask})
+    return res
+
+
+class TestHistoryStore:
+    def test_put_get(self):
+        store = HistoryStore()
+        key = store.put(b"1234")
+        assert key in store
+        assert store.get(key) == b"1234"
+        assert store.memory_usage == 4
+        store.discard(key)
+        assert key not in store
+        assert store.memory_usage == 0
+
+    def test_spill(self, tmp_path):
+        store = HistoryStore(max_memory=10, spill_dir=str(tmp_path))
+        keys = [store.put(bytes([i]) * 4) for i in range(5)]
+        assert store.memory_usage <= 10
+        assert store.spilled_size == 12
+        assert len(store) == 5
+        for i, key in enumerate(keys):
+            assert store.get(key) == bytes([i]) * 4
+        for key in keys[:3]:
+            store.discard(key)
+        assert store.spilled_size == 0
+        assert store.get(keys[4]) == bytes([4]) * 4
+        key = store.put(b"abcdefghij")
+        assert store.get(key) == b"abcdefghij"
+        store.clear()
+        assert len(store) == 0
+
+    def test_spill_compact(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(history_store_module, "SPILL_COMPACT_SIZE", 8)
+        store = HistoryStore(max_memory=4, spill_dir=str(tmp_path))
+        keys = [store.put(bytes([i]) * 4) for i in range(10)]
+        assert store.spilled_size == 36
+        for key in keys[:4]:
+            store.discard(key)
+        # removed data is not bigger than kept one
+        assert store._spill_end == 36  # pylint: disable=protected-access
+        store.discard(keys[4])
+        assert store._spill_end == 16  # pylint: disable=protected-access
+        for i, key in enumerate(keys[5:], start=5):
+            assert store.get(key) == bytes([i]) * 4
+
+    def test_discard_when_locked(self):
+        store = HistoryStore()
+        key = store.put(b"1234")
+        with store._lock:  # pylint: disable=protected-access
+            # like finalizer called by garbage collector inside locked method
+            store.discard(key)
+        assert store.memory_usage == 4
+        store.put(b"5")
+        assert key not in store
+        assert store.memory_usage == 1
+
+
+class TestHistoryArrays:
+    def test_delta(self):
+        store = HistoryStore()
+        states = _states()
+        history = [HistoryArrays.create(state, store=store) for state in states]
+        assert history[0].is_key_frame
+        assert all(not x.is_key_frame for x in history[1:])
+        assert history[3].depth == 3
+        assert history[3].nbytes < history[0].nbytes
+        for state, hist in zip(states[::-1], history[::-1]):
+            res = hist.get()
+            assert set(res) == {"roi", "mask"}
+            assert np.array_equal(res["roi"], state["roi"])
+            assert np.array_equal(res["mask"], state["mask"])
+        HistoryArrays.reset_cursor()
+        assert np.array_equal(history[2].get()["roi"], states[2]["roi"])
+        assert np.array_equal(history[4].get()["roi"], states[4]["roi"])
+
+    def test_copy_on_create_and_get(self):
+        array = np.zeros((5, 5), dtype=np.uint8)
+        hist = HistoryArrays.create({"a": array})
+        array[:] = 1
+        res = hist.get()
+        assert np.all(res["a"] == 0)
+        res["a"][:] = 2
+        assert np.all(hist.get()["a"] == 0)
+
+    def test_layout_change(self):
+        hist1 = HistoryArrays.create({"a": np.zeros((5, 5), dtype=np.uint8)})
+        hist2 = HistoryArrays.create({"a": np.zeros((5, 6), dtype=np.uint8)})
+        hist3 = HistoryArrays.create({"a": np.zeros((5, 6), dtype=np.uint16)})
+        hist4 = HistoryArrays.create({"a": np.zeros((5, 6), dtype=np.uint16), "b": np.ones(3)})
+        assert all(x.is_key_frame for x in (hist1, hist2, hist3, hist4))
+        assert hist1.get()["a"].shape == (5, 5)
+
+    def test_big_change_key_frame(self):
+        HistoryArrays.create({"a": np.zeros((10, 10), dtype=np.uint8)})
+        hist = HistoryArrays.create({"a": np.ones((10, 10), dtype=np.uint8)})
+        assert hist.is_key_frame
+
+    def test_max_chain(self, monkeypatch):
+        monkeypatch.setattr(history_store_module, "MAX_CHAIN", 3)
+        states = _states(7)
+        history = [HistoryArrays.create(state) for state in states]
+        assert [x.depth for x in history] == [0, 1, 2, 0, 1, 2, 0]
+        HistoryArrays.reset_cursor()
+        assert np.array_equal(history[5].get()["roi"], states[5]["roi"])
+
+    def test_release(self):
+        store = HistoryStore()
+        history = [HistoryArrays.create(state, store=store) for state in _states()]
+        assert len(store) > 0
+        del history
+        HistoryArrays.reset_cursor()
+        gc.collect()
+        assert len(store) == 0
+
+    def test_spilled_restore(self, tmp_path):
+        store = HistoryStore(max_memory=100, spill_dir=str(tmp_path))
+        states = _states()
+        history = [HistoryArrays.create(state, store=store) for state in states]
+        assert store.spilled_size > 0
+        HistoryArrays.reset_cursor()
+        for state, hist in zip(states, history):
+            assert np.array_equal(hist.get()["mask"], state["mask"])
+
+    def test_pickle_and_getvalue(self):
+        states = _states(3)
+        history = [HistoryArrays.create(state, {"a": 1}) for state in states]
+        hist2 = pickle.loads(pickle.dumps(history[2]))
+        assert hist2.metadata == {"a": 1}
+        assert np.array_equal(hist2.get()["roi"], states[2]["roi"])
+        with np.load(BytesIO(history[1].getvalue())) as data:
+            assert np.array_equal(data["roi"], states[1]["roi"])
+
+    def test_object_array(self):
+        with pytest.raises(ValueError, match="objects"):
+            HistoryArrays.create({"a": np.array([None, 1])})
+
+
+def test_history_element_bound_info(monkeypatch):
+    states = _states(3)
+    history = [
+        HistoryElement.create(ROIInfo(state["roi"]), state["mask"], {}, MaskProperty.simple_mask()) for state in states
+    ]
+    assert isinstance(history[2].arrays, HistoryArrays)
+    assert not history[2].arrays.is_key_frame
+
+    def _fail(*_args):
+        raise AssertionError("bounds should not be calculated")
+
+    monkeypatch.setattr(ROIInfo, "calc_bounds", staticmethod(_fail))
+    roi_info, mask = history[1].get_roi_info_and_mask()
+    assert np.array_equal(roi_info.roi, states[1]["roi"])
+    assert np.array_equal(mask, states[1]["mask"])
+    assert set(roi_info.bound_info) == {1, 2}
+    assert roi_info.sizes[2] == 40
@@ -0,0 +1,113 @@
+import gc
+import os
+
+import numpy as np
+import pytest
+
+from PartSegCore import image_pyramid
+from PartSegCore.image_pyramid import (
+    build_pyramid,
+    cache_path,
+    downsample_mean,
+    downsample_mode,
+    image_pyramids,
+    level_count,
+    need_pyramid,
+)
+from PartSegCore.project_container import ChunkedArray
+from PartSegImage import Image, ImageWriter, TiffImageReader
+
+
+def test_level_count():
+    assert not need_pyramid((10, 100, 100))
+    assert need_pyramid((10, 5000, 100))
+    assert level_count((10, 100, 100)) == 1
+    assert level_count((1, 5000, 100)) == 4
+    assert level_count((1, 100, 100), min_size=10, top_size=10) == 5
+
+
+def test_downsample_mean():
+    data = np.array([[1, 1, 0, 2], [0, 2, 0, 2], [3, 0, 5, 5], [0, 3, 6, 7]], dtype=np.uint8)
+    res = downsample_mean(data)
+    assert res.dtype == np.uint8
+    assert np.array_equal(res, [[1, 1], [2, 6]])
+    res = downsample_mean(np.ones((2, 5, 5), dtype=np.float32))
+    assert res.shape == (2, 3, 3)
+    assert np.all(res == 1)
+
+
+def test_downsample_mode():
+    data = np.array([[1, 1, 0, 2], [0, 2, 0, 2], [3, 0, 5, 5], [0, 3, 6, 7]], dtype=np.uint8)
+    assert np.array_equal(downsample_mode(data), [[1, 2], [3, 5]])
+    data = np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]], dtype=np.uint16)
+    res = downsample_mode(data)
+    assert res.dtype == np.uint16
+    assert np.array_equal(res, [[1, 3], [7, 9]])
+    assert np.array_equal(downsample_mode(np.array([[True, False], [False, False]])), [[False]])
+
+
+def test_build_pyramid():
+    data = np.zeros((2, 100, 60), dtype=np.uint8)
+    data[:, 10:50, 10:30] = 2
+    data[:, 1, 1] = 1
+    assert len(build_pyramid(data)) == 1
+    levels = build_pyramid(data, labels=True, min_size=20, top_size=20)
+    assert levels[0] is data
+    assert [x.shape for x in levels] == [(2, 100, 60), (2, 50, 30), (2, 25, 15), (2, 13, 8)]
+    assert set(np.unique(levels[-1])) <= {0, 1, 2}
+    assert np.all(levels[1][:, 5:25, 5:15] == 2)
+
+
+def test_image_pyramids_cache(tmp_path, monkeypatch):
+    data = np.random.default_rng(0).integers(0, 1000, (1, 2, 2, 100, 60), dtype=np.uint16)
+    file_path = os.path.join(tmp_path, "image.tif")
+    ImageWriter.save(Image(data, (1, 1, 1), axes_order="TZCYX"), file_path)
+    image = TiffImageReader.read_image(file_path)
+    assert cache_path(image) == file_path + ".pyramid"
+
+    pyramids = image_pyramids(image, min_size=20, top_size=20)
+    assert len(pyramids) == 2
+    assert os.path.exists(cache_path(image))
+    assert all(isinstance(x, np.ndarray) for x in pyramids[1])
+
+    def _fail(*_args, **_kwargs):
+        raise AssertionError("pyramid should be read from cache")
+
+    monkeypatch.setattr(image_pyramid, "build_pyramid", _fail)
+    cached = image_pyramids(image, min_size=20, top_size=20)
+    assert all(isinstance(x, ChunkedArray) for x in cached[1][1:])
+    for levels1, levels2 in zip(pyramids, cached):
+        for level1, level2 in zip(levels1, levels2):
+            assert np.array_equal(level1, np.asarray(level2))
+    assert np.array_equal(cached[0][1][:, 5:10, 3], pyramids[0][1][:, 5:10, 3])
+    monkeypatch.undo()
+
+    image2 = image.substitute(data=image.get_data() + 1)
+    assert len(image_pyramids(image2, min_size=20, top_size=20)[0]) == 4
+    # cache was overwritten with pyramid of other data
+    monkeypatch.setattr(image_pyramid, "build_pyramid", _fail)
+    with pytest.raises(AssertionError, match="cache"):
+        image_pyramids(image, min_size=20, top_size=20)
+
+
+def test_image_pyramids_cache_closed(tmp_path):
+    data = np.zeros((1, 1, 100, 60), dtype=np.uint8)
+    file_path = os.path.join(tmp_path, "image.tif")
+    ImageWriter.save(Image(data, (1, 1, 1), axes_order="TZYX"), file_path)
+    image = TiffImageReader.read_image(file_path)
+    image_pyramids(image, min_size=20, top_size=20)
+    cached = image_pyramids(image, min_size=20, top_size=20)
+    finalizer = cached[0][1].container._finalizer  # pylint: disable=protected-access
+    assert finalizer.alive
+    del cached
+    gc.collect()
+    assert not finalizer.alive
+
+
+def test_image_pyramids_no_file():
+    image = Image(np.zeros((1, 100, 60), dtype=np.uint8), (1, 1, 1), axes_order="ZYX")
+    assert cache_path(image) == ""
+    pyramids = image_pyramids(image, min_size=20, top_size=20)
+    assert len(pyramids) == 1
+    assert len(pyramids[0]) == 4
+    assert len(image_pyramids(image)[0]) == 1
@@ -8,6 +8,7 @@ import tarfile
 from copy import deepcopy
 from enum import Enum
 from glob import glob
+from io import BytesIO, StringIO
 from pathlib import Path
 from typing import Type
 
@@ -16,15 +17,26 @@ import numpy as np
 import pandas as pd
 import pytest
 import tifffile
+from packaging.version import Version
 
 from PartSegCore import UNIT_SCALE, Units
 from PartSegCore.algorithm_describe_base import ROIExtractionProfile
-from PartSegCore.analysis import ProjectTuple
+from PartSegCore.analysis import ProjectTuple, save_functions
 from PartSegCore.analysis.calculation_plan import CalculationPlan, MaskSuffix, MeasurementCalculate
+from PartSegCore.analysis.io_utils import project_version_info
 from PartSegCore.analysis.load_functions import LoadProject
 from PartSegCore.analysis.measurement_base import Leaf, MeasurementEntry
 from PartSegCore.analysis.measurement_calculation import MEASUREMENT_DICT, MeasurementProfile
-from PartSegCore.analysis.save_functions import SaveAsNumpy, SaveAsTiff, SaveCmap, SaveProject, SaveXYZ
+from PartSegCore.analysis.save_functions import (
+    SaveAsNumpy,
+    SaveAsTiff,
+    SaveCmap,
+    SaveProject,
+    SaveXYZ,
+    SaveXYZNumpy,
+    SaveXYZParquet,
+    SaveXYZPly,
+)
 from PartSegCore.io_utils import (
     LoadBase,
     LoadPlanExcel,
@@ -45,11 +57,16 @@ from PartSegCore.mask.io_functions import (
     LoadStackImageWithMask,
     MaskProjectTuple,
     SaveComponents,
+    SaveComponentsOptions,
     SaveParametersJSON,
     SaveROI,
+    SaveROIOptions,
     save_components,
+    save_components_bundle,
+    save_stack_segmentation,
 )
 from PartSegCore.mask_create import MaskProperty
+from PartSegCore.project_container import ContainerReader, is_container
 from PartSegCore.project_info import HistoryElement, ProjectInfoBase
 from PartSegCore.roi_info import ROIInfo
 from PartSegCore.segmentation.algorithm_base import AdditionalLayerDescription
@@ -57,6 +74,7 @@ from PartSegCore.segmentation.noise_filtering import DimensionType
 from PartSegCore.segmentation.segmentation_algorithm import ThresholdAlgorithm
 from PartSegCore.utils import ProfileDict, check_loaded_dict
 from PartSegImage import Image
+from PartSegImage.lazy_array import LazyArray
 
 
 @pytest.fixture(scope="module")
@@ -447,11 +465,31 @@ class TestSegmentationMask:
             mask=stack_segmentation1.roi_info.roi,
         )
         SaveROI.save(tmp_path / "test1.seg", seg2, {"relative_path": False})
+        assert is_container(tmp_path / "test1.seg")
+        with ContainerReader(tmp_path / "test1.seg") as container:
+            assert set(container.array_names()) == {"roi", "mask"}
+            assert "history/history.json" in container
+            assert "history/arrays_0.npz" in container
+
+    def test_save_load_tar_project_with_history(self, tmp_path, stack_segmentation1, mask_property):
+        seg2 = dataclasses.replace(
+            stack_segmentation1,
+            history=[create_history_element_from_segmentation_tuple(stack_segmentation1, mask_property)],
+            selected_components=[1],
+            mask=stack_segmentation1.roi_info.roi,
+        )
+        with tarfile.open(tmp_path / "test1.seg", "w:gz") as tar_file:
+            save_stack_segmentation(tar_file, seg2, SaveROIOptions(relative_path=False))
         with tarfile.open(tmp_path / "test1.seg") as tf:
             tf.getmember("mask.tif")
             tf.getmember("segmentation.tif")
             tf.getmember("history/history.json")
             tf.getmember("history/arrays_0.npz")
+        assert not is_container(tmp_path / "test1.seg")
+        res = LoadROI.load([tmp_path / "test1.seg"])
+        assert np.all(res.roi_info.roi == seg2.roi_info.roi)
+        assert len(res.history) == 1
+        assert res.selected_components == [1]
 
     def test_load_project_with_history(self, tmp_path, stack_segmentation1, mask_property):
         image_location = tmp_path / "test1.tif"
@@ -474,6 +512,70 @@ class TestSegmentationMask:
         assert str(res.history[0].roi_extraction_parameters["parameters"]) == str(cmp_dict)
 
 
+@pytest.fixture()
+def components_project():
+    data = np.arange(2 * 30 * 60 * 60, dtype=np.uint16).reshape((1, 30, 60, 60, 2)) % 251
+    roi = np.zeros((1, 30, 60, 60), dtype=np.uint8)
+    roi[0, 2:5, 1:10, 3:20] = 1
+    roi[0, 10:20, 30:50, 40:58] = 2
+    roi[0, 25:30, 50:60, 0:5] = 3
+    roi[0, 12:15, 35:41, 42:48] = 4
+    image = Image(data, (1, 1, 1), axes_order="TZYXC", file_path="components.tif")
+    points = np.array([[0, 3, 5, 10], [0, 15, 40, 50], [0, 12, 36, 43], [0, 0, 0, 0]], dtype=float)
+    return image, ROIInfo(roi), points
+
+
+class TestSaveComponents:
+    @pytest.mark.parametrize("frame", [0, 3])
+    @pytest.mark.parametrize("mask_data", [True, False])
+    def test_same_as_full_cut(self, components_project, tmp_path, frame, mask_data):
+        image, roi_info, _ = components_project
+        parameters = SaveComponentsOptions(frame=frame, mask_data=mask_data)
+        steps = []
+        save_components(image, [], tmp_path, roi_info, parameters, step_changed=steps.append)
+        assert sorted(steps) == list(range(1, 9))
+        for i in range(1, 5):
+            expected = image.cut_image(roi_info.roi == i, replace_mask=True, frame=frame, zero_out_cut_area=mask_data)
+            data = tifffile.imread(tmp_path / f"components_component{i}.tif")
+            mask = tifffile.imread(tmp_path / f"components_component{i}_mask.tif")
+            assert np.array_equal(data, expected.get_image_for_save().squeeze())
+            assert np.array_equal(mask, expected.get_mask_for_save().squeeze())
+
+    @pytest.mark.parametrize("mask_data", [True, False])
+    def test_points(self, components_project, tmp_path, mask_data):
+        image, roi_info, points = components_project
+        parameters = SaveComponentsOptions(frame=3, mask_data=mask_data)
+        save_components(image, [2, 4], tmp_path, roi_info, parameters, points)
+        assert len(list(tmp_path.glob("*.csv"))) == 2
+        res = pd.read_csv(tmp_path / "components_component2.csv")
+        assert len(res) == 1
+        image_data = tifffile.imread(tmp_path / "components_component2.tif")
+        point = res.iloc[0, -3:].to_numpy().astype(int)
+        assert image_data[point[0], :, point[1], point[2]].tolist() == image.get_data()[:, 0, 15, 40, 50].tolist()
+
+    def test_bundle(self, components_project, tmp_path):
+        image, roi_info, points = components_project
+        parameters = SaveComponentsOptions(frame=2)
+        save_components_bundle(image, [1, 3, 4], tmp_path, roi_info, parameters, points)
+        assert {x.name for x in tmp_path.iterdir()} == {"components_components.ome.tif", "components_components.json"}
+        with open(tmp_path / "components_components.json", encoding="utf-8") as f_p:
+            index = json.load(f_p)
+        assert [x["component"] for x in index["components"]] == [1, 3, 4]
+        assert index["components"][1]["lower_bound"] == [0, 23, 48, 0]
+        assert index["components"][1]["upper_bound"] == [1, 30, 60, 7]
+        assert index["components"][2]["points"] == [[0, 2, 3, 3]]
+        with tifffile.TiffFile(tmp_path / index["file"]) as tiff:
+            assert len(tiff.series) == 6
+            for entry in index["components"]:
+                i = entry["component"]
+                expected = image.cut_image(roi_info.roi == i, replace_mask=True, frame=2, zero_out_cut_area=False)
+                data = tiff.series[entry["image_series"]].asarray()
+                mask = tiff.series[entry["mask_series"]].asarray()
+                assert tiff.series[entry["image_series"]].name == f"component{i}"
+                assert np.array_equal(data, expected.get_image_for_save().squeeze())
+                assert np.array_equal(mask, expected.get_mask_for_save().squeeze())
+
+
 class TestSaveFunctions:
     @staticmethod
     def read_cmap(file_path):
@@ -587,8 +689,46 @@ class TestSaveFunctions:
     def test_save_project(self, tmpdir, analysis_project):
         SaveProject.save(os.path.join(tmpdir, "test1.tgz"), analysis_project)
         assert os.path.exists(os.path.join(tmpdir, "test1.tgz"))
-        LoadProject.load([os.path.join(tmpdir, "test1.tgz")])
-        # TODO add more
+        load_data = LoadProject.load([os.path.join(tmpdir, "test1.tgz")])
+        image = analysis_project.image
+        assert np.all(load_data.image.get_data() == image.get_data())
+        assert load_data.image.spacing == image.spacing
+        assert load_data.image.channel_names == image.channel_names
+        assert np.all(load_data.roi_info.roi == analysis_project.roi_info.roi)
+        assert load_data.algorithm_parameters == analysis_project.algorithm_parameters
+
+    def test_save_project_buffer(self, analysis_project):
+        buffer = BytesIO()
+        SaveProject.save(buffer, analysis_project)
+        buffer.seek(0)
+        load_data = LoadProject.load([buffer])
+        assert np.all(load_data.image.get_data() == analysis_project.image.get_data())
+        assert np.all(load_data.roi_info.roi == analysis_project.roi_info.roi)
+
+    def test_load_project_lazy(self, tmp_path, analysis_project):
+        SaveProject.save(tmp_path / "test1.tgz", analysis_project)
+        load_data = LoadProject.load([tmp_path / "test1.tgz"])
+        assert isinstance(load_data.image._channel_arrays[0], LazyArray)  # pylint: disable=protected-access
+        assert np.all(load_data.image.get_data() == analysis_project.image.get_data())
+        SaveProject.save(tmp_path / "test1.tgz", load_data)
+        assert np.all(load_data.image.get_data() == analysis_project.image.get_data())
+        load_data2 = LoadProject.load([tmp_path / "test1.tgz"])
+        assert np.all(load_data2.image.get_data() == analysis_project.image.get_data())
+
+    def test_project_version(self, tmp_path, analysis_project):
+        SaveProject.save(tmp_path / "test1.tgz", analysis_project)
+        with ContainerReader(tmp_path / "test1.tgz") as container:
+            metadata = container.read_json("metadata.json")
+        assert metadata["project_version_info"] == str(project_version_info)
+        assert project_version_info > Version("1.1")
+        assert not LoadProject.load([tmp_path / "test1.tgz"]).errors
+
+    def test_load_project_roi_only(self, tmp_path, analysis_project):
+        SaveProject.save(tmp_path / "test1.tgz", analysis_project)
+        with ContainerReader(tmp_path / "test1.tgz") as container:
+            roi = container.array("roi")
+            assert roi.shape == analysis_project.roi_info.roi.shape
+            assert np.all(roi[0, 1] == analysis_project.roi_info.roi[0, 1])
 
     def test_save_tiff(self, tmpdir, analysis_project):
         SaveAsTiff.save(os.path.join(tmpdir, "test1.tiff"), analysis_project)
@@ -612,6 +752,72 @@ class TestSaveFunctions:
         array = np.load(os.path.join(tmpdir, "test1.npy"))
         assert np.all(array == analysis_project.roi_info.roi)
 
+    @staticmethod
+    def _read_ply(path):
+        with open(path, "rb") as f_p:
+            data = f_p.read()
+        header, body = data.split(b"end_header\n", 1)
+        header = header.decode("ascii").splitlines()
+        assert header[:2] == ["ply", "format binary_little_endian 1.0"]
+        types = {"int": "<i4", "ushort": "<u2", "uchar": "u1", "float": "<f4"}
+        fields = [(line.split()[2], types[line.split()[1]]) for line in header if line.startswith("property")]
+        array = np.frombuffer(body, dtype=fields)
+        assert len(array) == int(header[2].split()[2])
+        return np.column_stack([array[name] for name, _ in fields])
+
+    @pytest.mark.parametrize(
+        ("dtype", "ply_type"),
+        [
+            (np.bool_, "uchar"),
+            (np.int8, "char"),
+            (np.uint16, "ushort"),
+            (np.int32, "int"),
+            (np.int64, "double"),
+            (np.uint64, "double"),
+            (np.float32, "float"),
+            (np.float64, "double"),
+        ],
+    )
+    def test_ply_type(self, dtype, ply_type):
+        assert save_functions._ply_type(dtype) == ply_type  # pylint: disable=protected-access
+
+    @pytest.mark.parametrize("klass", [SaveXYZPly, SaveXYZNumpy, SaveXYZParquet])
+    def test_save_xyz_binary(self, tmp_path, analysis_project, klass, monkeypatch):
+        if klass is SaveXYZParquet:
+            pytest.importorskip("pyarrow")
+        # check that blocks are merged properly
+        monkeypatch.setattr(save_functions, "_POINTS_BLOCK_SIZE", 1000)
+        parameters = {"channel": 0, "separated_objects": True, "clip": True}
+        SaveXYZ.save(tmp_path / "text.xyz", analysis_project, parameters)
+        ext = klass.get_extensions()[0]
+        klass.save(tmp_path / f"test{ext}", analysis_project, parameters)
+        for suffix in ("", "_part1", "_part2"):
+            expected = pd.read_csv(tmp_path / f"text{suffix}.xyz", header=None, sep=" ").to_numpy()
+            path = tmp_path / f"test{suffix}{ext}"
+            if klass is SaveXYZPly:
+                array = self._read_ply(path)
+            elif klass is SaveXYZNumpy:
+                array = np.load(path)
+            else:
+                array = pd.read_parquet(path).to_numpy()
+            assert np.array_equal(array, expected)
+
+    def test_save_xyz_buffer(self, analysis_project):
+        buffer = BytesIO()
+        SaveXYZ.save(buffer, analysis_project, {"channel": 0, "separated_objects": False, "clip": False})
+        lines = buffer.getvalue().decode("ascii").splitlines()
+        assert len(lines) == np.count_nonzero(analysis_project.roi_info.roi)
+        with pytest.raises(ValueError, match="buffer"):
+            SaveXYZ.save(buffer, analysis_project, {"channel": 0, "separated_objects": True, "clip": False})
+
+    def test_save_xyz_text_buffer(self, analysis_project):
+        parameters = {"channel": 0, "separated_objects": False, "clip": False}
+        text_buffer = StringIO()
+        SaveXYZ.save(text_buffer, analysis_project, parameters)
+        buffer = BytesIO()
+        SaveXYZ.save(buffer, analysis_project, parameters)
+        assert text_buffer.getvalue() == buffer.getvalue().decode("ascii")
+
     @pytest.mark.parametrize(
         ("klass", "ext_li"),
         [
@@ -619,6 +825,9 @@ class TestSaveFunctions:
             (SaveAsTiff, [".tiff", ".tif"]),
             (SaveCmap, [".cmap"]),
             (SaveXYZ, [".xyz", ".txt"]),
+            (SaveXYZPly, [".ply"]),
+            (SaveXYZNumpy, [".npy"]),
+            (SaveXYZParquet, [".parquet"]),
             (SaveProject, [".tgz", ".tbz2", ".gz", ".bz2"]),
             (SaveROIAsNumpy, [".npy"]),
         ],
@@ -4,7 +4,14 @@ import numpy as np
 import pytest
 
 from PartSegCore.image_operations import RadiusType
-from PartSegCore.mask_create import MaskProperty, calculate_mask, fill_2d_holes_in_mask, fill_holes_in_mask
+from PartSegCore.mask_create import (
+    MaskProperty,
+    _cut_components,
+    calculate_mask,
+    fill_2d_holes_in_mask,
+    fill_holes_in_mask,
+)
+from PartSegCore.roi_info import ROIInfo
 from PartSegImage import Image
 
 
@@ -152,6 +159,53 @@ class TestFillHoles:
         assert np.all(mask == fill_holes_in_mask(mask2, -1))
         assert np.all(mask == fill_2d_holes_in_mask(mask2, -1))
 
+    def test_fill_many_holes(self):
+        mask = np.ones((5, 40, 40), dtype=np.uint8)
+        expected = np.ones(mask.shape, dtype=bool)
+        for i in range(1, 39, 3):
+            for j in range(1, 39, 3):
+                big = (i + j) % 2
+                mask[2, i : i + 1 + big, j] = 0
+                expected[2, i : i + 1 + big, j] = not big
+        mask[0, 5, 5] = 0
+        expected[0, 5, 5] = False
+        assert np.array_equal(fill_holes_in_mask(mask, 1), expected)
+        expected[1:] = True
+        assert np.array_equal(fill_holes_in_mask(mask, -1), expected)
+
+
+class TestCutComponents:
+    def test_cut(self):
+        mask = np.zeros((10, 20), dtype=np.uint8)
+        mask[1:4, 1:5] = 1
+        mask[6:9, 10:18] = 3
+        mask[2, 2] = 3
+        mask_copy = mask.copy()
+        image = np.arange(200, dtype=np.uint16).reshape(10, 20)
+        res = list(_cut_components(mask, image, 1))
+        assert np.array_equal(mask, mask_copy)
+        assert [x[2] for x in res] == [1, 3]
+        assert res[0][0].shape == (5, 6)
+        assert res[0][1] == (slice(1, 4), slice(1, 5))
+        assert np.array_equal(res[0][0][1:-1, 1:-1], np.where(mask[1:4, 1:5] == 1, image[1:4, 1:5], 0))
+        assert np.all(res[0][0][0] == 0)
+        assert res[1][0].shape == (9, 18)
+        assert np.count_nonzero(res[1][0]) == 25
+
+    def test_bound_info(self, monkeypatch):
+        mask = np.zeros((10, 20), dtype=np.uint8)
+        mask[1:4, 1:5] = 1
+        mask[6:9, 10:18] = 2
+        bound_info = ROIInfo.calc_bounds(mask)
+
+        def _fail(*_args):
+            raise AssertionError("bounds should not be calculated")
+
+        monkeypatch.setattr(ROIInfo, "calc_bounds", staticmethod(_fail))
+        res = list(_cut_components(mask, mask, 0, bound_info))
+        assert [x[0].shape for x in res] == [(3, 4), (3, 8)]
+        assert res[0][0].base is not mask
+
 
 class TestCalculateMask:
     def test_single(self):
@@ -447,5 +501,28 @@ class TestCalculateMask:
         mask1 = calculate_mask(mp, mask, None, (1, 1, 1))
         assert mask1.shape == mask.shape
 
+    @pytest.mark.parametrize("time_axis", [0, 1])
+    def test_time_points_independent(self, time_axis):
+        mask = np.zeros((3, 6, 12, 12), dtype=np.uint8)
+        for i in range(3):
+            mask[i, 1:5, 1 + i : 8 + i, 2:10] = 1
+            mask[i, 2:4, 3 + i : 5 + i, 4:7] = 0
+            mask[i, 1:5, 10, 10 - i] = 2
+        mask = np.moveaxis(mask, 0, time_axis)
+        mp = MaskProperty(
+            dilate=RadiusType.R2D,
+            dilate_radius=1,
+            fill_holes=RadiusType.R3D,
+            max_holes_size=-1,
+            save_components=True,
+            clip_to_mask=False,
+        )
+        mask1 = calculate_mask(mp, mask, None, (1, 1, 1), time_axis=time_axis)
+        for i in range(3):
+            single = np.take(mask, [i], axis=time_axis)
+            assert np.array_equal(
+                np.take(mask1, [i], axis=time_axis), calculate_mask(mp, single, None, (1, 1, 1), time_axis=time_axis)
+            )
+
 
 # TODO add test with touching boundaries.
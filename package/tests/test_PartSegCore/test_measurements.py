@@ -12,6 +12,7 @@ import numpy as np
 import pytest
 from sympy import symbols
 
+from PartSegCore import autofit
 from PartSegCore.algorithm_describe_base import ROIExtractionProfile
 from PartSegCore.analysis import load_metadata
 from PartSegCore.analysis.measurement_base import AreaType, Leaf, MeasurementEntry, Node, PerComponent
@@ -19,8 +20,10 @@ from PartSegCore.analysis.measurement_calculation import (
     HARALIC_FEATURES,
     MEASUREMENT_DICT,
     ColocalizationMeasurement,
+    ComponentBoundingBox,
     ComponentsInfo,
     ComponentsNumber,
+    ComponentStatistics,
     CorrelationEnum,
     Diameter,
     DistanceMaskROI,
@@ -48,8 +51,19 @@ from PartSegCore.analysis.measurement_calculation import (
     ThirdPrincipalAxisLength,
     Volume,
     Voxels,
+    convex_hull_candidates,
+    get_border,
+    min_distance,
+    min_distance_brute,
+)
+from PartSegCore.autofit import (
+    axis_projections,
+    calculate_density_momentum,
+    calculate_density_momentum_components,
+    density_mass_center,
+    density_mass_center_components,
+    projected_extent,
 )
-from PartSegCore.autofit import density_mass_center
 from PartSegCore.roi_info import ROIInfo
 from PartSegCore.segmentation.restartable_segmentation_algorithms import LowerThresholdAlgorithm
 from PartSegCore.universal_const import UNIT_SCALE, Units
@@ -208,6 +222,42 @@ class TestDiameter:
         mask = image.get_channel(0)[0] > 80
         assert Diameter.calculate_property(mask, image.spacing, 1) == 0
 
+    @pytest.mark.parametrize("seed", range(5))
+    def test_random_shape(self, seed):
+        rng = np.random.default_rng(seed)
+        mask = np.zeros((10, 40, 40), dtype=np.uint8)
+        for _ in range(5):
+            center = rng.integers(8, 32, size=2)
+            mask[2:8, center[0] - 5 : center[0] + 5, center[1] - 5 : center[1] + 5] = 1
+        pos = np.transpose(np.nonzero(get_border(mask))).astype(float) * [3, 1, 1]
+        expected = np.max(np.sum((pos[:, None] - pos[None]) ** 2, axis=2))
+        assert isclose(Diameter.calculate_property(mask, (3, 1, 1), 1), np.sqrt(expected))
+
+
+def test_convex_hull_candidates():
+    data = np.zeros((5, 10), dtype=np.uint8)
+    data[1, 2:5] = 1
+    data[2, 3] = 1
+    data[3, 1:9] = 1
+    res = convex_hull_candidates(data)
+    assert {tuple(x) for x in res} == {(1, 2), (1, 4), (2, 3), (3, 1), (3, 8)}
+    assert convex_hull_candidates(np.zeros((5, 10))).shape == (0, 2)
+
+
+class TestMinDistance:
+    @pytest.mark.parametrize("seed", range(5))
+    def test_random(self, seed):
+        rng = np.random.default_rng(seed)
+        points1 = rng.normal(size=(200, 3))
+        points2 = rng.normal(size=(50, 3)) + 3
+        assert min_distance(points1, points2) == min_distance_brute(points1, points2)
+        assert min_distance(points2, points1) == min_distance_brute(points1, points2)
+
+    def test_single_point(self):
+        points = np.array([[0, 0, 0], [1, 1, 1], [2, 2, 2]], dtype=float)
+        assert min_distance(points, np.array([[0, 0, -3]])) == 3
+        assert min_distance(np.array([[0, 0, -3]]), points) == 3
+
 
 class TestPixelBrightnessSum:
     def test_parameters(self):
@@ -498,6 +548,71 @@ class TestMoment:
         assert np.all(np.array(density_mass_center(image_array[5:6], spacing)) == np.array((0, 57, 48)))
 
 
+class TestAutofitReductions:
+    @pytest.fixture(autouse=True)
+    def _small_blocks(self, monkeypatch):
+        # force processing in many blocks
+        monkeypatch.setattr(autofit, "_BLOCK_SIZE", 300)
+
+    @staticmethod
+    def _data():
+        rng = np.random.default_rng(0)
+        image = rng.random((7, 20, 30)) * 10
+        labels = np.zeros(image.shape, dtype=np.uint8)
+        labels[1:4, 2:10, 3:12] = 1
+        labels[2:7, 12:19, 5:25] = 2
+        labels[5, 5, 5] = 4
+        return image, labels
+
+    def test_axis_projections(self):
+        image, labels = self._data()
+        projections = axis_projections(image, labels)
+        masked = image * (labels > 0)
+        assert np.allclose(projections[0], masked.sum(axis=(1, 2)))
+        assert np.allclose(projections[1], masked.sum(axis=(0, 2)))
+        assert np.allclose(projections[2], masked.sum(axis=(0, 1)))
+        assert np.allclose(axis_projections(image)[2], image.sum(axis=(0, 1)))
+
+    def test_mask_same_as_copy(self):
+        image, labels = self._data()
+        spacing = (3, 2, 1.5)
+        masked = image * (labels == 2)
+        assert np.allclose(density_mass_center(image, spacing, mask=labels == 2), density_mass_center(masked, spacing))
+        assert np.isclose(
+            calculate_density_momentum(image, spacing, mask=labels == 2), calculate_density_momentum(masked, spacing)
+        )
+        assert calculate_density_momentum(image, spacing, mask=np.zeros(image.shape)) == 0
+
+    def test_components(self):
+        image, labels = self._data()
+        spacing = (3, 2, 1.5)
+        centers = density_mass_center_components(image, labels, spacing)
+        moments = calculate_density_momentum_components(image, labels, spacing)
+        assert centers.shape == (5, 3)
+        assert moments.shape == (5,)
+        assert np.all(np.isnan(centers[[0, 3]]))
+        assert moments[0] == 0
+        assert moments[3] == 0
+        assert moments[4] == 0
+        assert np.allclose(centers[4], np.array([5, 5, 5]) * spacing)
+        for i in (1, 2):
+            assert np.allclose(centers[i], density_mass_center(image, spacing, mask=labels == i))
+            assert np.isclose(moments[i], calculate_density_momentum(image, spacing, mask=labels == i))
+        assert calculate_density_momentum_components(image, labels, spacing, components_num=2).shape == (3,)
+
+    def test_projected_extent(self):
+        image = np.zeros((5, 10, 10))
+        image[1, 2, 3] = 1
+        image[3, 7, 5] = 1
+        image[4, 9, 9] = 1
+        mask = np.ones(image.shape, dtype=bool)
+        mask[4] = False
+        assert np.allclose(projected_extent(image, np.eye(3), (2, 1, 1), mask), [4, 5, 2])
+        diagonal = np.array([[0], [1], [1]]) / np.sqrt(2)
+        assert np.allclose(projected_extent(image, diagonal, (2, 1, 1), mask), [7 / np.sqrt(2)])
+        assert projected_extent(np.zeros((3, 3)), np.eye(2), (1, 1)) is None
+
+
 class TestMainAxis:
     @pytest.mark.parametrize("method", [FirstPrincipalAxisLength, SecondPrincipalAxisLength, ThirdPrincipalAxisLength])
     def test_parameters(self, method):
@@ -2433,3 +2548,160 @@ def test_per_mask_component():
     assert df["Mask component"][1] == df["Mask component"][2] == 1
     assert df["Mask component"][3] == df["Mask component"][4] == 2
     assert df["Volume (nm**3)"][1] == df["Volume (nm**3)"][2] == df["Volume (nm**3)"][3] == df["Volume (nm**3)"][4]
+
+
+@pytest.mark.parametrize(
+    "method",
+    [
+        Volume,
+        Voxels,
+        PixelBrightnessSum,
+        MaximumPixelBrightness,
+        MinimumPixelBrightness,
+        MeanPixelBrightness,
+        MedianPixelBrightness,
+        StandardDeviationOfPixelBrightness,
+        ComponentBoundingBox,
+    ],
+)
+@pytest.mark.parametrize(
+    "area,per_component",
+    [
+        (AreaType.ROI, PerComponent.Yes),
+        (AreaType.ROI, PerComponent.Mean),
+        (AreaType.ROI, PerComponent.Per_Mask_component),
+        (AreaType.Mask, PerComponent.Yes),
+        (AreaType.Mask_without_ROI, PerComponent.Yes),
+    ],
+)
+def test_calculate_per_component_same_as_per_component_loop(method, area, per_component, monkeypatch):
+    if method is ComponentBoundingBox and (area != AreaType.ROI or per_component != PerComponent.Yes):
+        pytest.skip("bounding box is defined only for ROI components")
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 1000, size=(6, 30, 30), dtype=np.uint16)
+    roi = np.zeros(data.shape, dtype=np.uint8)
+    for i in range(5):
+        for j in range(5):
+            roi[1:-1, 1 + i * 6 : 5 + i * 6, 1 + j * 6 : 4 + j * 6] = i * 5 + j + 1
+    roi[roi == 7] = 0
+    mask = np.zeros(data.shape, dtype=np.uint8)
+    mask[:, :15] = 1
+    mask[:, 15:] = 2
+    mask[:, :, 20:] = 0
+    image = Image(data, image_spacing=(10**-8,) * 3, axes_order="ZYX", mask=mask)
+    profile = MeasurementProfile(
+        name="test",
+        chosen_fields=[
+            MeasurementEntry(
+                name="measurement",
+                calculation_tree=Leaf(name=method.get_name(), area=area, per_component=per_component),
+            )
+        ],
+    )
+    result = profile.calculate(image=image, channel_num=0, roi=roi, result_units=Units.nm)
+    monkeypatch.setattr(method, "calculate_per_component", classmethod(lambda cls, **_: None))
+    expected = profile.calculate(image=image, channel_num=0, roi=roi, result_units=Units.nm)
+    if method is ComponentBoundingBox:
+        assert result["measurement"] == expected["measurement"]
+    else:
+        assert np.allclose(result["measurement"][0], expected["measurement"][0])
+        assert result["measurement"][1] == expected["measurement"][1]
+
+
+def test_component_statistics_empty_component():
+    labels = np.zeros((10, 10), dtype=np.uint8)
+    labels[2:5, 2:5] = 1
+    channel = np.arange(100, dtype=float).reshape(10, 10)
+    statistics = ComponentStatistics(labels, channel, [1, 2])
+    assert list(statistics.counts) == [9, 0]
+    assert list(statistics.minimum) == [22, 0]
+    assert list(statistics.maximum) == [44, 0]
+    assert list(statistics.median) == [33, 0]
+    assert list(statistics.means) == [33, 0]
+    assert statistics.std[1] == 0
+    assert np.isclose(statistics.std[0], np.std(channel[labels == 1]))
+
+
+def test_component_statistics_integer_channel():
+    labels = np.zeros((10, 10), dtype=np.uint8)
+    labels[2:5, 2:5] = 1
+    labels[6:8, 6:8] = 2
+    channel = np.full((10, 10), 65000, dtype=np.uint16)
+    channel[6:8, 6:8] = 65535
+    statistics = ComponentStatistics(labels, channel, [1, 2])
+    assert list(statistics.sums) == [9 * 65000, 4 * 65535]
+    assert statistics.sums.dtype == np.sum(channel).dtype
+    assert list(statistics.median) == [65000, 65535]
+    assert list(statistics.maximum) == [65000, 65535]
+
+
+def _component_stream_data():
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 1000, size=(2, 6, 30, 30), dtype=np.uint16)
+    roi = np.zeros(data.shape, dtype=np.uint8)
+    for i in range(4):
+        for j in range(4):
+            roi[:, 1:-1, 1 + i * 7 : 6 + i * 7, 1 + j * 7 : 5 + j * 7] = 16 - (i * 4 + j)
+    roi[1, roi[1] == 3] = 0
+    image = Image(data, image_spacing=(10**-8,) * 3, axes_order="TZYX")
+    return image, roi
+
+
+@pytest.mark.parametrize(
+    "method",
+    [Volume, PixelBrightnessSum, MaximumPixelBrightness, FirstPrincipalAxisLength, Diameter, Surface, Sphericity],
+)
+@pytest.mark.parametrize("time", [0, 1])
+def test_calculate_components_same_as_calculate(method, time):
+    image, roi = _component_stream_data()
+    leaf = method.get_starting_leaf().replace_(area=AreaType.ROI, per_component=PerComponent.Yes)
+    profile = MeasurementProfile(
+        name="test",
+        chosen_fields=[
+            MeasurementEntry(name="measurement", calculation_tree=leaf),
+            MeasurementEntry(
+                name="ratio",
+                calculation_tree=Node(
+                    left=leaf,
+                    op="/",
+                    right=Volume.get_starting_leaf().replace_(area=AreaType.ROI, per_component=PerComponent.Yes),
+                ),
+            ),
+        ],
+        name_prefix="pre_",
+    )
+    assert profile.supports_component_stream()
+    expected = profile.calculate(image, 0, roi, Units.nm, time=time)
+    records = list(profile.calculate_components(image, 0, roi, Units.nm, time=time, workers=2))
+    components = [x[0] for x in records]
+    assert sorted(components) == list(expected.components_info.roi_components)
+    # components are ordered by bounding boxes
+    assert components[:4] == [16, 15, 14, 13]
+    values = dict(records)
+    for name in ["pre_measurement", "pre_ratio"]:
+        assert np.allclose(
+            [values[x][name] for x in expected.components_info.roi_components], expected[name][0], equal_nan=True
+        )
+    result = profile.calculate(image, 0, roi, Units.nm, time=time, stream_components=True)
+    for name in ["pre_measurement", "pre_ratio"]:
+        assert np.allclose(result[name][0], expected[name][0], equal_nan=True)
+        assert result[name][1] == expected[name][1]
+    assert result.get_labels() == expected.get_labels()
+
+
+def test_calculate_components_not_supported():
+    image, roi = _component_stream_data()
+    profile = MeasurementProfile(
+        name="test",
+        chosen_fields=[
+            MeasurementEntry(
+                name="volume",
+                calculation_tree=Volume.get_starting_leaf().replace_(area=AreaType.ROI, per_component=PerComponent.No),
+            ),
+        ],
+    )
+    assert not profile.supports_component_stream()
+    with pytest.raises(ValueError, match="per ROI component"):
+        next(profile.calculate_components(image, 0, roi, Units.nm))
+    result = profile.calculate(image, 0, roi, Units.nm, stream_components=True)
+    assert np.isclose(result["volume"][0], np.count_nonzero(roi[0]) * 1000)
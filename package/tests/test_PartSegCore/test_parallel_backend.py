@@ -0,0 +1,96 @@
+import time
+from dataclasses import dataclass, field
+from uuid import UUID, uuid4
+
+import pytest
+
+from PartSegCore.analysis.batch_processing.parallel_backend import BatchManager, PoolBatchManager, SubprocessOrder
+
+
+@dataclass
+class GlobalParameters:
+    shift: int
+    delay: float = 0
+    uuid: UUID = field(default_factory=uuid4)
+
+
+def shift_fun(data, global_parameters: GlobalParameters):
+    time.sleep(global_parameters.delay)
+    return data + global_parameters.shift
+
+
+def collect_results(manager, timeout=60):
+    res = []
+    for _ in range(int(timeout / 0.01)):
+        res.extend(manager.get_result())
+        if not manager.has_work:
+            break
+        time.sleep(0.01)
+    else:  # pragma: no cover
+        manager.kill_jobs()
+        pytest.fail("jobs hanged")
+    return res
+
+
+def wait_finished(manager, timeout=10):
+    for _ in range(int(timeout / 0.1)):
+        manager.join_all()
+        if manager.finished:
+            break
+        time.sleep(0.1)
+    else:  # pragma: no cover
+        manager.kill_jobs()
+        pytest.fail("process hanged")
+
+
+@pytest.mark.parametrize("manager_class", [BatchManager, PoolBatchManager])
+def test_calculate(manager_class):
+    manager = manager_class()
+    manager.set_number_of_process(2)
+    parameters = GlobalParameters(shift=10)
+    assert manager.add_work(list(range(20)), parameters, shift_fun) == parameters.uuid
+    res = collect_results(manager)
+    assert all(x[0] == parameters.uuid for x in res)
+    assert sorted(x[1] for x in res) == list(range(10, 30))
+    wait_finished(manager)
+
+
+def test_pool_multiple_works():
+    manager = PoolBatchManager()
+    manager.set_number_of_process(3)
+    parameters1 = GlobalParameters(shift=10)
+    parameters2 = GlobalParameters(shift=100)
+    manager.add_work(list(range(10)), parameters1, shift_fun)
+    manager.add_work(list(range(10)), parameters2, shift_fun)
+    res = collect_results(manager)
+    assert sorted(x[1] for x in res if x[0] == parameters1.uuid) == list(range(10, 20))
+    assert sorted(x[1] for x in res if x[0] == parameters2.uuid) == list(range(100, 110))
+    wait_finished(manager)
+    assert not manager.calculation_dict
+
+
+def test_pool_change_number_of_process():
+    manager = PoolBatchManager()
+    parameters = GlobalParameters(shift=1, delay=0.01)
+    manager.add_work(list(range(40)), parameters, shift_fun)
+    manager.set_number_of_process(3)
+    assert len(manager.process_list) == 3
+    manager.set_number_of_process(1)
+    assert len(manager.process_list) == 1
+    res = collect_results(manager)
+    assert sorted(x[1] for x in res) == list(range(1, 41))
+    wait_finished(manager)
+
+
+def test_pool_cancel_work():
+    manager = PoolBatchManager()
+    manager.set_number_of_process(1)
+    parameters = GlobalParameters(shift=1, delay=0.05)
+    manager.add_work(list(range(20)), parameters, shift_fun)
+    manager.cancel_work(parameters)
+    res = collect_results(manager)
+    assert len(res) == 20
+    canceled = [x for x in res if x[1] == (-1, [SubprocessOrder.cancel_job])]
+    assert len(canceled) > 10
+    wait_finished(manager)
+    assert not manager.canceled_jobs
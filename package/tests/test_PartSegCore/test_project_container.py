@@ -0,0 +1,166 @@
+import os
+import pickle
+import tarfile
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from PartSegCore.project_container import ContainerReader, ContainerWriter, default_chunks, is_container
+from PartSegImage.lazy_array import LazyArray
+
+
+@pytest.fixture()
+def array():
+    return np.arange(5 * 7 * 9 * 11, dtype=np.uint16).reshape(5, 7, 9, 11)
+
+
+def test_default_chunks():
+    assert default_chunks((5, 10, 20), 2) == (5, 10, 20)
+    assert default_chunks((5, 10, 20), 2, chunk_size=800) == (2, 10, 20)
+    assert default_chunks((5, 10, 20), 2, chunk_size=200) == (1, 5, 20)
+    assert default_chunks((5, 10, 20), 2, chunk_size=10) == (1, 1, 5)
+    assert default_chunks((), 2) == ()
+
+
+def test_write_read(tmp_path, array):
+    with ContainerWriter(tmp_path / "data.zip", workers=2) as writer:
+        writer.write_array("data", array, chunks=(2, 3, 9, 11), attrs={"a": 1})
+        writer.write_array("bool", array > 100)
+        writer.write_array("scalar", np.float64(5))
+        writer.write_json("info.json", {"b": [1, 2]})
+        writer.write_bytes("raw", b"1234")
+        with pytest.raises(ValueError, match="already saved"):
+            writer.write_array("data", array)
+    assert is_container(tmp_path / "data.zip")
+    with ContainerReader(tmp_path / "data.zip") as reader:
+        assert set(reader.array_names()) == {"data", "bool", "scalar"}
+        assert set(reader.names()) == {"info.json", "raw"}
+        assert "data" in reader
+        assert "info.json" in reader
+        assert "other" not in reader
+        assert np.array_equal(reader.read_array("data"), array)
+        assert reader.read_array("bool").dtype == bool
+        assert np.array_equal(reader.read_array("bool"), array > 100)
+        assert reader.read_array("scalar") == 5
+        assert reader.attrs("data") == {"a": 1}
+        assert reader.read_json("info.json") == {"b": [1, 2]}
+        assert reader.read_bytes("raw") == b"1234"
+        with pytest.raises(KeyError):
+            reader.array("other")
+
+
+def test_chunks_stored_separately(tmp_path, array):
+    with ContainerWriter(tmp_path / "data.zip") as writer:
+        writer.write_array("data", array, chunks=(2, 7, 9, 11))
+    with zipfile.ZipFile(tmp_path / "data.zip") as zip_file:
+        names = [x for x in zip_file.namelist() if x.startswith("arrays/data/")]
+        assert sorted(names) == [f"arrays/data/{i}.0.0.0" for i in range(3)]
+        assert all(zip_file.getinfo(x).compress_type == zipfile.ZIP_STORED for x in names)
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        (1,),
+        (slice(1, 4), 2),
+        (Ellipsis, slice(2, 8)),
+        (slice(None), slice(1, 6, 2), slice(None, None, -1)),
+        (slice(4, 0, -2), -1, slice(3, 3)),
+        (-2, 3, 4, 5),
+        ([0, 3], 1),
+    ],
+)
+def test_indexing(tmp_path, array, key):
+    with ContainerWriter(tmp_path / "data.zip") as writer:
+        writer.write_array("data", array, chunks=(2, 2, 4, 11))
+    with ContainerReader(tmp_path / "data.zip") as reader:
+        chunked = reader.array("data")
+        assert np.array_equal(chunked[key], array[key])
+
+
+def test_lazy_read(tmp_path, array, monkeypatch):
+    with ContainerWriter(tmp_path / "data.zip") as writer:
+        writer.write_array("data", array, chunks=(1, 7, 9, 11))
+    with ContainerReader(tmp_path / "data.zip") as reader:
+        read_names = []
+        read_bytes = reader.read_bytes
+
+        def _read_bytes(name):
+            read_names.append(name)
+            return read_bytes(name)
+
+        monkeypatch.setattr(reader, "read_bytes", _read_bytes)
+        chunked = reader.array("data")
+        assert chunked.chunk_grid == (5, 1, 1, 1)
+        assert np.array_equal(chunked[3, 1:3], array[3, 1:3])
+        assert read_names == ["arrays/data/3.0.0.0"]
+        lazy = LazyArray(chunked)
+        assert np.array_equal(np.asarray(lazy[1:3].transpose(1, 0, 2, 3)), array[1:3].transpose(1, 0, 2, 3))
+
+
+def test_buffer(array):
+    buffer = BytesIO()
+    with ContainerWriter(buffer) as writer:
+        writer.write_array("data", array)
+    buffer.seek(0)
+    assert is_container(buffer)
+    assert buffer.tell() == 0
+    with ContainerReader(buffer) as reader:
+        assert reader.file_path == ""
+        assert np.array_equal(reader.read_array("data"), array)
+
+
+def test_not_container(tmp_path):
+    with tarfile.open(tmp_path / "data.tgz", "w:gz") as tar_file:
+        tar_file.addfile(tarfile.TarInfo("empty"), BytesIO())
+    assert not is_container(tmp_path / "data.tgz")
+    with zipfile.ZipFile(tmp_path / "data.zip", "w") as zip_file:
+        zip_file.writestr("a", b"1")
+    with pytest.raises(ValueError, match="not PartSeg container"):
+        ContainerReader(tmp_path / "data.zip")
+
+
+def test_object_array(tmp_path):
+    with ContainerWriter(tmp_path / "data.zip") as writer, pytest.raises(ValueError, match="objects"):
+        writer.write_array("data", np.array([None, 1]))
+
+
+def test_overwrite_keeps_lazy_arrays(tmp_path, array):
+    with ContainerWriter(tmp_path / "data.zip") as writer:
+        writer.write_array("data", array)
+    reader = ContainerReader(tmp_path / "data.zip")
+    lazy = reader.array("data")
+    with ContainerWriter(tmp_path / "data.zip") as writer:
+        writer.write_array("data", array + 1)
+    assert np.array_equal(lazy[1], array[1])
+    reader.close()
+    with ContainerReader(tmp_path / "data.zip") as reader2:
+        assert np.array_equal(reader2.read_array("data"), array + 1)
+    assert os.listdir(tmp_path) == ["data.zip"]
+
+
+def test_pickle_reader(tmp_path, array):
+    with ContainerWriter(tmp_path / "data.zip") as writer:
+        writer.write_array("data", array)
+    with ContainerReader(tmp_path / "data.zip") as reader:
+        lazy = pickle.loads(pickle.dumps(LazyArray(reader.array("data"))))
+    assert np.array_equal(np.asarray(lazy[2]), array[2])
+    lazy.source.container.close()
+    buffer = BytesIO()
+    with ContainerWriter(buffer) as writer:
+        writer.write_array("data", array)
+    buffer.seek(0)
+    with ContainerReader(buffer) as reader, pytest.raises(TypeError, match="from path"):
+        pickle.dumps(reader)
+
+
+def test_reader_closed_on_collect(tmp_path, array):
+    with ContainerWriter(tmp_path / "data.zip") as writer:
+        writer.write_array("data", array)
+    lazy = ContainerReader(tmp_path / "data.zip").array("data")
+    zip_file = lazy.container._zip  # pylint: disable=protected-access
+    assert np.array_equal(lazy[0], array[0])
+    del lazy
+    assert zip_file.fp is None
@@ -0,0 +1,147 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from PartSegCore import project_state_store
+from PartSegCore.analysis.io_utils import ProjectTuple
+from PartSegCore.mask.io_functions import MaskProjectTuple
+from PartSegCore.project_state_store import ProjectStateStore, load_state, save_state, state_arrays
+from PartSegCore.roi_info import ROIInfo
+from PartSegImage import Image
+
+
+def _project(value=0, size=100):
+    image = Image(np.full((1, 10, size, size), value, dtype=np.float32), (1, 1, 1), axes_order="CZYX", file_path="a")
+    roi = np.zeros((10, size, size), dtype=np.uint8)
+    roi[2:5, 10:20, 10:20] = 1
+    return ProjectTuple("a", image, ROIInfo(roi).fit_to_image(image), mask=roi > 0, points=np.zeros((3, 4)))
+
+
+@pytest.mark.parametrize("raw", [True, False])
+def test_save_load_state(tmp_path, raw):
+    state = _project(3)
+    if raw:
+        state = state.get_raw_copy()
+    save_state(str(tmp_path / "state"), state)
+    loaded = load_state(str(tmp_path / "state"))
+    assert isinstance(loaded, ProjectTuple)
+    assert loaded.file_path == state.file_path
+    assert np.array_equal(loaded.image.get_data(), state.image.get_data())
+    assert loaded.image.get_data().flags.writeable
+    if raw:
+        assert loaded.roi_info.roi is None
+    else:
+        assert np.array_equal(loaded.roi_info.roi, state.roi_info.roi)
+        assert np.array_equal(loaded.mask, state.mask)
+
+
+def test_save_load_mask_state(tmp_path):
+    project = _project(2)
+    state = MaskProjectTuple("a", project.image, roi_info=project.roi_info, selected_components=[1])
+    save_state(str(tmp_path / "state"), state)
+    loaded = load_state(str(tmp_path / "state"))
+    assert loaded.selected_components == [1]
+    assert np.array_equal(loaded.roi_info.roi, state.roi_info.roi)
+
+
+def test_state_arrays():
+    state = _project()
+    assert sum(x.nbytes for x in state_arrays(state)) == 400000 + 100000 + 100000 + 96
+    raw = ProjectTuple("a", state.image)
+    assert {id(x) for x in state_arrays(raw)} <= {id(x) for x in state_arrays(state)}
+
+
+class TestProjectStateStore:
+    def test_budget(self, tmp_path):
+        store = ProjectStateStore(max_memory=500000, spill_dir=str(tmp_path))
+        for i in range(4):
+            store[i] = _project(i).get_raw_copy()
+        store.wait()
+        assert len(store) == 4
+        assert store.memory_usage <= 500000
+        assert [store.is_spilled(i) for i in range(4)] == [True, True, True, False]
+        assert np.all(store[0].image.get_data() == 0)
+        store.wait()
+        assert [store.is_spilled(i) for i in range(4)] == [False, True, True, True]
+        assert set(store) == {0, 1, 2, 3}
+        del store[1]
+        assert 1 not in store
+        store.clear()
+        assert len(store) == 0
+        assert os.listdir(os.path.join(tmp_path, os.listdir(tmp_path)[0])) == []
+
+    def test_shared_arrays(self):
+        store = ProjectStateStore(max_memory=700000)
+        state = _project()
+        store["raw"] = ProjectTuple("a", state.image)
+        store["state"] = state
+        assert not store.is_spilled("raw")
+        assert store.memory_usage == sum(x.nbytes for x in state_arrays(state))
+
+    def test_shared_arrays_spilled_together(self):
+        store = ProjectStateStore(max_memory=700000)
+        state = _project()
+        store["raw"] = ProjectTuple("a", state.image)
+        store["state"] = state
+        store["other"] = _project(1).get_raw_copy()
+        store.wait()
+        # raw state alone is not spilled as its image is still used by other state
+        assert store.is_spilled("raw")
+        assert store.is_spilled("state")
+        assert not store.is_spilled("other")
+        loaded = store["raw"]
+        assert not store.is_spilled("state")
+        assert store["state"].image is loaded.image
+
+    def test_shared_with_current(self):
+        store = ProjectStateStore(max_memory=1)
+        state = _project()
+        store["raw"] = ProjectTuple("a", state.image)
+        store["state"] = state
+        store.wait()
+        assert not store.is_spilled("raw")
+
+    def test_spill_in_background(self, monkeypatch):
+        event = threading.Event()
+
+        def _save_state(file_path, state):
+            event.wait(5)
+            save_state(file_path, state)
+
+        monkeypatch.setattr(project_state_store, "save_state", _save_state)
+        store = ProjectStateStore(max_memory=500000)
+        store[0] = _project(0).get_raw_copy()
+        store[1] = _project(1).get_raw_copy()
+        store[2] = _project(2).get_raw_copy()
+        assert not store.is_spilled(0)
+        assert np.all(store[1].image.get_data() == 1)
+        event.set()
+        store.wait()
+        assert store.is_spilled(0)
+        # state used during saving is kept in memory
+        assert not store.is_spilled(1)
+
+    def test_prefetch(self):
+        store = ProjectStateStore(max_memory=500000)
+        for i in range(3):
+            store[i] = _project(i).get_raw_copy()
+        store.wait()
+        assert store.prefetch(2) is None
+        future = store.prefetch(0)
+        assert np.all(future.result().image.get_data() == 0)
+        store.wait()
+        assert not store.is_spilled(0)
+        # currently used state is not removed by prefetch
+        assert not store.is_spilled(2)
+        assert store.is_spilled(1)
+
+    def test_replace_spilled(self):
+        store = ProjectStateStore(max_memory=500000)
+        for i in range(3):
+            store[i] = _project(i).get_raw_copy()
+        store[0] = _project(5).get_raw_copy()
+        assert np.all(store[0].image.get_data() == 5)
+        with pytest.raises(KeyError):
+            store[10]  # pylint: disable=W0104
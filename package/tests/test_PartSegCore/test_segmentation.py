@@ -20,6 +20,7 @@ from PartSegCore.roi_info import BoundInfo, ROIInfo
 from PartSegCore.segmentation import ROIExtractionAlgorithm, algorithm_base
 from PartSegCore.segmentation import restartable_segmentation_algorithms as sa
 from PartSegCore.segmentation.noise_filtering import NoiseFilterSelection
+from PartSegCore.segmentation.threshold import OtsuThreshold, ThresholdSelection
 from PartSegCore.segmentation.watershed import FlowMethodSelection
 from PartSegImage import Image
 
@@ -153,6 +154,58 @@ class BaseOneThreshold(BaseThreshold, ABC):  # pylint: disable=W0223
         result = alg.calculation_run(empty)
         self.check_result(result, [96000 + 5 + 72000 + 5], operator.eq, parameters)
 
+    def test_minimum_size_change(self, monkeypatch):
+        image = self.get_base_object()
+        alg: sa.ThresholdBaseAlgorithm = self.get_algorithm_class()()
+        parameters = self.get_parameters()
+        alg.set_image(image)
+        alg.set_parameters(parameters)
+        result = alg.calculation_run(empty)
+        self.check_result(result, [96000, 72000], operator.eq, parameters)
+        assert alg.calculation_run(empty) is None
+
+        def raise_fun(*_args, **_kwargs):
+            raise AssertionError("should not be called")
+
+        monkeypatch.setattr(sa.SimpleITK, "ConnectedComponent", raise_fun)
+        monkeypatch.setattr(ROIInfo, "calc_bounds", raise_fun)
+        parameters.minimum_size = 80000
+        alg.set_parameters(parameters)
+        result = alg.calculation_run(empty)
+        self.check_result(result, [96000], operator.eq, parameters)
+        assert list(result.roi_info.bound_info) == [1]
+        assert np.all(result.roi_info.sizes == np.bincount(result.roi.flat))
+        assert result.roi_annotation == {1: {"component": 1, "voxels": 96000}}
+
+        parameters.minimum_size = 30000
+        alg.set_parameters(parameters)
+        result2 = alg.calculation_run(empty)
+        self.check_result(result2, [96000, 72000], operator.eq, parameters)
+        assert list(result2.roi_info.bound_info) == [1, 2]
+        assert np.all(result2.roi_info.sizes == np.bincount(result2.roi.flat))
+        assert np.all(result2.roi[result.roi > 0] == 1)
+
+    def test_threshold_statistics_cache(self):
+        image = self.get_base_object()
+        alg: sa.ThresholdBaseAlgorithm = self.get_algorithm_class()()
+        parameters = self.get_parameters()
+        parameters.threshold = ThresholdSelection(
+            name=OtsuThreshold.get_name(), values=OtsuThreshold.get_default_values()
+        )
+        alg.set_image(image)
+        alg.set_parameters(parameters)
+        alg.calculation_run(empty)
+        statistics = alg._threshold_statistics[2]
+        assert any(isinstance(key, tuple) and key[0] == "histogram" for key in statistics._cache)
+        assert not {"sitk_image", "sitk_mask", "values", "sorted"} & set(statistics._cache)
+
+        alg.set_mask(image.get_channel(0)[0] > 0)
+        assert alg._threshold_statistics is None
+        alg.calculation_run(empty)
+        assert alg._threshold_statistics is not None
+        alg.set_image(image)
+        assert alg._threshold_statistics is None
+
 
 class TestLowerThreshold(BaseOneThreshold):
     parameters = sa.LowerThresholdAlgorithm.__argument_class__(
@@ -759,6 +812,68 @@ class TestConvexFill:
     def test__convex_fill(self):
         arr = np.zeros((20, 20), dtype=bool)
         assert _convex_fill(arr) is None
+        arr[5, 5:10] = 1
+        assert _convex_fill(arr) is None
+        arr[10, 7] = 1
+        res = _convex_fill(arr)
+        assert res.sum() == 14
+        assert np.array_equal(res[6:10, 7], [1, 1, 1, 1])
+
+    def test_triangle(self):
+        arr = np.zeros((20, 20), dtype=np.uint8)
+        arr[2, 2] = 1
+        arr[2, 12] = 1
+        arr[12, 2] = 1
+        res = convex_fill(arr)
+        expected = np.zeros((20, 20), dtype=bool)
+        for i in range(11):
+            expected[2 + i, 2 : 13 - i] = True
+        assert np.array_equal(res > 0, expected)
+
+    def test_overlap_order(self):
+        arr = np.zeros((20, 20), dtype=np.uint8)
+        arr[2:18, 2] = 1
+        arr[2:18, 17] = 1
+        arr[8:12, 8:12] = 2
+        res = convex_fill(arr.copy())
+        assert np.all(res[2:18, 2:18] == 1)
+        arr[8:12, 8:12] = 0
+        arr[10:19, 10] = 2
+        arr[10, 10:19] = 2
+        res = convex_fill(arr.copy())
+        assert np.all(res[2:18, 2:18] == 1)
+        assert res[18, 10] == 2
+        assert res[10, 18] == 2
+        assert np.count_nonzero(res == 2) == 2
+
+    def test_hull_3d(self):
+        arr = np.zeros((10, 20, 20), dtype=np.uint8)
+        arr[2, 2:8, 2:8] = 1
+        arr[7, 2, 2] = 1
+        res_2d = convex_fill(arr.copy())
+        assert np.count_nonzero(res_2d) == 37
+        res_3d = convex_fill(arr.copy(), hull_3d=True)
+        expected = np.zeros(arr.shape, dtype=bool)
+        for i in range(6):
+            expected[2 + i, 2 : 8 - i, 2 : 8 - i] = True
+        assert np.array_equal(res_3d > 0, expected)
+
+    def test_hull_3d_flat(self):
+        arr = np.zeros((10, 20, 20), dtype=np.uint8)
+        arr[2, 2:8, 2] = 1
+        arr[2, 2, 2:8] = 1
+        res = convex_fill(arr.copy(), hull_3d=True)
+        assert np.count_nonzero(res) == 21
+        assert np.count_nonzero(res[2]) == 21
+
+    @pytest.mark.parametrize("hull_3d", [True, False])
+    def test_workers(self, hull_3d):
+        arr = np.zeros((10, 50, 50), dtype=np.uint8)
+        for i in range(4):
+            for j in range(4):
+                arr[2:8, 2 + 12 * i : 10 + 12 * i, 2 + 12 * j] = 4 * i + j + 1
+                arr[2:8, 2 + 12 * i, 2 + 12 * j : 10 + 12 * j] = 4 * i + j + 1
+        assert np.array_equal(convex_fill(arr.copy(), hull_3d, workers=1), convex_fill(arr.copy(), hull_3d))
 
 
 class TestSegmentationInfo:
@@ -817,6 +932,46 @@ class TestSegmentationInfo:
         assert np.all(si.bound_info[1].lower == 2)
         assert np.all(si.bound_info[1].upper == [10 * comp_num - 1, 8])
 
+    def test_precalculated(self, monkeypatch):
+        data = np.zeros((10, 10), dtype=np.uint8)
+        data[2:8, 2:8] = 1
+        base = ROIInfo(data)
+
+        def raise_fun(*_args, **_kwargs):
+            raise AssertionError("should not be called")
+
+        monkeypatch.setattr(ROIInfo, "calc_bounds", raise_fun)
+        si = ROIInfo(data, bound_info=base.bound_info, sizes=base.sizes)
+        assert np.array_equal(si.roi, data)
+        assert si.bound_info is base.bound_info
+        assert si.sizes is base.sizes
+
+    def test_input_change(self):
+        data = np.zeros((10, 10), dtype=np.uint8)
+        data[2:8, 2:8] = 1
+        si = ROIInfo(data)
+        data[:] = 0
+        data[0, 0] = 2
+        assert np.all(si.roi[2:8, 2:8] == 1)
+        assert si.roi[0, 0] == 0
+        assert list(si.bound_info) == [1]
+        assert si.sizes[1] == 36
+
+    def test_fit_to_image(self):
+        data = np.zeros((10, 20), dtype=np.uint8)
+        data[2:8, 3:9] = 1
+        data[1, 12:15] = 2
+        si = ROIInfo(data)
+        image = Image(np.zeros((1, 1, 10, 20), dtype=np.uint8), (1, 1, 1), axes_order="TZYX")
+        si2 = si.fit_to_image(image)
+        expected = ROIInfo(si2.roi)
+        assert si2.roi.shape == (1, 1, 10, 20)
+        assert set(si2.bound_info) == set(expected.bound_info)
+        for num, bound in expected.bound_info.items():
+            assert np.all(si2.bound_info[num].lower == bound.lower)
+            assert np.all(si2.bound_info[num].upper == bound.upper)
+        assert np.all(si2.sizes == expected.sizes)
+
 
 def test_bound_info():
     bi = BoundInfo(lower=np.array([1, 1, 1]), upper=np.array([5, 6, 7]))
@@ -0,0 +1,79 @@
+import multiprocessing
+import pickle
+import uuid
+
+import numpy as np
+import pytest
+
+from PartSegCore.analysis.batch_processing.shared_arrays import SharedArrayRegistry
+
+
+@pytest.fixture()
+def registry():
+    registry = SharedArrayRegistry(uuid.uuid4().hex[:8], ["a", "b"])
+    yield registry
+    registry.unlink()
+
+
+def _sum_shared(registry: SharedArrayRegistry, key: str):
+    array = registry.get(key)
+    res = None if array is None else int(array.sum())
+    del array
+    registry.close()
+    return res
+
+
+def test_publish_get(registry):
+    assert registry.get("a") is None
+    data = np.arange(12, dtype=np.uint16).reshape(3, 4)
+    shared = registry.publish("a", data)
+    assert np.array_equal(shared, data)
+    assert shared.dtype == data.dtype
+    assert not shared.flags.writeable
+    assert np.array_equal(registry.get("a"), data)
+    assert registry.get("b") is None
+    del shared
+    registry.close()
+    assert np.array_equal(registry.get("a"), data)
+
+
+def test_not_shared_key(registry):
+    data = np.arange(5)
+    assert "c" not in registry
+    assert registry.publish("c", data) is data
+    assert registry.get("c") is None
+
+
+def test_get_or_publish(registry):
+    calls = []
+
+    def fun():
+        calls.append(1)
+        return np.ones((5, 5), dtype=np.uint8)
+
+    assert registry.get_or_publish("a", fun).sum() == 25
+    assert registry.get_or_publish("a", fun).sum() == 25
+    assert len(calls) == 1
+
+
+def test_publish_existing(registry):
+    registry.publish("a", np.zeros(10))
+    registry2 = pickle.loads(pickle.dumps(registry))
+    assert registry2.keys == registry.keys
+    assert np.all(registry2.publish("a", np.ones(10)) == 0)
+    registry2.close()
+
+
+def test_other_process(registry):
+    registry.publish("a", np.arange(10))
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        assert pool.apply(_sum_shared, (registry, "a")) == 45
+        assert pool.apply(_sum_shared, (registry, "b")) is None
+
+
+def test_unlink(registry):
+    registry.publish("a", np.arange(10))
+    registry.unlink()
+    assert registry.get("a") is None
+    registry.unlink()
@@ -12,8 +12,9 @@ from PartSegCore.segmentation.border_smoothing import (
     OpeningSmoothingParams,
     VoteSmoothing,
     VoteSmoothingParams,
+    _neighbour_count,
 )
-from PartSegCore.segmentation.watershed import NeighType
+from PartSegCore.segmentation.watershed import NeighType, get_neighbourhood
 
 
 class TestVoteSmoothing:
@@ -583,3 +584,54 @@ class TestOpeningSmooth:
         for pos in itertools.product([2, -3], repeat=2):
             res2[(0, *pos)] = 0
         assert np.all(res2 == res)
+
+
+def _vote_reference(data, neighbourhood_type, support_level, max_steps):
+    neighbourhood = get_neighbourhood(data.squeeze().shape, neighbourhood_type)
+    padded = np.pad(data > 0, 1).astype(np.uint8)
+    for _ in range(max_steps):
+        count = sum(np.roll(padded, shift, (0, 1, 2)) for shift in neighbourhood)
+        padded[count < support_level] = 0
+    return np.where(padded[1:-1, 1:-1, 1:-1] > 0, data, 0)
+
+
+class TestVoteSmoothingEngine:
+    def test_border(self):
+        data = np.zeros((1, 10, 10), dtype=np.uint8)
+        data[0, :, :3] = 1
+        data[0, ::2, -1] = 2
+        res = VoteSmoothing.smooth(data, VoteSmoothingParams(neighbourhood_type=NeighType.sides, support_level=1))
+        # no wrap around between first and last column
+        assert np.all(res[0, :, -1] == 0)
+        assert np.all(res[0, :, :3] == 1)
+        res = VoteSmoothing.smooth(data, VoteSmoothingParams(neighbourhood_type=NeighType.sides, support_level=3))
+        assert np.all(res[0, :, 1] == 1)
+        assert np.all(res[0, [0, -1]][:, [0, 2]] == 0)
+        assert np.count_nonzero(res) == 26
+
+    @pytest.mark.parametrize("neighbourhood_type", list(NeighType))
+    @pytest.mark.parametrize("max_steps", [1, 3])
+    @pytest.mark.parametrize("shape", [(12, 20, 20), (1, 30, 30)])
+    def test_random(self, neighbourhood_type, max_steps, shape):
+        data = (np.random.default_rng(0).random(shape) > 0.4).astype(np.uint8)
+        data[data > 0] = 5
+        for support_level in (2, 4, 7, 11):
+            params = IterativeSmoothingParams(
+                neighbourhood_type=neighbourhood_type, support_level=support_level, max_steps=max_steps
+            )
+            res = IterativeVoteSmoothing.smooth(data, params)
+            assert np.array_equal(res, _vote_reference(data, neighbourhood_type, support_level, max_steps))
+
+    def test_neighbour_count(self):
+        data = np.zeros((5, 5, 5), dtype=np.uint8)
+        data[2, 2, 2] = 1
+        for neighbourhood_type in NeighType:
+            count = _neighbour_count(data, neighbourhood_type)
+            assert np.count_nonzero(count) == neighbourhood_type.value
+            assert count[2, 2, 2] == 0
+
+    def test_empty(self):
+        data = np.zeros((5, 5, 5), dtype=np.uint8)
+        res = VoteSmoothing.smooth(data, VoteSmoothingParams(neighbourhood_type=NeighType.sides, support_level=2))
+        assert np.all(res == 0)
+        assert res is not data
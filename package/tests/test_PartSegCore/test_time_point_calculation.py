@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from PartSegCore.algorithm_describe_base import ROIExtractionProfile
+from PartSegCore.analysis.measurement_base import AreaType, Leaf, MeasurementEntry, PerComponent
+from PartSegCore.analysis.measurement_calculation import TIME_POINT_STR, MeasurementProfile
+from PartSegCore.analysis.time_point_calculation import (
+    TimePointTask,
+    calculate_time_point,
+    get_time_point,
+    iterate_time_points,
+    time_points_to_dataframe,
+)
+from PartSegCore.segmentation.restartable_segmentation_algorithms import LowerThresholdAlgorithm
+from PartSegCore.universal_const import Units
+from PartSegImage import Image
+
+
+@pytest.fixture
+def time_image():
+    data = np.zeros((4, 3, 20, 20), dtype=np.uint16)
+    for t in range(4):
+        data[t, :, 2 : 4 + t, 2:6] = 100
+        data[t, :, 10:15, 10:15] = 200
+    return Image(data, (10**-9, 10**-9, 10**-9), axes_order="TZYX")
+
+
+@pytest.fixture
+def segmentation_profile():
+    values = LowerThresholdAlgorithm.get_default_values().copy(update={"minimum_size": 1})
+    values.threshold.values.threshold = 50
+    return ROIExtractionProfile(name="test", algorithm=LowerThresholdAlgorithm.get_name(), values=values)
+
+
+@pytest.fixture
+def measurement_profile():
+    chosen_fields = [
+        MeasurementEntry(
+            name="Volume",
+            calculation_tree=Leaf(name="Volume", area=AreaType.ROI, per_component=PerComponent.Yes),
+        ),
+        MeasurementEntry(
+            name="Components number",
+            calculation_tree=Leaf(name="Components number", area=AreaType.ROI, per_component=PerComponent.No),
+        ),
+    ]
+    return MeasurementProfile(name="test", chosen_fields=chosen_fields)
+
+
+def test_get_time_point(time_image):
+    mask = np.zeros(time_image.shape, dtype=np.uint8)
+    mask[2] = 1
+    image, time_mask = get_time_point(time_image, 2, mask)
+    assert image.times == 1
+    assert np.array_equal(image.get_channel(0), time_image.get_channel(0)[2:3])
+    assert time_mask.shape == image.shape
+    assert np.all(time_mask == 1)
+
+
+@pytest.mark.parametrize("max_pending", [1, None])
+def test_iterate_time_points(time_image, segmentation_profile, measurement_profile, max_pending):
+    results = list(
+        iterate_time_points(
+            time_image,
+            segmentation_profile,
+            measurement_profile,
+            units=Units.nm,
+            workers_num=2,
+            max_pending=max_pending,
+        )
+    )
+    assert [x[TIME_POINT_STR][0] for x in results] == [0, 1, 2, 3]
+    for t, result in enumerate(results):
+        assert result["Components number"][0] == 2
+        assert sorted(result["Volume"][0]) == [3 * (2 + t) * 4, 3 * 5 * 5]
+
+    df = time_points_to_dataframe(results)
+    assert df.shape == (8, 4)
+    assert list(df.columns) == [TIME_POINT_STR, "Segmentation component", "Volume", "Components number"]
+    assert list(df[TIME_POINT_STR]) == [0, 0, 1, 1, 2, 2, 3, 3]
+
+
+def test_calculate_time_point_same_as_iterate(time_image, segmentation_profile, measurement_profile):
+    image, mask = get_time_point(time_image, 1)
+    channel = segmentation_profile.values.channel
+    result = calculate_time_point(
+        TimePointTask(1, image, mask, segmentation_profile, measurement_profile, channel, Units.nm)
+    )
+    assert result[TIME_POINT_STR][0] == 1
+    assert result.get_separated()[0][0] == 1
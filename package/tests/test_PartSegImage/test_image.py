@@ -1,4 +1,5 @@
 # pylint: disable=R0201
+import itertools
 import os
 
 import numpy as np
@@ -433,6 +434,109 @@ class TestInheritanceAdditionalAxesImage(TestImageBase):
     image_class = AdditionalAxesImage
 
 
+class TestImageFromChannels:
+    def test_views(self):
+        data1 = np.zeros((3, 10, 10), dtype=np.uint8)
+        data2 = np.arange(300, dtype=np.uint16).reshape((3, 10, 10))
+        image = Image.from_channels(
+            [data1, data2], (1, 1, 1), axes_order="ZYX", channel_names=["a", "b"], ranges=[(0, 1), (0, 299)]
+        )
+        assert image.channels == 2
+        assert image.channel_names == ["a", "b"]
+        assert image.get_ranges() == [(0, 1), (0, 299)]
+        assert np.shares_memory(image.get_channel(0), data1)
+        assert np.shares_memory(image.get_channel(1), data2)
+        assert image.get_channel(0).dtype == np.uint8
+        assert image.dtype == np.uint16
+        assert image.get_data().shape == (2, 1, 3, 10, 10)
+
+    def test_calculate_ranges(self):
+        data = np.arange(300, dtype=np.uint16).reshape((3, 10, 10))
+        image = Image.from_channels([data, data + 5], (1, 1, 1), axes_order="ZYX")
+        assert image.get_ranges() == [(0, 299), (5, 304)]
+        image = Image.from_channels([data, data + 5], (1, 1, 1), axes_order="ZYX", ranges=[None, (0, 1000)])
+        assert image.get_ranges() == [(0, 299), (0, 1000)]
+        assert image.channel_names == ["channel 1", "channel 2"]
+
+    def test_fail(self):
+        with pytest.raises(ValueError, match="At least one"):
+            Image.from_channels([], (1, 1, 1), axes_order="ZYX")
+        with pytest.raises(ValueError, match="different shapes"):
+            Image.from_channels([np.zeros((3, 10, 10)), np.zeros((4, 10, 10))], (1, 1, 1), axes_order="ZYX")
+        with pytest.raises(ValueError, match="Number of ranges"):
+            Image.from_channels([np.zeros((3, 10, 10))], (1, 1, 1), axes_order="ZYX", ranges=[(0, 1), (0, 1)])
+
+
+class TestImageStatistics:
+    @staticmethod
+    def _image():
+        data = np.zeros((2, 10, 20, 3), dtype=np.uint16)
+        data[..., 0] = 5
+        data[1, 2:5, 3:7, 1] = 100
+        data[..., 2] = np.arange(20)
+        return Image(data, (1, 1, 1), axes_order="ZYXC", channel_names=["a", "b", "c"])
+
+    def test_lazy_ranges(self, monkeypatch):
+        image = self._image()
+        assert image._known_ranges() == [None, None, None]
+        assert image.get_ranges() == [(5, 5), (0, 100), (0, 19)]
+        monkeypatch.setattr(Image, "_calculate_channel_range", lambda x: pytest.fail("ranges should be cached"))
+        assert image.get_ranges() == [(5, 5), (0, 100), (0, 19)]
+        image = Image(np.zeros((10, 20, 2)), (1, 1, 1), axes_order="YXC", ranges=[(0, 10)])
+        assert image._known_ranges() == [(0, 10), None]
+
+    def test_statistics(self):
+        image = self._image()
+        counts, edges = image.get_channel_histogram("b", bins=10)
+        assert counts.sum() == 2 * 10 * 20
+        assert counts[-1] == 12
+        assert edges[0] == 0
+        assert edges[-1] == 100
+        assert image.get_channel_histogram(1, bins=10) is image.get_channel_histogram("b", bins=10)
+        assert image.get_channel_mean_std(0) == (5, 0)
+        mean, std = image.get_channel_mean_std(2)
+        assert mean == pytest.approx(9.5)
+        assert std == pytest.approx(np.std(np.arange(20)))
+
+    def test_propagate(self):
+        image = self._image()
+        ranges = image.get_ranges()
+        mean_std = image.get_channel_mean_std(1)
+        image2 = image.substitute()
+        assert image2._known_ranges() == ranges
+        assert image2._statistics[(1, "mean_std")] == mean_std
+        image3 = image.swap_time_and_stack()
+        assert image3._known_ranges() == ranges
+        assert (1, "mean_std") in image3._statistics
+        merged = image.merge(Image(np.ones((2, 10, 20)), (1, 1, 1), axes_order="ZYX"), "C")
+        assert merged._known_ranges() == [*ranges, None]
+        assert merged.get_ranges()[3] == (1, 1)
+        assert (1, "mean_std") in merged._statistics
+
+    def test_invalidate(self):
+        image = self._image()
+        image.get_ranges()
+        image.get_channel_mean_std(1)
+        image2 = image.substitute(data=image.get_data() + 1)
+        assert image2._known_ranges() == [None, None, None]
+        assert image2.get_ranges() == [(6, 6), (1, 101), (1, 20)]
+        assert image2.get_channel_mean_std(0) == (6, 0)
+        image3 = Image(np.zeros((10, 20, 3)), (1, 1, 1), axes_order="YXC", ranges=[(0, 1)] * 3)
+        assert image3.substitute(data=image3.get_data() + 1).get_ranges() == [(0, 1)] * 3
+
+    def test_cut_image(self, monkeypatch):
+        image = self._image()
+        monkeypatch.setattr(Image, "_calculate_channel_range", lambda x: pytest.fail("ranges should not be calculated"))
+        cut = image.cut_image([slice(None), slice(0, 1), slice(2, 5), slice(3, 7)])
+        assert cut._known_ranges() == [None, None, None]
+        assert not cut._statistics
+        monkeypatch.undo()
+        image.get_ranges()
+        assert (
+            image.cut_image([slice(None), slice(0, 1), slice(2, 5), slice(3, 7)])._known_ranges() == image.get_ranges()
+        )
+
+
 class TestMergeImage:
     @pytest.mark.parametrize("check_dtype", [np.uint8, np.uint16, np.uint32, np.float16, np.float32, np.float64])
     def test_merge_chanel(self, check_dtype):
@@ -512,3 +616,62 @@ def test_cut_with_roi():
         assert cut_image[0].shape == (1, 1, 15, 15)
         assert np.all(cut_image[0][0, 0, 2:-2, 2:-2][diam > 0])
         assert np.all(cut_mask[0, 0, 2:-2, 2:-2] == diam)
+
+
+class ChunkedArray:
+    """Array-like which records read chunks"""
+
+    def __init__(self, array: np.ndarray, chunks):
+        self.array = array
+        self.chunks = chunks
+        self.shape = array.shape
+        self.dtype = array.dtype
+        self.ndim = array.ndim
+        self.read_chunks = set()
+
+    def __getitem__(self, key):
+        ranges = [range(size)[x] for x, size in zip(key, self.shape)]
+        ranges = [x if isinstance(x, range) else range(x, x + 1) for x in ranges]
+        chunk_ranges = [range(x.start // c, (x[-1] // c) + 1) if x else range(0) for x, c in zip(ranges, self.chunks)]
+        self.read_chunks.update(itertools.product(*chunk_ranges))
+        return self.array[key]
+
+
+class TestChunkedImage:
+    @staticmethod
+    def create(chunks=(1, 1, 1, 10, 10)):
+        data = np.arange(3 * 4 * 5 * 20 * 20, dtype=np.uint32).reshape((3, 4, 5, 20, 20)) % 1000
+        return data, ChunkedArray(data, chunks)
+
+    def test_read_only_touched_chunks(self):
+        data, chunked = self.create()
+        image = Image(chunked, (1, 1, 1), axes_order="CTZYX")
+        chunked.read_chunks.clear()
+        assert np.array_equal(image.get_data_by_axis(c=1, T=2, Z=3), data[1, 2, 3])
+        assert len(chunked.read_chunks) == 4
+        chunked.read_chunks.clear()
+        with pytest.deprecated_call():
+            assert np.array_equal(image.get_layer(1, 2), data[:, 1, 2])
+        assert len(chunked.read_chunks) == 12
+        chunked.read_chunks.clear()
+        cut = image.cut_image([slice(0, 1), slice(1, 2), slice(3, 7), slice(5, 8)], frame=0)
+        assert np.array_equal(cut.get_data(), data[:, :1, 1:2, 3:7, 5:8])
+        assert len(chunked.read_chunks) == 3
+
+    def test_channel_last(self):
+        data, chunked = self.create()
+        data = np.moveaxis(data, 0, -1)
+        chunked = ChunkedArray(data, (1, 1, 10, 10, 1))
+        image = Image(chunked, (1, 1, 1), axes_order="TZYXC")
+        assert image.channels == 3
+        assert image.ranges == [(np.min(data[..., i]), np.max(data[..., i])) for i in range(3)]
+        chunked.read_chunks.clear()
+        assert np.array_equal(image.get_channel(2)[1], data[1, ..., 2])
+        assert np.array_equal(image.get_data(), np.moveaxis(data, -1, 0))
+
+    def test_dask_array(self):
+        da = pytest.importorskip("dask.array")
+        data, _ = self.create()
+        image = Image(da.from_array(data, chunks=(1, 1, 1, 10, 10)), (1, 1, 1), axes_order="CTZYX")
+        assert np.array_equal(image.get_data_by_axis(c=0, T=1), data[0, 1])
+        assert np.array_equal(image.get_data(), data)
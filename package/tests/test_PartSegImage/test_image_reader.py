@@ -11,6 +11,7 @@ import tifffile
 
 import PartSegData
 from PartSegImage import CziImageReader, GenericImageReader, Image, ObsepImageReader, OifImagReader, TiffImageReader
+from PartSegImage.lazy_array import LazyArray
 
 
 class TestImageClass:
@@ -130,6 +131,41 @@ class TestImageClass:
         assert image.channels == 3
 
 
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_tiff_lazy_read(tmp_path, compression):
+    data = np.random.default_rng(0).integers(0, 1000, size=(3, 4, 2, 10, 12), dtype=np.uint16)
+    tifffile.imwrite(tmp_path / "test.tif", data, imagej=True, compression=compression)
+    image = TiffImageReader.read_image(tmp_path / "test.tif")
+    lazy_image = TiffImageReader.read_image(tmp_path / "test.tif", lazy=True)
+    assert lazy_image.shape == image.shape
+    assert not any(isinstance(x, np.ndarray) and not isinstance(x, np.memmap) for x in lazy_image._channel_arrays)
+    assert lazy_image.ranges == image.ranges
+    assert np.array_equal(lazy_image.get_channel(1), image.get_channel(1))
+    assert np.array_equal(lazy_image.get_data_by_axis(c=0, T=1, Z=2), image.get_data_by_axis(c=0, T=1, Z=2))
+    assert np.array_equal(
+        lazy_image.cut_image([slice(None), slice(1, 3), slice(2, 5), slice(3, 9)]).get_data(),
+        image.cut_image([slice(None), slice(1, 3), slice(2, 5), slice(3, 9)]).get_data(),
+    )
+
+
+@pytest.mark.parametrize("shape", [(4, 2, 10, 12), (4, 10, 12), (10, 12)])
+def test_tiff_lazy_read_less_axes(tmp_path, shape):
+    data = np.random.default_rng(0).integers(0, 1000, size=shape, dtype=np.uint16)
+    tifffile.imwrite(tmp_path / "test.tif", data, imagej=True, compression="zlib")
+    image = TiffImageReader.read_image(tmp_path / "test.tif")
+    lazy_image = TiffImageReader.read_image(tmp_path / "test.tif", lazy=True)
+    assert lazy_image.shape == image.shape
+    assert all(isinstance(x, LazyArray) for x in lazy_image._channel_arrays)
+    assert np.array_equal(lazy_image.get_data(), image.get_data())
+
+
+def test_tiff_lazy_read_buffer():
+    with open(PartSegData.segmentation_mask_default_image, "rb") as f_p:
+        buffer = BytesIO(f_p.read())
+    image = TiffImageReader.read_image(buffer, lazy=True)
+    assert type(image._channel_arrays[0]) is np.ndarray
+
+
 class CustomImage(Image):
     axis_order = "TCXYZ"
 
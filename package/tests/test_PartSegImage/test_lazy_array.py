@@ -0,0 +1,99 @@
+import pickle
+
+import numpy as np
+import pytest
+import tifffile
+
+from PartSegImage.lazy_array import LazyArray, TiffPagesArray, normalize_key
+
+
+@pytest.fixture
+def array():
+    return np.arange(2 * 3 * 4 * 5).reshape((2, 3, 4, 5))
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        1,
+        (slice(None), 2),
+        (Ellipsis, 3),
+        (1, slice(1, 3), Ellipsis, slice(None, None, 2)),
+        (slice(3, 1), 0),
+        (0, slice(None, None, -1)),
+        (np.int64(1), [0, 2]),
+    ],
+)
+def test_lazy_array_getitem(array, key):
+    lazy = LazyArray(array)
+    assert np.array_equal(np.asarray(lazy[key]), array[key])
+
+
+def test_normalize_key():
+    assert normalize_key(1, 3) == (1, slice(None), slice(None))
+    assert normalize_key((Ellipsis, 2), 3) == (slice(None), slice(None), 2)
+    assert normalize_key((0, [1, 2]), 3) is None
+    with pytest.raises(IndexError, match="too many indices"):
+        normalize_key((0, 0, 0), 2)
+
+def test_lazy_array_views(array):
+    lazy = LazyArray(array)
+    assert lazy.shape == array.shape
+    assert lazy.dtype == array.dtype
+    assert np.array_equal(np.asarray(lazy.transpose(2, 0, 3, 1)), array.transpose(2, 0, 3, 1))
+    assert np.array_equal(np.asarray(lazy.T[1:3]), array.T[1:3])
+    assert np.array_equal(np.asarray(np.moveaxis(lazy, [0, 1], [3, 2])), np.moveaxis(array, [0, 1], [3, 2]))
+    assert np.array_equal(np.asarray(np.swapaxes(lazy, 0, 2)), np.swapaxes(array, 0, 2))
+    assert np.array_equal(np.asarray(lazy.take(1, axis=2)), array.take(1, axis=2))
+    reshaped = lazy[:1].reshape((1, 1, 3, 4, 5, 1))
+    assert isinstance(reshaped, LazyArray)
+    assert np.array_equal(np.asarray(reshaped), array[:1].reshape((1, 1, 3, 4, 5, 1)))
+    assert np.array_equal(np.asarray(reshaped[0, :, 1, ..., 0]), array[:1].reshape((1, 1, 3, 4, 5, 1))[0, :, 1, ..., 0])
+    assert np.array_equal(np.asarray(reshaped.squeeze()), array[0])
+    assert np.array_equal(lazy.reshape(-1), array.reshape(-1))
+    assert lazy.astype(np.float32).dtype == np.float32
+
+
+def test_lazy_array_read_only_requested(array):
+    class Source:
+        shape = array.shape
+        dtype = array.dtype
+
+        def __init__(self):
+            self.keys = []
+
+        def __getitem__(self, key):
+            self.keys.append(key)
+            return array[key]
+
+    source = Source()
+    lazy = np.moveaxis(LazyArray(source), 0, 3)[1, 2]
+    assert not source.keys
+    assert np.array_equal(np.asarray(lazy), np.moveaxis(array, 0, 3)[1, 2])
+    assert source.keys == [(slice(0, 2, 1), 1, 2, slice(0, 5, 1))]
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_tiff_pages_array(tmp_path, compression):
+    data = np.random.default_rng(0).integers(0, 1000, size=(3, 4, 2, 10, 12), dtype=np.uint16)
+    tifffile.imwrite(tmp_path / "test.tif", data, imagej=True, compression=compression)
+    pages_array = TiffPagesArray(tmp_path / "test.tif", cache_size=4)
+    assert pages_array.shape == data.shape
+    assert pages_array.axes == "TZCYX"
+    assert np.array_equal(pages_array[1, 2:4, :, 3:5], data[1, 2:4, :, 3:5])
+    assert np.array_equal(pages_array[...], data)
+    assert len(pages_array._cache) == 4  # pylint: disable=protected-access
+    assert np.array_equal(np.asarray(LazyArray(pages_array)[2, 3, 1]), data[2, 3, 1])
+    pages_array2 = pickle.loads(pickle.dumps(pages_array))
+    assert np.array_equal(pages_array2[2], data[2])
+    pages_array.close()
+    pages_array2.close()
+
+
+def test_tiff_pages_array_close_on_collect(tmp_path):
+    tifffile.imwrite(tmp_path / "test.tif", np.zeros((2, 10, 12), dtype=np.uint8))
+    pages_array = TiffPagesArray(tmp_path / "test.tif")
+    pages_array.get_page(0)
+    tiff_file = pages_array._tiff_file  # pylint: disable=protected-access
+    del pages_array
+    assert tiff_file.filehandle.closed